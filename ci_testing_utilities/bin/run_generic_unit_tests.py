@@ -55,6 +55,82 @@ def _do_generic_tests():
     my_unittests["runtests.py"] = "python3 -m unittest -v harness_unit_tests.test_runtests"
     my_unittests_return_code["runtests.py"] = 0
 
+    # Add test for status_file.py module.
+    my_unittests["status_file.py"] = "python3 -m unittest -v harness_unit_tests.test_status_file"
+    my_unittests_return_code["status_file.py"] = 0
+
+    # Add test for influx_shipper.py module.
+    my_unittests["influx_shipper.py"] = "python3 -m unittest -v harness_unit_tests.test_influx_shipper"
+    my_unittests_return_code["influx_shipper.py"] = 0
+
+    # Add test for status_database.py module.
+    my_unittests["status_database.py"] = "python3 -m unittest -v harness_unit_tests.test_status_database"
+    my_unittests_return_code["status_database.py"] = 0
+
+    # Add test for status_watcher.py module.
+    my_unittests["status_watcher.py"] = "python3 -m unittest -v harness_unit_tests.test_status_watcher"
+    my_unittests_return_code["status_watcher.py"] = 0
+
+    # Add test for schedulers module.
+    my_unittests["schedulers"] = "python3 -m unittest -v harness_unit_tests.test_schedulers"
+    my_unittests_return_code["schedulers"] = 0
+
+    # Add test for regression_test.py module.
+    my_unittests["regression_test.py"] = "python3 -m unittest -v harness_unit_tests.test_regression_test"
+    my_unittests_return_code["regression_test.py"] = 0
+
+    # Add test for driver_pool.py module.
+    my_unittests["driver_pool.py"] = "python3 -m unittest -v harness_unit_tests.test_driver_pool"
+    my_unittests_return_code["driver_pool.py"] = 0
+
+    # Add test for task_dag.py module.
+    my_unittests["task_dag.py"] = "python3 -m unittest -v harness_unit_tests.test_task_dag"
+    my_unittests_return_code["task_dag.py"] = 0
+
+    # Add test for build_cache.py module.
+    my_unittests["build_cache.py"] = "python3 -m unittest -v harness_unit_tests.test_build_cache"
+    my_unittests_return_code["build_cache.py"] = 0
+
+    # Add test for source_copy.py module.
+    my_unittests["source_copy.py"] = "python3 -m unittest -v harness_unit_tests.test_source_copy"
+    my_unittests_return_code["source_copy.py"] = 0
+
+    # Add test for rte_cache.py module.
+    my_unittests["rte_cache.py"] = "python3 -m unittest -v harness_unit_tests.test_rte_cache"
+    my_unittests_return_code["rte_cache.py"] = 0
+
+    # Add test for linux_utilities.py module.
+    my_unittests["linux_utilities.py"] = "python3 -m unittest -v harness_unit_tests.test_linux_utilities"
+    my_unittests_return_code["linux_utilities.py"] = 0
+
+    # Add test for template_engine.py module.
+    my_unittests["template_engine.py"] = "python3 -m unittest -v harness_unit_tests.test_template_engine"
+    my_unittests_return_code["template_engine.py"] = 0
+
+    # Add test for process_supervisor.py module.
+    my_unittests["process_supervisor.py"] = "python3 -m unittest -v harness_unit_tests.test_process_supervisor"
+    my_unittests_return_code["process_supervisor.py"] = 0
+
+    # Add test for submission_pipeline.py module.
+    my_unittests["submission_pipeline.py"] = "python3 -m unittest -v harness_unit_tests.test_submission_pipeline"
+    my_unittests_return_code["submission_pipeline.py"] = 0
+
+    # Add test for packed_submission.py module.
+    my_unittests["packed_submission.py"] = "python3 -m unittest -v harness_unit_tests.test_packed_submission"
+    my_unittests_return_code["packed_submission.py"] = 0
+
+    # Add test for harness_daemon.py module.
+    my_unittests["harness_daemon.py"] = "python3 -m unittest -v harness_unit_tests.test_harness_daemon"
+    my_unittests_return_code["harness_daemon.py"] = 0
+
+    # Add test for startup_time module.
+    my_unittests["startup_time"] = "python3 -m unittest -v harness_unit_tests.test_startup_time"
+    my_unittests_return_code["startup_time"] = 0
+
+    # Add test for event_records.py module.
+    my_unittests["event_records.py"] = "python3 -m unittest -v harness_unit_tests.test_event_records"
+    my_unittests_return_code["event_records.py"] = 0
+
     for module_name,test_command_line in my_unittests.items():
         args = shlex.split(test_command_line)
         my_test_process = subprocess.run(args)
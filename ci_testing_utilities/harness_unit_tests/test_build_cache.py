@@ -0,0 +1,221 @@
+#! /usr/bin/env python3
+""" Test class module verifies the content-addressed build cache. """
+
+# System imports
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+
+# Local imports
+from libraries.build_cache import BuildCache
+from libraries.rgt_loggers import rgt_logger_factory
+from machine_types.base_machine import BaseMachine
+
+class Test_build_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.scratch_dir, 'Source')
+        os.makedirs(os.path.join(self.source_dir, 'src'))
+        with open(os.path.join(self.source_dir, 'src', 'main.c'), 'w') as file_obj:
+            file_obj.write('int main() { return 0; }\n')
+        self.cache = BuildCache(os.path.join(self.scratch_dir, 'cache'), 1024 * 1024)
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _key(self, environment=None, build_command='make', test_environment=None, instance_paths=()):
+        if environment is None:
+            environment = {'PATH' : '/usr/bin', 'PWD' : '/tmp'}
+        return BuildCache.make_key([self.source_dir], environment, build_command,
+                                   test_environment or {}, instance_paths=instance_paths)
+
+    def _make_build(self, build_dir, contents):
+        os.makedirs(build_dir)
+        binary = os.path.join(build_dir, 'a.out')
+        with open(binary, 'w') as file_obj:
+            file_obj.write(contents)
+        os.chmod(binary, 0o755)
+        os.symlink('a.out', os.path.join(build_dir, 'link_to_binary'))
+
+    def test_key(self):
+        """ Tests that the key changes with the sources, environment, build command and [EnvVars] only. """
+        key = default_key = self._key()
+        self.assertEqual(self._key(environment={'PATH' : '/usr/bin', 'PWD' : '/elsewhere', 'SHLVL' : '2'}), key)
+        self.assertNotEqual(self._key(environment={'PATH' : '/opt/bin'}), key)
+        self.assertNotEqual(self._key(build_command='make -j'), key)
+        self.assertNotEqual(self._key(test_environment={'OMP_NUM_THREADS' : '4'}), key)
+
+        # The paths of the test instance do not change the key.
+        key = self._key(environment={'TEST_BUILD_DIR' : '/ws/1.1/build_directory'},
+                        instance_paths=['/ws/1.1/build_directory'])
+        self.assertEqual(self._key(environment={'TEST_BUILD_DIR' : '/ws/2.1/build_directory'},
+                                   instance_paths=['/ws/2.1/build_directory']), key)
+
+        # The per-run bookkeeping variables of the harness do not change the key.
+        key = self._key(environment={'PATH' : '/usr/bin',
+                                     'RGT_RTE_CACHE_DIR' : '/runs/harness_log_files.1/rte_cache',
+                                     'RGT_PACK_DIR' : '/runs/harness_log_files.1/packed_submissions'})
+        self.assertEqual(self._key(environment={'PATH' : '/usr/bin',
+                                                'RGT_RTE_CACHE_DIR' : '/runs/harness_log_files.2/rte_cache',
+                                                'RGT_SUBMIT_RATE_FILE' : '/runs/submit_rate.json',
+                                                'RGT_NUM_WORKERS' : '8',
+                                                'RGT_KILL_GRACE' : '5',
+                                                'RGT_INFLUX_BATCH_SIZE' : '100'}), key)
+        self.assertEqual(key, default_key)
+
+        # The harness variables describing the machine change the key.
+        self.assertNotEqual(self._key(environment={'PATH' : '/usr/bin', 'RGT_MACHINE_NAME' : 'frontier'}), key)
+        self.assertNotEqual(self._key(environment={'PATH' : '/usr/bin', 'RGT_TEST_RUNARCHIVE_DIR' : '/ra/1.1'}), key)
+
+        with open(os.path.join(self.source_dir, 'src', 'main.c'), 'a') as file_obj:
+            file_obj.write('// changed\n')
+        self.assertNotEqual(self._key(), default_key)
+        return
+
+    def test_store_and_restore(self):
+        """ Tests that a restored build replaces the build directory, keeping modes and links. """
+        key = self._key()
+        build_dir = os.path.join(self.scratch_dir, 'build_1')
+        self.assertFalse(self.cache.restore(key, build_dir))
+        self._make_build(build_dir, 'binary')
+        self.cache.store(key, build_dir)
+
+        new_build_dir = os.path.join(self.scratch_dir, 'build_2')
+        os.makedirs(new_build_dir)
+        with open(os.path.join(new_build_dir, 'stale.txt'), 'w') as file_obj:
+            file_obj.write('stale')
+        self.assertTrue(self.cache.restore(key, new_build_dir))
+        self.assertEqual(sorted(os.listdir(new_build_dir)), ['a.out', 'link_to_binary'])
+        self.assertTrue(os.stat(os.path.join(new_build_dir, 'a.out')).st_mode & stat.S_IXUSR)
+        self.assertEqual(os.readlink(os.path.join(new_build_dir, 'link_to_binary')), 'a.out')
+        return
+
+    def test_lru_eviction(self):
+        """ Tests that the least recently used builds are evicted above the size of the cache. """
+        cache = BuildCache(os.path.join(self.scratch_dir, 'small_cache'), 65 * 1024)
+        for (index, key) in enumerate(('old', 'used', 'new')):
+            build_dir = os.path.join(self.scratch_dir, f'build_{key}')
+            self._make_build(build_dir, 'x' * 15 * 1024)
+            cache.store(key, build_dir)
+            tarball = os.path.join(cache.cache_dir, key + '.tar')
+            os.utime(tarball, (1000 + index, 1000 + index))
+
+        # Restoring 'used' makes 'old' the least recently used build.
+        self.assertTrue(cache.restore('used', os.path.join(self.scratch_dir, 'restored')))
+        build_dir = os.path.join(self.scratch_dir, 'build_newest')
+        self._make_build(build_dir, 'x' * 15 * 1024)
+        cache.store('newest', build_dir)
+        self.assertEqual(sorted(os.listdir(cache.cache_dir)), ['new.tar', 'newest.tar', 'used.tar'])
+        return
+
+class _Test_config:
+    test_environment = {}
+
+    def get_build_command(self):
+        return './build.sh'
+
+class _Apptest:
+
+    def __init__(self, scratch_dir, test_id, logger):
+        self.__scratch_dir = scratch_dir
+        self.__test_id = test_id
+        self.logger = logger
+
+    def get_path_to_source(self):
+        return os.path.join(self.__scratch_dir, 'Source')
+
+    def get_path_to_scripts(self):
+        return os.path.join(self.__scratch_dir, 'Scripts')
+
+    def get_path_to_workspace_build(self):
+        return os.path.join(self.__scratch_dir, 'workspace', self.__test_id, 'build_directory')
+
+    def get_path_to_workspace_run(self):
+        return os.path.join(self.__scratch_dir, 'workspace', self.__test_id, 'workdir')
+
+    def get_path_to_status(self):
+        return os.path.join(self.__scratch_dir, 'Status', self.__test_id)
+
+    def get_path_to_runarchive(self):
+        return os.path.join(self.__scratch_dir, 'Run_Archive', self.__test_id)
+
+class _Machine(BaseMachine):
+    """ A machine whose build writes a binary, and which counts the copies of the source. """
+
+    def __init__(self, apptest):
+        super().__init__('test_machine', None, None, 1, 1, 1, apptest)
+        self.copies = 0
+        self.builds = 0
+
+    @property
+    def test_config(self):
+        return _Test_config()
+
+    @property
+    def build_runtime_environment_command_file(self):
+        return ""
+
+    @property
+    def submit_runtime_environment_command_file(self):
+        return ""
+
+    @property
+    def check_runtime_environment_command_file(self):
+        return ""
+
+    def _copy_source_to_build_directory(self):
+        self.copies += 1
+        super()._copy_source_to_build_directory()
+
+    def _build_executable(self, new_env):
+        self.builds += 1
+        with open('a.out', 'w') as file_obj:
+            file_obj.write('binary')
+        return 0
+
+class Test_build_executable_with_build_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.scratch_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.scratch_dir, 'Source'))
+        os.makedirs(os.path.join(self.scratch_dir, 'Scripts'))
+        with open(os.path.join(self.scratch_dir, 'Source', 'main.c'), 'w') as file_obj:
+            file_obj.write('int main() { return 0; }\n')
+        os.environ['RGT_BUILD_CACHE_DIR'] = os.path.join(self.scratch_dir, 'cache')
+        os.environ['RGT_SOURCE_COPY_STRATEGY'] = 'copy'
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_build_executable_with_build_cache',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'build_cache_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def test_hit_does_not_copy_source(self):
+        """ Tests that a build restored from the cache does not copy the source first. """
+        machine1 = _Machine(_Apptest(self.scratch_dir, '1.1', self.logger))
+        self.assertEqual(machine1.build_executable(), 0)
+        self.assertEqual((machine1.copies, machine1.builds, machine1.build_cache_hit), (1, 1, False))
+        self.assertEqual(sorted(os.listdir(machine1.apptest.get_path_to_workspace_build())), ['a.out', 'main.c'])
+
+        machine2 = _Machine(_Apptest(self.scratch_dir, '2.1', self.logger))
+        self.assertEqual(machine2.build_executable(), 0)
+        self.assertEqual((machine2.copies, machine2.builds, machine2.build_cache_hit), (0, 0, True))
+        self.assertEqual(machine2.build_cache_key, machine1.build_cache_key)
+        self.assertEqual(sorted(os.listdir(machine2.apptest.get_path_to_workspace_build())), ['a.out', 'main.c'])
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+#! /usr/bin/env python3
+""" Test class module verifies the isolation of calls in the test_harness_driver process pool. """
+
+# System imports
+import unittest
+import logging
+import os
+import shutil
+import socket
+import sys
+import tempfile
+
+# Local imports
+from libraries import driver_pool
+from libraries.rgt_loggers import rgt_logger_factory
+
+def _change_worker_state(argv):
+    """ Changes the state a driver changes, and fails with the exit status in argv. """
+    (scratch_dir, exit_status) = argv
+    print(f"cwd={os.getcwd()}")
+    os.system("echo from a child process")
+    os.environ['RGT_DRIVER_POOL_TEST'] = 'set'
+    sys.path.insert(0, scratch_dir)
+    rgt_logger_factory.create_rgt_logger(logger_name='driver_pool_test',
+                                         fh_filepath=os.path.join(scratch_dir, 'driver_pool_test.log'),
+                                         logger_threshold_log_level='CRITICAL',
+                                         fh_threshold_log_level='CRITICAL',
+                                         ch_threshold_log_level='CRITICAL')
+    os.chdir('/')
+    if exit_status == 'exit':
+        sys.exit("driver error")
+    return exit_status
+
+def _report_worker_state(argv):
+    """ Prints the state left by earlier calls on the worker. """
+    (scratch_dir,) = argv
+    print(f"cwd={os.getcwd()}")
+    print(f"env={os.environ.get('RGT_DRIVER_POOL_TEST')}")
+    print(f"caller_env={os.environ.get('RGT_DRIVER_POOL_CALLER')}")
+    print(f"sys_path={scratch_dir in sys.path}")
+    print(f"handlers={len(logging.getLogger('driver_pool_test').handlers)}")
+    return 0
+
+def _submit_influx_record(argv):
+    """ Queues an Influx record for the unreachable InfluxDB in argv, and returns without flushing it. """
+    (influx_uri, spool_path) = argv
+    os.environ['RGT_INFLUX_URI'] = influx_uri
+    os.environ['RGT_INFLUX_TOKEN'] = 'token'
+    os.environ['RGT_INFLUX_MAX_RETRIES'] = '1'
+    os.environ['RGT_INFLUX_HTTP_TIMEOUT'] = '1'
+    from libraries.influx_shipper import get_influx_shipper
+    shipper = get_influx_shipper()
+    if shipper is None:
+        return 2
+    shipper.submit('events,test_id=1 event_value="0" 1', spool_path)
+    return 0
+
+class _Test_config:
+
+    def __init__(self, test_environment):
+        self.test_environment = test_environment
+
+    def get_build_command(self):
+        return 'echo "a=${POOL_TEST_A:-unset} b=${POOL_TEST_B:-unset}"'
+
+class _Machine:
+    """ The attributes of a machine used by linux_utilities.build_executable. """
+
+    def __init__(self, test_environment, logger):
+        self.test_config = _Test_config(test_environment)
+        self.logger = logger
+        self.separate_build_stdio = False
+        self.process_results = {}
+
+def _build_with_env_vars(argv):
+    """ Runs the build command of a test with the [EnvVars] in argv, and prints its output. """
+    (scratch_dir, test_environment) = argv
+    from machine_types import linux_utilities
+    logger = rgt_logger_factory.create_rgt_logger(logger_name='driver_pool_build_test',
+                                                  fh_filepath=os.path.join(scratch_dir, 'driver_pool_test.log'),
+                                                  logger_threshold_log_level='CRITICAL',
+                                                  fh_threshold_log_level='CRITICAL',
+                                                  ch_threshold_log_level='CRITICAL')
+    exit_status = linux_utilities.build_executable(_Machine(test_environment, logger), None)
+    with open('output_build.txt') as file_obj:
+        print(file_obj.read(), end='')
+    return exit_status
+
+class Test_driver_pool(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.scratch_dir = tempfile.mkdtemp()
+        self.scripts_dir = os.path.join(self.scratch_dir, 'Scripts')
+        os.makedirs(self.scripts_dir)
+        # One worker, so every call runs on the process changed by the previous one.
+        os.environ['RGT_DRIVER_POOL_WORKERS'] = '1'
+        return
+
+    def tearDown(self):
+        driver_pool.shutdown_driver_pool()
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def test_calls_are_isolated(self):
+        """ Tests that the cwd, environment, sys.path and log handlers are restored after each call. """
+        (stdout, stderr, exit_status) = driver_pool.run_in_driver_pool(_change_worker_state,
+                                                                       [self.scratch_dir, 3],
+                                                                       self.scripts_dir,
+                                                                       capture_output=True)
+        self.assertEqual(exit_status, 3)
+        self.assertEqual(stdout, f"cwd={self.scripts_dir}\nfrom a child process\n")
+
+        os.environ['RGT_DRIVER_POOL_CALLER'] = 'caller'
+        (stdout, stderr, exit_status) = driver_pool.run_in_driver_pool(_report_worker_state,
+                                                                       [self.scratch_dir],
+                                                                       self.scratch_dir,
+                                                                       capture_output=True)
+        self.assertEqual(exit_status, 0)
+        self.assertEqual(stdout, (f"cwd={self.scratch_dir}\n"
+                                  "env=None\n"
+                                  "caller_env=caller\n"
+                                  "sys_path=False\n"
+                                  "handlers=0\n"))
+        return
+
+    def test_env_vars_do_not_leak(self):
+        """ Tests that the [EnvVars] of a build do not leak into the build of the next test on the worker. """
+        (stdout, stderr, exit_status) = driver_pool.run_in_driver_pool(_build_with_env_vars,
+                                                                       [self.scratch_dir, {'pool_test_a' : '1'}],
+                                                                       self.scripts_dir,
+                                                                       capture_output=True)
+        self.assertEqual(exit_status, 0, stderr)
+        self.assertEqual(stdout, "a=1 b=unset\n")
+
+        (stdout, stderr, exit_status) = driver_pool.run_in_driver_pool(_build_with_env_vars,
+                                                                       [self.scratch_dir, {'pool_test_b' : '2'}],
+                                                                       self.scripts_dir,
+                                                                       capture_output=True)
+        self.assertEqual(exit_status, 0, stderr)
+        self.assertEqual(stdout, "a=unset b=2\n")
+        return
+
+    def test_influx_records_are_spooled(self):
+        """ Tests that the Influx records of a call are spooled, although the workers skip the atexit handlers. """
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        spool_path = os.path.join(self.scratch_dir, 'influx_spool.txt')
+        (stdout, stderr, exit_status) = driver_pool.run_in_driver_pool(_submit_influx_record,
+                                                                       [f"http://127.0.0.1:{port}/api/v2/write", spool_path],
+                                                                       self.scripts_dir,
+                                                                       capture_output=True)
+        if exit_status == 2:
+            self.skipTest("the requests module is not available")
+        self.assertEqual(exit_status, 0, stderr)
+        driver_pool.shutdown_driver_pool()
+        self.assertTrue(os.path.exists(spool_path))
+        return
+
+    def test_exit_with_message(self):
+        """ Tests that sys.exit with a message fails the call, like the driver script would. """
+        (stdout, stderr, exit_status) = driver_pool.run_in_driver_pool(_change_worker_state,
+                                                                       [self.scratch_dir, 'exit'],
+                                                                       self.scripts_dir,
+                                                                       capture_output=True)
+        self.assertEqual(exit_status, 1)
+        self.assertEqual(stderr, "driver error\n")
+        return
+
+    def test_unknown_backend(self):
+        """ Tests that an unknown RGT_DRIVER_BACKEND is rejected. """
+        os.environ['RGT_DRIVER_BACKEND'] = 'threads'
+        with self.assertRaises(ValueError):
+            driver_pool.get_driver_backend()
+        os.environ.pop('RGT_DRIVER_BACKEND')
+        self.assertEqual(driver_pool.get_driver_backend(), driver_pool.DRIVER_BACKEND_SUBPROCESS)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
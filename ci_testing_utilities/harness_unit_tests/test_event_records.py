@@ -0,0 +1,115 @@
+#! /usr/bin/env python3
+""" Test class module verifies the event records of test instances and their events.jsonl file. """
+
+# System imports
+import unittest
+import glob
+import os
+import shutil
+import tempfile
+
+# Local imports
+from libraries import event_records
+from libraries.event_records import EventRecord
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.rgt_loggers import rgt_logger_factory
+from libraries.status_file import StatusFile
+from libraries.status_file_factory import StatusFileFactory
+
+class Test_event_records(unittest.TestCase):
+
+    def setUp(self):
+        self.__startingDirectory = os.getcwd()
+        self.__saved_environ = dict(os.environ)
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.scratch_dir, 'App', 'Test')
+        self.status_dir = os.path.join(self.test_dir, apptest_layout.test_status_dirname, '1000.1')
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_scripts_dirname))
+        os.makedirs(self.status_dir)
+        os.chdir(os.path.join(self.test_dir, apptest_layout.test_scripts_dirname))
+
+        os.environ['USER'] = os.getenv('USER', 'harness')
+        os.environ['RGT_PATH_TO_SSPACE'] = os.path.join(self.scratch_dir, 'scratch')
+        os.environ['RGT_MACHINE_NAME'] = 'machine=1'
+        for key in ('RGT_INFLUX_URI', 'RGT_INFLUX_TOKEN', 'RGT_SYSTEM_LOG_TAG', 'RGT_STATUS_FILE_BACKEND',
+                    'RGT_EVENT_JSONL'):
+            os.environ.pop(key, None)
+
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_event_records',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'event_records_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        return
+
+    def tearDown(self):
+        os.chdir(self.__startingDirectory)
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _log_events(self):
+        path_to_status_file = os.path.join(self.test_dir, apptest_layout.test_status_dirname,
+                                           apptest_layout.test_status_filename)
+        sfile = StatusFileFactory.create(path_to_status_file=path_to_status_file, logger=self.logger)
+        sfile.initialize_subtest('launch_1', '1000.1')
+        sfile.log_event(StatusFile.EVENT_BUILD_START)
+        sfile.log_custom_event('build', 'resources', 'exit_status=0,max_rss_kb=1024')
+        sfile.log_event(StatusFile.EVENT_BUILD_END, '0')
+        return
+
+    def test_jsonl_matches_event_files(self):
+        """ Tests that events.jsonl holds the events of the event files, with values containing '='. """
+        os.environ['RGT_EVENT_JSONL'] = '1'
+        self._log_events()
+
+        with open(event_records.get_path_to_events_jsonl(self.status_dir)) as file_obj:
+            self.assertEqual(len(file_obj.readlines()), 4)
+        from_jsonl = event_records.read_event_records(self.status_dir)
+
+        os.remove(event_records.get_path_to_events_jsonl(self.status_dir))
+        from_files = event_records.read_event_records(self.status_dir)
+
+        self.assertEqual(list(from_jsonl), ['Event_110_logging_start.txt', 'Event_120_build_start.txt',
+                                            'Event_build_resources.txt', 'Event_130_build_end.txt'])
+        self.assertEqual(sorted(from_jsonl), sorted(from_files))
+        for (event_filename, record) in from_jsonl.items():
+            self.assertEqual(record.fields, from_files[event_filename].fields)
+            self.assertEqual(record.event_time, from_files[event_filename].event_time)
+
+        resources = from_jsonl['Event_build_resources.txt']
+        self.assertEqual(resources.event_value, 'exit_status=0,max_rss_kb=1024')
+        self.assertNotIn('exit_status', resources.fields)
+        self.assertEqual(resources.fields['machine'], 'machine=1')
+        self.assertEqual(resources.event_name, 'build_resources')
+        self.assertIsNotNone(resources.event_datetime)
+        return
+
+    def test_jsonl_and_event_files(self):
+        """ Tests that the events missing from events.jsonl are read from their files, in order of time. """
+        self._log_events()
+        self.assertFalse(os.path.exists(event_records.get_path_to_events_jsonl(self.status_dir)))
+
+        # The last event is only in events.jsonl, and a line cut short is ignored.
+        with open(os.path.join(self.status_dir, 'Event_130_build_end.txt')) as file_obj:
+            build_end = EventRecord.from_event_file_line('Event_130_build_end.txt', file_obj.readline())
+        os.remove(os.path.join(self.status_dir, 'Event_130_build_end.txt'))
+        event_records.append_event_record(self.status_dir, build_end)
+        with open(event_records.get_path_to_events_jsonl(self.status_dir), 'a') as file_obj:
+            file_obj.write('{"event_filename": "Event_140_')
+
+        records = event_records.read_event_records(self.status_dir)
+        self.assertEqual(list(records), ['Event_110_logging_start.txt', 'Event_120_build_start.txt',
+                                         'Event_build_resources.txt', 'Event_130_build_end.txt'])
+        self.assertEqual(records['Event_130_build_end.txt'].event_value, '0')
+        self.assertEqual(event_records.read_event_record(self.status_dir, 'Event_120_build_start.txt').fields['app'],
+                         'App')
+        self.assertIsNone(event_records.read_event_record(self.status_dir, 'Event_180_binary_execute_end.txt'))
+        self.assertEqual(len(glob.glob(os.path.join(self.status_dir, 'Event_*.txt'))), 3)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
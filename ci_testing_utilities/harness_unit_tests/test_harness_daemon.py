@@ -0,0 +1,156 @@
+#! /usr/bin/env python3
+""" Test class module verifies the harness daemon serving the callbacks of the batch jobs. """
+
+# System imports
+import unittest
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+
+# Local imports
+from libraries import harness_daemon
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.rgt_loggers import rgt_logger_factory
+
+class Test_harness_daemon(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.__startingDirectory = os.getcwd()
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.scratch_dir, 'App', 'Test')
+        self.scripts_dir = os.path.join(self.test_dir, apptest_layout.test_scripts_dirname)
+        self.unique_id = '1000.1'
+        self.status_dir = os.path.join(self.test_dir, apptest_layout.test_status_dirname, self.unique_id)
+        self.ra_dir = os.path.join(self.test_dir, apptest_layout.test_run_archive_dirname, self.unique_id)
+        os.makedirs(self.scripts_dir)
+        os.makedirs(self.status_dir)
+        os.makedirs(os.path.join(self.ra_dir, apptest_layout.test_logfile_dirname))
+
+        os.environ['USER'] = os.getenv('USER', 'harness')
+        os.environ['RGT_PATH_TO_SSPACE'] = os.path.join(self.scratch_dir, 'scratch')
+        for key in ('RGT_HARNESS_DAEMON_SOCKET', 'RGT_STATUS_FILE_BACKEND', 'RGT_INFLUX_URI',
+                    'RGT_INFLUX_TOKEN', 'RGT_SYSTEM_LOG_TAG'):
+            os.environ.pop(key, None)
+
+        self.socket_path = os.path.join(self.scratch_dir, 'harness.sock')
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_harness_daemon',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'harness_daemon_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        self.daemon = None
+        return
+
+    def tearDown(self):
+        if self.daemon is not None:
+            self.daemon.shutdown()
+            self.thread.join()
+        os.chdir(self.__startingDirectory)
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _start_daemon(self):
+        self.daemon = harness_daemon.HarnessDaemon(self.socket_path, logger=self.logger)
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+        return
+
+    def _event_file(self, name):
+        return os.path.join(self.status_dir, name)
+
+    def test_log_event(self):
+        """ Tests that the daemon logs events in the environment of the client, without changing its own. """
+        self._start_daemon()
+        self.assertEqual(harness_daemon.call_daemon({'op' : 'ping'}, socket_path=self.socket_path)['pid'],
+                         os.getpid())
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+        cwd = os.getcwd()
+        harness_daemon.log_event(self.scripts_dir, self.unique_id, 'BINARY_EXECUTE_START',
+                                 socket_path=self.socket_path)
+        harness_daemon.log_event(self.scripts_dir, self.unique_id, 'BINARY_EXECUTE_END',
+                                 socket_path=self.socket_path)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertTrue(os.path.exists(self._event_file('Event_170_binary_execute_start.txt')))
+        self.assertTrue(os.path.exists(self._event_file('Event_180_binary_execute_end.txt')))
+        with open(self._event_file('Event_170_binary_execute_start.txt')) as file_obj:
+            self.assertIn(f"rgt_path_to_sspace={os.environ['RGT_PATH_TO_SSPACE']}", file_obj.read())
+
+        with self.assertRaises(harness_daemon.DaemonError):
+            harness_daemon.log_event(self.scripts_dir, self.unique_id, 'CHECK_END', socket_path=self.socket_path)
+        with self.assertRaises(harness_daemon.DaemonError):
+            harness_daemon.call_daemon({'op' : 'no_such_op'}, socket_path=self.socket_path)
+        with self.assertRaises(harness_daemon.DaemonError):
+            harness_daemon.run_check(self.ra_dir, '1000.2', socket_path=self.socket_path)
+        return
+
+    def test_socket_in_use(self):
+        """ Tests that a stale socket is replaced, and a live one is not. """
+        with self.assertRaises(OSError):
+            harness_daemon.call_daemon({'op' : 'ping'}, socket_path=self.socket_path)
+
+        with open(self.socket_path, 'w') as file_obj:
+            file_obj.write('')
+        self._start_daemon()
+        with self.assertRaises(OSError):
+            harness_daemon.HarnessDaemon(self.socket_path)
+
+        harness_daemon.call_daemon({'op' : 'shutdown'}, socket_path=self.socket_path)
+        self.thread.join()
+        self.daemon = None
+        self.assertFalse(os.path.exists(self.socket_path))
+        return
+
+    def test_client_fallback(self):
+        """ Tests that log_binary_execution_time.py logs the event itself when the daemon can not be reached. """
+        os.environ['RGT_HARNESS_DAEMON_SOCKET'] = self.socket_path
+        command = [sys.executable, '-m', 'log_binary_execution_time', '--scriptsdir', self.scripts_dir,
+                   '--uniqueid', self.unique_id, '--mode', 'start']
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("logging it locally", result.stderr)
+        self.assertTrue(os.path.exists(self._event_file('Event_170_binary_execute_start.txt')))
+
+        self._start_daemon()
+        command[-1] = 'final'
+        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stderr, '')
+        self.assertTrue(os.path.exists(self._event_file('Event_180_binary_execute_end.txt')))
+        return
+
+    def test_client_no_fallback_after_connecting(self):
+        """ Tests that log_binary_execution_time.py does not log the event again once the daemon has the request. """
+        os.environ['RGT_HARNESS_DAEMON_SOCKET'] = self.socket_path
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(self.socket_path)
+            server.listen(1)
+
+            def accept_and_close():
+                # A daemon that dies after reading the request.
+                (connection, address) = server.accept()
+                with connection:
+                    connection.recv(65536)
+            thread = threading.Thread(target=accept_and_close)
+            thread.start()
+
+            command = [sys.executable, '-m', 'log_binary_execution_time', '--scriptsdir', self.scripts_dir,
+                       '--uniqueid', self.unique_id, '--mode', 'start']
+            result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+            thread.join()
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("failed to log the event", result.stderr)
+        self.assertFalse(os.path.exists(self._event_file('Event_170_binary_execute_start.txt')))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,253 @@
+#! /usr/bin/env python3
+""" Test class module verifies the asynchronous Influx shipper. """
+
+# System imports
+import unittest
+import json
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+# Local imports
+from libraries.influx_bulk_logger import InfluxBulkLogger
+from libraries.influx_shipper import InfluxShipper, drain_influx_spool, spool_influx_records
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.rgt_loggers import rgt_logger_factory
+from libraries.status_file import StatusFile
+from libraries.subtest_factory import SubtestFactory
+
+class _Influx_request_handler(BaseHTTPRequestHandler):
+    """ Records the body of every POST and answers with the server's status code.
+
+    A body containing the server's reject_marker is answered with 400.
+    """
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        body = self.rfile.read(length).decode()
+        self.server.bodies.append(body)
+        reject_marker = getattr(self.server, 'reject_marker', None)
+        self.send_response(400 if reject_marker and reject_marker in body else self.server.status_code)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        return
+
+class Test_influx_shipper(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.spool_path = os.path.join(self.scratch_dir, 'influx_spool.txt')
+
+        self.server = HTTPServer(('127.0.0.1', 0), _Influx_request_handler)
+        self.server.bodies = []
+        self.server.status_code = 204
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/v2/write"
+        return
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _unused_url(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        return f"http://127.0.0.1:{port}/api/v2/write"
+
+    def test_records_are_batched(self):
+        """ Tests that queued records are sent in multi-line POSTs. """
+        shipper = InfluxShipper(self.url, 'token', batch_size=100)
+        records = [f'events,test_id={i} event_value="0" {i}' for i in range(250)]
+
+        start = time.monotonic()
+        for record in records:
+            shipper.submit(record, self.spool_path)
+        self.assertLess(time.monotonic() - start, 1.0)
+
+        self.assertTrue(shipper.flush(timeout=10))
+        shipper.close()
+
+        sent = [line for body in self.server.bodies for line in body.split('\n')]
+        self.assertEqual(sent, records)
+        self.assertLess(len(self.server.bodies), len(records))
+        self.assertFalse(os.path.exists(self.spool_path))
+        return
+
+    def test_unreachable_server_spools_records(self):
+        """ Tests that records are spooled when InfluxDB is unreachable, and drained later. """
+        shipper = InfluxShipper(self._unused_url(), 'token', max_retries=2, http_timeout=1)
+        records = ['events,test_id=1 event_value="multi\nline" 1', 'events,test_id=2 event_value="0" 2']
+        for record in records:
+            shipper.submit(record, self.spool_path)
+        shipper.close(timeout=10)
+        self.assertTrue(os.path.exists(self.spool_path))
+
+        shipper = InfluxShipper(self.url, 'token')
+        (sent, failed, rejected) = drain_influx_spool(self.spool_path, shipper)
+        shipper.close()
+        self.assertEqual((sent, failed, rejected), (2, 0, 0))
+        self.assertEqual(self.server.bodies, ['\n'.join(records)])
+        self.assertFalse(os.path.exists(self.spool_path))
+        return
+
+    def test_failed_drain_keeps_records(self):
+        """ Tests that a failed drain leaves the records in the spool file. """
+        spool_influx_records(self.spool_path, ['events,test_id=1 event_value="0" 1'])
+        self.server.status_code = 503
+        shipper = InfluxShipper(self.url, 'token', max_retries=1)
+        (sent, failed, rejected) = drain_influx_spool(self.spool_path, shipper)
+        shipper.close()
+        self.assertEqual((sent, failed, rejected), (0, 1, 0))
+        self.assertTrue(os.path.exists(self.spool_path))
+        return
+
+    def test_drain_isolates_rejected_records(self):
+        """ Tests that the records InfluxDB rejects are moved aside and the others are sent. """
+        records = [f'events,test_id={i} event_value="0" {i}' for i in range(5)]
+        records[3] = 'events,test_id=3 malformed'
+        spool_influx_records(self.spool_path, records)
+        with open(self.spool_path, 'a') as file_obj:
+            file_obj.write('{"not a record\n')
+        self.server.reject_marker = 'malformed'
+
+        shipper = InfluxShipper(self.url, 'token', max_retries=1)
+        (sent, failed, rejected) = drain_influx_spool(self.spool_path, shipper)
+        shipper.close()
+        self.assertEqual((sent, failed, rejected), (4, 0, 1))
+        self.assertFalse(os.path.exists(self.spool_path))
+        sent_records = [line for body in self.server.bodies if 'malformed' not in body for line in body.split('\n')]
+        self.assertEqual(sorted(sent_records), sorted(records[:3] + records[4:]))
+
+        with open(self.spool_path + '.rejected') as file_obj:
+            self.assertEqual([json.loads(line) for line in file_obj], [records[3]])
+        return
+
+class Test_influx_bulk_logger(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.scratch_dir = tempfile.mkdtemp()
+
+        self.server = HTTPServer(('127.0.0.1', 0), _Influx_request_handler)
+        self.server.bodies = []
+        self.server.status_code = 204
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+
+        os.environ['RGT_INFLUX_URI'] = f"http://127.0.0.1:{self.server.server_port}/api/v2/write"
+        os.environ['RGT_INFLUX_TOKEN'] = 'token'
+        os.environ['RGT_MACHINE_NAME'] = 'testmachine'
+        os.environ['RGT_IGNORE_NODE_LOCATION'] = '1'
+        for key in ('RGT_DISABLE_INFLUX', 'RGT_INFLUX_NO_SEND', 'RGT_NODE_LOCATION_FILE'):
+            os.environ.pop(key, None)
+
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_influx_bulk_logger',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'bulk_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        return
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _make_instance(self, test, test_id, finished):
+        """ Writes the event files and Run_Archive of a test instance. """
+        status_dir = os.path.join(self.scratch_dir, 'App', test, apptest_layout.test_status_dirname, test_id)
+        runarchive_dir = os.path.join(self.scratch_dir, 'App', test, apptest_layout.test_run_archive_dirname, test_id)
+        os.makedirs(status_dir)
+        os.makedirs(runarchive_dir)
+        events = [StatusFile.EVENT_LOGGING_START, StatusFile.EVENT_BUILD_START, StatusFile.EVENT_BUILD_END,
+                  StatusFile.EVENT_BINARY_EXECUTE_START, StatusFile.EVENT_BINARY_EXECUTE_END]
+        if finished:
+            events.append(StatusFile.EVENT_CHECK_END)
+        for (second, event_id) in enumerate(events):
+            event_filename = StatusFile.EVENT_DICT[event_id][0]
+            fields = {'test_id': test_id, 'app': 'App', 'test': test, 'runtag': 'tag',
+                      'machine': 'testmachine', 'event_name': event_id,
+                      'run_archive': runarchive_dir}
+            with open(os.path.join(status_dir, event_filename), 'w') as file_obj:
+                file_obj.write(f"2023-01-01T00:00:0{second}.000000\t0\t"
+                               + '\t'.join(f"{k}={v}" for (k, v) in fields.items()) + '\n')
+        with open(os.path.join(runarchive_dir, 'metrics.txt'), 'w') as file_obj:
+            file_obj.write('flops = 1.5\n')
+        return (runarchive_dir, len(events) + 1)
+
+    def test_bulk_replay(self):
+        """ Tests that all instances are sent in batches and only finished instances are marked. """
+        instances = [self._make_instance('Test1', '1', True),
+                     self._make_instance('Test1', '2', True),
+                     self._make_instance('Test2', '3', False)]
+        subtests = [SubtestFactory.make_subtest(name_of_application='App',
+                                                name_of_subtest=test,
+                                                local_path_to_tests=self.scratch_dir,
+                                                logger=self.logger,
+                                                tag='bulk') for test in ('Test1', 'Test2')]
+
+        summary = InfluxBulkLogger(subtests, self.logger, batch_size=4, senders=2).run()
+        # The unfinished instance has no metrics record.
+        nrecords = instances[0][1] + instances[1][1] + instances[2][1] - 1
+        self.assertEqual(summary['records'], nrecords)
+        self.assertEqual(summary['sent'], nrecords)
+        self.assertEqual(summary['logged_instances'], 2)
+        # Lines of string fields may continue on the next line.
+        sent = [line for body in self.server.bodies for line in body.split('\n')
+                if line.startswith(('events,', 'metrics,'))]
+        self.assertEqual(len(sent), nrecords)
+        self.assertEqual(len(self.server.bodies), 5)
+        self.assertEqual(len([line for line in sent if line.startswith('metrics,')]), 2)
+
+        self.assertTrue(os.path.exists(os.path.join(instances[0][0], '.influx_logged')))
+        self.assertTrue(os.path.exists(os.path.join(instances[1][0], '.influx_logged')))
+        self.assertFalse(os.path.exists(os.path.join(instances[2][0], '.influx_logged')))
+
+        # A second replay only sends the unfinished instance again.
+        summary = InfluxBulkLogger(subtests, self.logger, batch_size=4).run()
+        self.assertEqual(summary['instances'], 1)
+        return
+
+    def test_failed_batch_leaves_instances_unmarked(self):
+        """ Tests that no marker is written when InfluxDB rejects the records. """
+        (runarchive_dir, nrecords) = self._make_instance('Test1', '1', True)
+        subtest = SubtestFactory.make_subtest(name_of_application='App',
+                                              name_of_subtest='Test1',
+                                              local_path_to_tests=self.scratch_dir,
+                                              logger=self.logger,
+                                              tag='bulk')
+        self.server.status_code = 400
+        summary = InfluxBulkLogger([subtest], self.logger).run()
+        self.assertEqual((summary['sent'], summary['failed']), (0, nrecords))
+        self.assertFalse(os.path.exists(os.path.join(runarchive_dir, '.influx_logged')))
+        return
+
+    def test_instance_without_metrics_is_unmarked(self):
+        """ Tests that, as with the per-test influx_log, an instance without metrics is not marked. """
+        (runarchive_dir, nrecords) = self._make_instance('Test1', '1', True)
+        os.remove(os.path.join(runarchive_dir, 'metrics.txt'))
+        subtest = SubtestFactory.make_subtest(name_of_application='App',
+                                              name_of_subtest='Test1',
+                                              local_path_to_tests=self.scratch_dir,
+                                              logger=self.logger,
+                                              tag='bulk')
+        summary = InfluxBulkLogger([subtest], self.logger).run()
+        self.assertEqual((summary['sent'], summary['logged_instances']), (nrecords - 1, 0))
+        self.assertFalse(os.path.exists(os.path.join(runarchive_dir, '.influx_logged')))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
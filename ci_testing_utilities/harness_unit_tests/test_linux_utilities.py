@@ -0,0 +1,60 @@
+#! /usr/bin/env python3
+""" Test class module verifies the parser of the environment set by runtime environment files. """
+
+# System imports
+import unittest
+import time
+
+# Local imports
+from machine_types import linux_utilities
+
+class Test_parse_env_output(unittest.TestCase):
+
+    def setUp(self):
+        self.env = {'PATH' : '/usr/bin:/bin',
+                    'EMPTY' : '',
+                    'WITH_EQUALS' : 'a=b=c',
+                    'BASH_FUNC_module%%' : '() {  eval $($LMOD_CMD bash "$@")\n}',
+                    'LAST' : 'value'}
+        return
+
+    def _env_output(self, env):
+        return ''.join(f'{key}={value}\n' for (key, value) in env.items())
+
+    def _env_0_output(self, env):
+        return ''.join(f'{key}={value}\0' for (key, value) in env.items())
+
+    def test_env_0_output(self):
+        """ Tests the parsing of the NUL separated output of env -0. """
+        self.assertEqual(linux_utilities.parse_env_output(self._env_0_output(self.env)), self.env)
+        multiline = {'MULTILINE' : 'first\nSECOND=line\n'}
+        self.assertEqual(linux_utilities.parse_env_output(self._env_0_output(multiline)), multiline)
+        return
+
+    def test_env_output(self):
+        """ Tests the parsing of the newline separated output of env, with multiline values. """
+        # Empty values are only parsed from the output of env -0.
+        del self.env['EMPTY']
+        self.assertEqual(linux_utilities.parse_env_output(self._env_output(self.env)), self.env)
+        self.assertEqual(linux_utilities.parse_env_output(''), {})
+        with self.assertRaises(ValueError):
+            linux_utilities.parse_env_output(' not a variable\nPATH=/usr/bin\n')
+        return
+
+    def test_benchmark(self):
+        """ Tests that a synthetic environment of 5000 variables is parsed in linear time. """
+        env = {f'VARIABLE_{index}' : f'/opt/modules/{index}/bin:/usr/bin' for index in range(5000)}
+        for index in range(0, 5000, 100):
+            env[f'BASH_FUNC_function_{index}%%'] = '() {  echo one;\n echo two\n}'
+
+        for (name, output) in (('env', self._env_output(env)), ('env -0', self._env_0_output(env))):
+            start_time = time.perf_counter()
+            parsed = linux_utilities.parse_env_output(output)
+            seconds = time.perf_counter() - start_time
+            self.assertEqual(parsed, env, name)
+            # The former parser took seconds, as it logged each search range of the output.
+            self.assertLess(seconds, 1.0, f"Parsing the output of {name} took {seconds:.3f} seconds.")
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+#! /usr/bin/env python3
+""" Test class module verifies the packed submission of the batch scripts of many tests. """
+
+# System imports
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+
+# Local imports
+from libraries import packed_submission
+from libraries import submission_pipeline
+from libraries.packed_submission import PackRequest
+from machine_types.slurm import SLURM
+
+class Test_packed_submission(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        for name in ('RGT_PACKED_SUBMIT', 'RGT_PACK_DIR', 'RGT_PACK_MAX_TESTS', 'RGT_SUBMIT_RATE',
+                     'RGT_SUBMIT_QUEUE', 'RGT_BATCH_QUEUE', 'RGT_SUBMIT_ARGS', 'RGT_SUBMIT_ACCT', 'RGT_PROJECT_ID'):
+            os.environ.pop(name, None)
+        submission_pipeline._rate_limiters.clear()
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.pack_dir = os.path.join(self.scratch_dir, 'packed_submissions')
+        self.bin_dir = os.path.join(self.scratch_dir, 'bin')
+        os.makedirs(self.bin_dir)
+        self.calls_file = os.path.join(self.scratch_dir, 'calls.txt')
+        os.environ['PATH'] = self.bin_dir + os.pathsep + os.environ['PATH']
+
+        path = os.path.join(self.bin_dir, 'sbatch')
+        with open(path, 'w') as file_obj:
+            file_obj.write('#!/bin/sh\n')
+            file_obj.write(f'echo "sbatch $*" >> {self.calls_file}\n')
+            file_obj.write('echo "Submitted batch job 777"\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        submission_pipeline._rate_limiters.clear()
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _make_request(self, scheduler, unique_id, nodes=1, walltime='00:10:00'):
+        ra_dir = os.path.join(self.scratch_dir, unique_id, 'Run_Archive')
+        os.makedirs(ra_dir)
+        with open(os.path.join(ra_dir, 'batch.sh'), 'w') as file_obj:
+            file_obj.write('#!/bin/bash\n')
+            file_obj.write(f'#SBATCH -J test_{unique_id}\n')
+            file_obj.write(f'#SBATCH -o test_{unique_id}.o%j\n')
+            file_obj.write(f'#SBATCH -N {nodes}\n')
+            if walltime:
+                file_obj.write(f'#SBATCH -t {walltime}\n')
+            file_obj.write(f'echo {unique_id} > ran.txt\n')
+        pack_key = packed_submission.make_pack_key(scheduler, os.path.join(ra_dir, 'batch.sh'))
+        return PackRequest('slurm', os.path.join(self.scratch_dir, unique_id), unique_id, 'app.test',
+                           ra_dir, 'batch.sh', pack_key)
+
+    def test_pack_mode(self):
+        """ Tests that packing is disabled by default and that unknown modes are rejected. """
+        self.assertIsNone(packed_submission.get_pack_mode())
+        os.environ['RGT_PACK_DIR'] = self.pack_dir
+        self.assertIsNone(packed_submission.get_pack_dir())
+        os.environ['RGT_PACKED_SUBMIT'] = 'steps'
+        self.assertEqual(packed_submission.get_pack_dir(), self.pack_dir)
+        os.environ['RGT_PACKED_SUBMIT'] = 'bundle'
+        with self.assertRaises(ValueError):
+            packed_submission.get_pack_mode()
+        return
+
+    def test_group_requests(self):
+        """ Tests that the requests differing only by per-test directives are packed together. """
+        scheduler = SLURM()
+        requests = [self._make_request(scheduler, uid) for uid in ('1', '2', '3')]
+        requests.append(self._make_request(scheduler, '4', nodes=2))
+        self.assertEqual(requests[0].pack_key, requests[1].pack_key)
+        self.assertNotEqual(requests[0].pack_key, requests[3].pack_key)
+
+        groups = packed_submission.group_requests(requests)
+        self.assertEqual([[r.unique_id for r in group] for group in groups], [['1', '2', '3'], ['4']])
+        groups = packed_submission.group_requests(requests, max_tests=2)
+        self.assertEqual([[r.unique_id for r in group] for group in groups], [['1', '2'], ['3'], ['4']])
+        return
+
+    def test_write_pack_script(self):
+        """ Tests the packed job scripts of the array and steps modes. """
+        scheduler = SLURM()
+        requests = [self._make_request(scheduler, uid) for uid in ('1', '2')]
+        os.makedirs(self.pack_dir)
+
+        array_script = os.path.join(self.pack_dir, 'pack.0.sh')
+        packed_submission.write_pack_script(scheduler, requests, array_script, packed_submission.PACK_MODE_ARRAY)
+        with open(array_script) as file_obj:
+            text = file_obj.read()
+        self.assertIn('#SBATCH -N 1\n#SBATCH -t 00:10:00\n', text)
+        self.assertNotIn('-J test_', text)
+        self.assertIn('unset RGT_PACKED_SUBMIT RGT_PACK_DIR\n', text)
+        self.assertIn('case "${SLURM_ARRAY_TASK_ID}" in', text)
+        self.assertIn(f"    1) cd {requests[1].runarchive_dir} && exec ./batch.sh ;;", text)
+        self.assertTrue(os.access(array_script, os.X_OK))
+
+        steps_script = os.path.join(self.pack_dir, 'pack.1.sh')
+        packed_submission.write_pack_script(scheduler, requests, steps_script, packed_submission.PACK_MODE_STEPS)
+        with open(steps_script) as file_obj:
+            text = file_obj.read()
+        # The tests run one after the other, so the job has the sum of their walltimes.
+        self.assertIn('#SBATCH -N 1\n#SBATCH --time=0-00:20:00\n', text)
+        os.environ['RGT_PACKED_SUBMIT'] = 'steps'
+        self.assertEqual(os.system(steps_script), 0)
+        for request in requests:
+            with open(os.path.join(request.runarchive_dir, 'ran.txt')) as file_obj:
+                self.assertEqual(file_obj.read(), f"{request.unique_id}\n")
+        return
+
+    def test_submit_packed_requests(self):
+        """ Tests that a group of tests is submitted as one job array, and each test gets the id of its task. """
+        scheduler = SLURM()
+        for uid in ('1', '2', '3'):
+            packed_submission.queue_request(self.pack_dir, self._make_request(scheduler, uid, nodes=1 if uid != '3' else 2))
+
+        recorded = []
+        failed = packed_submission.submit_packed_requests(
+                                       self.pack_dir,
+                                       lambda scheduler_type: SLURM(),
+                                       lambda request, exit_status, job_id: recorded.append((request.unique_id, exit_status, job_id)),
+                                       mode=packed_submission.PACK_MODE_ARRAY)
+        self.assertEqual(failed, 0)
+        self.assertEqual(sorted(recorded), [('1', 0, '777_0'), ('2', 0, '777_1'), ('3', 0, '777')])
+        self.assertEqual(packed_submission.read_requests(self.pack_dir), [])
+
+        with open(self.calls_file) as file_obj:
+            calls = sorted(file_obj.read().splitlines())
+        self.assertEqual(calls, ['sbatch --array=0-1 pack.0.sh', 'sbatch batch.sh'])
+        return
+
+    def test_steps_need_walltime(self):
+        """ Tests that, in steps mode, the tests whose batch script sets no walltime are submitted on their own. """
+        scheduler = SLURM()
+        for uid in ('1', '2'):
+            packed_submission.queue_request(self.pack_dir, self._make_request(scheduler, uid, walltime=None))
+        for uid in ('3', '4'):
+            packed_submission.queue_request(self.pack_dir, self._make_request(scheduler, uid, nodes=2))
+
+        recorded = []
+        failed = packed_submission.submit_packed_requests(
+                                       self.pack_dir,
+                                       lambda scheduler_type: SLURM(),
+                                       lambda request, exit_status, job_id: recorded.append((request.unique_id, exit_status, job_id)),
+                                       mode=packed_submission.PACK_MODE_STEPS)
+        self.assertEqual(failed, 0)
+        self.assertEqual(sorted(recorded), [('1', 0, '777'), ('2', 0, '777'), ('3', 0, '777'), ('4', 0, '777')])
+
+        with open(self.calls_file) as file_obj:
+            calls = sorted(file_obj.read().splitlines())
+        self.assertEqual(calls, ['sbatch batch.sh', 'sbatch batch.sh', 'sbatch pack.1.sh'])
+        return
+
+if __name__ == "__main__":
+    unittest.main()
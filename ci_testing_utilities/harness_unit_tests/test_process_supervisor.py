@@ -0,0 +1,98 @@
+#! /usr/bin/env python3
+""" Test class module verifies the supervision of the build and check commands. """
+
+# System imports
+import unittest
+import io
+import os
+import shutil
+import tempfile
+import time
+
+# Local imports
+from libraries import process_supervisor
+
+class Test_process_supervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        os.environ.pop('RGT_BUILD_TIMEOUT', None)
+        os.environ.pop('RGT_CHECK_TIMEOUT', None)
+        self.scratch_dir = tempfile.mkdtemp()
+        self.stdout_path = os.path.join(self.scratch_dir, 'output.txt')
+        self.stderr_path = os.path.join(self.scratch_dir, 'output.stderr.txt')
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _read(self, path):
+        with open(path) as file_obj:
+            return file_obj.read()
+
+    def test_output_and_resources(self):
+        """ Tests that the output is written to the files and the live tail, with the resource usage. """
+        live_output = io.StringIO()
+        command = ("echo $RGT_SUPERVISED; echo error >&2; printf partial; "
+                   "python3 -c 'sum(range(3000000))'; exit 3")
+        result = process_supervisor.run_supervised(command, self.stdout_path,
+                                                   env=dict(os.environ, RGT_SUPERVISED='hello'),
+                                                   cwd=self.scratch_dir, live_output=live_output,
+                                                   name='build')
+        self.assertEqual(result.exit_status, 3)
+        self.assertFalse(result.timed_out)
+        self.assertGreater(result.user_cpu_seconds + result.system_cpu_seconds, 0.0)
+        self.assertGreater(result.max_rss_kb, 0)
+        self.assertIn('exit_status=3,', result.event_value)
+        self.assertNotIn('\t', result.event_value)
+
+        self.assertEqual(self._read(self.stdout_path), "hello\nerror\npartial")
+        self.assertIn("[build] hello\n", live_output.getvalue())
+        self.assertIn("[build] partial\n", live_output.getvalue())
+
+        result = process_supervisor.run_supervised("echo out; echo err >&2", self.stdout_path,
+                                                   self.stderr_path)
+        self.assertEqual(result.exit_status, 0)
+        self.assertEqual(self._read(self.stdout_path), "out\n")
+        self.assertEqual(self._read(self.stderr_path), "err\n")
+        return
+
+    def test_timeout_kills_process_group(self):
+        """ Tests that a command running past its limit is killed with the processes it started. """
+        marker = os.path.join(self.scratch_dir, 'not_killed.txt')
+        command = f"(sleep 5; touch {marker}) & trap '' TERM; sleep 30"
+        start_time = time.monotonic()
+        result = process_supervisor.run_supervised(command, self.stdout_path, timeout=0.5, kill_grace=0.5)
+        self.assertLess(time.monotonic() - start_time, 5.0)
+        self.assertTrue(result.timed_out)
+        self.assertLess(result.exit_status, 0)
+        self.assertFalse(os.path.exists(marker))
+        return
+
+    def test_timeout_kills_process_group_after_leader_exits(self):
+        """ Tests that the processes ignoring SIGTERM are killed after the grace period, although the command exited. """
+        marker = os.path.join(self.scratch_dir, 'not_killed.txt')
+        command = f"(trap '' TERM; sleep 1.5; touch {marker}) > /dev/null 2>&1 & sleep 30"
+        result = process_supervisor.run_supervised(command, self.stdout_path, timeout=0.5, kill_grace=0.5)
+        self.assertTrue(result.timed_out)
+        time.sleep(1.5)
+        self.assertFalse(os.path.exists(marker))
+        return
+
+    def test_get_timeout(self):
+        """ Tests the wall-clock limits set by RGT_BUILD_TIMEOUT and RGT_CHECK_TIMEOUT. """
+        self.assertIsNone(process_supervisor.get_timeout('build'))
+        os.environ['RGT_BUILD_TIMEOUT'] = '0'
+        self.assertIsNone(process_supervisor.get_timeout('build'))
+        os.environ['RGT_CHECK_TIMEOUT'] = '90.5'
+        self.assertEqual(process_supervisor.get_timeout('check'), 90.5)
+        os.environ['RGT_CHECK_TIMEOUT'] = '-1'
+        with self.assertRaises(ValueError):
+            process_supervisor.get_timeout('check')
+        return
+
+if __name__ == "__main__":
+    unittest.main()
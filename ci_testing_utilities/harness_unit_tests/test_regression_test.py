@@ -0,0 +1,142 @@
+#! /usr/bin/env python3
+""" Test class module verifies how the Harness spreads subtests over its workers. """
+
+# System imports
+import unittest
+import collections
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+# Local imports
+from bin import runtests
+from libraries.apptest import subtest
+from libraries.regression_test import Harness, dispatch_subtests
+from libraries.rgt_loggers import rgt_logger_factory
+
+class _Fake_subtest:
+    """ Stands in for an apptest.subtest in the dispatcher. """
+
+    def __init__(self, appname, testname):
+        self.__appname = appname
+        self.__testname = testname
+
+    def getNameOfApplication(self):
+        return self.__appname
+
+    def getNameOfSubtest(self):
+        return self.__testname
+
+class Test_dispatch_subtests(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.running = collections.Counter()
+        self.max_running = collections.Counter()
+        self.max_total = 0
+        return
+
+    def _app_subtests(self, tests_per_app):
+        return collections.OrderedDict((appname, [_Fake_subtest(appname, f"Test{i}") for i in range(ntests)])
+                                       for (appname, ntests) in tests_per_app.items())
+
+    def _work(self, subtest):
+        appname = subtest.getNameOfApplication()
+        with self.lock:
+            self.running[appname] += 1
+            self.max_running[appname] = max(self.max_running[appname], self.running[appname])
+            self.max_total = max(self.max_total, sum(self.running.values()))
+        time.sleep(0.05)
+        with self.lock:
+            self.running[appname] -= 1
+        return subtest.getNameOfSubtest()
+
+    def test_one_application_uses_all_workers(self):
+        """ Tests that the subtests of a single application run concurrently. """
+        app_subtests = self._app_subtests({'App1' : 12})
+        results = [(subtest, my_future.result()) for (subtest, my_future)
+                   in dispatch_subtests(app_subtests, self._work, num_workers=4)]
+        self.assertEqual(len(results), 12)
+        self.assertEqual(self.max_total, 4)
+        return
+
+    def test_max_tests_per_app(self):
+        """ Tests that the cap per application holds while other applications fill the workers. """
+        app_subtests = self._app_subtests({'App1' : 8, 'App2' : 8, 'App3' : 1})
+        done = [subtest for (subtest, my_future) in
+                dispatch_subtests(app_subtests, self._work, num_workers=5, max_tests_per_app=2)]
+        self.assertEqual(sorted((s.getNameOfApplication(), s.getNameOfSubtest()) for s in done),
+                         sorted((s.getNameOfApplication(), s.getNameOfSubtest())
+                                for subtests in app_subtests.values() for s in subtests))
+        self.assertLessEqual(max(self.max_running.values()), 2)
+        self.assertEqual(self.max_total, 5)
+        return
+
+    def test_exceptions_are_returned(self):
+        """ Tests that a failing subtest does not stop the others. """
+        app_subtests = self._app_subtests({'App1' : 3})
+        def work(subtest):
+            if subtest.getNameOfSubtest() == 'Test1':
+                raise RuntimeError('failed')
+            return 0
+        exceptions = [my_future.exception() for (subtest, my_future)
+                      in dispatch_subtests(app_subtests, work, num_workers=2)]
+        self.assertEqual(len(exceptions), 3)
+        self.assertEqual(len([e for e in exceptions if e is not None]), 1)
+        return
+
+class Test_checkout_lock(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.scratch_dir = tempfile.mkdtemp()
+        os.environ.pop('RGT_TYPE_OF_REPOSITORY', None)
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_checkout_lock',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'checkout_lock_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def test_failed_checkout_releases_lock(self):
+        """ Tests that the checkout lock of an application is released when the checkout raises. """
+        a_subtest = subtest(name_of_application='App', name_of_subtest='Test',
+                            local_path_to_tests=self.scratch_dir, logger=self.logger, tag='1000.1')
+        lock = threading.Lock()
+        # Without RGT_TYPE_OF_REPOSITORY, the repository of the application can not be found.
+        with self.assertRaises(Exception):
+            a_subtest.doTasks(tasks=[Harness.checkout], test_checkout_lock=lock)
+        self.assertFalse(lock.locked())
+        return
+
+class Test_schedule_option(unittest.TestCase):
+
+    def setUp(self):
+        self.__default_schedule = runtests.DEFAULT_SCHEDULE
+        return
+
+    def tearDown(self):
+        runtests.DEFAULT_SCHEDULE = self.__default_schedule
+        return
+
+    def test_invalid_default_schedule(self):
+        """ Tests that an unknown schedule from RGT_SCHEDULE is an error instead of the 'app' schedule. """
+        runtests.DEFAULT_SCHEDULE = Harness.SCHEDULE_TEST
+        self.assertEqual(runtests.parse_commandline_argv(['--mode', 'checkout']).schedule, Harness.SCHEDULE_TEST)
+
+        runtests.DEFAULT_SCHEDULE = 'tset'
+        with self.assertRaises(SystemExit):
+            runtests.parse_commandline_argv(['--mode', 'checkout'])
+        return
+
+if __name__ == "__main__":
+    unittest.main()
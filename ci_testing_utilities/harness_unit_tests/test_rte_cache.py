@@ -0,0 +1,132 @@
+#! /usr/bin/env python3
+""" Test class module verifies the cache of the environments set by runtime environment files. """
+
+# System imports
+import unittest
+import os
+import shutil
+import tempfile
+
+# Local imports
+from libraries import rte_cache
+from libraries.rgt_loggers import rgt_logger_factory
+from machine_types import linux_utilities
+
+class _Fake_apptest:
+    """ The paths of a test instance, as used by get_new_environment. """
+
+    def __init__(self, scratch_dir, test_id):
+        self.__instance_dir = os.path.join(scratch_dir, 'workspace', test_id)
+        self.__scratch_dir = scratch_dir
+        self.__test_id = test_id
+        os.makedirs(self.get_path_to_workspace_build())
+
+    def get_path_to_workspace_build(self):
+        return os.path.join(self.__instance_dir, 'build_directory')
+
+    def get_path_to_workspace_run(self):
+        return os.path.join(self.__instance_dir, 'workdir')
+
+    def get_path_to_status(self):
+        return os.path.join(self.__scratch_dir, 'Status', self.__test_id)
+
+    def get_path_to_runarchive(self):
+        return os.path.join(self.__scratch_dir, 'Run_Archive', self.__test_id)
+
+    def get_path_to_scripts(self):
+        return os.path.join(self.__scratch_dir, 'Scripts')
+
+    def get_path_to_source(self):
+        return os.path.join(self.__scratch_dir, 'Source')
+
+class _Fake_machine:
+
+    def __init__(self, apptest, logger):
+        self.apptest = apptest
+        self.logger = logger
+
+class Test_rte_cache(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.scratch_dir = tempfile.mkdtemp()
+        self.count_file = os.path.join(self.scratch_dir, 'sourced.txt')
+        self.rte_file = os.path.join(self.scratch_dir, 'build_rte.sh')
+        with open(self.rte_file, 'w') as file_obj:
+            file_obj.write(f"echo sourced >> {self.count_file}\n")
+            file_obj.write("export RTE_BIN=$TEST_BUILD_DIR/bin\n")
+            file_obj.write("export RTE_MODULE=loaded\n")
+            file_obj.write("unset RTE_REMOVED\n")
+
+        os.environ.pop('RGT_RTE_CACHE', None)
+        os.environ['RGT_RTE_CACHE_DIR'] = os.path.join(self.scratch_dir, 'rte_cache')
+        os.environ['RTE_REMOVED'] = 'yes'
+        rte_cache._caches.clear()
+
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_rte_cache',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'rte_cache_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        rte_cache._caches.clear()
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _get_new_environment(self, test_id):
+        apptest = _Fake_apptest(self.scratch_dir, test_id)
+        os.environ['TEST_BUILD_DIR'] = apptest.get_path_to_workspace_build()
+        return (apptest, linux_utilities.get_new_environment(_Fake_machine(apptest, self.logger), self.rte_file))
+
+    def _times_sourced(self):
+        with open(self.count_file) as file_obj:
+            return len(file_obj.readlines())
+
+    def test_shared_environment_is_sourced_once(self):
+        """ Tests that a second test instance gets the cached environment, with its own paths. """
+        (first_apptest, first_env) = self._get_new_environment('1.1')
+        (second_apptest, second_env) = self._get_new_environment('1.2')
+        self.assertEqual(self._times_sourced(), 1)
+
+        self.assertEqual(first_env['RTE_BIN'], os.path.join(first_apptest.get_path_to_workspace_build(), 'bin'))
+        self.assertEqual(second_env['RTE_BIN'], os.path.join(second_apptest.get_path_to_workspace_build(), 'bin'))
+        self.assertEqual(second_env['RTE_MODULE'], 'loaded')
+        self.assertNotIn('RTE_REMOVED', second_env)
+        self.assertEqual(second_env['TEST_BUILD_DIR'], second_apptest.get_path_to_workspace_build())
+
+        # Another process of the same harness run reads the cache from disk.
+        rte_cache._caches.clear()
+        (third_apptest, third_env) = self._get_new_environment('1.3')
+        self.assertEqual(self._times_sourced(), 1)
+        self.assertEqual(third_env['RTE_BIN'], os.path.join(third_apptest.get_path_to_workspace_build(), 'bin'))
+        return
+
+    def test_key_changes(self):
+        """ Tests that a changed file or parent environment sources the file again. """
+        self._get_new_environment('1.1')
+        os.environ['MODULEPATH'] = '/other/modules'
+        self._get_new_environment('1.2')
+        self.assertEqual(self._times_sourced(), 2)
+
+        with open(self.rte_file, 'a') as file_obj:
+            file_obj.write("export RTE_EXTRA=1\n")
+        (apptest, env) = self._get_new_environment('1.3')
+        self.assertEqual(self._times_sourced(), 3)
+        self.assertEqual(env['RTE_EXTRA'], '1')
+        return
+
+    def test_disabled(self):
+        """ Tests that RGT_RTE_CACHE=0 sources the file every time. """
+        os.environ['RGT_RTE_CACHE'] = '0'
+        self._get_new_environment('1.1')
+        self._get_new_environment('1.2')
+        self.assertEqual(self._times_sourced(), 2)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -217,6 +217,25 @@ class Test_command_line_arguments(unittest.TestCase):
         argv = shlex.split(command_line_arguments)
         self.assertRaises(SystemExit,runtests.parse_commandline_argv,argv)
 
+    def test_worker_options(self):
+        """Tests the options of the thread pool running the tests."""
+
+        # The error message for a failed command line option.
+        frmt_message = ("\n\nError Details\n"
+                        "\tFailure in harness worker options:\n"
+                        "\tcommand line: {}\n")
+
+        command_line_arguments = "--mode start --num-workers 8 --schedule test --max-tests-per-app 2"
+        error_message = frmt_message.format(command_line_arguments)
+        argv = shlex.split(command_line_arguments)
+        harness_arguments = runtests.parse_commandline_argv(argv)
+        self.assertEqual(harness_arguments.num_workers,8,msg=error_message)
+        self.assertEqual(harness_arguments.schedule,"test",msg=error_message)
+        self.assertEqual(harness_arguments.max_tests_per_app,2,msg=error_message)
+
+        argv = shlex.split("--mode start --schedule invalid")
+        self.assertRaises(SystemExit,runtests.parse_commandline_argv,argv)
+
     def tearDown(self):
         """ Stud doc for tear down """
         return
@@ -0,0 +1,132 @@
+#! /usr/bin/env python3
+""" Test class module verifies the job state queries of the schedulers. """
+
+# System imports
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+
+# Local imports
+from machine_types.base_scheduler import BaseScheduler
+from machine_types.lsf import LSF
+from machine_types.pbs import PBS
+from machine_types.slurm import SLURM
+
+class Test_scheduler_job_states(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        self.bin_dir = tempfile.mkdtemp()
+        self.calls_file = os.path.join(self.bin_dir, 'calls.txt')
+        os.environ['PATH'] = self.bin_dir + os.pathsep + os.environ['PATH']
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.bin_dir)
+        return
+
+    def _fake_command(self, name, stdout, stderr='', exit_status=0):
+        """ Writes a scheduler command that records its arguments and prints stdout and stderr. """
+        path = os.path.join(self.bin_dir, name)
+        with open(path, 'w') as file_obj:
+            file_obj.write('#!/bin/sh\n')
+            file_obj.write(f'echo "{name} $*" >> {self.calls_file}\n')
+            file_obj.write(f"cat <<'EOF'\n{stdout}EOF\n")
+            if stderr:
+                file_obj.write(f"cat >&2 <<'EOF'\n{stderr}EOF\n")
+            file_obj.write(f'exit {exit_status}\n')
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+
+    def _calls(self):
+        with open(self.calls_file) as file_obj:
+            return file_obj.read().splitlines()
+
+    def test_slurm(self):
+        """ Tests that all jobs are queried with one sacct call. """
+        self._fake_command('sacct', '101|RUNNING\n102|CANCELLED by 1234\n103|COMPLETED\n104|NODE_FAIL\n105|PENDING\n')
+        states = SLURM().query_job_states(['101', '102', '103', '104', '105', '106'])
+        self.assertEqual(states, {'101' : BaseScheduler.JOB_STATE_RUNNING,
+                                  '102' : BaseScheduler.JOB_STATE_FAILED,
+                                  '103' : BaseScheduler.JOB_STATE_COMPLETED,
+                                  '104' : BaseScheduler.JOB_STATE_FAILED,
+                                  '105' : BaseScheduler.JOB_STATE_PENDING,
+                                  '106' : BaseScheduler.JOB_STATE_MISSING})
+        self.assertEqual(len(self._calls()), 1)
+        self.assertIn('101,102,103,104,105,106', self._calls()[0])
+        return
+
+    def test_slurm_without_accounting(self):
+        """ Tests that squeue is used when sacct fails. """
+        self._fake_command('sacct', '', stderr='sacct: error: accounting storage is disabled\n', exit_status=1)
+        self._fake_command('squeue', '101|PENDING\n')
+        self.assertEqual(SLURM().query_job_states(['101', '102']),
+                         {'101' : BaseScheduler.JOB_STATE_PENDING,
+                          '102' : BaseScheduler.JOB_STATE_MISSING})
+        self.assertEqual([call.split()[0] for call in self._calls()], ['sacct', 'squeue'])
+        return
+
+    def test_lsf(self):
+        """ Tests the bjobs states, including forgotten jobs. """
+        self._fake_command('bjobs', '201 RUN\n202 EXIT\n203 DONE\n',
+                           stderr='Job <204> is not found\n', exit_status=255)
+        self.assertEqual(LSF().query_job_states(['201', '202', '203', '204', '205']),
+                         {'201' : BaseScheduler.JOB_STATE_RUNNING,
+                          '202' : BaseScheduler.JOB_STATE_FAILED,
+                          '203' : BaseScheduler.JOB_STATE_COMPLETED,
+                          '204' : BaseScheduler.JOB_STATE_UNKNOWN})
+        return
+
+    def test_pbs(self):
+        """ Tests the qstat states of server-qualified job ids. """
+        stdout = ('Job id            Name             User              Time Use S Queue\n'
+                  '----------------  ---------------- ----------------  -------- - -----\n'
+                  '301.pbs01         test             user              00:00:00 Q workq\n'
+                  '302.pbs01         test             user              00:01:00 F workq\n')
+        self._fake_command('qstat', stdout)
+        self.assertEqual(PBS().query_job_states(['301', '302']),
+                         {'301' : BaseScheduler.JOB_STATE_PENDING,
+                          '302' : BaseScheduler.JOB_STATE_COMPLETED})
+        return
+
+    def test_missing_command(self):
+        """ Tests that None is returned if the scheduler cannot be queried. """
+        os.environ['PATH'] = self.bin_dir
+        self.assertIsNone(SLURM().query_job_states(['101']))
+        self.assertEqual(SLURM().query_job_states([]), {})
+        return
+
+class Test_scheduler_walltime(unittest.TestCase):
+
+    def test_slurm(self):
+        """ Tests that the sbatch time limits are multiplied, in all their formats. """
+        scheduler = SLURM()
+        self.assertEqual(scheduler.scale_walltime_directive('#SBATCH -t 00:10:00', 3), '#SBATCH --time=0-00:30:00')
+        self.assertEqual(scheduler.scale_walltime_directive('#SBATCH --time=90', 20), '#SBATCH --time=1-06:00:00')
+        self.assertEqual(scheduler.scale_walltime_directive('#SBATCH -t 1-12', 2), '#SBATCH --time=3-00:00:00')
+        self.assertEqual(scheduler.scale_walltime_directive('#SBATCH -t 5:30', 2), '#SBATCH --time=0-00:11:00')
+        self.assertIsNone(scheduler.scale_walltime_directive('#SBATCH -N 2', 2))
+        return
+
+    def test_lsf(self):
+        """ Tests that the bsub run limits are multiplied. """
+        scheduler = LSF()
+        self.assertEqual(scheduler.scale_walltime_directive('#BSUB -W 1:30', 3), '#BSUB -W 4:30')
+        self.assertEqual(scheduler.scale_walltime_directive('#BSUB -W 45', 2), '#BSUB -W 1:30')
+        self.assertIsNone(scheduler.scale_walltime_directive('#BSUB -nnodes 2', 2))
+        return
+
+    def test_pbs(self):
+        """ Tests that the walltime resource is multiplied, and the other resources kept. """
+        scheduler = PBS()
+        self.assertEqual(scheduler.scale_walltime_directive('#PBS -l walltime=01:00:00', 30), '#PBS -l walltime=30:00:00')
+        self.assertEqual(scheduler.scale_walltime_directive('#PBS -l select=2,walltime=10:00', 2),
+                         '#PBS -l select=2,walltime=00:20:00')
+        self.assertIsNone(scheduler.scale_walltime_directive('#PBS -l select=2', 2))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
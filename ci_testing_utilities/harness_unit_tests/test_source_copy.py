@@ -0,0 +1,129 @@
+#! /usr/bin/env python3
+""" Test class module verifies the strategies populating build directories. """
+
+# System imports
+import unittest
+import os
+import shutil
+import tempfile
+
+# Local imports
+from libraries import source_copy
+
+class Test_source_copy(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        os.environ.pop('RGT_SOURCE_COPY_STRATEGY', None)
+        os.environ.pop('RGT_SOURCE_COPY_WORKERS', None)
+        os.environ.pop('RGT_SOURCE_COPY_PATTERNS', None)
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.source_dir = os.path.join(self.scratch_dir, 'Source')
+        os.makedirs(os.path.join(self.source_dir, 'src', 'lib'))
+        self._write(os.path.join(self.source_dir, 'Makefile'), 'all:\n')
+        self._write(os.path.join(self.source_dir, 'config.h.in'), '#define X 1\n')
+        self._write(os.path.join(self.source_dir, 'src', 'main.c'), 'int main() { return 0; }\n')
+        self._write(os.path.join(self.source_dir, 'src', 'lib', 'lib.c'), 'int f() { return 1; }\n')
+        os.chmod(os.path.join(self.source_dir, 'Makefile'), 0o750)
+        os.symlink('src/main.c', os.path.join(self.source_dir, 'main_link.c'))
+        os.symlink('src', os.path.join(self.source_dir, 'src_link'))
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _write(self, path, contents):
+        with open(path, 'w') as file_obj:
+            file_obj.write(contents)
+
+    def _read(self, path):
+        with open(path) as file_obj:
+            return file_obj.read()
+
+    def _tree(self, top_dir):
+        """ Returns the relative paths, links and file contents and modes below top_dir. """
+        tree = {}
+        for (dirpath, dirnames, filenames) in os.walk(top_dir):
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                relpath = os.path.relpath(path, top_dir)
+                if os.path.islink(path):
+                    tree[relpath] = ('link', os.readlink(path))
+                elif os.path.isdir(path):
+                    tree[relpath] = ('dir',)
+                else:
+                    tree[relpath] = ('file', self._read(path), os.stat(path).st_mode & 0o777)
+        return tree
+
+    def test_strategies_copy_the_tree(self):
+        """ Tests that every strategy makes the same tree as shutil.copytree. """
+        expected_dir = os.path.join(self.scratch_dir, 'expected')
+        shutil.copytree(self.source_dir, expected_dir, symlinks=True)
+        expected = self._tree(expected_dir)
+
+        for strategy in source_copy.STRATEGIES:
+            build_dir = os.path.join(self.scratch_dir, strategy, '1.1', 'build_directory')
+            statistics = source_copy.copy_source_tree(self.source_dir, build_dir, strategy=strategy, workers=2)
+            self.assertEqual(self._tree(build_dir), expected, strategy)
+            self.assertEqual(statistics.strategy, strategy)
+            self.assertEqual(statistics.files, 4)
+            self.assertGreaterEqual(statistics.seconds, 0.0)
+        return
+
+    def test_hardlink_copies_matching_files(self):
+        """ Tests that files matching RGT_SOURCE_COPY_PATTERNS are copied, the others linked. """
+        os.environ['RGT_SOURCE_COPY_PATTERNS'] = '*.in, Makefile'
+        build_dir = os.path.join(self.scratch_dir, 'build_directory')
+        source_copy.copy_source_tree(self.source_dir, build_dir, strategy=source_copy.STRATEGY_HARDLINK)
+
+        def same_file(relpath):
+            return os.path.samefile(os.path.join(self.source_dir, relpath), os.path.join(build_dir, relpath))
+        self.assertTrue(same_file(os.path.join('src', 'main.c')))
+        self.assertTrue(same_file(os.path.join('src', 'lib', 'lib.c')))
+        self.assertFalse(same_file('config.h.in'))
+        self.assertFalse(same_file('Makefile'))
+        return
+
+    def test_hardlink_without_patterns_links_nothing(self):
+        """ Tests that, without RGT_SOURCE_COPY_PATTERNS, a write to the build directory does not change the source. """
+        build_dir = os.path.join(self.scratch_dir, 'build_directory')
+        source_copy.copy_source_tree(self.source_dir, build_dir, strategy=source_copy.STRATEGY_HARDLINK)
+
+        self.assertFalse(os.path.samefile(os.path.join(self.source_dir, 'src', 'main.c'),
+                                          os.path.join(build_dir, 'src', 'main.c')))
+        with open(os.path.join(build_dir, 'src', 'main.c'), 'a') as file_obj:
+            file_obj.write('// changed by the build\n')
+        self.assertEqual(self._read(os.path.join(self.source_dir, 'src', 'main.c')), 'int main() { return 0; }\n')
+        return
+
+    def test_incremental_update(self):
+        """ Tests that the previous build is kept and only changed sources are copied. """
+        test_dir = os.path.join(self.scratch_dir, 'workspace', 'App', 'Test')
+        first_build = os.path.join(test_dir, '1.1', 'build_directory')
+        source_copy.copy_source_tree(self.source_dir, first_build, strategy=source_copy.STRATEGY_INCREMENTAL)
+        self._write(os.path.join(first_build, 'src', 'main.o'), 'object')
+
+        self._write(os.path.join(self.source_dir, 'src', 'main.c'), 'int main() { return 20; }\n')
+        os.makedirs(os.path.join(test_dir, '1.2'))
+        second_build = os.path.join(test_dir, '1.2', 'build_directory')
+        self.assertEqual(source_copy.find_previous_build_directory(second_build), first_build)
+        statistics = source_copy.copy_source_tree(self.source_dir, second_build,
+                                                  strategy=source_copy.STRATEGY_INCREMENTAL)
+        self.assertEqual(self._read(os.path.join(second_build, 'src', 'main.o')), 'object')
+        self.assertEqual(self._read(os.path.join(second_build, 'src', 'main.c')), 'int main() { return 20; }\n')
+        self.assertEqual((statistics.files, statistics.skipped_files), (1, 3))
+        return
+
+    def test_unknown_strategy(self):
+        """ Tests that an unknown RGT_SOURCE_COPY_STRATEGY is rejected. """
+        os.environ['RGT_SOURCE_COPY_STRATEGY'] = 'rsync'
+        with self.assertRaises(ValueError):
+            source_copy.get_copy_strategy()
+        return
+
+if __name__ == "__main__":
+    unittest.main()
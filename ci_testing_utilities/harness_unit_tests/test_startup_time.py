@@ -0,0 +1,66 @@
+#! /usr/bin/env python3
+""" Test class module verifies the import time of the harness entry points run in the batch jobs. """
+
+# System imports
+import unittest
+import os
+import subprocess
+import sys
+
+# The modules an entry point must not import at startup, and its import time budget in milliseconds.
+# The budgets are generous, so they only catch gross regressions, and are
+# multiplied by RGT_IMPORT_BUDGET_SCALE on slow machines.
+HEAVY_MODULES = ('requests', 'dateutil', 'fireworks')
+ENTRY_POINTS = {
+    'test_harness_driver' : (HEAVY_MODULES, 300),
+    'log_binary_execution_time' : (HEAVY_MODULES + ('libraries.apptest', 'machine_types'), 80),
+    'check_executable_driver' : (HEAVY_MODULES + ('libraries.apptest', 'machine_types'), 80),
+}
+
+def measure_imports(module_name):
+    """Imports module_name in a new interpreter with -X importtime.
+
+    Returns
+    -------
+    tuple
+        (cumulative import time of module_name in microseconds, set of the names of the imported modules).
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    cumulative = None
+    modules = set()
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        (self_us, cumulative_us, name) = line[len('import time:'):].split('|')
+        if not cumulative_us.strip().isdigit():
+            continue
+        modules.add(name.strip())
+        if name.strip() == module_name:
+            cumulative = int(cumulative_us)
+    return (cumulative, modules)
+
+class Test_startup_time(unittest.TestCase):
+
+    def test_entry_point_imports(self):
+        """ Tests that the entry points do not import heavy modules, and import within their budget. """
+        scale = float(os.getenv('RGT_IMPORT_BUDGET_SCALE', '1'))
+        for (module_name, (forbidden, budget_ms)) in ENTRY_POINTS.items():
+            with self.subTest(entry_point=module_name):
+                (best_us, modules) = measure_imports(module_name)
+                for forbidden_name in forbidden:
+                    imported = sorted(name for name in modules
+                                      if name == forbidden_name or name.startswith(forbidden_name + '.'))
+                    self.assertEqual(imported, [], f"{module_name} imports {forbidden_name} at startup.")
+
+                # The best of a few runs, so a busy machine does not fail the test.
+                for attempt in range(2):
+                    best_us = min(best_us, measure_imports(module_name)[0])
+                self.assertLess(best_us / 1000.0, budget_ms * scale,
+                                f"{module_name} takes {best_us / 1000.0:.1f} ms to import, "
+                                f"over its budget of {budget_ms * scale:.0f} ms.")
+        return
+
+if __name__ == "__main__":
+    unittest.main()
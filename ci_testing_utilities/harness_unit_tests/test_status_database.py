@@ -0,0 +1,166 @@
+#! /usr/bin/env python3
+""" Test class module verifies the StatusDatabase and its on-disk cache. """
+
+# System imports
+import unittest
+import os
+import shutil
+import tempfile
+
+# Local imports
+from libraries import input_files
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.status_database import StatusDatabase
+from libraries.status_file import StatusFile
+
+class Test_status_database(unittest.TestCase):
+
+    QUERY = 'SELECT app, test, test_id, check_end_event_value FROM test_instances ORDER BY test_id'
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.scratch_dir, 'status_cache.db')
+        self.input_file_path = os.path.join(self.scratch_dir, 'rgt.input')
+        with open(self.input_file_path, 'w') as file_obj:
+            file_obj.write(f"Path_to_tests = {self.scratch_dir}\n")
+            file_obj.write("Test = App Test1\n")
+            file_obj.write("Test = App Test2 2\n")
+        return
+
+    def tearDown(self):
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _input_file(self):
+        return input_files.rgt_input_file(inputfilename=self.input_file_path,
+                                          runmodecmd=[input_files.USE_HARNESS_TASKS_IN_RGT_INPUT_FILE])
+
+    def _write_event(self, test, test_id, event_id, event_value, event_name=None):
+        """ Writes an event file, the way StatusFile does, and ages the Status directory. """
+        status_dir = os.path.join(self.scratch_dir, 'App', test, apptest_layout.test_status_dirname, test_id)
+        os.makedirs(status_dir, exist_ok=True)
+        (event_filename, event_type, event_subtype) = StatusFile.EVENT_DICT[event_id]
+        if event_name is None:
+            event_name = f"{event_type}_{event_subtype}"
+            event_path = os.path.join(status_dir, event_filename)
+        else:
+            event_path = os.path.join(status_dir, f"Event_{event_name}.txt")
+        fields = {'app': 'App', 'test': test, 'test_id': test_id,
+                  'test_instance': f"App,{test},{test_id}",
+                  'event_name': event_name, 'event_value': event_value,
+                  'event_time': '2023-01-01T00:00:00.000000',
+                  'job_status': StatusFile.NO_VALUE}
+        with open(event_path + '.tmp', 'w') as file_obj:
+            file_obj.write('2023-01-01T00:00:00.000000\t' + event_value + '\t'
+                           + '\t'.join(f"{k}={v}" for (k, v) in fields.items()) + '\n')
+        os.rename(event_path + '.tmp', event_path)
+        self._age(status_dir)
+        return event_path
+
+    def _age(self, path, seconds=3600):
+        """ Moves the mtime of path into the past, out of the cache's racy window. """
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns - seconds * 1000 * 1000 * 1000))
+
+    def _load(self, cache_file, num_workers=None, typed_schema=None):
+        return StatusDatabase(self._input_file(), cache_file=cache_file,
+                              num_workers=num_workers,
+                              typed_schema=typed_schema).load()
+
+    def test_cache_matches_memory(self):
+        """ Tests that the cached database answers queries like the in-memory one. """
+        self._write_event('Test1', '1.1', StatusFile.EVENT_BUILD_END, '0')
+        self._write_event('Test1', '1.1', StatusFile.EVENT_CHECK_END, '0')
+        self._write_event('Test2', '2.1', StatusFile.EVENT_CHECK_END, '1')
+
+        expected = self._load('').query(Test_status_database.QUERY)
+        self.assertEqual(expected, 'App Test1 1.1 0\nApp Test2 2.1 1\n')
+        self.assertEqual(self._load(self.cache_file).query(Test_status_database.QUERY), expected)
+        self.assertEqual(self._load(self.cache_file).query(Test_status_database.QUERY), expected)
+        return
+
+    def test_parallel_load_is_deterministic(self):
+        """ Tests that the number of workers does not change the database. """
+        for i in range(20):
+            self._write_event('Test1', f"1.{i}", StatusFile.EVENT_BUILD_END, '0')
+            self._write_event('Test1', f"1.{i}", StatusFile.EVENT_CHECK_END, str(i % 2))
+            self._write_event('Test2', f"2.{i}", StatusFile.EVENT_SUBMIT_END, '0')
+
+        for table in ('events', 'test_instances'):
+            query = f"SELECT * FROM {table} ORDER BY id"
+            expected = self._load('', num_workers=1).query(query)
+            self.assertEqual(self._load('', num_workers=4).query(query), expected)
+            self.assertEqual(self._load(self.cache_file, num_workers=4).query(query), expected)
+        return
+
+    def test_incremental_load(self):
+        """ Tests that only test instances whose Status directory changed are read again. """
+        event_path = self._write_event('Test1', '1.1', StatusFile.EVENT_CHECK_END, '0')
+        self._write_event('Test2', '2.1', StatusFile.EVENT_BUILD_END, '0')
+        self._load(self.cache_file)
+
+        # Rewriting an event file in place does not change its directory, so the cached value is kept.
+        status_dir = os.path.dirname(event_path)
+        dir_mtime_ns = os.stat(status_dir).st_mtime_ns
+        with open(event_path) as file_obj:
+            contents = file_obj.read()
+        with open(event_path, 'w') as file_obj:
+            file_obj.write(contents.replace('event_value=0', 'event_value=7'))
+        os.utime(status_dir, ns=(dir_mtime_ns, dir_mtime_ns))
+        self.assertEqual(self._load(self.cache_file).query(Test_status_database.QUERY),
+                         'App Test1 1.1 0\nApp Test2 2.1 [NO_VALUE]\n')
+
+        # New events and new or removed test instances are picked up.
+        self._write_event('Test2', '2.1', StatusFile.EVENT_CHECK_END, '1')
+        self._write_event('Test2', '2.2', StatusFile.EVENT_CHECK_END, '0')
+        shutil.rmtree(status_dir)
+        self.assertEqual(self._load(self.cache_file).query(Test_status_database.QUERY),
+                         'App Test2 2.1 1\nApp Test2 2.2 0\n')
+        return
+
+    def test_new_event_name_rebuilds_tables(self):
+        """ Tests that an event name seen for the first time adds its columns to all test instances. """
+        self._write_event('Test1', '1.1', StatusFile.EVENT_CHECK_END, '0')
+        self._load(self.cache_file)
+
+        self._write_event('Test2', '2.1', StatusFile.EVENT_CHECK_END, '0', event_name='custom_end')
+        query = 'SELECT test_id, custom_end_event_value FROM test_instances ORDER BY test_id'
+        expected = self._load('').query(query)
+        self.assertEqual(expected, '1.1 [NO_VALUE]\n2.1 0\n')
+        self.assertEqual(self._load(self.cache_file).query(query), expected)
+        return
+
+    def test_typed_schema(self):
+        """ Tests the numeric and epoch-ns columns and the indexes of the typed schema. """
+        self._write_event('Test1', '1.1', StatusFile.EVENT_CHECK_END, '0')
+        self._write_event('Test1', '1.2', StatusFile.EVENT_BUILD_END, '1')
+
+        for cache_file in ('', self.cache_file):
+            sdb = self._load(cache_file, typed_schema=True)
+            self.assertEqual(sdb.query('SELECT test_id, typeof(check_end_event_value), check_end_event_time_ns '
+                                       'FROM test_instances ORDER BY test_id'),
+                             f"1.1 integer {StatusDatabase.time_ns('2023-01-01T00:00:00.000000')}\n"
+                             "1.2 text None\n")
+            self.assertEqual(sdb.query('SELECT count(*) FROM events WHERE event_value = 1'), '1\n')
+
+            plan = sdb.query('EXPLAIN QUERY PLAN SELECT test_id FROM test_instances '
+                             'WHERE check_end_event_time_ns > 0')
+            self.assertIn('test_instances_check_end_time', plan)
+            plan = sdb.query('EXPLAIN QUERY PLAN SELECT test_id FROM events WHERE event_name = \'check_end\'')
+            self.assertIn('events_event_name', plan)
+
+        # Switching the schema of a cache rebuilds its tables.
+        self.assertEqual(self._load(self.cache_file, typed_schema=False).query(
+                         'SELECT typeof(check_end_event_value) FROM test_instances ORDER BY test_id'),
+                         'text\ntext\n')
+        return
+
+    def test_time_ns(self):
+        """ Tests the conversion of event times to ns since the epoch. """
+        self.assertEqual(StatusDatabase.time_ns('1970-01-01T00:00:01.000002+00:00'), 1000002000)
+        self.assertEqual(StatusDatabase.time_ns('2023-05-06T07:08:09+00:00'), 1683356889 * 1000 * 1000 * 1000)
+        self.assertIsNone(StatusDatabase.time_ns(StatusFile.NO_VALUE))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
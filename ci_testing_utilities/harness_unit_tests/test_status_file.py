@@ -0,0 +1,340 @@
+#! /usr/bin/env python3
+""" Test class module verifies the status file backends. """
+
+# System imports
+import unittest
+import os
+import shutil
+import tempfile
+import threading
+import time
+import fcntl
+import errno
+from unittest import mock
+
+# Local imports
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.rgt_loggers import rgt_logger_factory
+from libraries.status_file import StatusFile, parse_status_file2
+from libraries.status_file_factory import StatusFileFactory
+from libraries.status_file_journal import JournaledStatusFile, StatusJournalIndex
+from libraries.status_file_shard import ShardedStatusFile
+
+class Status_file_test_base:
+    """ Exercises a status file backend through the public StatusFile methods. """
+
+    BACKEND = None
+
+    def setUp(self):
+        """ Creates a scratch app/test directory and changes to its Scripts directory. """
+        self.__startingDirectory = os.getcwd()
+        self.__saved_environ = dict(os.environ)
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.scratch_dir, 'App', 'Test')
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_scripts_dirname))
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_status_dirname))
+        os.chdir(os.path.join(self.test_dir, apptest_layout.test_scripts_dirname))
+
+        os.environ['USER'] = os.getenv('USER', 'harness')
+        os.environ['RGT_PATH_TO_SSPACE'] = os.path.join(self.scratch_dir, 'scratch')
+        os.environ['RGT_STATUS_FILE_BACKEND'] = self.BACKEND
+        for key in ('RGT_INFLUX_URI', 'RGT_INFLUX_TOKEN', 'RGT_SYSTEM_LOG_TAG'):
+            os.environ.pop(key, None)
+
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_status_file_' + self.BACKEND,
+                                   fh_filepath=os.path.join(self.scratch_dir, 'status_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        self.path_to_status_file = os.path.join(self.test_dir,
+                                                apptest_layout.test_status_dirname,
+                                                apptest_layout.test_status_filename)
+        return
+
+    def tearDown(self):
+        os.chdir(self.__startingDirectory)
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _new_instance(self, unique_id):
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_status_dirname, unique_id))
+        sfile = StatusFileFactory.create(path_to_status_file=self.path_to_status_file,
+                                         logger=self.logger)
+        sfile.initialize_subtest('launch_1', unique_id)
+        return sfile
+
+    def _run_instance(self, sfile, check_value):
+        sfile.log_event(StatusFile.EVENT_BUILD_START)
+        sfile.log_event(StatusFile.EVENT_BUILD_END, '0')
+        sfile.log_event(StatusFile.EVENT_SUBMIT_START, '1')
+        sfile.log_event(StatusFile.EVENT_SUBMIT_END, '0')
+        sfile.log_event(StatusFile.EVENT_JOB_QUEUED, '1234')
+        sfile.log_event(StatusFile.EVENT_BINARY_EXECUTE_START, '17')
+        sfile.log_event(StatusFile.EVENT_CHECK_END, check_value)
+
+    def test_instance_lifecycle(self):
+        """ Tests that records are created, updated and finished. """
+        sfile1 = self._new_instance('1000.1')
+        sfile2 = self._new_instance('1000.2')
+
+        self.assertEqual(sfile2.getLastHarnessID(), '1000.2')
+        self.assertFalse(sfile1.isTestFinished('1000.1'))
+        self.assertFalse(sfile1.isTestFinished('no_such_id'))
+        self.assertEqual(sfile1.get_record('1000.1')[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]], '1000.1')
+        self.assertIsNone(sfile1.get_record('no_such_id'))
+
+        self._run_instance(sfile1, '0')
+        self.assertTrue(sfile1.isTestFinished('1000.1'))
+        self.assertFalse(sfile2.isTestFinished('1000.2'))
+        self.assertFalse(sfile2.didAllTestsPass())
+
+        self._run_instance(sfile2, '0')
+        self.assertTrue(sfile2.isTestFinished('1000.2'))
+        self.assertTrue(sfile1.didAllTestsPass())
+
+        # Initializing an already existing instance must not add a record.
+        sfile1.initialize_subtest('launch_1', '1000.1')
+        self.assertEqual(sfile1.getLastHarnessID(), '1000.2')
+
+        with open(os.path.join(self.test_dir, apptest_layout.test_status_dirname,
+                               '1000.1', apptest_layout.job_status_filename)) as file_obj:
+            self.assertEqual(file_obj.read(), '17')
+
+        shash, failed_jobs = parse_status_file2(self.path_to_status_file)
+        self.assertEqual(shash['number_of_tests'], 2)
+        self.assertEqual(shash['number_of_passed_tests'], 2)
+        return
+
+    def test_other_process_sees_updates(self):
+        """ Tests that a second StatusFile object sees updates made by the first. """
+        sfile1 = self._new_instance('2000.1')
+        reader = StatusFileFactory.create(path_to_status_file=self.path_to_status_file,
+                                          logger=self.logger)
+        self.assertFalse(reader.isTestFinished('2000.1'))
+        self._run_instance(sfile1, '1')
+        self.assertTrue(reader.isTestFinished('2000.1'))
+        self.assertFalse(reader.didAllTestsPass())
+        return
+
+    def test_event_fields_follow_job_files(self):
+        """ Tests that the cached instance info picks up changes to job_id.txt. """
+        sfile = self._new_instance('7000.1')
+        status_dir = os.path.join(self.test_dir, apptest_layout.test_status_dirname, '7000.1')
+
+        sfile.log_event(StatusFile.EVENT_SUBMIT_START, '1')
+        with open(os.path.join(status_dir, apptest_layout.job_id_filename), 'w') as file_obj:
+            file_obj.write('98765\n')
+        sfile.log_event(StatusFile.EVENT_JOB_QUEUED, '98765')
+
+        event_file = StatusFile.EVENT_DICT[StatusFile.EVENT_SUBMIT_START][0]
+        with open(os.path.join(status_dir, event_file)) as file_obj:
+            self.assertIn('\tjob_id=' + StatusFile.NO_VALUE + '\t', file_obj.read())
+        event_file = StatusFile.EVENT_DICT[StatusFile.EVENT_JOB_QUEUED][0]
+        with open(os.path.join(status_dir, event_file)) as file_obj:
+            self.assertIn('\tjob_id=98765\t', file_obj.read())
+        return
+
+class Test_fixed_width_status_file(Status_file_test_base, unittest.TestCase):
+    BACKEND = StatusFileFactory.BACKEND_FIXED_WIDTH
+
+    def test_index_rebuilt_after_external_edit(self):
+        """ Tests that the status file index is rebuilt when the status file changes behind its back. """
+        sfile = self._new_instance('5000.1')
+        self._new_instance('5000.2')
+
+        # Prepend a comment line, which moves every record.
+        with open(self.path_to_status_file) as file_obj:
+            contents = file_obj.read()
+        with open(self.path_to_status_file, 'w') as file_obj:
+            file_obj.write('# Edited by hand\n' + contents)
+
+        self._run_instance(sfile, '0')
+        self.assertTrue(sfile.isTestFinished('5000.1'))
+        self.assertFalse(sfile.isTestFinished('5000.2'))
+        self.assertEqual(sfile.getLastHarnessID(), '5000.2')
+        return
+
+    def test_stale_index_without_logger(self):
+        """ Tests that a StatusFile without a logger rebuilds a stale index. """
+        sfile = self._new_instance('5100.1')
+        self._new_instance('5100.2')
+        self._run_instance(sfile, '0')
+
+        # Swap the records, keeping the size and mtime the index header records.
+        stat_ = os.stat(self.path_to_status_file)
+        with open(self.path_to_status_file) as file_obj:
+            lines = file_obj.readlines()
+        (lines[-2], lines[-1]) = (lines[-1], lines[-2])
+        with open(self.path_to_status_file, 'w') as file_obj:
+            file_obj.writelines(lines)
+        os.utime(self.path_to_status_file, ns=(stat_.st_atime_ns, stat_.st_mtime_ns))
+
+        reader = StatusFile(None, self.path_to_status_file)
+        self.assertTrue(reader.isTestFinished('5100.1'))
+        self.assertFalse(reader.isTestFinished('5100.2'))
+        return
+
+    def test_read_only_reader(self):
+        """ Tests that a reader who may not write the index scans the status file. """
+        sfile = self._new_instance('5200.1')
+        self._run_instance(sfile, '0')
+        os.remove(os.path.join(self.test_dir, apptest_layout.test_status_dirname,
+                               apptest_layout.test_status_index_filename))
+
+        def read_only_open(path, flags, *args):
+            if flags & (os.O_WRONLY | os.O_RDWR):
+                raise PermissionError(errno.EACCES, os.strerror(errno.EACCES), path)
+            return os_open(path, flags, *args)
+
+        os_open = os.open
+        reader = StatusFile(None, self.path_to_status_file)
+        with mock.patch('os.open', read_only_open):
+            self.assertTrue(reader.isTestFinished('5200.1'))
+            self.assertFalse(reader.isTestFinished('no_such_id'))
+        return
+
+    def test_update_changing_record_length(self):
+        """ Tests an update with a value wider than its fixed-width column. """
+        sfile1 = self._new_instance('6000.1')
+        sfile2 = self._new_instance('6000.2')
+        sfile1.log_event(StatusFile.EVENT_JOB_QUEUED, 'a_very_long_batch_job_identifier_1234')
+        self._run_instance(sfile2, '0')
+
+        self.assertTrue(sfile2.isTestFinished('6000.2'))
+        with open(self.path_to_status_file) as file_obj:
+            records = [line.split() for line in file_obj if not StatusFile.ignore_line(line)]
+        self.assertEqual(records[0][StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]],
+                         'a_very_long_batch_job_identifier_1234')
+        self.assertEqual(records[1][StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]], '0')
+        return
+
+class Test_journaled_status_file(Status_file_test_base, unittest.TestCase):
+    BACKEND = StatusFileFactory.BACKEND_JOURNAL
+
+    def test_compaction(self):
+        """ Tests that the journal is folded into the fixed-width status file. """
+        os.environ['RGT_STATUS_JOURNAL_COMPACT_THRESHOLD'] = '1000000'
+        sfile = self._new_instance('3000.1')
+        self.assertIsInstance(sfile, JournaledStatusFile)
+        self._run_instance(sfile, '0')
+
+        with open(self.path_to_status_file) as file_obj:
+            self.assertNotIn('3000.1', file_obj.read())
+
+        sfile.compact()
+        self.assertEqual(os.path.getsize(sfile.journal_path), 0)
+        with open(self.path_to_status_file) as file_obj:
+            lines = [line for line in file_obj if not StatusFile.ignore_line(line)]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0].split()[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]], '0')
+        self.assertTrue(sfile.isTestFinished('3000.1'))
+        return
+
+    def test_refresh_waits_for_compaction(self):
+        """ Tests that the index is not refreshed while another process holds the journal lock. """
+        os.environ['RGT_STATUS_JOURNAL_COMPACT_THRESHOLD'] = '1000000'
+        sfile = self._new_instance('5000.1')
+        reader = StatusJournalIndex(self.path_to_status_file)
+        reader.refresh()
+
+        other = JournaledStatusFile(self.logger, self.path_to_status_file)
+        with open(other.journal_path, 'r') as lock_obj:
+            fcntl.flock(lock_obj, fcntl.LOCK_EX)
+            thread = threading.Thread(target=reader.refresh)
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            fcntl.flock(lock_obj, fcntl.LOCK_UN)
+        thread.join()
+
+        self._run_instance(sfile, '0')
+        reader.refresh()
+        self.assertEqual(reader.get_record('5000.1')[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]], '0')
+        return
+
+    def test_journal_selects_backend(self):
+        """ Tests that an existing journal overrides RGT_STATUS_FILE_BACKEND. """
+        self._new_instance('4000.1')
+        os.environ['RGT_STATUS_FILE_BACKEND'] = StatusFileFactory.BACKEND_FIXED_WIDTH
+        sfile = StatusFileFactory.create(path_to_status_file=self.path_to_status_file,
+                                         logger=self.logger)
+        self.assertIsInstance(sfile, JournaledStatusFile)
+        self.assertEqual(sfile.getLastHarnessID(), '4000.1')
+        return
+
+class Test_sharded_status_file(Status_file_test_base, unittest.TestCase):
+    BACKEND = StatusFileFactory.BACKEND_SHARDED
+
+    def test_concurrent_instances(self):
+        """ Tests that test instances updated at the same time each write their own shard, and no update is lost. """
+        unique_ids = [f'8000.{i}' for i in range(8)]
+        sfiles = [self._new_instance(unique_id) for unique_id in unique_ids]
+        self.assertIsInstance(sfiles[0], ShardedStatusFile)
+        threads = [threading.Thread(target=self._run_instance, args=(sfile, '0')) for sfile in sfiles]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with open(self.path_to_status_file) as file_obj:
+            self.assertEqual([line for line in file_obj if not StatusFile.ignore_line(line)], [])
+        for unique_id in unique_ids:
+            self.assertTrue(os.path.exists(os.path.join(self.test_dir, apptest_layout.test_status_dirname, unique_id,
+                                                        apptest_layout.test_status_shard_filename)))
+            self.assertTrue(sfiles[0].isTestFinished(unique_id))
+
+        shash, failed_jobs = parse_status_file2(self.path_to_status_file)
+        self.assertEqual(shash['number_of_tests'], 8)
+        self.assertEqual(shash['number_of_passed_tests'], 8)
+        self.assertEqual(sfiles[0].getLastHarnessID(), '8000.7')
+        return
+
+    def test_refresh_scans_after_writes(self):
+        """ Tests that the shards are only scanned again once a shard was written. """
+        self._new_instance('7000.1')
+        reader = StatusFileFactory.create(path_to_status_file=self.path_to_status_file, logger=self.logger)
+        old_time = time.time() - 60
+        for path in (os.path.dirname(self.path_to_status_file), reader.marker_path):
+            os.utime(path, (old_time, old_time))
+        self.assertEqual(reader.getLastHarnessID(), '7000.1')
+        with mock.patch('os.scandir', side_effect=AssertionError("The shards were scanned.")):
+            self.assertEqual(reader.getLastHarnessID(), '7000.1')
+
+        self._new_instance('7000.2')
+        self.assertEqual(reader.getLastHarnessID(), '7000.2')
+        return
+
+    def test_switch_to_shards(self):
+        """ Tests that the records of rgt_status.txt are kept, and updated, once the test is sharded. """
+        os.environ['RGT_STATUS_FILE_BACKEND'] = StatusFileFactory.BACKEND_FIXED_WIDTH
+        self._new_instance('9000.1')
+        sfile2 = self._new_instance('9000.2')
+        self._run_instance(sfile2, '1')
+
+        os.environ['RGT_STATUS_FILE_BACKEND'] = self.BACKEND
+        sfile1 = StatusFileFactory.create(path_to_status_file=self.path_to_status_file, logger=self.logger)
+        sfile1.initialize_subtest('launch_1', '9000.1')
+        self.assertIsInstance(sfile1, ShardedStatusFile)
+        self.assertFalse(sfile1.isTestFinished('9000.1'))
+        self._run_instance(sfile1, '0')
+        self._new_instance('9000.3')
+
+        os.environ['RGT_STATUS_FILE_BACKEND'] = StatusFileFactory.BACKEND_FIXED_WIDTH
+        reader = StatusFileFactory.create(path_to_status_file=self.path_to_status_file, logger=self.logger)
+        self.assertIsInstance(reader, ShardedStatusFile)
+        self.assertTrue(reader.isTestFinished('9000.1'))
+        self.assertTrue(reader.isTestFinished('9000.2'))
+        self.assertEqual(reader.getLastHarnessID(), '9000.3')
+
+        shash, failed_jobs = parse_status_file2(self.path_to_status_file)
+        self.assertEqual(shash['number_of_tests'], 2)
+        self.assertEqual(shash['number_of_passed_tests'], 1)
+        self.assertEqual(shash['number_of_failed_tests'], 1)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,191 @@
+#! /usr/bin/env python3
+""" Test class module verifies the waiting on testing cycles with the status watcher. """
+
+# System imports
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+# Local imports
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.rgt_loggers import rgt_logger_factory
+from libraries.status_file import StatusFile
+from libraries.status_file_factory import StatusFileFactory
+from libraries.status_watcher import StatusWatcher, is_test_cycle_complete, wait_for_test_cycles
+from libraries.subtest_factory import SubtestFactory
+from machine_types.slurm import SLURM
+
+class Test_status_watcher(unittest.TestCase):
+
+    def setUp(self):
+        self.__startingDirectory = os.getcwd()
+        self.__saved_environ = dict(os.environ)
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.scratch_dir, 'App', 'Test')
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_scripts_dirname))
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_status_dirname))
+        os.chdir(os.path.join(self.test_dir, apptest_layout.test_scripts_dirname))
+
+        os.environ['USER'] = os.getenv('USER', 'harness')
+        os.environ['RGT_PATH_TO_SSPACE'] = os.path.join(self.scratch_dir, 'scratch')
+        # Completion must be noticed through inotify, long before the next poll.
+        os.environ['RGT_STATUS_POLL_INTERVAL'] = '60'
+        for key in ('RGT_INFLUX_URI', 'RGT_INFLUX_TOKEN', 'RGT_SYSTEM_LOG_TAG',
+                    'RGT_STATUS_FILE_BACKEND', 'RGT_STATUS_WATCHER', 'RGT_STATUS_SETTLE_TIME',
+                    'RGT_JOB_STATE_POLL_INTERVAL', 'RGT_JOB_STATE_GRACE'):
+            os.environ.pop(key, None)
+
+        self.logger = rgt_logger_factory.create_rgt_logger(
+                                   logger_name='test_status_watcher',
+                                   fh_filepath=os.path.join(self.scratch_dir, 'watcher_test.log'),
+                                   logger_threshold_log_level='CRITICAL',
+                                   fh_threshold_log_level='CRITICAL',
+                                   ch_threshold_log_level='CRITICAL')
+        self.path_to_status_file = os.path.join(self.test_dir,
+                                                apptest_layout.test_status_dirname,
+                                                apptest_layout.test_status_filename)
+        self.subtest = SubtestFactory.make_subtest(name_of_application='App',
+                                                   name_of_subtest='Test',
+                                                   local_path_to_tests=self.scratch_dir,
+                                                   logger=self.logger,
+                                                   tag='watcher')
+        return
+
+    def tearDown(self):
+        os.chdir(self.__startingDirectory)
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _new_instance(self, unique_id):
+        os.makedirs(os.path.join(self.test_dir, apptest_layout.test_status_dirname, unique_id))
+        sfile = StatusFileFactory.create(path_to_status_file=self.path_to_status_file,
+                                         logger=self.logger)
+        sfile.initialize_subtest('launch_1', unique_id)
+        sfile.log_event(StatusFile.EVENT_BUILD_END, '0')
+        sfile.log_event(StatusFile.EVENT_SUBMIT_END, '0')
+        sfile.log_event(StatusFile.EVENT_JOB_QUEUED, '1234')
+        return sfile
+
+    def _finish_later(self, delay, sfile):
+        def finish():
+            time.sleep(delay)
+            sfile.log_event(StatusFile.EVENT_CHECK_END, '0')
+        thread = threading.Thread(target=finish)
+        thread.start()
+        return thread
+
+    def _require_inotify(self):
+        with StatusWatcher() as watcher:
+            if not watcher.uses_inotify:
+                self.skipTest("inotify is not available")
+
+    def test_completion_is_noticed_quickly(self):
+        """ Tests that the check_end event wakes the waiter instead of the poll interval. """
+        self._require_inotify()
+        thread = self._finish_later(0.3, self._new_instance('1000.1'))
+
+        start_time = time.monotonic()
+        incomplete = wait_for_test_cycles([self.subtest], 30.0, settle_time=0.2)
+        elapsed = time.monotonic() - start_time
+        thread.join()
+        self.assertEqual(incomplete, [])
+        self.assertLess(elapsed, 5.0)
+        return
+
+    def test_new_instance_restarts_settle_time(self):
+        """ Tests that a test instance started within the settle time is waited on as well. """
+        self._require_inotify()
+        sfile = self._new_instance('1000.1')
+        sfile.log_event(StatusFile.EVENT_CHECK_END, '0')
+
+        def resubmit():
+            time.sleep(0.2)
+            self._finish_later(0.5, self._new_instance('1000.2')).join()
+        thread = threading.Thread(target=resubmit)
+        thread.start()
+
+        incomplete = wait_for_test_cycles([self.subtest], 30.0, settle_time=1.0)
+        thread.join()
+        self.assertEqual(incomplete, [])
+        self.assertTrue(sfile.isTestFinished('1000.2'))
+        return
+
+    def test_timeout(self):
+        """ Tests that unfinished subtests are returned after the timeout. """
+        self._new_instance('1000.1')
+        start_time = time.monotonic()
+        self.assertEqual(wait_for_test_cycles([self.subtest], 0.5, settle_time=0.1), [self.subtest])
+        self.assertLess(time.monotonic() - start_time, 5.0)
+        self.assertFalse(is_test_cycle_complete(self.subtest, settle_time=0.1))
+        return
+
+    def test_poll_fallback(self):
+        """ Tests that the polling watcher also notices the completion. """
+        os.environ['RGT_STATUS_WATCHER'] = 'poll'
+        os.environ['RGT_STATUS_POLL_INTERVAL'] = '0.1'
+        with StatusWatcher() as watcher:
+            self.assertFalse(watcher.uses_inotify)
+        thread = self._finish_later(0.3, self._new_instance('1000.1'))
+        self.assertEqual(wait_for_test_cycles([self.subtest], 30.0, settle_time=0.2), [])
+        thread.join()
+        self.assertTrue(is_test_cycle_complete(self.subtest, settle_time=0.1))
+        return
+
+    def test_cancelled_job_ends_wait(self):
+        """ Tests that a test whose job left the queue is not waited on until the timeout. """
+        bin_dir = os.path.join(self.scratch_dir, 'bin')
+        os.makedirs(bin_dir)
+        sacct = os.path.join(bin_dir, 'sacct')
+        with open(sacct, 'w') as file_obj:
+            file_obj.write("#!/bin/sh\necho '1234|CANCELLED by 0'\n")
+        os.chmod(sacct, os.stat(sacct).st_mode | stat.S_IXUSR)
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+        os.environ['RGT_JOB_STATE_POLL_INTERVAL'] = '0.1'
+        os.environ['RGT_JOB_STATE_GRACE'] = '0.3'
+
+        self._new_instance('1000.1')
+        start_time = time.monotonic()
+        incomplete = wait_for_test_cycles([self.subtest], 30.0, settle_time=0.1, scheduler=SLURM())
+        self.assertEqual(incomplete, [self.subtest])
+        self.assertLess(time.monotonic() - start_time, 5.0)
+        return
+
+    def test_missing_job_ends_wait_once_reported(self):
+        """ Tests that a job missing from sacct only ends the wait if sacct reported it before. """
+        bin_dir = os.path.join(self.scratch_dir, 'bin')
+        os.makedirs(bin_dir)
+        reported_file = os.path.join(self.scratch_dir, 'reported')
+        sacct = os.path.join(bin_dir, 'sacct')
+        with open(sacct, 'w') as file_obj:
+            # The job is reported by sacct once the test creates reported_file,
+            # then it is missing again.
+            file_obj.write(f"#!/bin/sh\nif [ -e {reported_file} ]; then rm {reported_file}; echo '1234|RUNNING'; fi\n")
+        os.chmod(sacct, os.stat(sacct).st_mode | stat.S_IXUSR)
+        os.environ['PATH'] = bin_dir + os.pathsep + os.environ['PATH']
+        os.environ['RGT_JOB_STATE_POLL_INTERVAL'] = '0.1'
+        os.environ['RGT_JOB_STATE_GRACE'] = '0.3'
+
+        # A job sacct does not report yet, e.g. just after it was submitted, is waited on.
+        self._new_instance('1000.1')
+        start_time = time.monotonic()
+        incomplete = wait_for_test_cycles([self.subtest], 1.5, settle_time=0.1, scheduler=SLURM())
+        self.assertEqual(incomplete, [self.subtest])
+        self.assertGreaterEqual(time.monotonic() - start_time, 1.5)
+
+        with open(reported_file, 'w'):
+            pass
+        start_time = time.monotonic()
+        incomplete = wait_for_test_cycles([self.subtest], 30.0, settle_time=0.1, scheduler=SLURM())
+        self.assertEqual(incomplete, [self.subtest])
+        self.assertLess(time.monotonic() - start_time, 5.0)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
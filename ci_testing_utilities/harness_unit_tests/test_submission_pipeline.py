@@ -0,0 +1,134 @@
+#! /usr/bin/env python3
+""" Test class module verifies the concurrent, rate-limited submission of batch scripts. """
+
+# System imports
+import unittest
+import os
+import shutil
+import stat
+import tempfile
+import time
+
+# Local imports
+from libraries import submission_pipeline
+from libraries.submission_pipeline import RateLimiter, SubmissionPipeline
+from machine_types.lsf import LSF
+from machine_types.slurm import SLURM
+
+class Test_submission_pipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.__saved_environ = dict(os.environ)
+        for name in ('RGT_SUBMIT_RATE', 'RGT_SUBMIT_BURST', 'RGT_SUBMIT_RATE_FILE', 'RGT_SUBMIT_PIPELINE_WORKERS',
+                     'RGT_SUBMIT_QUEUE', 'RGT_BATCH_QUEUE', 'RGT_SUBMIT_ARGS', 'RGT_SUBMIT_ACCT', 'RGT_PROJECT_ID'):
+            os.environ.pop(name, None)
+        submission_pipeline._rate_limiters.clear()
+
+        self.scratch_dir = tempfile.mkdtemp()
+        self.bin_dir = os.path.join(self.scratch_dir, 'bin')
+        os.makedirs(self.bin_dir)
+        self.calls_file = os.path.join(self.scratch_dir, 'calls.txt')
+        os.environ['PATH'] = self.bin_dir + os.pathsep + os.environ['PATH']
+
+        # A submit command recording its directory and arguments, which prints
+        # the job id of the batch script given as its last argument.
+        for (name, output) in (('sbatch', 'Submitted batch job $job_id'),
+                               ('bsub', 'Job <$job_id> is submitted to queue <batch>.')):
+            path = os.path.join(self.bin_dir, name)
+            with open(path, 'w') as file_obj:
+                file_obj.write('#!/bin/sh\n')
+                file_obj.write('for last; do :; done\n')
+                file_obj.write('job_id=$(cat "$last") || exit 1\n')
+                file_obj.write(f'echo "$(pwd) {name} $*" >> {self.calls_file}\n')
+                file_obj.write(f'echo "{output}"\n')
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        return
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.__saved_environ)
+        submission_pipeline._rate_limiters.clear()
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def _make_run_archive(self, name, job_id):
+        ra_dir = os.path.join(self.scratch_dir, name)
+        os.makedirs(ra_dir)
+        with open(os.path.join(ra_dir, 'batch.x'), 'w') as file_obj:
+            file_obj.write(job_id)
+        return ra_dir
+
+    def _calls(self):
+        with open(self.calls_file) as file_obj:
+            return file_obj.read().splitlines()
+
+    def test_submit_job_in_directory(self):
+        """ Tests that a batch script is submitted in its directory, without changing the working directory. """
+        os.environ['RGT_SUBMIT_QUEUE'] = 'debug'
+        os.environ['RGT_PROJECT_ID'] = 'abc123'
+        ra_dir = self._make_run_archive('Run_Archive', '1234')
+        cwd = os.getcwd()
+
+        scheduler = SLURM()
+        self.assertEqual(scheduler.submit_job('batch.x', cwd=ra_dir), 0)
+        self.assertEqual(os.getcwd(), cwd)
+        self.assertEqual(scheduler.get_job_id(), '1234')
+        self.assertEqual(self._calls(), [f"{os.path.realpath(ra_dir)} sbatch -p debug -A abc123 batch.x"])
+        with open(os.path.join(ra_dir, 'submit.out')) as file_obj:
+            self.assertEqual(file_obj.read(), "Submitted batch job 1234\n")
+
+        lsf = LSF()
+        self.assertEqual(lsf.submit_job('batch.x', cwd=ra_dir), 0)
+        self.assertEqual(lsf.get_job_id(), '1234')
+        self.assertIn("bsub -q debug -P abc123 batch.x", self._calls()[-1])
+
+        self.assertNotEqual(scheduler.submit_job('missing.x', cwd=ra_dir), 0)
+        return
+
+    def test_pipeline(self):
+        """ Tests that the pipeline prepares and submits many batch scripts at once. """
+        scheduler = SLURM()
+        prepared = []
+        with SubmissionPipeline(max_workers=4) as pipeline:
+            futures = []
+            for index in range(10):
+                ra_dir = self._make_run_archive(f'test_{index}', str(500 + index))
+                futures.append(pipeline.submit(scheduler, 'batch.x', ra_dir,
+                                               prepare=lambda index=index: prepared.append(index)))
+            results = [future.result() for future in futures]
+
+        self.assertEqual([result.exit_status for result in results], [0] * 10)
+        self.assertEqual([result.job_id for result in results], [str(500 + index) for index in range(10)])
+        self.assertEqual(sorted(prepared), list(range(10)))
+        self.assertIsNone(scheduler.get_job_id())
+        for index in range(10):
+            self.assertTrue(any(call.startswith(os.path.realpath(os.path.join(self.scratch_dir, f'test_{index}')) + ' ')
+                                for call in self._calls()))
+        return
+
+    def test_rate_limiter(self):
+        """ Tests that the rate limiter allows a burst, then spaces the submissions, also across limiters sharing a file. """
+        self.assertIsNone(submission_pipeline.get_submit_rate_limiter())
+        os.environ['RGT_SUBMIT_RATE'] = '20'
+        os.environ['RGT_SUBMIT_BURST'] = '3'
+        limiter = submission_pipeline.get_submit_rate_limiter()
+        self.assertEqual((limiter.rate, limiter.burst), (20.0, 3))
+        self.assertIs(submission_pipeline.get_submit_rate_limiter(), limiter)
+
+        start_time = time.monotonic()
+        waits = [limiter.acquire() for index in range(7)]
+        self.assertEqual(waits[:3], [0.0, 0.0, 0.0])
+        self.assertGreaterEqual(time.monotonic() - start_time, 0.15)
+
+        state_file = os.path.join(self.scratch_dir, 'rate', 'submit_rate.json')
+        first = RateLimiter(10, 1, state_file)
+        second = RateLimiter(10, 1, state_file)
+        self.assertEqual(first.acquire(), 0.0)
+        self.assertGreater(second.acquire(), 0.0)
+
+        with self.assertRaises(ValueError):
+            RateLimiter(0)
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#! /usr/bin/env python3
+""" Test class module verifies the dependency graph of harness tasks. """
+
+# System imports
+import unittest
+import threading
+import time
+
+# Local imports
+from libraries.task_dag import TaskDAG, TaskDAGError, TaskResult
+
+class Test_task_dag(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.running = {}
+        self.max_running = {}
+        return
+
+    def _task(self, key, pool, exit_status=0, delay=0.0):
+        """ Returns a task function that records when it starts and ends, and how many tasks of pool run at once. """
+        def task():
+            with self.lock:
+                self.events.append(('start', key))
+                self.running[pool] = self.running.get(pool, 0) + 1
+                self.max_running[pool] = max(self.max_running.get(pool, 0), self.running[pool])
+            time.sleep(delay)
+            with self.lock:
+                self.running[pool] -= 1
+                self.events.append(('end', key))
+            if exit_status == 'raise':
+                raise RuntimeError(f"task {key} failed")
+            return exit_status
+        return task
+
+    def _add(self, dag, key, pool, dependencies=(), exit_status=0, delay=0.0):
+        dag.add_task(key, self._task(key, pool, exit_status, delay), pool, dependencies=dependencies)
+
+    def test_dependencies_and_pools(self):
+        """ Tests that tasks start after their dependencies and that pools bound the tasks run at once. """
+        dag = TaskDAG({'build' : 2, 'submit' : 1})
+        self._add(dag, 'checkout', 'build')
+        for test in ('t1', 't2', 't3', 't4'):
+            self._add(dag, (test, 'build'), 'build', dependencies=['checkout'], delay=0.05)
+            self._add(dag, (test, 'submit'), 'submit', dependencies=[(test, 'build')], delay=0.05)
+
+        results = dag.run()
+        self.assertTrue(all(result.status == TaskResult.SUCCEEDED for result in results.values()))
+        self.assertEqual(list(results.keys())[0], 'checkout')
+        for test in ('t1', 't2', 't3', 't4'):
+            self.assertLess(self.events.index(('end', 'checkout')), self.events.index(('start', (test, 'build'))))
+            self.assertLess(self.events.index(('end', (test, 'build'))), self.events.index(('start', (test, 'submit'))))
+        self.assertEqual(self.max_running, {'build' : 2, 'submit' : 1})
+        return
+
+    def test_slow_task_does_not_block_others(self):
+        """ Tests that the tasks of other tests go on while one build is slow. """
+        dag = TaskDAG({'build' : 2, 'submit' : 2})
+        self._add(dag, ('slow', 'build'), 'build', delay=0.5)
+        self._add(dag, ('slow', 'submit'), 'submit', dependencies=[('slow', 'build')])
+        self._add(dag, ('fast', 'build'), 'build')
+        self._add(dag, ('fast', 'submit'), 'submit', dependencies=[('fast', 'build')])
+
+        dag.run()
+        self.assertLess(self.events.index(('end', ('fast', 'submit'))), self.events.index(('end', ('slow', 'build'))))
+        return
+
+    def test_failure_skips_dependents(self):
+        """ Tests that a failed task skips the tasks depending on it, and only those. """
+        dag = TaskDAG({'build' : 1, 'submit' : 1})
+        self._add(dag, 'checkout', 'build')
+        self._add(dag, ('t1', 'build'), 'build', dependencies=['checkout'], exit_status=1)
+        self._add(dag, ('t1', 'submit'), 'submit', dependencies=[('t1', 'build')])
+        self._add(dag, ('t2', 'build'), 'build', dependencies=['checkout'], exit_status='raise')
+        self._add(dag, ('t2', 'submit'), 'submit', dependencies=[('t2', 'build'), 'checkout'])
+        self._add(dag, ('t3', 'build'), 'build', dependencies=['checkout'])
+
+        results = dag.run()
+        self.assertEqual({key : result.status for (key, result) in results.items()},
+                         {'checkout' : TaskResult.SUCCEEDED,
+                          ('t1', 'build') : TaskResult.FAILED,
+                          ('t1', 'submit') : TaskResult.SKIPPED,
+                          ('t2', 'build') : TaskResult.FAILED,
+                          ('t2', 'submit') : TaskResult.SKIPPED,
+                          ('t3', 'build') : TaskResult.SUCCEEDED})
+        self.assertEqual(results[('t1', 'build')].value, 1)
+        self.assertIn('task (\'t2\', \'build\') failed', results[('t2', 'build')].error)
+        self.assertNotIn(('start', ('t1', 'submit')), self.events)
+        return
+
+    def test_invalid_graph(self):
+        """ Tests that unknown pools and dependencies, and duplicated tasks, are rejected. """
+        dag = TaskDAG({'build' : 1})
+        self._add(dag, 'a', 'build')
+        with self.assertRaises(TaskDAGError):
+            self._add(dag, 'a', 'build')
+        with self.assertRaises(TaskDAGError):
+            self._add(dag, 'b', 'submit')
+        with self.assertRaises(TaskDAGError):
+            self._add(dag, 'b', 'build', dependencies=['c'])
+        with self.assertRaises(TaskDAGError):
+            TaskDAG({'build' : 0})
+        return
+
+if __name__ == "__main__":
+    unittest.main()
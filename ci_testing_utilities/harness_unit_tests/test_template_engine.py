@@ -0,0 +1,80 @@
+#! /usr/bin/env python3
+""" Test class module verifies the templates of the batch scripts. """
+
+# System imports
+import unittest
+import os
+import shutil
+import tempfile
+
+# Local imports
+from libraries import template_engine
+from libraries.template_engine import Template, TemplateError
+
+class Test_template_engine(unittest.TestCase):
+
+    def setUp(self):
+        self.scratch_dir = tempfile.mkdtemp()
+        self.template_file = os.path.join(self.scratch_dir, 'slurm.template.x')
+        with open(self.template_file, 'w') as file_obj:
+            file_obj.write("#SBATCH -J __job_name__\n"
+                           "#SBATCH -N __nodes__ -p __batch_queue__\n"
+                           "cd __rgt_.work-dir__ && __unknown_key__\n")
+        template_engine._templates.clear()
+        return
+
+    def tearDown(self):
+        template_engine._templates.clear()
+        shutil.rmtree(self.scratch_dir)
+        return
+
+    def test_render(self):
+        """ Tests that placeholders are replaced literally in one pass, and unresolved ones kept. """
+        template = Template("a __x__ b __y__ __x__ c____z", name='test')
+        self.assertEqual(template.placeholders, frozenset(['__x__', '__y__']))
+        replacements = {'__x__' : r'\1 $HOME __y__', '__y__' : 2, '__unused__' : 'u'}
+        self.assertEqual(template.render(replacements), r"a \1 $HOME __y__ b 2 \1 $HOME __y__ c____z")
+
+        self.assertEqual(template.render({'__x__' : 'X'}), "a X b __y__ X c____z")
+        self.assertEqual(template.unresolved_placeholders({'__x__' : 'X'}), ['__y__'])
+        with self.assertRaises(TemplateError) as context:
+            template.render({'__x__' : 'X'}, strict=True)
+        self.assertEqual(context.exception.unresolved, ['__y__'])
+        return
+
+    def test_keys_unlike_placeholders(self):
+        """ Tests that keys starting with '_' or containing '__' are replaced, the longest key first. """
+        template = Template("__a__b__ ___x__ __a__ __y__", name='test')
+        replacements = {'__a__' : 'A', '__a__b__' : 'AB', '___x__' : 'X'}
+        self.assertEqual(template.render(replacements), "AB X A __y__")
+        self.assertEqual(template.unresolved_placeholders(replacements), ['__y__'])
+        self.assertEqual(template.render({'__a__' : 'A'}), "Ab__ ___x__ A __y__")
+        with self.assertRaises(TemplateError) as context:
+            template.render(replacements, strict=True)
+        self.assertEqual(context.exception.unresolved, ['__y__'])
+        return
+
+    def test_render_template_file(self):
+        """ Tests that a template file is parsed once while it is unchanged. """
+        replacements = {'__job_name__' : 'job', '__nodes__' : '4', '__batch_queue__' : 'batch',
+                        '__rgt_.work-dir__' : '/tmp/work'}
+        output_file = os.path.join(self.scratch_dir, 'batch.x')
+        unresolved = template_engine.render_template_file(self.template_file, output_file, replacements)
+        self.assertEqual(unresolved, ['__unknown_key__'])
+        with open(output_file) as file_obj:
+            self.assertEqual(file_obj.read(), "#SBATCH -J job\n"
+                                              "#SBATCH -N 4 -p batch\n"
+                                              "cd /tmp/work && __unknown_key__\n")
+
+        template = template_engine.load_template(self.template_file)
+        self.assertIs(template_engine.load_template(self.template_file), template)
+
+        with open(self.template_file, 'a') as file_obj:
+            file_obj.write("echo __job_name__ done\n")
+        new_template = template_engine.load_template(self.template_file)
+        self.assertIsNot(new_template, template)
+        self.assertIn('echo job done', new_template.render(replacements))
+        return
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,11 +8,7 @@ import getopt
 import string
 
 # Harness imports
-from libraries.apptest import subtest
-from libraries.subtest_factory import SubtestFactory 
-from libraries.layout_of_apps_directory import get_layout_from_runarchivedir
-from libraries.layout_of_apps_directory import get_path_to_logfile_from_runarchivedir
-from libraries.rgt_loggers import rgt_logger_factory
+from libraries import harness_daemon
 
 #
 # Author: Arnold Tharrington, Scientific Computing Group
@@ -88,6 +84,34 @@ def main():
         usage()
         sys.exit(2)
 
+    # The check is run by the harness daemon if it can be reached. Once the
+    # daemon has the request it may have run the check, so it is not run again.
+    if harness_daemon.get_daemon_socket():
+        try:
+            (stdout, stderr, check_exit_value) = harness_daemon.run_check(path_to_results, test_id_string)
+        except harness_daemon.DaemonUnreachableError as err:
+            print(f"The harness daemon can not be reached, running the check locally: {err}", file=sys.stderr)
+        except harness_daemon.DaemonError as err:
+            print("ERROR:", err.message)
+            sys.exit(1)
+        except (OSError, ValueError) as err:
+            print(f"ERROR: The harness daemon failed to run the check: {err}")
+            sys.exit(1)
+        else:
+            sys.stdout.write(stdout)
+            sys.stderr.write(stderr)
+            return check_exit_value
+
+    return check_locally(path_to_results, test_id_string)
+
+def check_locally(path_to_results, test_id_string):
+    """Runs test_harness_driver.py --check for the test instance of path_to_results."""
+    # The harness is imported only here, so the clients of the harness daemon start quickly.
+    from libraries.subtest_factory import SubtestFactory
+    from libraries.layout_of_apps_directory import get_layout_from_runarchivedir
+    from libraries.layout_of_apps_directory import get_path_to_logfile_from_runarchivedir
+    from libraries.rgt_loggers import rgt_logger_factory
+
     (apps_root, app, test, testid) = get_layout_from_runarchivedir(path_to_results)
 
     if test_id_string != None:
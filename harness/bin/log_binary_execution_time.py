@@ -4,11 +4,7 @@ import argparse
 import sys
 import os
 
-from libraries.subtest_factory import SubtestFactory
-from libraries.status_file_factory import StatusFileFactory
-from libraries.status_file import StatusFile
-from libraries.layout_of_apps_directory import get_layout_from_scriptdir, get_path_to_logfile_from_scriptdir
-from libraries.rgt_loggers import rgt_logger_factory
+from libraries import harness_daemon
 
 MODULE_THRESHOLD_LOG_LEVEL = "DEBUG"
 """str : The logging level for this module. """
@@ -67,6 +63,31 @@ def main():
     unique_id = Vargs.uniqueid
     scriptsdir = Vargs.scriptsdir
 
+    # The event is logged by the harness daemon if there is one, and by
+    # this process if the daemon can not be reached. Once the daemon has the
+    # request it may have logged the event, so it is not logged again.
+    if harness_daemon.get_daemon_socket():
+        event_id = "BINARY_EXECUTE_START" if log_mode == "start" else "BINARY_EXECUTE_END"
+        try:
+            harness_daemon.log_event(scriptsdir, unique_id, event_id)
+            return
+        except harness_daemon.DaemonUnreachableError as err:
+            print(f"The harness daemon can not be reached, logging it locally: {err}", file=sys.stderr)
+        except (OSError, ValueError, harness_daemon.DaemonError) as err:
+            print(f"ERROR: The harness daemon failed to log the event: {err}", file=sys.stderr)
+            sys.exit(1)
+
+    log_event_locally(scriptsdir, unique_id, log_mode)
+
+def log_event_locally(scriptsdir, unique_id, log_mode):
+    """Logs the start or final event of log_mode to the status file of the test instance."""
+    # The harness is imported only here, so the clients of the harness daemon start quickly.
+    from libraries.subtest_factory import SubtestFactory
+    from libraries.status_file_factory import StatusFileFactory
+    from libraries.status_file import StatusFile
+    from libraries.layout_of_apps_directory import get_layout_from_scriptdir, get_path_to_logfile_from_scriptdir
+    from libraries.rgt_loggers import rgt_logger_factory
+
     # Change to the scripts directory of the test
     cwd = os.getcwd()
     if cwd != scriptsdir:
@@ -0,0 +1,85 @@
+#! /usr/bin/env python3
+"""Starts or stops the resident harness daemon serving the callbacks of the batch jobs.
+
+The batch jobs use the daemon when RGT_HARNESS_DAEMON_SOCKET is set to its
+socket in their environment. See libraries/harness_daemon.py.
+"""
+
+# Python imports
+import argparse
+import os
+import signal
+import sys
+import threading
+
+# Harness imports
+from libraries import harness_daemon
+from libraries.rgt_loggers import rgt_logger_factory
+
+MODULE_LOGGER_NAME = harness_daemon.DAEMON_LOGGER_NAME
+"""The logger name for this module."""
+
+def create_a_parser():
+    """Parses the arguments.
+
+    Returns
+    -------
+    An ArgParser object that contains the information of the arguments.
+    """
+    parser = argparse.ArgumentParser(description="Runs the harness daemon in the foreground until it is stopped.",
+                                     add_help=True)
+
+    parser.add_argument("--socket", type=str, default=harness_daemon.get_daemon_socket(),
+                        help="The path of the socket of the daemon. The default is $RGT_HARNESS_DAEMON_SOCKET.")
+
+    parser.add_argument("--logfile", type=str, default=None,
+                        help="The log file of the daemon. The default is the socket path with the suffix .log.")
+
+    parser.add_argument("--max-cached-tests", type=int, default=harness_daemon.DEFAULT_MAX_CACHED_TESTS,
+                        help="The number of tests whose status file and logger are kept open.")
+
+    parser.add_argument("--stop", action="store_true",
+                        help="Stops the daemon listening on the socket instead of starting one.")
+
+    return parser
+
+def main():
+    parser = create_a_parser()
+    Vargs = parser.parse_args()
+    if not Vargs.socket:
+        parser.error("The socket must be given by --socket or RGT_HARNESS_DAEMON_SOCKET.")
+    socket_path = os.path.abspath(Vargs.socket)
+
+    if Vargs.stop:
+        try:
+            harness_daemon.call_daemon({'op' : harness_daemon.OP_SHUTDOWN, 'environ' : {}},
+                                       socket_path=socket_path)
+        except (OSError, harness_daemon.DaemonError) as err:
+            print(f"Unable to stop the harness daemon at {socket_path}: {err}", file=sys.stderr)
+            return 1
+        return 0
+
+    a_logger = rgt_logger_factory.create_rgt_logger(
+                                         logger_name=MODULE_LOGGER_NAME,
+                                         fh_filepath=Vargs.logfile or socket_path + ".log",
+                                         logger_threshold_log_level="INFO",
+                                         fh_threshold_log_level="INFO",
+                                         ch_threshold_log_level="WARNING")
+    try:
+        daemon = harness_daemon.HarnessDaemon(socket_path, logger=a_logger,
+                                              max_cached_tests=Vargs.max_cached_tests)
+    except OSError as err:
+        print(err, file=sys.stderr)
+        return 1
+
+    # The shutdown waits for serve_forever, which runs in this thread.
+    def stop(signum, frame):
+        threading.Thread(target=daemon.shutdown, daemon=True).start()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    daemon.serve_forever()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
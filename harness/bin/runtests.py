@@ -248,6 +248,37 @@ DEFAULT_OUTPUT=PERMITTED_OUTPUT_VALUES[0]
 str: The default output option.
 """
 
+# This section pertains to the options of the thread pool running the tests.
+DEFAULT_NUM_WORKERS=int(os.getenv('RGT_NUM_WORKERS', '1'))
+"""
+int: The default number of worker threads running harness tasks.
+
+The number of workers is set by means of the command line arguments to the
+runtests.py command: --num-workers <N>. The default is the value of the
+environment variable RGT_NUM_WORKERS, or 1.
+"""
+
+PERMITTED_SCHEDULE_VALUES=regression_test.Harness.SCHEDULES
+"""
+A tuple of str: The permitted values of the schedule option.
+
+* app - The tests of an application are done one after another by one worker.
+* test - Every test is done by its own worker.
+* dag - The checkout, build, submit and remaining tasks of every test are
+  separate tasks, each started as soon as the tasks it depends on are done.
+"""
+
+DEFAULT_SCHEDULE=os.getenv('RGT_SCHEDULE', regression_test.Harness.SCHEDULE_APP)
+"""
+str: The default schedule option, from the environment variable RGT_SCHEDULE.
+"""
+
+DEFAULT_MAX_TESTS_PER_APP=int(os.getenv('RGT_MAX_TESTS_PER_APP', '0'))
+"""
+int: The default maximum number of tests of one application done at once
+with --schedule test. 0 means no limit.
+"""
+
 #-----------------------------------------------------
 # End of section that sets the permitted and/or      -
 # default for the command line options of the        -
@@ -326,6 +357,28 @@ def create_parser():
                         default=False,
                         help="Separate output from build into build_out.stderr.txt and build_out.stdout.txt")
 
+    parser.add_argument("--num-workers",
+                        required=False,
+                        type=int,
+                        default=DEFAULT_NUM_WORKERS,
+                        help="Number of worker threads running harness tasks (default: %(default)s)")
+
+    schedule_help = ("Unit of work of the worker threads:\n"
+                     "  'app'  - the tests of an application are done one after another (default)\n"
+                     "  'test' - every test is done by its own worker\n"
+                     "  'dag'  - the checkout, build and submit of the tests are scheduled as separate tasks\n")
+    parser.add_argument("--schedule",
+                        required=False,
+                        choices=PERMITTED_SCHEDULE_VALUES,
+                        default=DEFAULT_SCHEDULE,
+                        help=schedule_help)
+
+    parser.add_argument("--max-tests-per-app",
+                        required=False,
+                        type=int,
+                        default=DEFAULT_MAX_TESTS_PER_APP,
+                        help="With --schedule test, the maximum number of tests of one application done at once, 0 for no limit (default: %(default)s)")
+
     return parser
 
 def parse_commandline_argv(argv):
@@ -351,13 +404,21 @@ def parse_commandline_argv(argv):
 
     parser = create_parser()
     Vargs = parser.parse_args(argv)
+
+    # argparse does not check a default against the choices, so a schedule from RGT_SCHEDULE is checked here.
+    if Vargs.schedule not in PERMITTED_SCHEDULE_VALUES:
+        parser.error(f"invalid schedule RGT_SCHEDULE={Vargs.schedule!r}, "
+                     f"choose from {', '.join(PERMITTED_SCHEDULE_VALUES)}")
     harness_parsed_args = command_line.HarnessParsedArguments(inputfile=Vargs.inputfile,
                                                               loglevel=Vargs.loglevel,
                                                               configfile=Vargs.configfile,
                                                               stdout_stderr=Vargs.output,
                                                               runmode=Vargs.mode,
                                                               use_fireworks=Vargs.fireworks,
-                                                              separate_build_stdio=Vargs.separate_build_stdio)
+                                                              separate_build_stdio=Vargs.separate_build_stdio,
+                                                              num_workers=Vargs.num_workers,
+                                                              schedule=Vargs.schedule,
+                                                              max_tests_per_app=Vargs.max_tests_per_app)
     return harness_parsed_args
 
 def runtests(my_arg_string=None):
@@ -416,7 +477,10 @@ def runtests(my_arg_string=None):
                                   harness_arguments.loglevel,
                                   harness_arguments.stdout_stderr,
                                   harness_arguments.use_fireworks,
-                                  harness_arguments.separate_build_stdio)
+                                  harness_arguments.separate_build_stdio,
+                                  num_workers=harness_arguments.num_workers,
+                                  schedule=harness_arguments.schedule,
+                                  max_tests_per_app=harness_arguments.max_tests_per_app)
 
     main_logger.info("Created an instance of the harness.")
     main_logger.info("Harness: " + str(rgt))
@@ -145,6 +145,16 @@ def read_job_file(test_status_dir):
     return job_id
 
 
+def log_process_result(jstatus, mymachine, action):
+    """Logs the resource usage, and the timeout if any, of the supervised command of action as events."""
+    result = mymachine.process_results.get(action)
+    if result is None:
+        return
+    jstatus.log_custom_event(action, 'resources', result.event_value)
+    if result.timed_out:
+        jstatus.log_custom_event(action, 'timeout', result.elapsed_seconds)
+
+
 def auto_generated_scripts(harness_config,
                            apptest,
                            jstatus,
@@ -182,6 +192,10 @@ def auto_generated_scripts(harness_config,
             message += error.message
             a_logger.doCriticalLogging(message)
         finally:
+            # A build restored from the build cache is marked by a build_cache_hit event.
+            if mymachine.build_cache_hit:
+                jstatus.log_custom_event('build', 'cache_hit', mymachine.build_cache_key)
+            log_process_result(jstatus, mymachine, 'build')
             jstatus.log_event(status_file.StatusFile.EVENT_BUILD_END, build_exit_value)
 
     #-----------------------------------------------------
@@ -232,8 +246,16 @@ def auto_generated_scripts(harness_config,
         # Create the batch script
         make_batch_script_status = mymachine.make_batch_script()
 
-        # Submit the batch script
-        if make_batch_script_status:
+        # With RGT_PACKED_SUBMIT, the harness submits the batch script in a packed
+        # job, and logs the submit_end and job_queued events of the test.
+        from libraries import packed_submission
+        pack_dir = packed_submission.get_pack_dir()
+        if make_batch_script_status and pack_dir:
+            jstatus.log_event(status_file.StatusFile.EVENT_SUBMIT_START, run_count_str)
+            submit_exit_value = mymachine.queue_packed_submission(pack_dir)
+            if submit_exit_value != 0:
+                jstatus.log_event(status_file.StatusFile.EVENT_SUBMIT_END, submit_exit_value)
+        elif make_batch_script_status:
             # Submit the batch script
             jstatus.log_event(status_file.StatusFile.EVENT_SUBMIT_START, run_count_str)
             try:
@@ -292,6 +314,7 @@ def auto_generated_scripts(harness_config,
         if job_id != "0":
             jstatus.log_event(status_file.StatusFile.EVENT_CHECK_START)
             check_exit_value = mymachine.check_executable()
+            log_process_result(jstatus, mymachine, 'check')
             mymachine.start_report_executable()
             influx_reported = mymachine.log_to_influx()
             if not influx_reported:
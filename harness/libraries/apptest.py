@@ -15,15 +15,11 @@ import copy
 import re
 from types import *
 
-try:
-    import requests
-except ImportError as e:
-    print("Import Warning: Could not import requests in current Python environment. Influx logging will be disabled.")
-
 # NCCS Test Harness Package Imports
 from libraries.base_apptest import base_apptest
 from libraries.base_apptest import BaseApptestError
 from libraries.layout_of_apps_directory import apptest_layout
+from libraries.event_records import read_event_record, read_event_records
 from libraries.status_file import parse_status_file
 from libraries.status_file import parse_status_file2
 from libraries.status_file import summarize_status_file
@@ -131,30 +127,32 @@ class subtest(base_apptest, apptest_layout):
 
         for harness_task in tasks:
             if harness_task == Harness.checkout:
+                # The lock is released even if the checkout fails, or the
+                # other tests of the application would wait for it forever.
                 if test_checkout_lock:
                     test_checkout_lock.acquire()
+                try:
+                    from libraries.repositories import RepositoryFactory
 
-                from libraries.repositories import RepositoryFactory
-
-                repository_type = RepositoryFactory.get_type_of_repository()
-                name_of_application = self.getNameOfApplication()
-                url_to_remote_repsitory_application = RepositoryFactory.get_repository_url_of_application(name_of_application)
-                my_repository_branch = RepositoryFactory.get_repository_git_branch()
+                    repository_type = RepositoryFactory.get_type_of_repository()
+                    name_of_application = self.getNameOfApplication()
+                    url_to_remote_repsitory_application = RepositoryFactory.get_repository_url_of_application(name_of_application)
+                    my_repository_branch = RepositoryFactory.get_repository_git_branch()
 
-                my_repository = RepositoryFactory.create(repository_type,
-                                                         url_to_remote_repsitory_application,
-                                                         my_repository_branch)
+                    my_repository = RepositoryFactory.create(repository_type,
+                                                             url_to_remote_repsitory_application,
+                                                             my_repository_branch)
 
-                self.doInfoLogging("Start of cloning repository")
-                destination = self.getLocalPathToTests()
+                    self.doInfoLogging("Start of cloning repository")
+                    destination = self.getLocalPathToTests()
 
-                exit_code = self.cloneRepository(my_repository,
-                                     destination)
+                    exit_code = self.cloneRepository(my_repository,
+                                         destination)
 
-                self.doInfoLogging("End of cloning repository")
-
-                if test_checkout_lock:
-                    test_checkout_lock.release()
+                    self.doInfoLogging("End of cloning repository")
+                finally:
+                    if test_checkout_lock:
+                        test_checkout_lock.release()
 
                 if exit_code:
                     return 1
@@ -465,40 +463,21 @@ class subtest(base_apptest, apptest_layout):
 
         """
 
-        from machine_types.machine_factory import MachineFactory
+        from libraries.status_watcher import wait_for_test_cycles
 
-        # Set the time counters and other flags for ensuring a maximum
-        # wait time while checking completion of the test cycle.
-        time_between_checks = 5.0
         timeout_secs = timeout*60.0
-        elapsed_time = 0.0
 
         # Print an informational message on the maximum wait time.
         message  = 'Waiting for all {} : {} tests to complete the testing cycle.\n'.format(self.getNameOfApplication(),self.getNameOfSubtest())
         message += 'The maximum wait time is {}.\n'.format(str(timeout_secs))
-        message += 'The time between checks is {}.\n'.format(str(time_between_checks))
         self.logger.doInfoLogging(message)
 
-        # Instantiate the machine for this computer.
-        mymachine = MachineFactory.create_machine(harness_config, self)
-
-        continue_checking = True
         start_time = datetime.now()
-        while continue_checking:
-            time.sleep(time_between_checks)
-            elapsed_time = datetime.now() - start_time
-            message = 'Checking for subtest cycle completion at {} seconds.\n'.format(str(elapsed_time))
-            self.logger.doInfoLogging(message)
-
-            if mymachine.isTestCycleComplete(self):
-               continue_checking = False
-               break
-
+        if wait_for_test_cycles([self], timeout_secs, logger=self.logger,
+                                scheduler=_create_job_state_scheduler(harness_config)):
             elapsed_time = datetime.now() - start_time
-            if elapsed_time.total_seconds() > timeout_secs:
-                continue_checking = False
-                message_elapsed_time = 'After {} seconds the testing cycle has exceeded the maximum wait time.\n'.format(str(elapsed_time))
-                self.logger.doWarningLogging(message_elapsed_time)
+            message_elapsed_time = 'After {} seconds the testing cycle has exceeded the maximum wait time.\n'.format(str(elapsed_time))
+            self.logger.doWarningLogging(message_elapsed_time)
 
         return
 
@@ -531,18 +510,55 @@ class subtest(base_apptest, apptest_layout):
                     separate_build_stdio=False):
 
         # If the file kill file exits then remove it.
+        self.__remove_kill_file()
+
+        # This will automatically build & submit
+        driver_args = ["-r", "-l", launchid, "--loglevel", str(self.__loglevel)]
+        if separate_build_stdio:
+            driver_args.append("--separate-build-stdio")
+        return self.__run_test_harness_driver(driver_args, stdout_stderr)
+
+    def _build_test(self,
+                    launchid,
+                    unique_id,
+                    stdout_stderr,
+                    separate_build_stdio=False):
+        """Builds the test instance unique_id, the first half of _start_test."""
+        self.__remove_kill_file()
+
+        driver_args = ["-b", "-i", unique_id, "-l", launchid, "--loglevel", str(self.__loglevel)]
+        if separate_build_stdio:
+            driver_args.append("--separate-build-stdio")
+        return self.__run_test_harness_driver(driver_args, stdout_stderr)
+
+    def _submit_test(self,
+                     launchid,
+                     unique_id,
+                     stdout_stderr):
+        """Submits the test instance unique_id built by _build_test."""
+        driver_args = ["-s", "-r", "-i", unique_id, "-l", launchid, "--loglevel", str(self.__loglevel)]
+        return self.__run_test_harness_driver(driver_args, stdout_stderr)
+
+    def __remove_kill_file(self):
         pathtokillfile = self.get_path_to_kill_file()
         if os.path.lexists(pathtokillfile):
             os.remove(pathtokillfile)
 
-        # This will automatically build & submit
-        starttestcomand = f"test_harness_driver.py -r -l {launchid} --loglevel {self.__loglevel}"
-        if separate_build_stdio:
-            starttestcomand += "--separate-build-stdio"
+    def __run_test_harness_driver(self,
+                                  driver_args,
+                                  stdout_stderr):
+        starttestcomand = "test_harness_driver.py " + " ".join(driver_args)
 
         pathtoscripts = self.get_path_to_scripts()
 
-        if stdout_stderr == "logfile":
+        # The pool is only used by the harness, not by the drivers it starts.
+        from libraries import driver_pool
+        if driver_pool.get_driver_backend() == driver_pool.DRIVER_BACKEND_PROCESS_POOL:
+            (stdout,stderr,exit_status) = \
+            driver_pool.run_test_harness_driver(driver_args,
+                                                pathtoscripts,
+                                                capture_output=(stdout_stderr == "logfile"))
+        elif stdout_stderr == "logfile":
             (stdout,stderr,exit_status) = \
             run_as_subprocess_command_return_stdout_stderr_exitstatus(starttestcomand,
                                                                       command_execution_directory=pathtoscripts)
@@ -563,6 +579,7 @@ class subtest(base_apptest, apptest_layout):
             message += "stdout of command : {}\n".format(stdout)
             message += "stderr of command : {}\n".format(stderr)
             self.doInfoLogging(message)
+            return 0
 
     def _stop_test(self):
         pathtokillfile = self.get_path_to_kill_file()
@@ -575,62 +592,87 @@ class subtest(base_apptest, apptest_layout):
     # Used when --mode influx_log is run after a harness run
     def _influx_log_mode(self):
         """ Logs available tests to InfluxDB, via --mode influx_log """
-        currentdir = os.getcwd()
-        self.logger.doInfoLogging(f"In {self.__name_of_current_function()}, cwd: {currentdir}")
-        testdir = self.get_path_to_test()
-        os.chdir(testdir)
+        self.logger.doInfoLogging(f"In {self.__name_of_current_function()}, cwd: {os.getcwd()}")
+        runarchive_dir = os.path.join(self.get_path_to_test(), self.test_run_archive_dirname)
         # If Run_Archive exists, continue, else terminate because no tests have been run
-        if not os.path.exists(self.test_run_archive_dirname):
-            os.chdir(currentdir)
-            self.logger.doWarningLogging(f"No harness runs found in {testdir}")
+        if not os.path.exists(runarchive_dir):
+            self.logger.doWarningLogging(f"No harness runs found in {self.get_path_to_test()}")
             return
-        os.chdir(self.test_run_archive_dirname)
 
+        self._drain_influx_spools()
+
+        for test_id in self._get_influx_log_test_ids():
+            self.logger.doInfoLogging(f"Attempting to log {test_id}")
+            if self._log_to_influx(test_id, post_run=True):
+                self.logger.doInfoLogging(f"Successfully logged {test_id}")
+            else:
+                self.logger.doWarningLogging(f"Unable to log {test_id}")
+            if self._log_events_to_influx_post_run(test_id):
+                self.logger.doInfoLogging(f"Successfully logged all events found for {test_id}")
+            else:
+                self.logger.doWarningLogging(f"Unable to log all events for {test_id}")
+
+    def _get_influx_log_test_ids(self):
+        """ Returns the test ids in Run_Archive that have not been logged to InfluxDB yet """
+        runarchive_dir = os.path.join(self.get_path_to_test(), self.test_run_archive_dirname)
+        if not os.path.exists(runarchive_dir):
+            return []
+        test_ids = []
         # I don't need to worry about extraneous links, like `latest`, because there's no race conditions
-        for test_id in os.listdir('.'):
-            if not os.path.exists(f"./{test_id}/.influx_logged") and \
-                    not os.path.exists(f"./{test_id}/.influx_disabled") and \
-                    not os.path.islink(f"./{test_id}") \
-                    and self._machine_matches(test_id):
-                self.logger.doInfoLogging(f"Attempting to log {test_id}")
-                if self._log_to_influx(test_id, post_run=True):
-                    self.logger.doInfoLogging(f"Successfully logged {test_id}")
-                else:
-                    self.logger.doWarningLogging(f"Unable to log {test_id}")
-                if self._log_events_to_influx_post_run(test_id):
-                    self.logger.doInfoLogging(f"Successfully logged all events found for {test_id}")
-                else:
-                    self.logger.doWarningLogging(f"Unable to log all events for {test_id}")
-            elif os.path.islink(f"./{test_id}"):
+        for test_id in os.listdir(runarchive_dir):
+            test_id_dir = os.path.join(runarchive_dir, test_id)
+            if os.path.islink(test_id_dir):
                 self.logger.doDebugLogging(f"Ignoring link in influx_log_mode: {test_id}")
+            elif os.path.exists(os.path.join(test_id_dir, '.influx_logged')) or \
+                    os.path.exists(os.path.join(test_id_dir, '.influx_disabled')):
+                continue
             elif not self._machine_matches(test_id):
                 self.logger.doInfoLogging(f"Skipping test from another machine: {test_id}")
+            else:
+                test_ids.append(test_id)
+        return test_ids
+
+    def _drain_influx_spools(self):
+        """ Sends the Influx records that were spooled because InfluxDB was unreachable """
+        from libraries.influx_shipper import get_influx_shipper, drain_influx_spool
+
+        if 'RGT_DISABLE_INFLUX' in os.environ and str(os.environ['RGT_DISABLE_INFLUX']) == '1':
+            return
+        if not 'RGT_INFLUX_URI' in os.environ or not 'RGT_INFLUX_TOKEN' in os.environ:
+            return
+        if 'RGT_INFLUX_NO_SEND' in os.environ and os.environ['RGT_INFLUX_NO_SEND'] == '1':
+            self.logger.doInfoLogging("RGT_INFLUX_NO_SEND is set, not sending spooled Influx records.")
+            return
+
+        status_dir = os.path.join(self.get_path_to_test(), self.test_status_dirname)
+        if not os.path.isdir(status_dir):
+            return
+
+        shipper = get_influx_shipper(self.logger)
+        if shipper is None:
+            self.logger.doWarningLogging("The 'requests' module was unable to load. Not sending spooled Influx records.")
+            return
 
-        os.chdir(currentdir)
+        for test_id in os.listdir(status_dir):
+            spool_path = os.path.join(status_dir, test_id, self.influx_spool_filename)
+            if os.path.exists(spool_path):
+                (sent, failed, rejected) = drain_influx_spool(spool_path, shipper, self.logger)
+                self.logger.doInfoLogging(f"Sent {sent} spooled Influx records for {test_id}, {failed} records remain spooled, "
+                                          f"{rejected} records were rejected.")
 
     def _machine_matches(self, test_id):
         """ Checks if RGT_MACHINE_NAME is the same as the test machine name """
         if not 'RGT_MACHINE_NAME' in os.environ:
             self.logger.doErrorLogging("RGT_MACHINE_NAME not found in environment. Skipping machine name check.")
             return False
-        log_start_status_file = f"{self.get_path_to_test()}/{self.test_status_dirname}/{test_id}/"
-        log_start_status_file += f"{StatusFile.EVENT_DICT[StatusFile.EVENT_LOGGING_START][0]}"
+        status_dir = os.path.join(self.get_path_to_test(), self.test_status_dirname, test_id)
+        event_filename = StatusFile.EVENT_DICT[StatusFile.EVENT_LOGGING_START][0]
 
-        if not os.path.exists(f"{log_start_status_file}"):
-            self.logger.doErrorLogging(f"Couldn't find required file for checking machine name: {log_start_status_file}")
+        record = read_event_record(status_dir, event_filename)
+        if record is None:
+            self.logger.doErrorLogging(f"Couldn't find required file for checking machine name: {os.path.join(status_dir, event_filename)}")
             return False
-        with open(f"{log_start_status_file}", 'r') as log_fstr:
-            line = next(log_fstr)
-            line_splt = line.split()
-            for i in range(1, len(line_splt)):
-                # range of 1 skips timestamp
-                entry = line_splt[i]
-                if '=' in line:
-                    entry_splt = entry.split('=')
-                    if entry_splt[0] == 'machine' and \
-                            entry_splt[1] == os.environ['RGT_MACHINE_NAME']:
-                        return True
-        return False
+        return record.fields.get('machine') == os.environ['RGT_MACHINE_NAME']
 
     def _log_events_to_influx_post_run(self, test_id):
         """ Logs events to Influx when running in mode influx_log """
@@ -638,67 +680,73 @@ class subtest(base_apptest, apptest_layout):
 
         # StatusFile object to use to write the logs for each run
         logging_status_file = StatusFileFactory.create(self.get_path_to_status_file(), self.logger, test_id=test_id)
+        self.logger.doInfoLogging(f"Starting post-run influxDB event logging in apptest for {test_id}")
 
-        currentdir = os.getcwd()
-        self.logger.doInfoLogging(f"Current directory in apptest: {currentdir}")
-        # Can't use get_path_to_runarchive here, because the test ID may change without the apptest being reinitialized
-        scripts_dir = self.get_path_to_scripts()
-        os.chdir(scripts_dir)
-        self.logger.doInfoLogging(f"Starting post-run influxDB event logging in apptest: {os.getcwd()}")
-        files_found = 0
-        files_not_found = 0
-
+        records = read_event_records(os.path.join(self.get_path_to_test(), self.test_status_dirname, test_id))
         for e in StatusFile.EVENT_LIST:
-            logging_status_file.post_event_to_influx(e)
+            logging_status_file.post_event_to_influx(e, records=records)
 
-        os.chdir(currentdir)
         # if we make it to the end, return True
         return True
 
+    def _get_influx_event_records(self, test_id):
+        """ Returns the InfluxDB records of all events found for a test id """
+        from status_file_factory import StatusFileFactory
+
+        logging_status_file = StatusFileFactory.create(self.get_path_to_status_file(), self.logger, test_id=test_id)
+        event_records = read_event_records(os.path.join(self.get_path_to_test(), self.test_status_dirname, test_id))
+        records = []
+        for e in StatusFile.EVENT_LIST:
+            record = logging_status_file.get_influx_event_record(e, records=event_records)
+            if record is not None:
+                records.append(record)
+        return records
+
     # Logs a single test ID to InfluxDB (when run AFTER a harness run, this class doesn't hold a single test ID)
     def _log_to_influx(self, influx_test_id, post_run=False):
         """ Check if metrics.txt exists, is proper format, and log to influxDB. """
-        currentdir = os.getcwd()
-        self.logger.doInfoLogging(f"current directory in apptest: {currentdir}")
         # Can't use get_path_to_runarchive here, because the test ID may change without the apptest being reinitialized
         runarchive_dir = os.path.join(self.get_path_to_test(), self.test_run_archive_dirname, f"{influx_test_id}")
-        os.chdir(runarchive_dir)
-        self.logger.doInfoLogging(f"Starting influxDB logging in apptest: {os.getcwd()}")
+        self.logger.doInfoLogging(f"Starting influxDB logging in apptest: {runarchive_dir}")
 
         if 'RGT_DISABLE_INFLUX' in os.environ and str(os.environ['RGT_DISABLE_INFLUX']) == '1':
             self.logger.doWarningLogging("InfluxDB logging is explicitly disabled with RGT_DISABLE_INFLUX=1")
             self.logger.doInfoLogging("Creating .influx_disabled file in Run_Archive")
             self.logger.doInfoLogging("If this was not intended, remove the .influx_disabled file and run the harness under mode 'influx_log'")
-            os.mknod('.influx_disabled')
-            os.chdir(currentdir)
+            os.mknod(os.path.join(runarchive_dir, '.influx_disabled'))
             return False
         if not 'RGT_INFLUX_URI' in os.environ or not 'RGT_INFLUX_TOKEN' in os.environ:
             self.logger.doWarningLogging("RGT_INFLUX_URI and RGT_INFLUX_TOKEN required in environment to use InfluxDB")
-            os.chdir(currentdir)
             return False
 
         # Check if influx was disabled for this run
-        if os.path.exists('.influx_disabled'):
+        if os.path.exists(os.path.join(runarchive_dir, '.influx_disabled')):
             self.logger.doWarningLogging("This harness test explicitly disabled influx logging. If this is by mistake, remove the .influx_disabled file and run again")
             return False
         # Check if the .influx_logged file already exists - it shouldn't, but just in case
-        if os.path.exists('.influx_logged'):
+        if os.path.exists(os.path.join(runarchive_dir, '.influx_logged')):
             self.logger.doWarningLogging("The .influx_logged file already exists.")
             return False
 
         def local_send_to_influx(influx_url, influx_event_record_string, headers):
+            if 'RGT_INFLUX_NO_SEND' in os.environ and os.environ['RGT_INFLUX_NO_SEND'] == '1':
+                # RGT_INFLUX_NO_SEND explicitly tells the harness to print the Influx Event string, so use print()
+                print(f"RGT_INFLUX_NO_SEND is set, echoing: {influx_event_record_string}")
+                self.logger.doInfoLogging(f"Successfully sent {influx_event_record_string} to {influx_url}")
+                return True
+
+            # requests is slow to import, so it is imported only when a record is sent.
+            try:
+                import requests
+            except ImportError:
+                self.logger.doWarningLogging(f"InfluxDB is currently disabled. Reason: 'requests' module was unable to load. Skipping InfluxDB message: {influx_event_record_string}. This can be logged after the run using the harness --mode influx_log or by POSTing this message to the InfluxDB server.")
+                return False
+
             try:
-                if 'RGT_INFLUX_NO_SEND' in os.environ and os.environ['RGT_INFLUX_NO_SEND'] == '1':
-                    # RGT_INFLUX_NO_SEND explicitly tells the harness to print the Influx Event string, so use print()
-                    print(f"RGT_INFLUX_NO_SEND is set, echoing: {influx_event_record_string}")
-                elif not 'requests' in sys.modules:
-                    self.logger.doWarningLogging(f"InfluxDB is currently disabled. Reason: 'requests' module was unable to load. Skipping InfluxDB message: {influx_event_record_string}. This can be logged after the run using the harness --mode influx_log or by POSTing this message to the InfluxDB server.")
+                r = requests.post(influx_url, data=influx_event_record_string, headers=headers)
+                if not int(r.status_code) < 400:
+                    self.logger.doWarningLogging(f"Influx returned status code: {r.status_code}")
                     return False
-                else:
-                    r = requests.post(influx_url, data=influx_event_record_string, headers=headers)
-                    if not int(r.status_code) < 400:
-                        self.logger.doWarningLogging(f"Influx returned status code: {r.status_code}")
-                        return False
                 self.logger.doInfoLogging(f"Successfully sent {influx_event_record_string} to {influx_url}")
             except requests.exceptions.ConnectionError as e:
                 self.logger.doErrorLogging(f"InfluxDB is not reachable. Request not sent: {influx_event_record_string}")
@@ -719,6 +767,38 @@ class subtest(base_apptest, apptest_layout):
             'Accept': "application/json"
         }
 
+        records = self._get_influx_metric_records(influx_test_id, post_run=post_run)
+        if records is None:
+            return False
+
+        # This serves as the exit status
+        failed_log_attempts = 0
+        success_log_attempts = 0
+
+        for influx_event_record_string in records:
+            if local_send_to_influx(influx_url, influx_event_record_string, headers):
+                self.logger.doInfoLogging(f"Successfully logged {influx_event_record_string.split(',')[0]} record to Influx.")
+                success_log_attempts += 1
+            else:
+                self.logger.doWarningLogging(f"Logging {influx_event_record_string.split(',')[0]} record to Influx failed.")
+                failed_log_attempts += 1
+
+        # The Influx POST request has succeeded, as far as we know,
+        # so let's create a .influx_logged file
+        if failed_log_attempts == 0 and success_log_attempts > 0:
+            os.mknod(os.path.join(runarchive_dir, '.influx_logged'))
+
+        # If >0 records have been sent, and no failed attempts, return True
+        return (failed_log_attempts == 0 and success_log_attempts > 0)
+
+    def _get_influx_metric_records(self, influx_test_id, post_run=False):
+        """ Returns the metrics and node health InfluxDB records of a test id.
+
+        None is returned if the records can't be built, for example while the
+        test is still running.
+        """
+        runarchive_dir = os.path.join(self.get_path_to_test(), self.test_run_archive_dirname, f"{influx_test_id}")
+
         # Inherited from environment or 'unknown'
         # This may be set as `unknown` if run outside of harness job
         influx_runtag = (
@@ -747,8 +827,7 @@ class subtest(base_apptest, apptest_layout):
         for tag_name in StatusFile.INFLUX_TAGS:
             if not tag_name in tag_values:
                 self.logger.doErrorLogging(f"Influx key not found in tag_values: {tag_name}. Aborting metrics and node health logging for {influx_test_id}")
-                os.chdir(currentdir)
-                return False
+                return None
 
         # if mode is post-run harness logging, get Unix timestamp so that the time in InfluxDB is accurate
         run_timestamp = ''
@@ -756,14 +835,11 @@ class subtest(base_apptest, apptest_layout):
             run_timestamp = self._get_run_timestamp(influx_test_id)
             if run_timestamp < 0:
                 self.logger.doErrorLogging(f"Run Timestamp invalid for jobID {influx_test_id}: {run_timestamp}")
-                os.chdir(currentdir)
-                return False
+                return None
 
-        # This serves as the exit status
-        failed_log_attempts = 0
-        success_log_attempts = 0
+        records = []
 
-        metrics = self._get_metrics(influx_machine_name, influx_app, influx_test)
+        metrics = self._get_metrics(influx_machine_name, influx_app, influx_test, runarchive_dir)
 
         if len(metrics) == 0:
             self.logger.doWarningLogging(f"No metrics found to log to influxDB")
@@ -777,24 +853,19 @@ class subtest(base_apptest, apptest_layout):
             elif metrics[f'{influx_app}-{influx_test}-execution_time'] < 0:
                 self.logger.doWarningLogging(f"Invalid execution time for jobID {influx_test_id}.")
                 do_log_metric = False
-    
+
             tag_record_string = ','.join([f"{tag_name}={tag_values[tag_name]}" for tag_name in StatusFile.INFLUX_TAGS])
             field_record_string = ','.join([f"{k}={v}" for k, v in metrics.items()])
             influx_event_record_string = f'metrics,{tag_record_string} {field_record_string}'
             # Add timestamp
             if post_run:
                 influx_event_record_string += f" {run_timestamp}"
-            # If we've made it this far without do_log_metric set to False, then all our checking has completed 
-            if do_log_metric and local_send_to_influx(influx_url, influx_event_record_string, headers):
-                self.logger.doInfoLogging(f"Successfully logged metrics to Influx.")
-                success_log_attempts += 1
-            elif do_log_metric:
-                # Then logging failed
-                self.logger.doWarningLogging(f"Logging metrics to Influx failed.")
-                failed_log_attempts += 1
-    
+            # If we've made it this far without do_log_metric set to False, then all our checking has completed
+            if do_log_metric:
+                records.append(influx_event_record_string)
+
         # add node-based checking functionality
-        node_healths = self._get_node_health(influx_machine_name, influx_app, influx_test)
+        node_healths = self._get_node_health(influx_machine_name, influx_app, influx_test, runarchive_dir)
         self.logger.doInfoLogging(f"Found {len(node_healths)} nodes reported for node health")
         if len(node_healths) > 0:
             # find and read node location file -- json file
@@ -829,12 +900,7 @@ class subtest(base_apptest, apptest_layout):
                         influx_event_record_string += f' status="{node_healths[node_name]["status"]}",message="{node_healths[node_name]["message"]}",test_id="{tag_values["test_id"]}"'
                         if post_run and not str(run_timestamp) == '':
                             influx_event_record_string += f' {run_timestamp}'
-                        if local_send_to_influx(influx_url, influx_event_record_string, headers):
-                            success_log_attempts += 1
-                            self.logger.doInfoLogging(f"Successfully logged node health for {node_name} to Influx.")
-                        else:
-                            failed_log_attempts += 1
-                            self.logger.doErrorLogging(f"Logging node health to Influx failed.")
+                        records.append(influx_event_record_string)
             elif 'RGT_NODE_LOCATION_FILE' in os.environ:
                 message = f"Node location file path does not exist: {os.environ['RGT_NODE_LOCATION_FILE']}."
                 message += f"\nSkipping node health logging. To re-log, remove the .influx_logged file in Run_Archive and run in mode influx_log."
@@ -842,15 +908,7 @@ class subtest(base_apptest, apptest_layout):
             else:
                 self.logger.doErrorLogging(f"RGT_NODE_LOCATION_FILE not in os.environ, skipping node health logging.")
 
-
-        # We're in Run_Archive. The Influx POST request has succeeded, as far as we know,
-        # so let's create a .influx_logged file
-        if failed_log_attempts == 0 and success_log_attempts > 0:
-            os.mknod('.influx_logged')
-
-        os.chdir(currentdir)
-        # If >0 records have been sent, and no failed attempts, return True
-        return (failed_log_attempts == 0 and success_log_attempts > 0)
+        return records
 
     def _get_build_time(self, test_id):
         """ Parses the build time from the status file """
@@ -863,51 +921,39 @@ class subtest(base_apptest, apptest_layout):
                                                     StatusFile.EVENT_DICT[StatusFile.EVENT_BINARY_EXECUTE_END][0], test_id)
 
     def _get_run_timestamp(self, test_id):
-        # Check for start event file and end event file
-        check_status_file = f"{self.get_path_to_test()}/{self.test_status_dirname}/{test_id}/"
-        check_status_file += f"{StatusFile.EVENT_DICT[StatusFile.EVENT_CHECK_END][0]}"
+        # Check for the check end event
+        status_dir = os.path.join(self.get_path_to_test(), self.test_status_dirname, test_id)
+        event_filename = StatusFile.EVENT_DICT[StatusFile.EVENT_CHECK_END][0]
 
-        if not os.path.exists(f"{check_status_file}"):
-            self.logger.doWarningLogging(f"Couldn't find required file for post-run time logging: {check_status_file}")
+        record = read_event_record(status_dir, event_filename)
+        if record is None:
+            self.logger.doWarningLogging(f"Couldn't find required file for post-run time logging: {os.path.join(status_dir, event_filename)}")
+            return -1
+        dt_utc = record.event_datetime
+        if dt_utc is None:
+            self.logger.doErrorLogging(f"Invalid check timestamp: {record.event_time}")
             return -1
-        with open(f"{check_status_file}", 'r') as check_fstr:
-            line = next(check_fstr)
-            check_timestamp = line.split()[0]
-            # Convert to UTC
-            #dt_utc = datetime.strptime(check_timestamp, "%Y-%m-%dT%H:%M:%S.%f") \
-                #+ (datetime.utcnow() - datetime.now())
-            dt_utc = datetime.strptime(check_timestamp, "%Y-%m-%dT%H:%M:%S.%f")
-            ns_utc = int(datetime.timestamp(dt_utc)) * 1000 * 1000 * 1000
+        ns_utc = int(datetime.timestamp(dt_utc)) * 1000 * 1000 * 1000
         return ns_utc
 
     def _get_time_diff_of_status_files(self, start_event_file, end_event_file, test_id):
-        # Check for start event file and end event file
-        status_dir = f"{self.get_path_to_test()}/{self.test_status_dirname}/{test_id}"
+        # Check for start event and end event
+        status_dir = os.path.join(self.get_path_to_test(), self.test_status_dirname, test_id)
 
-        for targ in [ f"{status_dir}/{start_event_file}", \
-                        f"{status_dir}/{end_event_file}" ]:
-            if not os.path.exists(f"{targ}"):
-                self.logger.doWarningLogging(f"Couldn't find required file for time logging: {targ}")
+        records = read_event_records(status_dir)
+        for targ in [start_event_file, end_event_file]:
+            if targ not in records:
+                self.logger.doWarningLogging(f"Couldn't find required file for time logging: {os.path.join(status_dir, targ)}")
                 return -1
-        start_timestamp = ''
-        end_timestamp = ''
-        with open(f"{status_dir}/{start_event_file}", 'r') as start_fstr:
-            line = next(start_fstr)
-            start_timestamp = line.split()[0]
-        with open(f"{status_dir}/{end_event_file}", 'r') as end_fstr:
-            line = next(end_fstr)
-            end_timestamp = line.split()[0]
-        if len(start_timestamp) <= 1 or len(end_timestamp) <= 1:
-            self.logger.doErrorLogging(f"Invalid start or end timestamp: {start_timestamp}, {end_timestamp}")
+        start_ts_dt = records[start_event_file].event_datetime
+        end_ts_dt = records[end_event_file].event_datetime
+        if start_ts_dt is None or end_ts_dt is None:
+            self.logger.doErrorLogging(f"Invalid start or end timestamp: {records[start_event_file].event_time}, {records[end_event_file].event_time}")
             return -1
-        #start_ts_dt = datetime.fromisoformat(start_timestamp)
-        #end_ts_dt = datetime.fromisoformat(end_timestamp)
-        start_ts_dt = datetime.strptime(start_timestamp, "%Y-%m-%dT%H:%M:%S.%f")
-        end_ts_dt = datetime.strptime(end_timestamp, "%Y-%m-%dT%H:%M:%S.%f")
         diff = end_ts_dt - start_ts_dt
         return diff.total_seconds()   # diff in seconds
 
-    def _get_metrics(self, machine_name, app_name, test_name):
+    def _get_metrics(self, machine_name, app_name, test_name, runarchive_dir='.'):
         """ Parse the metrics.txt file for InfluxDB reporting """
         def is_numeric(s):
             """ Checks if an entry (RHS) is numeric """
@@ -922,10 +968,11 @@ class subtest(base_apptest, apptest_layout):
                 return False
 
         metrics = {}
-        if not os.path.isfile('metrics.txt'):
+        metrics_file = os.path.join(runarchive_dir, 'metrics.txt')
+        if not os.path.isfile(metrics_file):
             self.logger.doWarningLogging(f"File metrics.txt not found")
             return metrics
-        with open('metrics.txt', 'r') as metric_f:
+        with open(metrics_file, 'r') as metric_f:
             # Each line is in format "metric = value" (space around '=' optional)
             # All whitespace in metric name will be replaced with underscores
             for line in metric_f:
@@ -955,11 +1002,12 @@ class subtest(base_apptest, apptest_layout):
                         self.logger.doErrorLogging(f"Found a line in metrics.txt with 0 or >1 equals signs:\n{line.strip()}")
         return metrics
 
-    def _get_node_health(self, machine_name, app_name, test_name):
+    def _get_node_health(self, machine_name, app_name, test_name, runarchive_dir='.'):
         """ Parse the nodecheck.txt file for InfluxDB reporting """
         node_healths = {}
         return_empty = False
-        if not os.path.isfile('nodecheck.txt'):
+        nodecheck_file = os.path.join(runarchive_dir, 'nodecheck.txt')
+        if not os.path.isfile(nodecheck_file):
             self.logger.doInfoLogging(f"File nodecheck.txt not found.")
             return node_healths
         self.logger.doInfoLogging("Processing file nodecheck.txt.")
@@ -970,7 +1018,7 @@ class subtest(base_apptest, apptest_layout):
             'HW-FAIL': ['INCORRECT', 'HW-FAIL'],
             'PERF-FAIL': ['PERF', 'PERF-FAIL']
         }
-        with open('nodecheck.txt', 'r') as nodes_f:
+        with open(nodecheck_file, 'r') as nodes_f:
             # Each line is in format crusher012 FAILED <msg>
             # All whitespace in metric name will be replaced with underscores
             for line in nodes_f:
@@ -1032,22 +1080,60 @@ def do_application_tasks(launch_id,
     # Returns [#Passed,#Failed]
     ret = [0, 0, []]
     for app_test in app_test_list:
-        print(f"Starting tasks for Application.Test: {app_test.getNameOfApplication()}.{app_test.getNameOfSubtest()}: {tasks}")
-        # Non-zero exit status is failure
-        if app_test.doTasks(launchid=launch_id,
-                         tasks=tasks,
-                         stdout_stderr=stdout_stderr,
-                         separate_build_stdio=separate_build_stdio):
-            ret[1] += 1
-            ret[2].append(f"{app_test.getNameOfApplication()}.{app_test.getNameOfSubtest()}")
-        else:
-            ret[0] += 1
+        test_ret = do_subtest_tasks(launch_id, app_test, tasks, stdout_stderr, separate_build_stdio)
+        ret[0] += test_ret[0]
+        ret[1] += test_ret[1]
+        ret[2].extend(test_ret[2])
+    return ret
+
+def do_subtest_tasks(launch_id,
+                     app_test,
+                     tasks,
+                     stdout_stderr,
+                     separate_build_stdio=False,
+                     test_checkout_lock=None):
+    # Returns [#Passed,#Failed,[failed tests]] of the single subtest
+    ret = [0, 0, []]
+    print(f"Starting tasks for Application.Test: {app_test.getNameOfApplication()}.{app_test.getNameOfSubtest()}: {tasks}")
+    # Non-zero exit status is failure
+    if app_test.doTasks(launchid=launch_id,
+                     tasks=tasks,
+                     test_checkout_lock=test_checkout_lock,
+                     stdout_stderr=stdout_stderr,
+                     separate_build_stdio=separate_build_stdio):
+        ret[1] += 1
+        ret[2].append(f"{app_test.getNameOfApplication()}.{app_test.getNameOfSubtest()}")
+    else:
+        ret[0] += 1
     return ret
 
+def do_subtest_build(launch_id,
+                     app_test,
+                     unique_id,
+                     stdout_stderr,
+                     separate_build_stdio=False):
+    # Non-zero exit status is failure
+    print(f"Building Application.Test: {app_test.getNameOfApplication()}.{app_test.getNameOfSubtest()}")
+    if not app_test.check_paths():
+        app_test.logger.doErrorLogging("Aborting the build. Could not find all required paths.")
+        return 1
+    return app_test._build_test(launch_id, unique_id, stdout_stderr, separate_build_stdio=separate_build_stdio)
+
+def do_subtest_submit(launch_id,
+                      app_test,
+                      unique_id,
+                      stdout_stderr):
+    # Non-zero exit status is failure
+    print(f"Submitting Application.Test: {app_test.getNameOfApplication()}.{app_test.getNameOfSubtest()}")
+    return app_test._submit_test(launch_id, unique_id, stdout_stderr)
+
 def wait_for_jobs_to_complete_in_queue(harness_config,
                                        app_test_list,
                                        timeout):
-    """ Waits for the list of subtests to complete a subtestb cycle.
+    """ Waits for the list of subtests to complete a subtest cycle.
+
+    All subtests are waited on at once, and the completion of each one is
+    noticed as soon as its Status directory changes.
 
     Parameters
     ----------
@@ -1059,12 +1145,28 @@ def wait_for_jobs_to_complete_in_queue(harness_config,
 
     Returns
     -------
-    ???
+    list
+        The subtests that did not complete their cycle within timeout.
 
     """
-    for app_test in app_test_list:
-        app_test.waitForAllJobsToCompleteQueue(harness_config, timeout)
+    from libraries.status_watcher import wait_for_test_cycles
 
-    return
+    return wait_for_test_cycles(app_test_list, timeout*60.0,
+                                scheduler=_create_job_state_scheduler(harness_config))
+
+def _create_job_state_scheduler(harness_config):
+    """ Returns the scheduler of the machine, used to query the states of jobs.
+
+    None is returned if the harness configuration names no scheduler, or if
+    RGT_JOB_STATE_POLL is set to 0.
+    """
+    from machine_types.scheduler_factory import SchedulerFactory
+
+    if os.getenv('RGT_JOB_STATE_POLL', '1') == '0' or harness_config is None:
+        return None
+    scheduler_type = harness_config.get_machine_config().get('scheduler_type')
+    if scheduler_type is None:
+        return None
+    return SchedulerFactory.create_scheduler(scheduler_type)
 
 
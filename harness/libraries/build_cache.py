@@ -0,0 +1,230 @@
+#! /usr/bin/env python3
+"""A content-addressed cache of test build directories.
+
+Every test instance copies the application source into a new workspace and
+runs the build command again, even when nothing changed since the last
+build. With RGT_BUILD_CACHE_DIR set, the build directory of a successful
+build is stored as a tarball whose name is a hash of everything the build
+depends on:
+
+    * the contents of the application Source directory and of the test
+      Scripts directory,
+    * the build environment, i.e. the output of the build runtime environment
+      file, or the harness environment if the test has none, without the
+      RGT_* variables with which the harness tunes and keeps track of its
+      own work,
+    * the build command, and
+    * the [EnvVars] of the test.
+
+A later build with the same key extracts the tarball instead of running the
+build command. The paths of the test instance, which differ for every
+build, are replaced by placeholders before the environment is hashed.
+
+The cache is tuned with the following environment variables:
+
+    RGT_BUILD_CACHE_DIR       Directory of the cache. The cache is disabled if not set.
+    RGT_BUILD_CACHE_MAX_GB    Size of the cache, in GB, above which the least
+                              recently used builds are removed (default: 50).
+"""
+
+# Python imports
+import hashlib
+import os
+import shutil
+import tarfile
+import threading
+
+DEFAULT_MAX_GB = 50.0
+
+# Environment variables of the shell that ran the build runtime environment
+# file, which do not change the build.
+VOLATILE_ENVIRONMENT_VARIABLES = ('PWD', 'OLDPWD', 'SHLVL', '_')
+
+# The harness sets RGT_* variables to tune and keep track of its own work,
+# which do not change the build; some of them, e.g. RGT_RTE_CACHE_DIR, are
+# paths that differ for every harness run. They are left out of the key,
+# except the variables below, which describe the machine and the test
+# instance and may be used by a build.
+HARNESS_ENVIRONMENT_PREFIX = 'RGT_'
+BUILD_HARNESS_ENVIRONMENT_VARIABLES = ('RGT_MACHINE_NAME', 'RGT_MACHINE_TYPE', 'RGT_SCHEDULER_TYPE',
+                                       'RGT_JOBLAUNCHER_TYPE', 'RGT_CPUS_PER_NODE', 'RGT_GPUS_PER_NODE',
+                                       'RGT_NCCS_TEST_HARNESS_MODULE', 'RGT_PATH_TO_SSPACE')
+BUILD_HARNESS_ENVIRONMENT_PREFIXES = ('RGT_APP_', 'RGT_TEST_')
+
+TARBALL_SUFFIX = '.tar'
+
+class BuildCache:
+    """A directory of build tarballs, evicted least recently used first."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, cache_dir, max_bytes, logger=None):
+        self.__cache_dir = cache_dir
+        self.__max_bytes = max_bytes
+        self.__logger = logger
+        os.makedirs(self.__cache_dir, exist_ok=True)
+
+    ##################
+    # Public methods #
+    ##################
+
+    @classmethod
+    def from_environment(cls, logger=None):
+        """Returns the cache configured by RGT_BUILD_CACHE_DIR, or None if it is not set."""
+        cache_dir = os.getenv('RGT_BUILD_CACHE_DIR')
+        if not cache_dir:
+            return None
+        max_gb = float(os.getenv('RGT_BUILD_CACHE_MAX_GB', DEFAULT_MAX_GB))
+        return cls(cache_dir, int(max_gb * 1024 * 1024 * 1024), logger=logger)
+
+    @property
+    def cache_dir(self):
+        """str: The directory of the cache."""
+        return self.__cache_dir
+
+    @staticmethod
+    def make_key(source_dirs, environment, build_command, test_environment, instance_paths=()):
+        """Returns the hex digest identifying a build.
+
+        Parameters
+        ----------
+        source_dirs : list
+            The directories whose contents the build depends on.
+
+        environment : dict
+            The environment the build command runs in.
+
+        build_command : str
+            The build command.
+
+        test_environment : dict
+            The [EnvVars] of the test.
+
+        instance_paths : list
+            The paths of the test instance, e.g. its workspace, which are
+            replaced by placeholders in the environment.
+        """
+        digest = hashlib.sha256()
+        for source_dir in source_dirs:
+            digest.update(b'source\0')
+            _hash_tree(digest, source_dir)
+
+        # Longer paths first, so a path is not replaced in part by one of its parents.
+        instance_paths = sorted((path for path in instance_paths if path), key=len, reverse=True)
+        digest.update(b'environment\0')
+        for name in sorted(environment):
+            if name in VOLATILE_ENVIRONMENT_VARIABLES or not _changes_build(name):
+                continue
+            value = environment[name]
+            for (index, path) in enumerate(instance_paths):
+                value = value.replace(path, f'<instance_path_{index}>')
+            digest.update(f'{name}={value}\0'.encode())
+
+        digest.update(f'build_command\0{build_command}\0'.encode())
+        digest.update(b'test_environment\0')
+        for name in sorted(test_environment):
+            digest.update(f'{name}={test_environment[name]}\0'.encode())
+        return digest.hexdigest()
+
+    def restore(self, key, build_dir):
+        """Replaces build_dir with the cached build key. Returns False if it is not cached."""
+        tarball = self.__path_of(key)
+        try:
+            tar = tarfile.open(tarball, 'r')
+        except FileNotFoundError:
+            return False
+
+        with tar:
+            # A use of the build moves it to the end of the eviction order.
+            try:
+                os.utime(tarball)
+            except FileNotFoundError:
+                # Evicted by another harness since it was opened.
+                pass
+            shutil.rmtree(build_dir, ignore_errors=True)
+            os.makedirs(build_dir)
+            if hasattr(tarfile, 'tar_filter'):
+                tar.extractall(build_dir, filter='tar')
+            else:
+                tar.extractall(build_dir)
+        self.__log(f"Restored the build directory {build_dir} from {tarball}.")
+        return True
+
+    def store(self, key, build_dir):
+        """Stores build_dir as the build key, then evicts builds above the size of the cache."""
+        tarball = self.__path_of(key)
+        tmp_path = f"{tarball}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with tarfile.open(tmp_path, 'w') as tar:
+                for name in sorted(os.listdir(build_dir)):
+                    tar.add(os.path.join(build_dir, name), arcname=name)
+            os.replace(tmp_path, tarball)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.__log(f"Stored the build directory {build_dir} in {tarball}.")
+        self.evict()
+        return
+
+    def evict(self):
+        """Removes the least recently used builds until the cache fits in its size."""
+        entries = []
+        total_bytes = 0
+        with os.scandir(self.__cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(TARBALL_SUFFIX):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        for (mtime_ns, size, path) in sorted(entries):
+            if total_bytes <= self.__max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.__log(f"Evicted the build {path} from the build cache.")
+            except FileNotFoundError:
+                # Another harness evicted it at the same time.
+                pass
+            total_bytes -= size
+        return
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __path_of(self, key):
+        return os.path.join(self.__cache_dir, key + TARBALL_SUFFIX)
+
+    def __log(self, message):
+        if self.__logger:
+            self.__logger.doInfoLogging(message)
+
+def _changes_build(name):
+    """Returns False for the environment variables of the harness that do not change a build."""
+    if not name.startswith(HARNESS_ENVIRONMENT_PREFIX):
+        return True
+    return name in BUILD_HARNESS_ENVIRONMENT_VARIABLES or name.startswith(BUILD_HARNESS_ENVIRONMENT_PREFIXES)
+
+def _hash_tree(digest, top_dir):
+    """Adds the relative paths, modes and contents of the files below top_dir to digest."""
+    for (dirpath, dirnames, filenames) in os.walk(top_dir):
+        dirnames.sort()
+        for filename in sorted(filenames) + [name for name in dirnames if os.path.islink(os.path.join(dirpath, name))]:
+            path = os.path.join(dirpath, filename)
+            relpath = os.path.relpath(path, top_dir)
+            if os.path.islink(path):
+                digest.update(f'link\0{relpath}\0{os.readlink(path)}\0'.encode())
+                continue
+            stat = os.stat(path)
+            digest.update(f'file\0{relpath}\0{stat.st_mode & 0o777:o}\0{stat.st_size}\0'.encode())
+            with open(path, 'rb') as file_obj:
+                for block in iter(lambda: file_obj.read(1024 * 1024), b''):
+                    digest.update(block)
+    return
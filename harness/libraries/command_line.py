@@ -15,7 +15,10 @@ class HarnessParsedArguments:
                        runmode=None,
                        stdout_stderr=None,
                        use_fireworks=False,
-                       separate_build_stdio=False):
+                       separate_build_stdio=False,
+                       num_workers=1,
+                       schedule='app',
+                       max_tests_per_app=0):
 
         self.__inputfile = inputfile
         self.__loglevel = loglevel
@@ -24,6 +27,9 @@ class HarnessParsedArguments:
         self.__stdout_stderr = stdout_stderr
         self.__use_fireworks = use_fireworks
         self.__separate_build_stdio = separate_build_stdio
+        self.__num_workers = num_workers
+        self.__schedule = schedule
+        self.__max_tests_per_app = max_tests_per_app
 
         self.__verify_attributes()
 
@@ -68,6 +74,18 @@ class HarnessParsedArguments:
     def separate_build_stdio(self):
         return self.__separate_build_stdio
 
+    @property
+    def num_workers(self):
+        return self.__num_workers
+
+    @property
+    def schedule(self):
+        return self.__schedule
+
+    @property
+    def max_tests_per_app(self):
+        return self.__max_tests_per_app
+
     @property
     def effective_command_line(self):
         command_options = ("Effective command line: "
@@ -77,6 +95,9 @@ class HarnessParsedArguments:
                            " --loglevel {my_loglevel}"
                            " --output {my_output}"
                            " --separate-build-stdio"
+                           " --num-workers {my_num_workers}"
+                           " --schedule {my_schedule}"
+                           " --max-tests-per-app {my_max_tests_per_app}"
                            " --mode {my_runmode}")
 
         run_mode_args=" ".join(self.runmode) 
@@ -85,6 +106,9 @@ class HarnessParsedArguments:
                                      my_configfile = self.configfile,
                                      my_loglevel = self.loglevel,
                                      my_output = self.stdout_stderr,
+                                     my_num_workers = self.num_workers,
+                                     my_schedule = self.schedule,
+                                     my_max_tests_per_app = self.max_tests_per_app,
                                      my_runmode = run_mode_args)
 
         return efc
@@ -0,0 +1,226 @@
+#! /usr/bin/env python3
+"""Runs test_harness_driver in a pool of worker processes.
+
+By default the start task runs test_harness_driver.py in a new shell and
+Python interpreter for every test, which pays the interpreter and harness
+import startup each time. With RGT_DRIVER_BACKEND=process_pool the driver is
+instead called in long-lived worker processes that have already imported
+the harness.
+
+The workers are started with the forkserver method, because the harness
+forks from many threads at once. The driver changes the current directory,
+the environment, sys.path and the logging handlers, so each call is
+isolated: the worker takes the environment of the calling harness process,
+and restores its own state when the call returns. The environment is only
+restored through os.environ, so the driver must not set variables with
+os.putenv; the build and submit commands are given their environment instead.
+The workers exit without running the atexit handlers, so the Influx records
+of a call are sent or spooled before the call returns.
+
+The pool is tuned with the following environment variables:
+
+    RGT_DRIVER_BACKEND        'subprocess' (the default) or 'process_pool'.
+    RGT_DRIVER_POOL_WORKERS   Number of worker processes (default: the number
+                              of CPUs, at most 32).
+"""
+
+# Python imports
+import concurrent.futures
+import contextlib
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import traceback
+
+DRIVER_BACKEND_SUBPROCESS = 'subprocess'
+DRIVER_BACKEND_PROCESS_POOL = 'process_pool'
+DRIVER_BACKENDS = (DRIVER_BACKEND_SUBPROCESS, DRIVER_BACKEND_PROCESS_POOL)
+
+MAX_DEFAULT_POOL_WORKERS = 32
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_driver_backend():
+    """Returns the backend that runs test_harness_driver, from RGT_DRIVER_BACKEND."""
+    backend = os.getenv('RGT_DRIVER_BACKEND', DRIVER_BACKEND_SUBPROCESS)
+    if backend not in DRIVER_BACKENDS:
+        raise ValueError(f"Unknown driver backend RGT_DRIVER_BACKEND={backend}. "
+                         f"Valid backends are {list(DRIVER_BACKENDS)}.")
+    return backend
+
+def run_test_harness_driver(argv, scripts_dir, capture_output=False, environ=None, submit_lock=None):
+    """Calls test_harness_driver(argv) in scripts_dir on a worker process.
+
+    Parameters
+    ----------
+    argv : list
+        The command line arguments of test_harness_driver.py.
+
+    scripts_dir : str
+        The Scripts directory of the test, where the driver is called.
+
+    capture_output : bool
+        If True, the stdout and stderr of the call, including those of the
+        commands it runs, are returned instead of printed.
+
+    environ : dict
+        The environment of the call. The default is the environment of the
+        calling process.
+
+    submit_lock : threading.Lock
+        A lock held while the call is handed to the pool. Handing it may
+        start worker processes, which inherit the environment and working
+        directory of the calling process, so a caller that changes them in
+        other threads must hold the same lock while it does.
+
+    Returns
+    -------
+    tuple
+        (stdout, stderr, exit_status). stdout and stderr are None if the
+        output is not captured.
+    """
+    return run_in_driver_pool(_call_test_harness_driver, argv, scripts_dir, capture_output, environ, submit_lock)
+
+def run_in_driver_pool(function, argv, scripts_dir, capture_output=False, environ=None, submit_lock=None):
+    """Calls function(argv) in scripts_dir on a worker process. See run_test_harness_driver."""
+    if environ is None:
+        environ = dict(os.environ)
+    try:
+        with submit_lock or contextlib.nullcontext():
+            pool = _get_pool()
+            future = pool.submit(_run_isolated, function, argv, scripts_dir, environ, capture_output)
+        return future.result()
+    except concurrent.futures.process.BrokenProcessPool as err:
+        # A worker died, e.g. by a signal. The next call starts a new pool.
+        _discard_pool(pool)
+        return (None, f"The driver worker process died: {err}\n", 1)
+
+def shutdown_driver_pool():
+    """Stops the worker processes, if they have been started."""
+    global _pool
+    with _pool_lock:
+        pool = _pool
+        _pool = None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['test_harness_driver'])
+            else:
+                context = multiprocessing.get_context('spawn')
+            default_workers = min(MAX_DEFAULT_POOL_WORKERS, os.cpu_count() or 1)
+            max_workers = int(os.getenv('RGT_DRIVER_POOL_WORKERS', default_workers))
+            _pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        return _pool
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+def _call_test_harness_driver(argv):
+    import test_harness_driver
+    return test_harness_driver.test_harness_driver(argv)
+
+#-----------------------------------------------------
+# The functions below run on the worker processes.   -
+#                                                    -
+#-----------------------------------------------------
+
+def _run_isolated(function, argv, scripts_dir, environ, capture_output):
+    saved_cwd = os.getcwd()
+    saved_environ = dict(os.environ)
+    saved_sys_path = list(sys.path)
+    saved_handlers = _get_log_handlers()
+
+    os.environ.clear()
+    os.environ.update(environ)
+    os.chdir(scripts_dir)
+    output = _Captured_output() if capture_output else None
+    try:
+        exit_status = function(argv)
+    except SystemExit as err:
+        # The driver exits with an error message in some cases.
+        if err.code is None or isinstance(err.code, int):
+            exit_status = err.code
+        else:
+            print(err.code, file=sys.stderr)
+            exit_status = 1
+    except Exception:
+        traceback.print_exc()
+        exit_status = 1
+    finally:
+        _close_influx_shipper()
+        (stdout, stderr) = output.close() if output is not None else (None, None)
+        _restore_log_handlers(saved_handlers)
+        _forget_modules_in(scripts_dir)
+        sys.path[:] = saved_sys_path
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+
+    if exit_status is None:
+        exit_status = 0
+    return (stdout, stderr, int(exit_status))
+
+def _close_influx_shipper():
+    """Sends or spools the Influx records queued by a call, as the atexit handler would."""
+    influx_shipper = sys.modules.get('libraries.influx_shipper')
+    if influx_shipper is not None:
+        influx_shipper.close_influx_shipper()
+
+def _get_log_handlers():
+    loggers = [logging.getLogger()] + [logger for logger in logging.root.manager.loggerDict.values()
+                                        if isinstance(logger, logging.Logger)]
+    return {logger.name : list(logger.handlers) for logger in loggers}
+
+def _restore_log_handlers(saved_handlers):
+    """Closes and removes the logging handlers added by a call."""
+    for (name, handlers) in _get_log_handlers().items():
+        logger = logging.getLogger(name) if name != 'root' else logging.getLogger()
+        for handler in handlers:
+            if handler not in saved_handlers.get(name, []):
+                logger.removeHandler(handler)
+                handler.close()
+
+def _forget_modules_in(directory):
+    """Unloads the modules imported from a Scripts directory, so the next test imports its own."""
+    directory = os.path.join(os.path.realpath(directory), '')
+    for (name, module) in list(sys.modules.items()):
+        module_file = getattr(module, '__file__', None)
+        if module_file and os.path.realpath(module_file).startswith(directory):
+            del sys.modules[name]
+
+class _Captured_output:
+    """Redirects file descriptors 1 and 2, so the output of child processes is captured as well."""
+
+    def __init__(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.__files = [tempfile.TemporaryFile(mode='w+'), tempfile.TemporaryFile(mode='w+')]
+        self.__saved_fds = [os.dup(1), os.dup(2)]
+        os.dup2(self.__files[0].fileno(), 1)
+        os.dup2(self.__files[1].fileno(), 2)
+
+    def close(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        output = []
+        for (fd, saved_fd, file_obj) in zip((1, 2), self.__saved_fds, self.__files):
+            os.dup2(saved_fd, fd)
+            os.close(saved_fd)
+            file_obj.seek(0)
+            output.append(file_obj.read())
+            file_obj.close()
+        return tuple(output)
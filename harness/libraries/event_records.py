@@ -0,0 +1,213 @@
+#! /usr/bin/env python3
+"""The records of the events of a test instance, and their events.jsonl file.
+
+Each event of a test instance is written to its own file in the Status
+directory of the instance, e.g. Event_170_binary_execute_start.txt, as one
+tab separated line::
+
+    <event time> <event value> <field>=<value> <field>=<value> ...
+
+With RGT_EVENT_JSONL=1, every event is also appended to the file
+events.jsonl of the Status directory, as one JSON object per line::
+
+    {"event_filename": ..., "event_time": ..., "event_value": ..., "fields": {...}}
+
+The appends are locked and fsync'd. The readers of this module read
+events.jsonl with a single open, and only parse the event files missing
+from it, e.g. the events logged before RGT_EVENT_JSONL was set. The fields
+of an event file are split at the first '=' only, so the values may
+contain '='.
+"""
+
+# Python imports
+import datetime
+import fcntl
+import json
+import os
+
+# Harness imports
+from libraries.layout_of_apps_directory import apptest_layout
+
+EVENT_FILE_PREFIX = 'Event_'
+EVENT_FILE_SUFFIX = '.txt'
+
+def is_event_jsonl_enabled():
+    """Returns True if the events are also appended to events.jsonl, as set by RGT_EVENT_JSONL."""
+    return os.getenv('RGT_EVENT_JSONL', '0') == '1'
+
+class EventRecord:
+    """An event of a test instance."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, event_filename, event_time, event_value, fields):
+        """
+        Parameters
+        ----------
+        event_filename : str
+            The name of the event file, e.g. 'Event_170_binary_execute_start.txt'.
+
+        event_time : str
+            The time of the event in ISO format.
+
+        event_value : str
+            The value of the event.
+
+        fields : dict
+            The fields of the event, e.g. {'machine' : ..., 'event_name' : ...}.
+        """
+        self.__event_filename = event_filename
+        self.__event_time = event_time
+        self.__event_value = event_value
+        self.__fields = fields
+
+    def __repr__(self):
+        return f"EventRecord({self.__event_filename!r}, {self.__event_time!r}, {self.__event_value!r})"
+
+    ##################
+    # Public methods #
+    ##################
+
+    @property
+    def event_filename(self):
+        """str: The name of the event file."""
+        return self.__event_filename
+
+    @property
+    def event_name(self):
+        """str: The name of the event, e.g. 'binary_execute_start', or None if the record has none."""
+        return self.__fields.get('event_name')
+
+    @property
+    def event_time(self):
+        """str: The time of the event in ISO format."""
+        return self.__event_time
+
+    @property
+    def event_datetime(self):
+        """datetime.datetime: The time of the event, or None if it is not in ISO format."""
+        try:
+            return datetime.datetime.fromisoformat(self.__event_time)
+        except ValueError:
+            return None
+
+    @property
+    def event_value(self):
+        """str: The value of the event."""
+        return self.__event_value
+
+    @property
+    def fields(self):
+        """dict: The fields of the event, by name."""
+        return self.__fields
+
+    def to_json(self):
+        """Returns the record as a line of events.jsonl, without the newline."""
+        return json.dumps({'event_filename' : self.__event_filename,
+                           'event_time' : self.__event_time,
+                           'event_value' : self.__event_value,
+                           'fields' : self.__fields})
+
+    @staticmethod
+    def from_json(line):
+        """Returns the record of a line of events.jsonl. Raises a ValueError if the line is ill-formed."""
+        record = json.loads(line)
+        try:
+            return EventRecord(record['event_filename'], record['event_time'],
+                               record['event_value'], dict(record['fields']))
+        except (KeyError, TypeError) as err:
+            raise ValueError(f"Ill-formed event record: {line!r}") from err
+
+    @staticmethod
+    def from_event_file_line(event_filename, line):
+        """Returns the record of the line of an event file."""
+        words = line.rstrip('\n').split('\t')
+        event_time = words[0]
+        event_value = words[1] if len(words) > 1 else ''
+        fields = {}
+        for word in words[2:]:
+            (field, sep, value) = word.partition('=')
+            if sep:
+                fields[field] = value
+        return EventRecord(event_filename, event_time, event_value, fields)
+
+def get_path_to_events_jsonl(status_dir):
+    """Returns the path of the events.jsonl file of the Status directory of a test instance."""
+    return os.path.join(status_dir, apptest_layout.test_events_jsonl_filename)
+
+def append_event_record(status_dir, record):
+    """Appends record to the events.jsonl file of status_dir, and syncs it to disk."""
+    data = (record.to_json() + '\n').encode()
+    fd = os.open(get_path_to_events_jsonl(status_dir), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o664)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            os.write(fd, data)
+            os.fsync(fd)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+    return
+
+def read_event_records(status_dir):
+    """Returns the events of the test instance of the Status directory status_dir.
+
+    Returns
+    -------
+    dict
+        The EventRecord of every event by event filename, in the order the
+        events were recorded. An event recorded more than once has its last
+        record.
+    """
+    records = {}
+    try:
+        with open(get_path_to_events_jsonl(status_dir), 'r') as file_obj:
+            for line in file_obj:
+                # A line cut short by a crash is ignored.
+                if not line.endswith('\n'):
+                    break
+                try:
+                    record = EventRecord.from_json(line)
+                except ValueError:
+                    continue
+                records.pop(record.event_filename, None)
+                records[record.event_filename] = record
+    except FileNotFoundError:
+        pass
+
+    num_jsonl_records = len(records)
+    try:
+        with os.scandir(status_dir) as it:
+            event_filenames = sorted(entry.name for entry in it
+                                     if entry.name.startswith(EVENT_FILE_PREFIX)
+                                     and entry.name.endswith(EVENT_FILE_SUFFIX)
+                                     and entry.name not in records)
+    except FileNotFoundError:
+        event_filenames = []
+    for event_filename in event_filenames:
+        record = _read_event_file(status_dir, event_filename)
+        if record is not None:
+            records[event_filename] = record
+
+    if num_jsonl_records and event_filenames:
+        # Order the events of both sources by time.
+        records = dict(sorted(records.items(), key=lambda item: item[1].event_time))
+    return records
+
+def read_event_record(status_dir, event_filename):
+    """Returns the EventRecord of the event file event_filename of status_dir, or None if it was not recorded."""
+    path = get_path_to_events_jsonl(status_dir)
+    if os.path.exists(path):
+        return read_event_records(status_dir).get(event_filename)
+    return _read_event_file(status_dir, event_filename)
+
+def _read_event_file(status_dir, event_filename):
+    try:
+        with open(os.path.join(status_dir, event_filename), 'r') as file_obj:
+            line = file_obj.readline()
+    except FileNotFoundError:
+        return None
+    return EventRecord.from_event_file_line(event_filename, line)
@@ -0,0 +1,383 @@
+#! /usr/bin/env python3
+"""A resident harness process serving the callbacks of the batch jobs.
+
+A batch job calls back into the harness three times: log_binary_execution_time.py
+at the start and end of the binary, and check_executable_driver.py, which
+runs test_harness_driver.py --check. Each call starts a new Python
+interpreter that imports the harness, creates its loggers, subtest and
+StatusFile objects, and reads the environment.
+
+With RGT_HARNESS_DAEMON_SOCKET set, these scripts are thin clients instead:
+they send their request to a HarnessDaemon listening on that Unix domain
+socket, started with rgt_harness_daemon.py, and import the rest of the
+harness only if the daemon can not be reached. The daemon keeps the
+StatusFile objects and loggers of the recent tests, logs the events of all
+clients one at a time, and runs the checks in the test_harness_driver
+process pool of driver_pool, whose workers have already imported the harness.
+
+A Unix domain socket is only reachable from its own host, so the daemon
+serves the jobs running on the host where it is started, e.g. a workstation
+or a node running many jobs of a harness run. The socket is readable and
+writable by its owner only.
+
+Each connection carries one request and one response, both JSON objects
+on a single line. A request has an 'op', one of 'ping', 'log_event',
+'check' and 'shutdown', and the environment of the client in 'environ'.
+A response has a 'status', either 'ok' or 'error' with a 'message'.
+"""
+
+# Python imports
+import collections
+import contextlib
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+
+DEFAULT_CONNECT_TIMEOUT = 5.0
+"""float : The seconds a client waits to connect to the daemon."""
+
+DEFAULT_MAX_CACHED_TESTS = 256
+"""int : The number of tests whose StatusFile and logger the daemon keeps."""
+
+DAEMON_LOGGER_NAME = "harness_daemon"
+"""str : The name of the logger of the daemon, and the prefix of the loggers of its tests."""
+
+OP_PING = 'ping'
+OP_LOG_EVENT = 'log_event'
+OP_CHECK = 'check'
+OP_SHUTDOWN = 'shutdown'
+
+# The events a client may log, as in StatusFile.EVENT_DICT.
+LOGGABLE_EVENTS = ('BINARY_EXECUTE_START', 'BINARY_EXECUTE_END')
+
+class DaemonError(Exception):
+    """Raised when the daemon reports that it failed to serve a request."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+class DaemonUnreachableError(ConnectionError):
+    """Raised when the daemon can not be reached, so it has not seen the request."""
+
+#-----------------------------------------------------
+# The functions below run on the clients.            -
+#                                                    -
+#-----------------------------------------------------
+
+def get_daemon_socket():
+    """Returns the path of the socket of the daemon from RGT_HARNESS_DAEMON_SOCKET, or None."""
+    return os.getenv('RGT_HARNESS_DAEMON_SOCKET') or None
+
+def call_daemon(request, socket_path=None, connect_timeout=DEFAULT_CONNECT_TIMEOUT):
+    """Sends request to the daemon and returns its response.
+
+    Parameters
+    ----------
+    request : dict
+        The request. Its 'environ' is set to the environment of the process if missing.
+
+    socket_path : str
+        The socket of the daemon. The default is get_daemon_socket().
+
+    Raises
+    ------
+    DaemonUnreachableError
+        If the daemon can not be reached. The request was not served, so
+        the client may serve it itself.
+
+    OSError
+        If the daemon closes the connection without responding. The request
+        may have been served.
+
+    DaemonError
+        If the daemon fails to serve the request.
+    """
+    if socket_path is None:
+        socket_path = get_daemon_socket()
+    if socket_path is None:
+        raise DaemonUnreachableError("RGT_HARNESS_DAEMON_SOCKET is not set.")
+    request = dict(request)
+    request.setdefault('environ', dict(os.environ))
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(connect_timeout)
+        try:
+            client.connect(socket_path)
+        except OSError as err:
+            raise DaemonUnreachableError(f"The harness daemon at {socket_path} can not be reached: {err}") from err
+        # A check may run for as long as the check command of the test.
+        client.settimeout(None)
+        client.sendall(json.dumps(request).encode() + b'\n')
+        with client.makefile('rb') as file_obj:
+            line = file_obj.readline()
+    if not line:
+        raise ConnectionError(f"The harness daemon at {socket_path} closed the connection without a response.")
+
+    response = json.loads(line)
+    if response.get('status') != 'ok':
+        raise DaemonError(response.get('message', 'The harness daemon failed to serve the request.'))
+    return response
+
+def log_event(scriptsdir, unique_id, event_id, socket_path=None):
+    """Logs the event event_id of LOGGABLE_EVENTS of the test instance unique_id through the daemon."""
+    call_daemon({'op' : OP_LOG_EVENT, 'scriptsdir' : scriptsdir, 'unique_id' : unique_id, 'event' : event_id},
+                socket_path=socket_path)
+    return
+
+def run_check(path_to_results, unique_id, socket_path=None):
+    """Runs the check of the test instance through the daemon.
+
+    Parameters
+    ----------
+    path_to_results : str
+        The run archive directory of the test instance.
+
+    unique_id : str
+        The unique id of the test instance, or None to take it from path_to_results.
+
+    Returns
+    -------
+    tuple
+        (stdout, stderr, exit_status) of test_harness_driver.py --check.
+    """
+    response = call_daemon({'op' : OP_CHECK, 'path_to_results' : path_to_results, 'unique_id' : unique_id},
+                           socket_path=socket_path)
+    return (response['stdout'], response['stderr'], response['exit_status'])
+
+#-----------------------------------------------------
+# The classes below run on the daemon.               -
+#                                                    -
+#-----------------------------------------------------
+
+class HarnessDaemon:
+    """Serves the requests of the batch jobs on a Unix domain socket."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, socket_path, logger=None, max_cached_tests=DEFAULT_MAX_CACHED_TESTS):
+        """Binds the socket of the daemon.
+
+        Parameters
+        ----------
+        socket_path : str
+            The path of the socket. A socket left by a daemon that is no
+            longer running is replaced.
+
+        logger : rgt_logger
+            The logger of the daemon.
+
+        max_cached_tests : int
+            The number of tests whose StatusFile and logger are kept.
+
+        Raises
+        ------
+        OSError
+            If another daemon is listening on socket_path.
+        """
+        self.__socket_path = os.path.abspath(socket_path)
+        self.__logger = logger
+        self.__max_cached_tests = max(1, max_cached_tests)
+
+        # Maps (scriptsdir, unique_id) to (logger name, StatusFile), least recently used first.
+        self.__tests = collections.OrderedDict()
+
+        # Serializes the status file writes of the daemon, which change the
+        # working directory and environment of the process, and the start
+        # of the checks, which may start driver pool workers inheriting them.
+        self.__status_lock = threading.Lock()
+
+        self.__remove_stale_socket()
+        os.makedirs(os.path.dirname(self.__socket_path), exist_ok=True)
+        saved_umask = os.umask(0o177)
+        try:
+            self.__server = _Unix_server(self.__socket_path, _Request_handler)
+        finally:
+            os.umask(saved_umask)
+        self.__server.harness_daemon = self
+
+    ##################
+    # Public methods #
+    ##################
+
+    @property
+    def socket_path(self):
+        """str: The path of the socket of the daemon."""
+        return self.__socket_path
+
+    def serve_forever(self):
+        """Serves requests until shutdown is called, then removes the socket."""
+        self.__log_info(f"The harness daemon is listening on {self.__socket_path}.")
+        try:
+            self.__server.serve_forever()
+        finally:
+            self.__server.server_close()
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self.__socket_path)
+            from libraries import driver_pool
+            driver_pool.shutdown_driver_pool()
+            with self.__status_lock:
+                for (logger_name, jstatus) in self.__tests.values():
+                    _close_logger(logger_name)
+                self.__tests.clear()
+            self.__log_info("The harness daemon has stopped.")
+        return
+
+    def shutdown(self):
+        """Stops serve_forever. Must not be called from the thread running serve_forever."""
+        self.__server.shutdown()
+        return
+
+    def serve_request(self, request):
+        """Returns the response to request. See the module documentation for the protocol."""
+        op = request.get('op')
+        try:
+            if op == OP_PING:
+                response = {'pid' : os.getpid()}
+            elif op == OP_LOG_EVENT:
+                response = self.__log_event(request)
+            elif op == OP_CHECK:
+                response = self.__check(request)
+            elif op == OP_SHUTDOWN:
+                threading.Thread(target=self.shutdown, daemon=True).start()
+                response = {}
+            else:
+                raise DaemonError(f"Unknown harness daemon request {op!r}.")
+        except DaemonError as err:
+            return {'status' : 'error', 'message' : err.message}
+        except SystemExit as err:
+            # The layout functions exit with a message for ill-formed paths.
+            return {'status' : 'error', 'message' : str(err.code)}
+        except Exception as err:
+            self.__log_error(f"The harness daemon failed to serve {op!r}: {err!r}")
+            return {'status' : 'error', 'message' : f"{type(err).__name__}: {err}"}
+        response['status'] = 'ok'
+        return response
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __log_event(self, request):
+        event_id = request['event']
+        if event_id not in LOGGABLE_EVENTS:
+            raise DaemonError(f"The event {event_id} can not be logged through the harness daemon.")
+        scriptsdir = os.path.realpath(request['scriptsdir'])
+        unique_id = request['unique_id']
+        with self.__status_lock, _client_context(scriptsdir, request['environ']):
+            jstatus = self.__get_status_file(scriptsdir, unique_id)
+            jstatus.log_event(event_id)
+        return {}
+
+    def __check(self, request):
+        from libraries import driver_pool
+        from libraries.layout_of_apps_directory import apptest_layout, get_layout_from_runarchivedir
+
+        (apps_root, app, test, testid) = get_layout_from_runarchivedir(request['path_to_results'])
+        unique_id = request.get('unique_id')
+        if unique_id is not None and unique_id != testid:
+            raise DaemonError(f"The test id {unique_id} does not match the run archive id {testid}.")
+        scriptsdir = os.path.join(apps_root, app, test, apptest_layout.test_scripts_dirname)
+
+        (stdout, stderr, exit_status) = driver_pool.run_test_harness_driver(["--check", "-i", testid],
+                                                                            scriptsdir,
+                                                                            capture_output=True,
+                                                                            environ=request['environ'],
+                                                                            submit_lock=self.__status_lock)
+        self.__log_info(f"The check of {app}.{test} {testid} returned {exit_status}.")
+        return {'stdout' : stdout or '', 'stderr' : stderr or '', 'exit_status' : exit_status}
+
+    def __get_status_file(self, scriptsdir, unique_id):
+        """Returns the StatusFile of the test instance. Called in its Scripts directory with the status lock held."""
+        key = (scriptsdir, unique_id)
+        if key in self.__tests:
+            self.__tests.move_to_end(key)
+            return self.__tests[key][1]
+
+        from libraries.layout_of_apps_directory import get_layout_from_scriptdir, get_path_to_logfile_from_scriptdir
+        from libraries.rgt_loggers import rgt_logger_factory
+        from libraries.status_file_factory import StatusFileFactory
+        from libraries.subtest_factory import SubtestFactory
+
+        logger_name = f"{DAEMON_LOGGER_NAME}.{unique_id}"
+        a_logger = rgt_logger_factory.create_rgt_logger(
+                                             logger_name=logger_name,
+                                             fh_filepath=get_path_to_logfile_from_scriptdir(scriptsdir, unique_id),
+                                             logger_threshold_log_level="INFO",
+                                             fh_threshold_log_level="INFO",
+                                             ch_threshold_log_level="WARNING")
+        (apps_root, app, test) = get_layout_from_scriptdir(scriptsdir)
+        apptest = SubtestFactory.make_subtest(name_of_application=app,
+                                              name_of_subtest=test,
+                                              local_path_to_tests=apps_root,
+                                              logger=a_logger,
+                                              tag=unique_id)
+        jstatus = StatusFileFactory.create(path_to_status_file=apptest.get_path_to_status_file(), logger=a_logger)
+        jstatus.initialize_subtest(None, unique_id)
+
+        self.__tests[key] = (logger_name, jstatus)
+        while len(self.__tests) > self.__max_cached_tests:
+            (old_logger_name, old_jstatus) = self.__tests.popitem(last=False)[1]
+            _close_logger(old_logger_name)
+        return jstatus
+
+    def __remove_stale_socket(self):
+        if not os.path.exists(self.__socket_path):
+            return
+        try:
+            call_daemon({'op' : OP_PING, 'environ' : {}}, socket_path=self.__socket_path)
+        except (OSError, ValueError, DaemonError):
+            os.remove(self.__socket_path)
+            return
+        raise OSError(f"A harness daemon is already listening on {self.__socket_path}.")
+
+    def __log_info(self, message):
+        if self.__logger:
+            self.__logger.doInfoLogging(message)
+
+    def __log_error(self, message):
+        if self.__logger:
+            self.__logger.doErrorLogging(message)
+
+class _Unix_server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _Request_handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("The request is not a JSON object.")
+        except ValueError as err:
+            response = {'status' : 'error', 'message' : f"Ill-formed harness daemon request: {err}"}
+        else:
+            response = self.server.harness_daemon.serve_request(request)
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+@contextlib.contextmanager
+def _client_context(directory, environ):
+    """Runs the body in directory with the environment of a client, as the harness scripts expect."""
+    saved_cwd = os.getcwd()
+    saved_environ = dict(os.environ)
+    os.environ.clear()
+    os.environ.update(environ)
+    try:
+        os.chdir(directory)
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+
+def _close_logger(logger_name):
+    a_logger = logging.getLogger(logger_name)
+    for handler in list(a_logger.handlers):
+        a_logger.removeHandler(handler)
+        handler.close()
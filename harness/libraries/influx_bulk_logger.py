@@ -0,0 +1,241 @@
+#! /usr/bin/env python3
+"""Bulk replay of ``--mode influx_log`` for all tests of a harness input file.
+
+The per-test influx_log task walks one test at a time and posts every event,
+metric and node health record with its own HTTP request. After an InfluxDB
+outage there can be hundreds of thousands of records to send, so the bulk
+replay
+
+    1. scans the Run_Archive and Status directories of all tests in parallel,
+       building the line-protocol records of every test instance that has
+       not been logged yet in memory,
+    2. sends the records in batches through a pooled session, with several
+       batches in flight at once, and
+    3. writes the .influx_logged marker of a test instance as soon as all
+       batches holding its records are acknowledged.
+
+As with the per-test influx_log, only a test instance with metrics or node
+health records is marked as logged. The events of an instance without them
+are sent, and the instance is logged again by the next influx_log.
+
+The bulk replay is enabled with RGT_INFLUX_BULK=1 and is tuned with the
+following environment variables:
+
+    RGT_INFLUX_BATCH_SIZE          Maximum number of records per POST (default 5000).
+    RGT_INFLUX_BULK_SCAN_WORKERS   Number of threads reading test instances (default 8).
+    RGT_INFLUX_BULK_SENDERS        Number of batches sent at once (default 4).
+"""
+
+# Python imports
+import concurrent.futures
+import os
+import threading
+import time
+
+# Harness imports
+from libraries.influx_shipper import InfluxShipper, InfluxWriter
+
+def bulk_influx_log_enabled():
+    """Returns True if --mode influx_log should use the bulk replay."""
+    return os.getenv('RGT_INFLUX_BULK', '0') == '1'
+
+def write_influx_logged_marker(runarchive_dir):
+    """Atomically creates the .influx_logged marker of a test instance.
+
+    The marker is written to a temporary file which is renamed into place, so
+    a concurrent influx_log never sees a partially created marker.
+    """
+    marker_path = os.path.join(runarchive_dir, '.influx_logged')
+    tmp_path = f"{marker_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w'):
+        pass
+    os.replace(tmp_path, marker_path)
+
+class InfluxBulkLogger:
+    """Logs the test instances of many subtests to InfluxDB in bulk."""
+
+    DEFAULT_SCAN_WORKERS = 8
+    DEFAULT_SENDERS = 4
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, subtests, logger, batch_size=None, scan_workers=None, senders=None):
+        """
+        Parameters
+        ----------
+        subtests : list
+            The apptest.subtest objects whose test instances are logged.
+
+        logger : rgt_logger
+            The harness logger. Per-instance messages go to the logger of the subtest.
+        """
+        self.__subtests = subtests
+        self.__logger = logger
+        self.__batch_size = batch_size or int(os.getenv('RGT_INFLUX_BATCH_SIZE', InfluxShipper.DEFAULT_BATCH_SIZE))
+        self.__scan_workers = scan_workers or int(os.getenv('RGT_INFLUX_BULK_SCAN_WORKERS', InfluxBulkLogger.DEFAULT_SCAN_WORKERS))
+        self.__senders = senders or int(os.getenv('RGT_INFLUX_BULK_SENDERS', InfluxBulkLogger.DEFAULT_SENDERS))
+
+        self.__lock = threading.Lock()
+        self.__pending_batches = {}
+        self.__sent_records = 0
+        self.__failed_records = 0
+        self.__sent_bytes = 0
+        self.__logged_instances = 0
+
+    ###################
+    # Public methods  #
+    ###################
+
+    def run(self):
+        """Scans all subtests and sends their records.
+
+        Returns
+        -------
+        dict
+            Counts of the replay: 'instances', 'records', 'sent', 'failed',
+            'logged_instances', 'batches', 'bytes', 'seconds'.
+        """
+        if 'RGT_DISABLE_INFLUX' in os.environ and str(os.environ['RGT_DISABLE_INFLUX']) == '1':
+            self.__logger.doWarningLogging("InfluxDB logging is explicitly disabled with RGT_DISABLE_INFLUX=1")
+            return None
+        if not 'RGT_INFLUX_URI' in os.environ or not 'RGT_INFLUX_TOKEN' in os.environ:
+            self.__logger.doWarningLogging("RGT_INFLUX_URI and RGT_INFLUX_TOKEN required in environment to use InfluxDB")
+            return None
+
+        start_time = time.monotonic()
+        instances = self.__scan()
+        scan_time = time.monotonic() - start_time
+        nrecords = sum(len(records) for (runarchive_dir, records) in instances)
+        self.__logger.doInfoLogging(f"Bulk influx_log: found {nrecords} records in {len(instances)} test instances in {scan_time:.1f} s.")
+
+        batches = self.__make_batches(instances)
+        if 'RGT_INFLUX_NO_SEND' in os.environ and os.environ['RGT_INFLUX_NO_SEND'] == '1':
+            for (records, runarchive_dirs) in batches:
+                for record in records:
+                    print(f"RGT_INFLUX_NO_SEND is set, echoing: {record}")
+        else:
+            self.__send(batches)
+
+        elapsed = time.monotonic() - start_time
+        summary = {'instances': len(instances),
+                   'records': nrecords,
+                   'sent': self.__sent_records,
+                   'failed': self.__failed_records,
+                   'logged_instances': self.__logged_instances,
+                   'batches': len(batches),
+                   'bytes': self.__sent_bytes,
+                   'seconds': elapsed}
+        message = (f"Bulk influx_log: sent {self.__sent_records} of {nrecords} records "
+                   f"({self.__sent_bytes / 1.0e6:.1f} MB) in {len(batches)} batches "
+                   f"from {len(instances)} test instances in {elapsed:.1f} s "
+                   f"({self.__sent_records / max(elapsed, 1.0e-6):.0f} records/s). "
+                   f"{self.__logged_instances} test instances marked as logged, {self.__failed_records} records failed.")
+        self.__logger.doInfoLogging(message)
+        # For the moment, hard-code this as a print statement.
+        print(message)
+        return summary
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __scan(self):
+        """Builds the records of all test instances that are not logged yet.
+
+        Returns
+        -------
+        list
+            A (runarchive_dir, records) tuple per test instance. runarchive_dir
+            is None for an instance that must not be marked as logged, such as
+            an instance that is still running.
+        """
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.__scan_workers) as executor:
+            list_futures = [executor.submit(self.__list_instances, subtest) for subtest in self.__subtests]
+            instance_futures = []
+            for list_future in list_futures:
+                for (subtest, test_id) in list_future.result():
+                    instance_futures.append(executor.submit(self.__read_instance, subtest, test_id))
+            instances = [future.result() for future in instance_futures]
+        return [instance for instance in instances if instance[1]]
+
+    def __list_instances(self, subtest):
+        # Records spooled while InfluxDB was unreachable are sent first.
+        subtest._drain_influx_spools()
+        return [(subtest, test_id) for test_id in subtest._get_influx_log_test_ids()]
+
+    def __read_instance(self, subtest, test_id):
+        runarchive_dir = os.path.join(subtest.get_path_to_test(), subtest.test_run_archive_dirname, test_id)
+        metric_records = subtest._get_influx_metric_records(test_id, post_run=True)
+        event_records = subtest._get_influx_event_records(test_id)
+        if not metric_records:
+            # The per-test influx_log does not mark such an instance as logged either.
+            subtest.logger.doWarningLogging(f"Unable to log metrics of {test_id}. Only its events are sent.")
+            return (None, event_records)
+        return (runarchive_dir, metric_records + event_records)
+
+    def __make_batches(self, instances):
+        """Packs the records of the test instances into batches of at most batch_size records.
+
+        Returns
+        -------
+        list
+            A (records, runarchive_dirs) tuple per batch, where runarchive_dirs
+            lists the test instances that have records in the batch.
+        """
+        batches = []
+        records = []
+        runarchive_dirs = []
+        for (runarchive_dir, instance_records) in instances:
+            start = 0
+            while start < len(instance_records):
+                count = min(self.__batch_size - len(records), len(instance_records) - start)
+                records.extend(instance_records[start:start + count])
+                start += count
+                if runarchive_dir is not None:
+                    runarchive_dirs.append(runarchive_dir)
+                    self.__pending_batches[runarchive_dir] = self.__pending_batches.get(runarchive_dir, 0) + 1
+                if len(records) == self.__batch_size:
+                    batches.append((records, runarchive_dirs))
+                    records = []
+                    runarchive_dirs = []
+        if records:
+            batches.append((records, runarchive_dirs))
+        return batches
+
+    def __send(self, batches):
+        writer = InfluxWriter(os.environ['RGT_INFLUX_URI'], os.environ['RGT_INFLUX_TOKEN'],
+                              logger=self.__logger, pool_size=self.__senders)
+        try:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.__senders) as executor:
+                for future in [executor.submit(self.__send_batch, writer, batch) for batch in batches]:
+                    future.result()
+        finally:
+            writer.close()
+
+    def __send_batch(self, writer, batch):
+        (records, runarchive_dirs) = batch
+        nbytes = sum(len(record.encode('utf-8')) + 1 for record in records)
+        if not writer.post_records(records):
+            with self.__lock:
+                self.__failed_records += len(records)
+                # These instances are left unmarked and are sent again by the next influx_log.
+                for runarchive_dir in runarchive_dirs:
+                    self.__pending_batches[runarchive_dir] = None
+            return
+
+        completed = []
+        with self.__lock:
+            self.__sent_records += len(records)
+            self.__sent_bytes += nbytes
+            for runarchive_dir in runarchive_dirs:
+                if self.__pending_batches[runarchive_dir] is None:
+                    continue
+                self.__pending_batches[runarchive_dir] -= 1
+                if self.__pending_batches[runarchive_dir] == 0:
+                    completed.append(runarchive_dir)
+            self.__logged_instances += len(completed)
+
+        for runarchive_dir in completed:
+            write_influx_logged_marker(runarchive_dir)
@@ -0,0 +1,493 @@
+#! /usr/bin/env python3
+"""Asynchronous, batched shipping of InfluxDB line-protocol records.
+
+Posting an event to InfluxDB used to be a blocking HTTP request made in the
+middle of building, submitting or checking a test. The InfluxShipper moves
+the requests to a background thread. Records are put on a bounded queue,
+sent in multi-line batches through one requests.Session, and retried with
+exponential backoff. Records that cannot be sent are appended to a spool
+file in the Status directory of their test instance, which
+``--mode influx_log`` drains later. A batch InfluxDB rejects (4xx) is split
+to find the records it rejects, which are moved to the ``.rejected`` file
+next to the spool file instead of being sent again.
+
+The InfluxWriter, which does the POSTs, is also used directly by the bulk
+replay of ``--mode influx_log`` (see influx_bulk_logger).
+
+The behaviour is controlled with the following environment variables:
+
+    RGT_INFLUX_BATCH_SIZE     Maximum number of records per POST (default 5000).
+    RGT_INFLUX_QUEUE_SIZE     Maximum number of queued records (default 10000).
+    RGT_INFLUX_MAX_RETRIES    Number of attempts per batch (default 5).
+    RGT_INFLUX_HTTP_TIMEOUT   Timeout of a single POST in seconds (default 10).
+    RGT_INFLUX_EXIT_TIMEOUT   Time allowed to flush the queue at exit, in seconds (default 10).
+"""
+
+# Python imports
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+
+REJECTED_SUFFIX = '.rejected'
+
+_influx_shipper = None
+_influx_shipper_lock = threading.Lock()
+
+def get_influx_shipper(logger=None):
+    """Returns the InfluxShipper of this process.
+
+    The shipper is created on first use from RGT_INFLUX_URI and
+    RGT_INFLUX_TOKEN and is flushed when the process exits.
+
+    Returns
+    -------
+    InfluxShipper
+        The shipper, or None if the requests module is not available.
+    """
+    global _influx_shipper
+    with _influx_shipper_lock:
+        if _influx_shipper is None:
+            try:
+                import requests
+            except ImportError:
+                return None
+            _influx_shipper = InfluxShipper(os.environ['RGT_INFLUX_URI'],
+                                            os.environ['RGT_INFLUX_TOKEN'],
+                                            logger=logger)
+            atexit.register(_influx_shipper.close)
+        return _influx_shipper
+
+def close_influx_shipper():
+    """Closes the InfluxShipper of this process, if it was created.
+
+    The queued records are sent or spooled before this returns. The next
+    call of get_influx_shipper creates a new shipper. This is for processes
+    that exit without running the atexit handlers, like the driver pool
+    workers.
+    """
+    global _influx_shipper
+    with _influx_shipper_lock:
+        shipper = _influx_shipper
+        _influx_shipper = None
+    if shipper is not None:
+        atexit.unregister(shipper.close)
+        shipper.close()
+
+def spool_influx_records(spool_path, records):
+    """Appends records to the spool file at spool_path.
+
+    Each record is stored as a JSON string on its own line, since records
+    may contain newlines in string field values.
+    """
+    text = ''.join(json.dumps(record) + '\n' for record in records)
+    with open(spool_path, 'a') as spool_obj:
+        fcntl.flock(spool_obj, fcntl.LOCK_EX)
+        try:
+            spool_obj.write(text)
+        finally:
+            fcntl.flock(spool_obj, fcntl.LOCK_UN)
+
+def drain_influx_spool(spool_path, shipper, logger=None):
+    """Sends the records of a spool file and removes it.
+
+    The spool file is renamed before it is read, so records spooled while
+    draining go to a new spool file. Records that fail to send are spooled
+    again. Records InfluxDB rejects are appended to the spool file path
+    with REJECTED_SUFFIX, and lines that are not JSON strings are skipped.
+
+    Returns
+    -------
+    tuple
+        The number of records sent, spooled again and rejected.
+    """
+    if not os.path.exists(spool_path):
+        return (0, 0, 0)
+
+    draining_path = f"{spool_path}.draining.{os.getpid()}"
+    try:
+        os.rename(spool_path, draining_path)
+    except FileNotFoundError:
+        return (0, 0, 0)
+
+    records = []
+    skipped = 0
+    with open(draining_path, 'r', errors='replace') as spool_obj:
+        for line in spool_obj:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            if isinstance(record, str):
+                records.append(record)
+            else:
+                skipped += 1
+    if skipped and logger:
+        logger.doWarningLogging(f"Skipped {skipped} lines of {spool_path} that are not Influx records.")
+
+    sent = 0
+    rejected = []
+    unsent = []
+    batch_size = shipper.batch_size
+    for start in range(0, len(records), batch_size):
+        (batch_sent, batch_rejected, unsent) = _send_isolating_rejected(shipper, records[start:start + batch_size])
+        sent += batch_sent
+        rejected.extend(batch_rejected)
+        if unsent:
+            unsent.extend(records[start + batch_size:])
+            spool_influx_records(spool_path, unsent)
+            if logger:
+                logger.doWarningLogging(f"Unable to send {len(unsent)} spooled Influx records. Spooled again in {spool_path}.")
+            break
+
+    if rejected:
+        spool_influx_records(spool_path + REJECTED_SUFFIX, rejected)
+        if logger:
+            logger.doErrorLogging(f"InfluxDB rejected {len(rejected)} spooled records. "
+                                  f"They were moved to {spool_path + REJECTED_SUFFIX}.")
+    os.remove(draining_path)
+    return (sent, len(unsent), len(rejected))
+
+def _send_isolating_rejected(shipper, records):
+    """Sends records, splitting the batches InfluxDB rejects until the rejected records are found.
+
+    Returns
+    -------
+    tuple
+        The number of records sent, the records rejected on their own, and
+        the records not sent because InfluxDB could not be reached.
+    """
+    sent = 0
+    rejected = []
+    pending = [records]
+    while pending:
+        batch = pending.pop()
+        status = shipper.send_records(batch)
+        if status == InfluxWriter.SENT:
+            sent += len(batch)
+        elif status == InfluxWriter.REJECTED and len(batch) == 1:
+            rejected.extend(batch)
+        elif status == InfluxWriter.REJECTED:
+            middle = len(batch) // 2
+            pending.append(batch[middle:])
+            pending.append(batch[:middle])
+        else:
+            unsent = list(batch)
+            for batch in reversed(pending):
+                unsent.extend(batch)
+            return (sent, rejected, unsent)
+    return (sent, rejected, [])
+
+class InfluxWriter:
+    """Posts line-protocol records to InfluxDB through one requests.Session.
+
+    The session keeps its connections open between requests. pool_size is
+    the number of connections kept, which should be at least the number of
+    threads posting through the writer at once.
+    """
+
+    DEFAULT_MAX_RETRIES = 5
+    DEFAULT_HTTP_TIMEOUT = 10.0
+
+    SENT = 'sent'
+    """str: InfluxDB accepted the records."""
+
+    REJECTED = 'rejected'
+    """str: InfluxDB rejected the records (4xx), sending them again will not help."""
+
+    FAILED = 'failed'
+    """str: InfluxDB could not be reached or failed (5xx), the records may be sent again later."""
+
+    INITIAL_BACKOFF = 0.5
+    """float: Delay in seconds before the first retry, doubled for every retry."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, influx_url, influx_token, logger=None,
+                 max_retries=None, http_timeout=None, pool_size=1):
+        import requests
+
+        self.__influx_url = influx_url
+        self.__logger = logger
+        self.__max_retries = max_retries or int(os.getenv('RGT_INFLUX_MAX_RETRIES', InfluxWriter.DEFAULT_MAX_RETRIES))
+        self.__http_timeout = http_timeout or float(os.getenv('RGT_INFLUX_HTTP_TIMEOUT', InfluxWriter.DEFAULT_HTTP_TIMEOUT))
+
+        self.__session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+        self.__session.headers.update({'Authorization': "Token " + influx_token,
+                                       'Content-Type': "text/plain; charset=utf-8",
+                                       'Accept': "application/json"})
+
+    ###################
+    # Public methods  #
+    ###################
+
+    def post_records(self, records, deadline=None):
+        """Sends records in one POST, retrying with backoff.
+
+        Parameters
+        ----------
+        records : list
+            Line-protocol records.
+
+        deadline : float
+            A time.monotonic() value after which no more retries are made.
+
+        Returns
+        -------
+        bool
+            True if InfluxDB accepted the records.
+        """
+        return self.send_records(records, deadline=deadline) == InfluxWriter.SENT
+
+    def send_records(self, records, deadline=None):
+        """Sends records in one POST, retrying with backoff.
+
+        Takes the same parameters as post_records.
+
+        Returns
+        -------
+        str
+            SENT, REJECTED or FAILED.
+        """
+        import requests
+
+        data = '\n'.join(records)
+        delay = InfluxWriter.INITIAL_BACKOFF
+        for attempt in range(self.__max_retries):
+            try:
+                r = self.__session.post(self.__influx_url, data=data.encode('utf-8'), timeout=self.__http_timeout)
+                if r.status_code < 400:
+                    self.__log_info(f"Logged {len(records)} records to InfluxDB ({r.status_code}, {r.reason}).")
+                    return InfluxWriter.SENT
+                if r.status_code < 500 and r.status_code != 429:
+                    # The records were rejected, sending them again will not help.
+                    self.__log_error(f"InfluxDB rejected {len(records)} records: {r.status_code} - {r.reason}: {r.text}")
+                    return InfluxWriter.REJECTED
+                self.__log_warning(f"Failed to post {len(records)} records to InfluxDB: {r.status_code} - {r.reason}")
+            except requests.exceptions.RequestException as e:
+                self.__log_warning(f"InfluxDB is not reachable ({e}). {len(records)} records not sent.")
+
+            if attempt + 1 == self.__max_retries:
+                break
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+            time.sleep(delay)
+            delay *= 2
+        return InfluxWriter.FAILED
+
+    def close(self):
+        """Closes the connections of the session."""
+        self.__session.close()
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __log_info(self, message):
+        if self.__logger:
+            self.__logger.doInfoLogging(message)
+
+    def __log_warning(self, message):
+        if self.__logger:
+            self.__logger.doWarningLogging(message)
+
+    def __log_error(self, message):
+        if self.__logger:
+            self.__logger.doErrorLogging(message)
+
+class InfluxShipper:
+    """Sends line-protocol records to InfluxDB from a background thread."""
+
+    DEFAULT_BATCH_SIZE = 5000
+    DEFAULT_QUEUE_SIZE = 10000
+    DEFAULT_EXIT_TIMEOUT = 10.0
+
+    FLUSH_INTERVAL = 0.2
+    """float: Time in seconds the background thread waits for more records to batch."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, influx_url, influx_token, logger=None,
+                 batch_size=None, queue_size=None, max_retries=None,
+                 http_timeout=None, exit_timeout=None):
+        self.__logger = logger
+        self.__batch_size = batch_size or int(os.getenv('RGT_INFLUX_BATCH_SIZE', InfluxShipper.DEFAULT_BATCH_SIZE))
+        self.__exit_timeout = exit_timeout or float(os.getenv('RGT_INFLUX_EXIT_TIMEOUT', InfluxShipper.DEFAULT_EXIT_TIMEOUT))
+        queue_size = queue_size or int(os.getenv('RGT_INFLUX_QUEUE_SIZE', InfluxShipper.DEFAULT_QUEUE_SIZE))
+
+        self.__writer = InfluxWriter(influx_url, influx_token, logger=logger,
+                                     max_retries=max_retries, http_timeout=http_timeout)
+
+        self.__queue = queue.Queue(maxsize=queue_size)
+        self.__lock = threading.Lock()
+        self.__inflight = None
+        self.__deadline = None
+        self.__closed = False
+        self.__thread = threading.Thread(target=self.__run, name='influx_shipper', daemon=True)
+        self.__thread.start()
+
+    ###################
+    # Public methods  #
+    ###################
+
+    @property
+    def batch_size(self):
+        """int: The maximum number of records per POST."""
+        return self.__batch_size
+
+    def submit(self, record, spool_path):
+        """Queues a record for sending. Never blocks.
+
+        Parameters
+        ----------
+        record : str
+            A line-protocol record.
+
+        spool_path : str
+            The file the record is appended to if it cannot be sent.
+        """
+        if self.__closed:
+            spool_influx_records(spool_path, [record])
+            return
+        try:
+            self.__queue.put_nowait((record, spool_path))
+        except queue.Full:
+            self.__log_warning(f"Influx queue is full, spooling record to {spool_path}.")
+            spool_influx_records(spool_path, [record])
+
+    def flush(self, timeout=None):
+        """Waits until all queued records are sent or spooled."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.__queue.unfinished_tasks > 0:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=None):
+        """Flushes the queue and stops the background thread.
+
+        Records that are not sent within timeout (RGT_INFLUX_EXIT_TIMEOUT by
+        default) are spooled.
+        """
+        if self.__closed:
+            return
+        timeout = self.__exit_timeout if timeout is None else timeout
+        self.__deadline = time.monotonic() + timeout
+        try:
+            self.__queue.put((None, None), timeout=timeout)
+        except queue.Full:
+            pass
+        self.__thread.join(max(0.0, self.__deadline - time.monotonic()))
+        self.__closed = True
+
+        with self.__lock:
+            leftover = self.__inflight or []
+            self.__inflight = None
+        while True:
+            try:
+                (record, spool_path) = self.__queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                leftover.append((record, spool_path))
+        self.__spool(leftover)
+        self.__writer.close()
+
+    def post_records(self, records):
+        """Synchronously sends records in one POST, retrying with backoff.
+
+        Returns
+        -------
+        bool
+            True if InfluxDB accepted the records.
+        """
+        return self.__writer.post_records(records, deadline=self.__deadline)
+
+    def send_records(self, records):
+        """Synchronously sends records in one POST, retrying with backoff.
+
+        Returns
+        -------
+        str
+            InfluxWriter.SENT, REJECTED or FAILED.
+        """
+        return self.__writer.send_records(records, deadline=self.__deadline)
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __run(self):
+        stopping = False
+        while not stopping:
+            (record, spool_path) = self.__queue.get()
+            batch = []
+            if record is None:
+                stopping = True
+            else:
+                batch.append((record, spool_path))
+
+            # Gather whatever else arrives within the flush interval.
+            flush_time = time.monotonic() + InfluxShipper.FLUSH_INTERVAL
+            while not stopping and len(batch) < self.__batch_size:
+                try:
+                    (record, spool_path) = self.__queue.get(timeout=max(0.0, flush_time - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                else:
+                    batch.append((record, spool_path))
+
+            if batch:
+                self.__send(batch)
+            for _ in range(len(batch) + (1 if stopping else 0)):
+                self.__queue.task_done()
+
+    def __send(self, batch):
+        with self.__lock:
+            self.__inflight = batch
+        sent = self.post_records([record for (record, spool_path) in batch])
+        with self.__lock:
+            if self.__inflight is None:
+                # close() gave up waiting and has spooled the batch.
+                return
+            self.__inflight = None
+        if not sent:
+            self.__spool(batch)
+
+    def __spool(self, batch):
+        by_spool_path = {}
+        for (record, spool_path) in batch:
+            by_spool_path.setdefault(spool_path, []).append(record)
+        for (spool_path, records) in by_spool_path.items():
+            try:
+                spool_influx_records(spool_path, records)
+                self.__log_warning(f"Spooled {len(records)} Influx records to {spool_path}. "
+                                   "They will be sent by the harness --mode influx_log.")
+            except OSError as e:
+                self.__log_error(f"Unable to spool {len(records)} Influx records to {spool_path}: {e}")
+
+    def __log_warning(self, message):
+        if self.__logger:
+            self.__logger.doWarningLogging(message)
+
+    def __log_error(self, message):
+        if self.__logger:
+            self.__logger.doErrorLogging(message)
@@ -31,9 +31,15 @@ class apptest_layout:
     test_kill_filename = '.kill_test'
     test_rc_filename = '.testrc'
     test_status_filename = 'rgt_status.txt'
+    test_status_journal_filename = 'rgt_status_journal.txt'
+    test_status_index_filename = 'rgt_status_index.txt'
+    test_status_sharded_filename = 'rgt_status_sharded.txt'
+    test_status_shard_filename = 'rgt_status_shard.txt'
     test_summary_filename = 'rgt_summary.txt'
     job_status_filename = 'job_status.txt'
     job_id_filename = 'job_id.txt'
+    influx_spool_filename = 'influx_spool.txt'
+    test_events_jsonl_filename = 'events.jsonl'
     app_logger_filename = 'application_logfile.txt'
     status_logger_filename = 'status_logfile.txt'
     """
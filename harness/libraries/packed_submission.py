@@ -0,0 +1,301 @@
+#! /usr/bin/env python3
+"""Packed submission of the batch scripts of many tests in few scheduler jobs.
+
+With RGT_PACKED_SUBMIT set, the test_harness_driver processes of a harness
+run do not submit their batch scripts. Each one queues a PackRequest in the
+directory RGT_PACK_DIR instead. Once all tests are launched, the harness
+groups the compatible requests and submits each group as a single job.
+Requests are compatible if they have the same scheduler, submit arguments,
+and batch script directives, e.g. queue, account, nodes and walltime, apart
+from the directives of PER_TEST_DIRECTIVE_OPTIONS like the job name.
+
+    array    Each group is a job array, and each task of the array runs the
+             batch script of one test. Each test gets the job id of its task.
+    steps    Each group is one job that runs the batch scripts of its tests
+             one after the other. The job has the resources of one test, and
+             the sum of the walltimes of the tests. Tests whose batch script
+             sets no walltime are submitted on their own. Every test of a
+             group gets the job id of the group.
+
+The batch scripts run unchanged in their run archive directory, so their
+log_binary_execution_time.py and check_executable_driver.py calls log the
+events of their own test. The harness writes the job id file of each test
+and logs its submit_end and job_queued events.
+
+The packing is tuned with the following environment variables:
+
+    RGT_PACKED_SUBMIT     array, steps, or empty for no packing (default).
+    RGT_PACK_DIR          The directory of the queued requests and of the
+                          scripts of the packed jobs. The harness sets it
+                          for each of its runs.
+    RGT_PACK_MAX_TESTS    The maximum number of tests in a packed job
+                          (default: 100).
+"""
+
+# Python imports
+import collections
+import glob
+import json
+import os
+import shlex
+import stat
+import threading
+
+# Harness imports
+from libraries.submission_pipeline import SubmissionPipeline
+
+PACK_MODE_ARRAY = 'array'
+PACK_MODE_STEPS = 'steps'
+PACK_MODES = (PACK_MODE_ARRAY, PACK_MODE_STEPS)
+
+DEFAULT_PACK_MAX_TESTS = 100
+
+# The environment variables that are unset in packed jobs, so that tests
+# resubmitted from their batch script are submitted on their own.
+PACK_ENVIRONMENT_VARIABLES = ('RGT_PACKED_SUBMIT', 'RGT_PACK_DIR')
+
+def get_pack_mode():
+    """Returns the packing mode set by RGT_PACKED_SUBMIT, or None if batch scripts are submitted one by one."""
+    mode = os.getenv('RGT_PACKED_SUBMIT', '')
+    if not mode:
+        return None
+    if mode not in PACK_MODES:
+        raise ValueError(f"Unknown packing mode RGT_PACKED_SUBMIT={mode}. Valid modes are {list(PACK_MODES)}.")
+    return mode
+
+def get_pack_dir():
+    """Returns the directory of the queued requests if packing is enabled, otherwise None."""
+    if get_pack_mode() is None:
+        return None
+    return os.getenv('RGT_PACK_DIR') or None
+
+class PackRequest:
+    """The batch script of a test instance, waiting to be submitted in a packed job."""
+
+    FIELDS = ('scheduler_type', 'scripts_dir', 'unique_id', 'test_name', 'runarchive_dir',
+              'batch_file', 'pack_key')
+
+    def __init__(self, scheduler_type, scripts_dir, unique_id, test_name, runarchive_dir,
+                 batch_file, pack_key):
+        self.scheduler_type = scheduler_type
+        """str: The type of the scheduler, as given to SchedulerFactory."""
+
+        self.scripts_dir = scripts_dir
+        """str: The Scripts directory of the test."""
+
+        self.unique_id = unique_id
+        """str: The unique id of the test instance."""
+
+        self.test_name = test_name
+        """str: The name of the test, <app>.<test>."""
+
+        self.runarchive_dir = runarchive_dir
+        """str: The run archive directory of the test instance, from which the batch script is run."""
+
+        self.batch_file = batch_file
+        """str: The name of the batch script in runarchive_dir."""
+
+        self.pack_key = pack_key
+        """str: The requests with the same key are packed together."""
+
+    def to_dict(self):
+        return {field : getattr(self, field) for field in PackRequest.FIELDS}
+
+    @staticmethod
+    def from_dict(fields):
+        return PackRequest(**{field : fields[field] for field in PackRequest.FIELDS})
+
+def make_pack_key(scheduler, batch_script_path, env=None):
+    """Returns the key of the batch script, equal for the batch scripts that can be packed together.
+
+    The key is made of the type of the scheduler, its submit command for a
+    placeholder batch script, and the directives of the batch script except
+    those of scheduler.PER_TEST_DIRECTIVE_OPTIONS.
+    """
+    directives = [' '.join(line.split()[1:]) for line in _read_pack_directives(scheduler, batch_script_path)]
+    submit_command = scheduler.get_submit_command('<batch script>', env)
+    return json.dumps([scheduler.get_scheduler_type(), submit_command, directives])
+
+def queue_request(pack_dir, request):
+    """Writes the request to pack_dir, where the harness finds it after launching all tests."""
+    os.makedirs(pack_dir, exist_ok=True)
+    path = os.path.join(pack_dir, f"request.{request.unique_id}.json")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as file_obj:
+        json.dump(request.to_dict(), file_obj)
+    os.replace(tmp_path, path)
+    return path
+
+def read_requests(pack_dir):
+    """Returns the list of (path, PackRequest) of the requests queued in pack_dir, by test name and unique id."""
+    requests = []
+    for path in glob.glob(os.path.join(pack_dir, "request.*.json")):
+        with open(path, 'r') as file_obj:
+            requests.append((path, PackRequest.from_dict(json.load(file_obj))))
+    return sorted(requests, key=lambda item: (item[1].test_name, item[1].unique_id))
+
+def group_requests(requests, max_tests=None):
+    """Returns the lists of requests to pack in one job each.
+
+    Parameters
+    ----------
+    requests : list
+        PackRequest objects.
+
+    max_tests : int
+        The maximum number of requests in a group. The default is set by RGT_PACK_MAX_TESTS.
+    """
+    if max_tests is None:
+        max_tests = int(os.getenv('RGT_PACK_MAX_TESTS', DEFAULT_PACK_MAX_TESTS))
+    max_tests = max(1, max_tests)
+    by_key = collections.OrderedDict()
+    for request in requests:
+        by_key.setdefault(request.pack_key, []).append(request)
+    groups = []
+    for same_key in by_key.values():
+        for start in range(0, len(same_key), max_tests):
+            groups.append(same_key[start:start + max_tests])
+    return groups
+
+def write_pack_script(scheduler, requests, path, mode):
+    """Writes the batch script of the packed job of requests to path.
+
+    The directives of the packed job are those of the batch script of the
+    first request, and its output is written next to path. In array mode,
+    the task of index i runs the batch script of requests[i - scheduler.ARRAY_FIRST_INDEX].
+    In steps mode, the walltime is multiplied by the number of requests.
+    """
+    header = _get_pack_directives(scheduler, requests, mode)
+    if header is None:
+        raise ValueError(f"The batch script of {requests[0].test_name} sets no walltime to pack in steps.")
+    header.extend(scheduler.get_output_directives(os.path.splitext(path)[0]))
+
+    lines = ['#!/bin/bash', *header, '',
+             f"# A packed job of {len(requests)} tests of the OLCF test harness.",
+             f"unset {' '.join(PACK_ENVIRONMENT_VARIABLES)}", '']
+    if mode == PACK_MODE_ARRAY:
+        lines.append(f'case "${{{scheduler.ARRAY_INDEX_VARIABLE}}}" in')
+        for (index, request) in enumerate(requests, scheduler.ARRAY_FIRST_INDEX):
+            lines.append(f"    {index}) cd {shlex.quote(request.runarchive_dir)} && "
+                         f"exec ./{shlex.quote(request.batch_file)} ;;")
+        lines.append(f'    *) echo "No test for task ${{{scheduler.ARRAY_INDEX_VARIABLE}}}" >&2; exit 1 ;;')
+        lines.append('esac')
+    else:
+        lines.append('exit_status=0')
+        for request in requests:
+            lines.append(f"(cd {shlex.quote(request.runarchive_dir)} && ./{shlex.quote(request.batch_file)}) "
+                         f"|| exit_status=1")
+        lines.append('exit $exit_status')
+
+    for request in requests:
+        batch_script = os.path.join(request.runarchive_dir, request.batch_file)
+        os.chmod(batch_script, os.stat(batch_script).st_mode | stat.S_IXUSR)
+    with open(path, 'w') as file_obj:
+        file_obj.write('\n'.join(lines) + '\n')
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return
+
+def submit_packed_requests(pack_dir, create_scheduler, record_submission, mode=None, logger=None):
+    """Submits the requests queued in pack_dir in packed jobs, and records the submission of every test.
+
+    Parameters
+    ----------
+    pack_dir : str
+        The directory of the queued requests.
+
+    create_scheduler : callable
+        Returns the scheduler object of a scheduler type, e.g. SchedulerFactory.create_scheduler.
+
+    record_submission : callable
+        Called as record_submission(request, exit_status, job_id) for every
+        request, in the calling thread, once its packed job is submitted.
+
+    mode : str
+        One of PACK_MODES. The default is get_pack_mode().
+
+    Returns
+    -------
+    int
+        The number of requests whose submission failed.
+    """
+    if mode is None:
+        mode = get_pack_mode()
+    requests = read_requests(pack_dir)
+    if not requests:
+        return 0
+    paths = {id(request) : path for (path, request) in requests}
+    groups = group_requests([request for (path, request) in requests])
+
+    submissions = []
+    with SubmissionPipeline() as pipeline:
+        for (number, group) in enumerate(groups):
+            scheduler = create_scheduler(group[0].scheduler_type)
+            array_options = scheduler.get_array_options(len(group)) if mode == PACK_MODE_ARRAY else None
+            if ( (len(group) == 1) or
+                 (mode == PACK_MODE_ARRAY and array_options is None) or
+                 (mode == PACK_MODE_STEPS and _get_pack_directives(scheduler, group, mode) is None) ):
+                # A test submitted on its own, as without packing.
+                for request in group:
+                    future = pipeline.submit(scheduler, request.batch_file, request.runarchive_dir)
+                    submissions.append((scheduler, [request], None, future))
+                continue
+
+            pack_script = f"pack.{number}.sh"
+            write_pack_script(scheduler, group, os.path.join(pack_dir, pack_script), mode)
+            future = pipeline.submit(scheduler, pack_script, pack_dir, extra_args=array_options or ())
+            submissions.append((scheduler, group, array_options, future))
+
+        failed = 0
+        for (scheduler, group, array_options, future) in submissions:
+            try:
+                result = future.result()
+                (exit_status, job_id) = (result.exit_status, result.job_id)
+            except OSError as error:
+                (exit_status, job_id) = (1, None)
+                result = None
+                if logger:
+                    logger.doCriticalLogging(f"Unable to submit the packed job of {len(group)} tests: {error}")
+            if exit_status != 0:
+                failed += len(group)
+                if logger and result is not None:
+                    logger.doCriticalLogging(f"The packed job of {len(group)} tests was not submitted:\n{result.stderr}")
+            elif logger:
+                logger.doInfoLogging(f"Submitted {len(group)} tests in the packed job {job_id}.")
+
+            for (index, request) in enumerate(group, scheduler.ARRAY_FIRST_INDEX):
+                test_job_id = job_id
+                if exit_status == 0 and array_options:
+                    test_job_id = scheduler.get_array_task_job_id(job_id, index)
+                record_submission(request, exit_status, test_job_id)
+                os.remove(paths[id(request)])
+    return failed
+
+def _get_pack_directives(scheduler, requests, mode):
+    """Returns the directive lines of the packed job of requests, or None if the tests cannot be run in steps.
+
+    All the requests of a group have the same directives, so in steps mode
+    the walltime of the job, the sum of those of the tests, is the walltime
+    of the first test multiplied by the number of tests.
+    """
+    first = requests[0]
+    directives = _read_pack_directives(scheduler, os.path.join(first.runarchive_dir, first.batch_file))
+    if mode != PACK_MODE_STEPS:
+        return directives
+    scaled = [scheduler.scale_walltime_directive(directive, len(requests)) for directive in directives]
+    if all(directive is None for directive in scaled):
+        return None
+    return [directive if scaled_directive is None else scaled_directive
+            for (directive, scaled_directive) in zip(directives, scaled)]
+
+def _read_pack_directives(scheduler, batch_script_path):
+    """Returns the directive lines of the batch script, except those of scheduler.PER_TEST_DIRECTIVE_OPTIONS."""
+    directives = []
+    with open(batch_script_path, 'r') as file_obj:
+        for line in file_obj:
+            words = line.split()
+            if not words or words[0] != scheduler.DIRECTIVE_PREFIX:
+                continue
+            option = words[1].split('=')[0] if len(words) > 1 else ''
+            if option not in scheduler.PER_TEST_DIRECTIVE_OPTIONS:
+                directives.append(line.rstrip('\n'))
+    return directives
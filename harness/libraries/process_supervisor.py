@@ -0,0 +1,247 @@
+#! /usr/bin/env python3
+"""Runs the build and check commands of the tests under supervision.
+
+A supervised command runs in its own process group, with its output read
+from pipes and copied to its output files, and optionally to a live tail.
+If the command runs past its wall-clock limit, its process group is sent
+SIGTERM, then SIGKILL after a grace period, so a hung command does not block
+the harness. The command is reaped with wait4, which gives the CPU time and
+maximum resident set size of the command and of the processes it waited on.
+
+The supervision is tuned with the following environment variables:
+
+    RGT_BUILD_TIMEOUT     Wall-clock limit of the build command, in seconds
+                          (default: none).
+    RGT_CHECK_TIMEOUT     Wall-clock limit of the check command, in seconds
+                          (default: none).
+    RGT_KILL_GRACE        Seconds between SIGTERM and SIGKILL after a timeout
+                          (default: 10).
+    RGT_LIVE_OUTPUT       If 1, the output of the commands is also written to
+                          the standard output of the harness, each line
+                          prefixed with the name of the command (default: 0).
+"""
+
+# Python imports
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import time
+
+DEFAULT_KILL_GRACE = 10.0
+
+# The time to read the output left in the pipes by background processes of an exited command.
+_DRAIN_SECONDS = 1.0
+
+_READ_SIZE = 65536
+
+class ProcessResult:
+    """The exit status and resource usage of a supervised command."""
+
+    def __init__(self, exit_status, elapsed_seconds, rusage, timed_out):
+        self.exit_status = exit_status
+        """int: The exit status of the command, or -N if it was killed by signal N."""
+
+        self.elapsed_seconds = elapsed_seconds
+        """float: The wall-clock duration of the command."""
+
+        self.user_cpu_seconds = rusage.ru_utime if rusage else 0.0
+        """float: The user CPU time of the command and the processes it waited on."""
+
+        self.system_cpu_seconds = rusage.ru_stime if rusage else 0.0
+        """float: The system CPU time of the command and the processes it waited on."""
+
+        self.max_rss_kb = rusage.ru_maxrss if rusage else 0
+        """int: The maximum resident set size, in kilobytes, of the command or a process it waited on."""
+
+        self.timed_out = timed_out
+        """bool: True if the command was killed for running past its wall-clock limit."""
+
+    def __str__(self):
+        return self.event_value
+
+    @property
+    def event_value(self):
+        """str: The result as a status file event value."""
+        return (f"exit_status={self.exit_status},elapsed_s={self.elapsed_seconds:.3f},"
+                f"user_cpu_s={self.user_cpu_seconds:.3f},system_cpu_s={self.system_cpu_seconds:.3f},"
+                f"max_rss_kb={self.max_rss_kb},timed_out={int(self.timed_out)}")
+
+def get_timeout(action):
+    """Returns the wall-clock limit in seconds of the command of action 'build' or 'check', or None."""
+    value = os.getenv(f'RGT_{action.upper()}_TIMEOUT', '')
+    if value.strip() in ('', '0'):
+        return None
+    timeout = float(value)
+    if timeout < 0:
+        raise ValueError(f"RGT_{action.upper()}_TIMEOUT={value} must not be negative.")
+    return timeout
+
+def get_live_output():
+    """Returns the stream of the live tail of the commands, or None, from RGT_LIVE_OUTPUT."""
+    return sys.stdout if os.getenv('RGT_LIVE_OUTPUT', '0') == '1' else None
+
+def run_supervised(command, stdout_path, stderr_path=None, env=None, cwd=None,
+                   timeout=None, live_output=None, name=None, kill_grace=None):
+    """Runs the shell command and returns its ProcessResult.
+
+    Parameters
+    ----------
+    command : str
+        The shell command.
+
+    stdout_path : str
+        The file of the standard output of the command. The standard error is
+        also written to it, unless stderr_path is given.
+
+    stderr_path : str
+        The file of the standard error of the command.
+
+    env : dict
+        The environment of the command. The default is the environment of the harness.
+
+    cwd : str
+        The working directory of the command.
+
+    timeout : float
+        The wall-clock limit of the command in seconds, or None for no limit.
+
+    live_output : file object
+        A text stream to which the output is also written, or None.
+
+    name : str
+        The name prefixed to the lines of the live output. The default is the command.
+
+    kill_grace : float
+        The seconds between SIGTERM and SIGKILL after a timeout. The default is
+        set by RGT_KILL_GRACE.
+    """
+    if kill_grace is None:
+        kill_grace = float(os.getenv('RGT_KILL_GRACE', DEFAULT_KILL_GRACE))
+    prefix = f"[{name or command}] "
+
+    with open(stdout_path, 'wb') as stdout_obj, \
+         open(stderr_path if stderr_path else os.devnull, 'wb') as stderr_obj:
+        start_time = time.monotonic()
+        process = subprocess.Popen(command, shell=True, env=env, cwd=cwd,
+                                   stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE if stderr_path else subprocess.STDOUT,
+                                   start_new_session=True)
+
+        streams = {process.stdout : _Tee(stdout_obj, live_output, prefix)}
+        if stderr_path:
+            streams[process.stderr] = _Tee(stderr_obj, live_output, prefix)
+
+        deadline = start_time + timeout if timeout is not None else None
+        kill_time = None
+        timed_out = False
+        wait_status = None
+        rusage = None
+        exited_at = None
+
+        selector = selectors.DefaultSelector()
+        for pipe in streams:
+            os.set_blocking(pipe.fileno(), False)
+            selector.register(pipe, selectors.EVENT_READ)
+        try:
+            while True:
+                if wait_status is None:
+                    (pid, status, usage) = os.wait4(process.pid, os.WNOHANG)
+                    if pid == process.pid:
+                        (wait_status, rusage) = (status, usage)
+                        exited_at = time.monotonic()
+
+                now = time.monotonic()
+                if not selector.get_map():
+                    if wait_status is not None:
+                        break
+                elif exited_at is not None and now - exited_at > _DRAIN_SECONDS:
+                    # Background processes of the command hold the pipes open.
+                    break
+
+                if not timed_out and wait_status is None and deadline is not None and now >= deadline:
+                    timed_out = True
+                    _kill_process_group(process.pid, signal.SIGTERM)
+                    kill_time = now + kill_grace
+                elif kill_time is not None and now >= kill_time:
+                    _kill_process_group(process.pid, signal.SIGKILL)
+                    kill_time = None
+
+                if selector.get_map():
+                    for (key, events) in selector.select(timeout=0.1):
+                        data = os.read(key.fd, _READ_SIZE)
+                        if data:
+                            streams[key.fileobj].write(data)
+                        else:
+                            selector.unregister(key.fileobj)
+                else:
+                    time.sleep(0.05)
+        finally:
+            selector.close()
+            for (pipe, tee) in streams.items():
+                tee.flush()
+                pipe.close()
+            if wait_status is None:
+                _kill_process_group(process.pid, signal.SIGKILL)
+                (pid, wait_status, rusage) = os.wait4(process.pid, 0)
+                exited_at = time.monotonic()
+            elif kill_time is not None:
+                # The command exited on SIGTERM, but the processes it started may ignore it.
+                _kill_process_group_at(process.pid, kill_time)
+
+        process.returncode = _exit_status(wait_status)
+
+    return ProcessResult(process.returncode, exited_at - start_time, rusage, timed_out)
+
+class _Tee:
+    """Writes the output of a pipe to a file and to the live output."""
+
+    def __init__(self, file_obj, live_output, prefix):
+        self.__file_obj = file_obj
+        self.__live_output = live_output
+        self.__prefix = prefix
+        self.__partial_line = b''
+
+    def write(self, data):
+        self.__file_obj.write(data)
+        if self.__live_output is None:
+            return
+        lines = (self.__partial_line + data).split(b'\n')
+        self.__partial_line = lines.pop()
+        for line in lines:
+            self.__write_line(line)
+        self.__live_output.flush()
+
+    def flush(self):
+        self.__file_obj.flush()
+        if self.__live_output is not None and self.__partial_line:
+            self.__write_line(self.__partial_line)
+            self.__partial_line = b''
+            self.__live_output.flush()
+
+    def __write_line(self, line):
+        self.__live_output.write(self.__prefix + line.decode(errors='replace') + '\n')
+
+def _kill_process_group(pid, signum):
+    try:
+        os.killpg(pid, signum)
+    except ProcessLookupError:
+        pass
+
+def _kill_process_group_at(pid, kill_time):
+    """Kills the process group with SIGKILL at kill_time, unless it is gone before."""
+    while time.monotonic() < kill_time:
+        try:
+            os.killpg(pid, 0)
+        except ProcessLookupError:
+            return
+        time.sleep(0.05)
+    _kill_process_group(pid, signal.SIGKILL)
+
+def _exit_status(wait_status):
+    """Returns the exit status of a wait status, like subprocess.Popen.returncode."""
+    if os.WIFSIGNALED(wait_status):
+        return -os.WTERMSIG(wait_status)
+    return os.WEXITSTATUS(wait_status)
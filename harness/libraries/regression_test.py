@@ -5,16 +5,27 @@
 import collections
 import concurrent.futures
 import datetime
+import functools
 import getpass
 import os
+import threading
 import time
 
 # Harness package imports.
 from libraries import apptest
+from libraries.driver_pool import shutdown_driver_pool
+from libraries.influx_bulk_logger import InfluxBulkLogger, bulk_influx_log_enabled
+from libraries import packed_submission
+from libraries.layout_of_apps_directory import get_layout_from_scriptdir
+from libraries.status_file import StatusFile
+from libraries.status_file_factory import StatusFileFactory
 from libraries.subtest_factory import SubtestFactory
+from libraries.task_dag import TaskDAG, TaskResult
+from libraries import rgt_utilities
 from fundamental_types.rgt_state import RgtState
 from libraries.rgt_loggers import rgt_logger_factory
 from machine_types.machine_factory import MachineFactory
+from machine_types.scheduler_factory import SchedulerFactory
 
 #
 # Author: Arnold Tharrington (arnoldt@ornl.gov)
@@ -35,6 +46,23 @@ class Harness:
     # Defines the harness log file name.
     LOGGER_NAME = __name__
 
+    # These strings define the units of work of the thread pool. With
+    # 'app', the subtests of an application are done one after another
+    # by one worker. With 'test', every subtest is its own unit of work.
+    # With 'dag', the checkout of an application and the build, submit and
+    # remaining tasks of every subtest are the units of work, each started
+    # as soon as the units it depends on are done.
+    SCHEDULE_APP = "app"
+    SCHEDULE_TEST = "test"
+    SCHEDULE_DAG = "dag"
+    SCHEDULES = (SCHEDULE_APP, SCHEDULE_TEST, SCHEDULE_DAG)
+
+    # The resource pools of the 'dag' schedule.
+    POOL_CHECKOUT = "checkout"
+    POOL_BUILD = "build"
+    POOL_SUBMIT = "submit"
+    POOL_TASKS = "tasks"
+
     #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     #                                                                 @
     # Special methods                                                 @
@@ -47,7 +75,10 @@ class Harness:
                  log_level,
                  stdout_stderr,
                  use_fireworks,
-                 separate_build_stdio):
+                 separate_build_stdio,
+                 num_workers=1,
+                 schedule=SCHEDULE_APP,
+                 max_tests_per_app=0):
         self.__config = config
         self.__tests = rgt_input_file.get_tests()
         self.__tasks = rgt_input_file.get_harness_tasks()
@@ -57,7 +88,9 @@ class Harness:
         self.__log_level = log_level
         self.__myLogger = None
         self.__stdout_stderr = stdout_stderr
-        self.__num_workers = 1
+        self.__num_workers = num_workers
+        self.__schedule = schedule
+        self.__max_tests_per_app = max_tests_per_app
         self.__use_fireworks = use_fireworks
         self.__separate_build_stdio = separate_build_stdio
         self.__formAppTests()
@@ -133,15 +166,51 @@ class Harness:
         # Mark status as tasks not completed.
         self.__returnState = RgtState.ALL_TASKS_NOT_COMPLETED
 
+        # The test_harness_driver processes of this run share the environments
+        # set by runtime environment files, see libraries.rte_cache.
+        if os.getenv('RGT_RTE_CACHE', '1') != '0' and not os.getenv('RGT_RTE_CACHE_DIR'):
+            os.environ['RGT_RTE_CACHE_DIR'] = os.path.abspath("harness_log_files" + "." + self.__timestamp + "/rte_cache")
+
+        # The test_harness_driver processes of this run share the rate limit
+        # of their submissions, see libraries.submission_pipeline.
+        if os.getenv('RGT_SUBMIT_RATE') and not os.getenv('RGT_SUBMIT_RATE_FILE'):
+            os.environ['RGT_SUBMIT_RATE_FILE'] = os.path.abspath("harness_log_files" + "." + self.__timestamp + "/submit_rate.json")
+
+        # With RGT_PACKED_SUBMIT, the test_harness_driver processes of this run
+        # queue their batch scripts, which are submitted in packed jobs once
+        # all tests are launched, see libraries.packed_submission.
+        if packed_submission.get_pack_mode() and not os.getenv('RGT_PACK_DIR'):
+            os.environ['RGT_PACK_DIR'] = os.path.abspath("harness_log_files" + "." + self.__timestamp + "/packed_submissions")
+
         # Form a collection of applications with their subtests.
         self.__app_subtests = self.__formCollectionOfTests()
 
+        # With RGT_INFLUX_BULK=1, the influx_log task is done for all subtests at once.
+        bulk_influx_log = (not self.__use_fireworks and Harness.influx_log in self.__tasks
+                           and bulk_influx_log_enabled())
+        if bulk_influx_log:
+            self.__tasks = [task for task in self.__tasks if task != Harness.influx_log]
+
         # Run subtests
         if self.__use_fireworks:
             self.__run_fireworks()
-        else:
+        elif self.__tasks and self.__schedule == Harness.SCHEDULE_TEST:
+            self.__run_subtests_per_test()
+        elif self.__tasks and self.__schedule == Harness.SCHEDULE_DAG:
+            self.__run_subtests_dag()
+        elif self.__tasks:
             self.__run_subtests_asynchronously()
 
+        # Stop the test_harness_driver workers of RGT_DRIVER_BACKEND=process_pool.
+        shutdown_driver_pool()
+
+        pack_dir = packed_submission.get_pack_dir()
+        if pack_dir and os.path.isdir(pack_dir):
+            self.__submit_packed_tests(pack_dir)
+
+        if bulk_influx_log:
+            self.__run_bulk_influx_log()
+
         # If we get to this point mark all task as completed.
         self.__returnState = RgtState.ALL_TASKS_COMPLETED
 
@@ -160,25 +229,26 @@ class Harness:
         timeout : float
             The maximum time to wait in minutes for the subtest cycle to complete.
         """
-        future_to_appname = {}
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.__num_workers) as executor:
-            for appname in self.__app_subtests.keys():
-                future = executor.submit(apptest.wait_for_jobs_to_complete_in_queue,
-                                         self.__config,
-                                         self.__app_subtests[appname],
-                                         timeout)
+        # The subtests of all applications are waited on at once.
+        app_test_list = [stest for appname in self.__app_subtests.keys() for stest in self.__app_subtests[appname]]
+        try:
+            incomplete_tests = apptest.wait_for_jobs_to_complete_in_queue(self.__config,
+                                                                          app_test_list,
+                                                                          timeout)
+        except Exception as err:
+            message = "Exception while waiting for jobs in the queue:\n{}".format(err)
+            self.__myLogger.doCriticalLogging(message)
+            return
 
-                future_to_appname[future] = appname
-
-            for my_future in concurrent.futures.as_completed(future_to_appname):
-                appname = future_to_appname[my_future]
-                my_future_exception = my_future.exception()
-                if my_future_exception:
-                    message = "Application {} future for queue exception:\n{}".format(appname, my_future_exception)
-                    self.__myLogger.doCriticalLogging(message)
-                else:
-                    message = "Application {} future for queue is completed.".format(appname)
-                    self.__myLogger.doInfoLogging(message)
+        for appname in self.__app_subtests.keys():
+            incomplete_names = [stest.getNameOfSubtest() for stest in incomplete_tests
+                                if stest.getNameOfApplication() == appname]
+            if incomplete_names:
+                message = "Application {} tests {} did not complete in the queue within {} minutes.".format(appname, incomplete_names, timeout)
+                self.__myLogger.doWarningLogging(message)
+            else:
+                message = "Application {} jobs are completed in the queue.".format(appname)
+                self.__myLogger.doInfoLogging(message)
         return
 
     def didAllTestsPass(self):
@@ -302,6 +372,174 @@ class Harness:
 
         return
 
+    def __run_subtests_per_test(self):
+        # The checkout of the tests of one application shares a repository.
+        checkout_locks = {appname : threading.Lock() for appname in self.__app_subtests.keys()}
+
+        def do_tasks(subtest):
+            return apptest.do_subtest_tasks(self.__launch_id,
+                                            subtest,
+                                            self.__tasks,
+                                            self.__stdout_stderr,
+                                            self.__separate_build_stdio,
+                                            test_checkout_lock=checkout_locks[subtest.getNameOfApplication()])
+
+        for (subtest, my_future) in dispatch_subtests(self.__app_subtests, do_tasks,
+                                                      self.__num_workers, self.__max_tests_per_app):
+            name = f"{subtest.getNameOfApplication()}.{subtest.getNameOfSubtest()}"
+
+            # Check if an exception has been raised
+            my_future_exception = my_future.exception()
+            if my_future_exception:
+                message = "Test {} future exception:\n{}".format(name, my_future_exception)
+                self.__myLogger.doCriticalLogging(message)
+                self.__failed_tests += 1
+                self.__failed_test_list.append(name)
+                continue
+
+            message = "Test {} future is completed.".format(name)
+            self.__myLogger.doInfoLogging(message)
+
+            subtest_result = my_future.result()
+            self.__launched_tests += subtest_result[0]
+            self.__failed_tests += subtest_result[1]
+            self.__failed_test_list.extend(subtest_result[2])
+
+        message = "All tests completed futures."
+        self.__myLogger.doInfoLogging(message)
+        # For the moment, hard-code this as a print statement.
+        print(f"Launched {self.__launched_tests} tests, failed to launch {self.__failed_tests} tests.")
+        if self.__failed_tests:
+            print("Failed tests:")
+            for t in self.__failed_test_list:
+                print(f"\t{t}")
+
+        return
+
+    def __run_subtests_dag(self):
+        dag = TaskDAG({Harness.POOL_CHECKOUT : self.__num_workers,
+                       Harness.POOL_BUILD : int(os.getenv('RGT_BUILD_WORKERS', self.__num_workers)),
+                       Harness.POOL_SUBMIT : int(os.getenv('RGT_SUBMIT_WORKERS', self.__num_workers)),
+                       Harness.POOL_TASKS : self.__num_workers})
+        tasks = apptest.subtest.reorderTaskList(self.__tasks)
+        other_tasks = [task for task in tasks if task not in (Harness.checkout, Harness.starttest)]
+
+        # The keys of the DAG tasks of every subtest, to find whether it was launched.
+        subtest_keys = []
+        for (appname, subtests) in self.__app_subtests.items():
+            # The tests of an application share a repository, which is checked out once.
+            checkout_key = None
+            if Harness.checkout in tasks:
+                checkout_key = (appname, Harness.checkout)
+                dag.add_task(checkout_key,
+                             functools.partial(subtests[0].doTasks, launchid=self.__launch_id,
+                                               tasks=[Harness.checkout], stdout_stderr=self.__stdout_stderr),
+                             Harness.POOL_CHECKOUT)
+
+            for subtest in subtests:
+                name = f"{appname}.{subtest.getNameOfSubtest()}"
+                keys = []
+                last_key = checkout_key
+                if Harness.starttest in tasks:
+                    # Every test is built on its own, in the build directory of
+                    # its instance, with its own Scripts, build command and
+                    # [EnvVars]. Identical builds are shared through the build
+                    # cache (RGT_BUILD_CACHE_DIR) rather than by build tasks.
+                    unique_id = rgt_utilities.unique_harness_id()
+                    keys.append((name, "build"))
+                    dag.add_task(keys[-1],
+                                 functools.partial(apptest.do_subtest_build, self.__launch_id, subtest,
+                                                   unique_id, self.__stdout_stderr, self.__separate_build_stdio),
+                                 Harness.POOL_BUILD,
+                                 dependencies=[last_key] if last_key else [])
+                    keys.append((name, "submit"))
+                    dag.add_task(keys[-1],
+                                 functools.partial(apptest.do_subtest_submit, self.__launch_id, subtest,
+                                                   unique_id, self.__stdout_stderr),
+                                 Harness.POOL_SUBMIT,
+                                 dependencies=[keys[-2]])
+                    last_key = keys[-1]
+                if other_tasks:
+                    keys.append((name, "tasks"))
+                    dag.add_task(keys[-1],
+                                 functools.partial(subtest.doTasks, launchid=self.__launch_id,
+                                                   tasks=other_tasks, stdout_stderr=self.__stdout_stderr),
+                                 Harness.POOL_TASKS,
+                                 dependencies=[last_key] if last_key else [])
+                if checkout_key:
+                    keys.insert(0, checkout_key)
+                subtest_keys.append((name, keys))
+
+        results = dag.run()
+        for (key, result) in results.items():
+            if result.status != TaskResult.SUCCEEDED:
+                message = "Task {} {}.".format(key, result.status)
+                if result.error:
+                    message += "\n{}".format(result.error)
+                self.__myLogger.doCriticalLogging(message)
+
+        for (name, keys) in subtest_keys:
+            if all(results[key].status == TaskResult.SUCCEEDED for key in keys):
+                self.__launched_tests += 1
+            else:
+                self.__failed_tests += 1
+                self.__failed_test_list.append(name)
+
+        message = "All tasks of the task graph are completed."
+        self.__myLogger.doInfoLogging(message)
+        # For the moment, hard-code this as a print statement.
+        print(f"Launched {self.__launched_tests} tests, failed to launch {self.__failed_tests} tests.")
+        if self.__failed_tests:
+            print("Failed tests:")
+            for t in self.__failed_test_list:
+                print(f"\t{t}")
+
+        return
+
+    def __submit_packed_tests(self, pack_dir):
+        message = f"Start of the packed submission of the batch scripts queued in {pack_dir}."
+        self.__myLogger.doInfoLogging(message)
+        failed = packed_submission.submit_packed_requests(pack_dir,
+                                                          SchedulerFactory.create_scheduler,
+                                                          self.__record_packed_submission,
+                                                          logger=self.__myLogger)
+        if failed:
+            print(f"Failed to submit {failed} tests in packed jobs.")
+        message = "End of the packed submission."
+        self.__myLogger.doInfoLogging(message)
+
+    def __record_packed_submission(self, request, exit_status, job_id):
+        """Writes the job id file and logs the submit_end and job_queued events of a packed test."""
+        # The status file of a test is written from its Scripts directory.
+        currentdir = os.getcwd()
+        os.chdir(request.scripts_dir)
+        try:
+            (apps_root, app, test) = get_layout_from_scriptdir(request.scripts_dir)
+            test_instance = SubtestFactory.make_subtest(name_of_application=app,
+                                                        name_of_subtest=test,
+                                                        local_path_to_tests=apps_root,
+                                                        logger=self.__myLogger,
+                                                        tag=request.unique_id)
+            jstatus = StatusFileFactory.create(path_to_status_file=test_instance.get_path_to_status_file(),
+                                               logger=self.__myLogger)
+            jstatus.initialize_subtest(None, request.unique_id)
+            if exit_status == 0:
+                with open(test_instance.get_path_to_job_id_file(), "w") as fileobj:
+                    fileobj.write("%20s\n" % job_id)
+            jstatus.log_event(StatusFile.EVENT_SUBMIT_END, exit_status)
+            if exit_status == 0:
+                jstatus.log_event(StatusFile.EVENT_JOB_QUEUED, job_id)
+        finally:
+            os.chdir(currentdir)
+
+    def __run_bulk_influx_log(self):
+        subtests = [subtest for appname in self.__app_subtests.keys() for subtest in self.__app_subtests[appname]]
+        message = f"Start of bulk influx_log for {len(subtests)} tests."
+        self.__myLogger.doInfoLogging(message)
+        InfluxBulkLogger(subtests, self.__myLogger).run()
+        message = "End of bulk influx_log."
+        self.__myLogger.doInfoLogging(message)
+
     def __run_fireworks(self):
         from fireworks import Firework, Workflow, LaunchPad, ScriptTask
 
@@ -393,3 +631,60 @@ class Harness:
     #                                                                 @
     #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
 
+
+def dispatch_subtests(app_subtests, work, num_workers, max_tests_per_app=0):
+    """Runs work(subtest) for every subtest on a thread pool.
+
+    Subtests are started in input-file order, but an application that
+    already has max_tests_per_app subtests running is skipped until one of
+    them finishes, so no worker waits on the cap while other applications
+    have work.
+
+    Parameters
+    ----------
+    app_subtests : dict
+        The list of subtests of each application.
+
+    work : function
+        Called with one subtest on a worker thread.
+
+    num_workers : int
+        The number of worker threads.
+
+    max_tests_per_app : int
+        The maximum number of running subtests per application. 0 is no limit.
+
+    Yields
+    ------
+    tuple
+        (subtest, future) for every subtest, as its work completes.
+    """
+    waiting = collections.OrderedDict((appname, collections.deque(subtests))
+                                      for (appname, subtests) in app_subtests.items() if subtests)
+    running = {appname : 0 for appname in waiting.keys()}
+    future_to_subtest = {}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, num_workers)) as executor:
+        while waiting or future_to_subtest:
+            # Fill the free workers, taking one subtest per application in turn.
+            submitted = True
+            while submitted and len(future_to_subtest) < max(1, num_workers):
+                submitted = False
+                for appname in list(waiting.keys()):
+                    if len(future_to_subtest) >= max(1, num_workers):
+                        break
+                    if max_tests_per_app > 0 and running[appname] >= max_tests_per_app:
+                        continue
+                    subtest = waiting[appname].popleft()
+                    if not waiting[appname]:
+                        del waiting[appname]
+                    running[appname] += 1
+                    future_to_subtest[executor.submit(work, subtest)] = subtest
+                    submitted = True
+
+            (done, not_done) = concurrent.futures.wait(future_to_subtest.keys(),
+                                                       return_when=concurrent.futures.FIRST_COMPLETED)
+            for my_future in done:
+                subtest = future_to_subtest.pop(my_future)
+                running[subtest.getNameOfApplication()] -= 1
+                yield (subtest, my_future)
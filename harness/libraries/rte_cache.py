@@ -0,0 +1,170 @@
+#! /usr/bin/env python3
+"""A cache of the environments set by runtime environment files.
+
+linux_utilities.get_new_environment sources the build, submit or check
+runtime environment file of a test in bash, which usually runs module load
+commands that take seconds. The cache keeps the changes a runtime environment
+file made to the environment, keyed by
+
+    * the contents and name of the runtime environment file, and
+    * the environment it was sourced in, without the variables that differ
+      between test instances, like TEST_BUILD_DIR.
+
+The paths of the test instance are replaced by placeholders in the cached
+changes and put back when they are applied, so tests sharing a runtime
+environment file pay its cost once. The cache is kept in memory, and in
+RGT_RTE_CACHE_DIR if it is set, which the harness does for each of its runs.
+It is disabled with RGT_RTE_CACHE=0.
+
+Files sourced by the runtime environment file are not part of the key, so a
+change to them is only seen by a new harness run.
+"""
+
+# Python imports
+import hashlib
+import json
+import os
+import threading
+
+# Environment variables set by the shell sourcing the runtime environment file.
+SHELL_ENVIRONMENT_VARIABLES = ('PWD', 'OLDPWD', 'SHLVL', '_')
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+def get_rte_cache():
+    """Returns the cache of runtime environments of this process, or None if it is disabled."""
+    if os.getenv('RGT_RTE_CACHE', '1') == '0':
+        return None
+    cache_dir = os.getenv('RGT_RTE_CACHE_DIR') or None
+    with _caches_lock:
+        if cache_dir not in _caches:
+            _caches[cache_dir] = RteCache(cache_dir)
+        return _caches[cache_dir]
+
+class RteCache:
+    """The changes made to the environment by runtime environment files, in memory and on disk."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, cache_dir=None):
+        self.__cache_dir = cache_dir
+        self.__changes = {}
+        self.__lock = threading.Lock()
+
+    ##################
+    # Public methods #
+    ##################
+
+    @staticmethod
+    def make_key(rte_file, working_directory, parent_environment, instance_paths):
+        """Returns the key of sourcing rte_file in working_directory with parent_environment.
+
+        Parameters
+        ----------
+        rte_file : str
+            The runtime environment file, as given to the bash source command.
+
+        working_directory : str
+            The directory in which the file is sourced.
+
+        parent_environment : dict
+            The environment in which the file is sourced.
+
+        instance_paths : dict
+            The paths of the test instance by name, e.g. {'TEST_BUILD_DIR' : path}.
+            These variables are left out of the key, and the paths are replaced
+            by placeholders in the other variables.
+        """
+        digest = hashlib.sha256()
+        digest.update(f'rte_file\0{rte_file}\0'.encode())
+        path = os.path.join(working_directory, os.path.expandvars(os.path.expanduser(rte_file)))
+        if os.path.isfile(path):
+            with open(path, 'rb') as file_obj:
+                digest.update(hashlib.sha256(file_obj.read()).digest())
+        else:
+            digest.update(b'no file\0')
+
+        environment = RteCache.__normalize(parent_environment, instance_paths)
+        for name in sorted(environment):
+            if name in instance_paths or name in SHELL_ENVIRONMENT_VARIABLES:
+                continue
+            digest.update(f'{name}={environment[name]}\0'.encode())
+        return digest.hexdigest()
+
+    def lookup(self, key, parent_environment, instance_paths):
+        """Returns the environment of key applied to parent_environment, or None if key is not cached."""
+        with self.__lock:
+            changes = self.__changes.get(key)
+        if changes is None:
+            changes = self.__read(key)
+            if changes is None:
+                return None
+            with self.__lock:
+                self.__changes[key] = changes
+
+        environment = dict(parent_environment)
+        for name in changes['unset']:
+            environment.pop(name, None)
+        for (name, value) in changes['set'].items():
+            for (path_name, path) in instance_paths.items():
+                if path:
+                    value = value.replace(RteCache.__placeholder(path_name), path)
+            environment[name] = value
+        return environment
+
+    def store(self, key, parent_environment, new_environment, instance_paths):
+        """Stores the changes from parent_environment to new_environment as key."""
+        parent = RteCache.__normalize(parent_environment, instance_paths)
+        new = RteCache.__normalize(new_environment, instance_paths)
+        changes = {'set' : {name : value for (name, value) in new.items() if parent.get(name) != value},
+                   'unset' : sorted(name for name in parent if name not in new)}
+        with self.__lock:
+            self.__changes[key] = changes
+        self.__write(key, changes)
+        return
+
+    ###################
+    # Private methods #
+    ###################
+
+    @staticmethod
+    def __placeholder(path_name):
+        return f'@{{{path_name}}}@'
+
+    @staticmethod
+    def __normalize(environment, instance_paths):
+        # Longer paths first, so a path is not replaced in part by one of its parents.
+        paths = sorted(((name, path) for (name, path) in instance_paths.items() if path),
+                       key=lambda item: len(item[1]), reverse=True)
+        normalized = {}
+        for (name, value) in environment.items():
+            for (path_name, path) in paths:
+                value = value.replace(path, RteCache.__placeholder(path_name))
+            normalized[name] = value
+        return normalized
+
+    def __path_of(self, key):
+        return os.path.join(self.__cache_dir, key + '.json')
+
+    def __read(self, key):
+        if not self.__cache_dir:
+            return None
+        try:
+            with open(self.__path_of(key)) as file_obj:
+                return json.load(file_obj)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def __write(self, key, changes):
+        if not self.__cache_dir:
+            return
+        os.makedirs(self.__cache_dir, exist_ok=True)
+        path = self.__path_of(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as file_obj:
+            json.dump(changes, file_obj)
+        os.replace(tmp_path, path)
+        return
@@ -0,0 +1,275 @@
+#! /usr/bin/env python3
+"""Strategies to populate the build directory of a test instance with the application source.
+
+The strategy is selected with RGT_SOURCE_COPY_STRATEGY:
+
+    copy          A full copy of every file (the default).
+    parallel      A full copy, with the files copied by several threads.
+    reflink       Every file is cloned with the FICLONE ioctl, so it shares its
+                  blocks with the source until either is written. Files are
+                  copied on file systems without reflinks.
+    hardlink      Every file is a hard link to the source file, except the
+                  files matching RGT_SOURCE_COPY_PATTERNS, e.g. files rewritten
+                  by configure, which are copied. The build must not modify the
+                  linked files in place, since that modifies the source. Without
+                  RGT_SOURCE_COPY_PATTERNS, no file is known to be safe to link,
+                  so the files are cloned like with reflink instead.
+    incremental   The build directory of the previous instance of the test is
+                  copied, then every source file whose size or modification
+                  time differs is copied again, like rsync. The objects of the
+                  previous build are kept, so make only rebuilds what changed.
+
+The copy is tuned with the following environment variables:
+
+    RGT_SOURCE_COPY_WORKERS    Number of threads copying files (default: 8 for
+                               parallel, 1 for the other strategies).
+    RGT_SOURCE_COPY_PATTERNS   Comma separated glob patterns of the files that
+                               the hardlink strategy copies. The hardlink
+                               strategy only links files if it is set.
+"""
+
+# Python imports
+import concurrent.futures
+import errno
+import fcntl
+import fnmatch
+import os
+import shutil
+import threading
+import time
+
+STRATEGY_COPY = 'copy'
+STRATEGY_PARALLEL = 'parallel'
+STRATEGY_REFLINK = 'reflink'
+STRATEGY_HARDLINK = 'hardlink'
+STRATEGY_INCREMENTAL = 'incremental'
+STRATEGIES = (STRATEGY_COPY, STRATEGY_PARALLEL, STRATEGY_REFLINK, STRATEGY_HARDLINK, STRATEGY_INCREMENTAL)
+
+DEFAULT_PARALLEL_WORKERS = 8
+
+# From linux/fs.h: _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# The errors of FICLONE and link() on file systems, or pairs of file systems, that do not support them.
+_UNSUPPORTED_ERRNOS = (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM, errno.EMLINK)
+
+class CopyStatistics:
+    """The timing and amounts of a copy of a source tree."""
+
+    def __init__(self, strategy):
+        self.strategy = strategy
+        """str: The strategy used for the copy."""
+
+        self.files = 0
+        """int: The number of files copied, cloned or linked."""
+
+        self.skipped_files = 0
+        """int: The number of files already up to date, with the incremental strategy."""
+
+        self.bytes = 0
+        """int: The size of the files copied, cloned or linked."""
+
+        self.fallback_files = 0
+        """int: The number of files copied because they could not be cloned or linked."""
+
+        self.seconds = 0.0
+        """float: The duration of the copy."""
+
+        self.__lock = threading.Lock()
+
+    def __str__(self):
+        message = (f"strategy={self.strategy} files={self.files} bytes={self.bytes} "
+                   f"seconds={self.seconds:.3f}")
+        if self.fallback_files:
+            message += f" fallback_files={self.fallback_files}"
+        if self.skipped_files:
+            message += f" skipped_files={self.skipped_files}"
+        return message
+
+    def add_file(self, size, fallback=False):
+        with self.__lock:
+            self.files += 1
+            self.bytes += size
+            if fallback:
+                self.fallback_files += 1
+
+    def add_skipped_file(self):
+        with self.__lock:
+            self.skipped_files += 1
+
+def get_copy_strategy():
+    """Returns the strategy to populate build directories, from RGT_SOURCE_COPY_STRATEGY."""
+    strategy = os.getenv('RGT_SOURCE_COPY_STRATEGY', STRATEGY_COPY)
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown source copy strategy RGT_SOURCE_COPY_STRATEGY={strategy}. "
+                         f"Valid strategies are {list(STRATEGIES)}.")
+    return strategy
+
+def find_previous_build_directory(build_dir):
+    """Returns the most recent build directory of another instance of the same test, or None.
+
+    The build directories of the instances of a test are
+    <workspace>/<app>/<test>/<test id>/<build dirname>.
+    """
+    (instance_dir, build_dirname) = os.path.split(os.path.normpath(build_dir))
+    (test_dir, test_id) = os.path.split(instance_dir)
+    candidates = []
+    try:
+        with os.scandir(test_dir) as it:
+            for entry in it:
+                if entry.name == test_id:
+                    continue
+                candidate = os.path.join(entry.path, build_dirname)
+                if os.path.isdir(candidate) and not os.path.islink(candidate):
+                    candidates.append((os.stat(candidate).st_mtime_ns, candidate))
+    except FileNotFoundError:
+        return None
+    return max(candidates)[1] if candidates else None
+
+def copy_source_tree(src, dst, strategy=None, workers=None, previous_dst=None):
+    """Copies the directory src to the new directory dst. Returns the CopyStatistics of the copy.
+
+    Symbolic links are copied as links, like shutil.copytree(symlinks=True).
+
+    Parameters
+    ----------
+    strategy : str
+        One of STRATEGIES. The default is get_copy_strategy().
+
+    workers : int
+        The number of threads copying files. The default is set by RGT_SOURCE_COPY_WORKERS.
+
+    previous_dst : str
+        With the incremental strategy, the build directory to update from.
+        The default is find_previous_build_directory(dst). If there is none, the
+        source is copied in full.
+    """
+    if strategy is None:
+        strategy = get_copy_strategy()
+    if workers is None:
+        default_workers = DEFAULT_PARALLEL_WORKERS if strategy == STRATEGY_PARALLEL else 1
+        workers = int(os.getenv('RGT_SOURCE_COPY_WORKERS', default_workers))
+
+    statistics = CopyStatistics(strategy)
+    start_time = time.monotonic()
+
+    if strategy == STRATEGY_INCREMENTAL:
+        if previous_dst is None:
+            previous_dst = find_previous_build_directory(dst)
+        if previous_dst is None:
+            _copy_tree(src, dst, _Copier(statistics).copy, workers)
+        else:
+            # Not counted: the statistics are those of the update from the source.
+            _copy_tree(previous_dst, dst, _Copier(CopyStatistics(strategy), reflink=True).copy, workers)
+            _copy_tree(src, dst, _Copier(statistics).update, workers, exist_ok=True)
+    elif strategy == STRATEGY_REFLINK:
+        _copy_tree(src, dst, _Copier(statistics, reflink=True).copy, workers)
+    elif strategy == STRATEGY_HARDLINK:
+        patterns = [pattern.strip() for pattern in os.getenv('RGT_SOURCE_COPY_PATTERNS', '').split(',')
+                    if pattern.strip()]
+        if patterns:
+            _copy_tree(src, dst, _Copier(statistics, patterns=patterns).link, workers)
+        else:
+            # A link to every file would let an in-place write of the build modify the source.
+            _copy_tree(src, dst, _Copier(statistics, reflink=True).copy, workers)
+    else:
+        _copy_tree(src, dst, _Copier(statistics).copy, workers)
+
+    statistics.seconds = time.monotonic() - start_time
+    return statistics
+
+class _Copier:
+    """The functions copying one file of a tree, which count the files in statistics."""
+
+    def __init__(self, statistics, reflink=False, patterns=()):
+        self.__statistics = statistics
+        self.__reflink = reflink
+        self.__patterns = patterns
+
+    def copy(self, src, dst, relpath):
+        if self.__reflink and self.__clone(src, dst):
+            self.__statistics.add_file(os.stat(dst).st_size)
+            return
+        shutil.copy2(src, dst)
+        self.__statistics.add_file(os.stat(dst).st_size, fallback=self.__reflink)
+
+    def link(self, src, dst, relpath):
+        if not any(fnmatch.fnmatch(relpath, pattern) or fnmatch.fnmatch(os.path.basename(relpath), pattern)
+                   for pattern in self.__patterns):
+            try:
+                os.link(src, dst)
+                self.__statistics.add_file(os.stat(dst).st_size)
+                return
+            except OSError as err:
+                if err.errno not in _UNSUPPORTED_ERRNOS:
+                    raise
+            shutil.copy2(src, dst)
+            self.__statistics.add_file(os.stat(dst).st_size, fallback=True)
+            return
+        shutil.copy2(src, dst)
+        self.__statistics.add_file(os.stat(dst).st_size)
+
+    def update(self, src, dst, relpath):
+        src_stat = os.stat(src)
+        try:
+            dst_stat = os.lstat(dst)
+            if (dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime_ns == src_stat.st_mtime_ns
+                    and not os.path.islink(dst)):
+                self.__statistics.add_skipped_file()
+                return
+            os.remove(dst)
+        except FileNotFoundError:
+            pass
+        shutil.copy2(src, dst)
+        self.__statistics.add_file(src_stat.st_size)
+
+    def __clone(self, src, dst):
+        """Clones src to dst with FICLONE. Returns False if the file system does not support it."""
+        try:
+            with open(src, 'rb') as src_obj, open(dst, 'wb') as dst_obj:
+                fcntl.ioctl(dst_obj.fileno(), FICLONE, src_obj.fileno())
+        except OSError as err:
+            if err.errno not in _UNSUPPORTED_ERRNOS:
+                raise
+            # Stop trying once the file system refused a clone.
+            self.__reflink = False
+            return False
+        shutil.copystat(src, dst)
+        return True
+
+def _copy_tree(src, dst, copy_file, workers, exist_ok=False):
+    """Creates the directories and links of src in dst, and calls copy_file(src, dst, relpath) for its files."""
+    os.makedirs(dst, exist_ok=exist_ok)
+    files = []
+    directories = []
+    for (dirpath, dirnames, filenames) in os.walk(src):
+        reldir = os.path.relpath(dirpath, src)
+        dst_dir = os.path.normpath(os.path.join(dst, reldir))
+        directories.append((dirpath, dst_dir))
+        for name in sorted(dirnames) + sorted(filenames):
+            src_path = os.path.join(dirpath, name)
+            dst_path = os.path.join(dst_dir, name)
+            relpath = os.path.normpath(os.path.join(reldir, name))
+            if os.path.islink(src_path):
+                if os.path.lexists(dst_path):
+                    if os.path.islink(dst_path) and os.readlink(dst_path) == os.readlink(src_path):
+                        continue
+                    os.remove(dst_path)
+                os.symlink(os.readlink(src_path), dst_path)
+            elif name in dirnames:
+                os.makedirs(dst_path, exist_ok=exist_ok)
+            else:
+                files.append((src_path, dst_path, relpath))
+
+    if workers > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            for future in [executor.submit(copy_file, *paths) for paths in files]:
+                future.result()
+    else:
+        for paths in files:
+            copy_file(*paths)
+
+    # The times of the directories are set last, as creating their files changes them.
+    for (src_dir, dst_dir) in reversed(directories):
+        shutil.copystat(src_dir, dst_dir)
+    return
@@ -12,22 +12,63 @@ Copyright (C) 2016 Oak Ridge National Laboratory, UT-Battelle, LLC.
 import os
 import sys
 import re
+import json
+import time
+import datetime
+import concurrent.futures
 
 import sqlite3
 
 #from libraries import input_files
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.event_records import read_event_records
 from libraries.status_file import StatusFile
 
 #------------------------------------------------------------------------------
 
 class StatusDatabase:
-    """Class for accessing status information for runs."""
+    """Class for accessing status information for runs.
+
+    By default the database is built in memory from the event files on
+    every load. If a cache file is given (or RGT_STATUS_DB_CACHE is set),
+    the database is kept in that sqlite file, and a load only reads the
+    test instances whose Status directory changed since the previous load.
+
+    Status directories and event files are read by num_workers threads
+    (RGT_STATUS_DB_WORKERS, default 8), which hides the latency of
+    metadata operations on parallel file systems. The result does not
+    depend on the number of workers.
+
+    With typed_schema (RGT_STATUS_DB_TYPED=1), event_value and job_status
+    columns have NUMERIC affinity, every *event_time column has a companion
+    *event_time_ns INTEGER column holding the time in ns since the epoch,
+    and the tables are indexed on (app, test, test_id), event_name and
+    check_end_event_time_ns.
+    """
 
     NO_VALUE = StatusFile.NO_VALUE #---Convenience variable.
 
+    CACHE_SCHEMA_VERSION = '1'
+
+    #---A Status directory modified less than this many ns before a scan
+    #---is read again by the next load, since a later change within the
+    #---timestamp granularity of the file system would not change its mtime.
+    CACHE_MTIME_GUARD_NS = 2 * 1000 * 1000 * 1000
+
+    DEFAULT_NUM_WORKERS = 8
+
+    TEST_ID_PATTERN = re.compile(r'^[0-9.]+$')
+
+    #---Typed schema: fields stored with NUMERIC affinity, and fields
+    #---given an epoch-ns companion column.
+    NUMERIC_FIELD_PATTERN = re.compile(r'(^|_)(event_value|job_status)$')
+    TIME_FIELD_PATTERN = re.compile(r'(^|_)event_time$')
+    TIME_NS_SUFFIX = '_ns'
+
     #--------------------------------------------------------------------------
 
-    def __init__(self, rgt_input_file):
+    def __init__(self, rgt_input_file, cache_file=None, num_workers=None,
+                 typed_schema=None):
         """Constructor - simple initializations."""
 
         #---Get some locations from harness.
@@ -36,8 +77,14 @@ class StatusDatabase:
         self.__input_file = rgt_input_file
         self.__path_to_tests = self.__input_file.get_path_to_tests()
 
-        self.__event_data = None
-        self.__test_instance_data = None
+        self.__cache_file = (cache_file if cache_file is not None else
+                             os.getenv('RGT_STATUS_DB_CACHE'))
+        self.__num_workers = max(1, num_workers or int(
+            os.getenv('RGT_STATUS_DB_WORKERS',
+                      StatusDatabase.DEFAULT_NUM_WORKERS)))
+        self.__executor = None
+        self.__typed_schema = (typed_schema if typed_schema is not None else
+                               os.getenv('RGT_STATUS_DB_TYPED', '0') == '1')
 
         self.__event_names = None
         self.__event_fields = None
@@ -55,103 +102,354 @@ class StatusDatabase:
         #---Initializations.
 
         stf = StatusFile #---Convenience variable.
-        no_value = StatusDatabase.NO_VALUE #---Convenience variable.
-
-        #---Two python dicts that will be converted to sql databases.
-
-        self.__event_data = {}
-        self.__test_instance_data = {}
 
         self.__event_names = set(
             ['_'.join(stf.EVENT_DICT[event][1:3]) for event in stf.EVENT_LIST])
 
-        self.__event_fields = set()
-
         self.__event_fields = set(stf.FIELDS_PER_TEST_INSTANCE +
                                   stf.FIELDS_PER_EVENT)
 
-        per_event_fields = set(stf.FIELDS_PER_EVENT)
+        if self.__num_workers > 1:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.__num_workers)
+        try:
+            if self.__cache_file:
+                self.__load_cache()
+            else:
+                self.__load_memory()
+        finally:
+            if self.__executor:
+                self.__executor.shutdown()
+                self.__executor = None
+
+        return self #---for chaining.
+
+    #--------------------------------------------------------------------------
+
+    def __load_memory(self):
+        """Build the database in memory from the event files."""
+
+        per_event_fields = set(StatusFile.FIELDS_PER_EVENT)
 
         #---PASS 1: loop to ingest information from disk files and compute
         #---some information.
 
+        test_id_dirs = self.__list_test_instances()
+        instances = []
+        for (app, test, test_id, test_id_dir, mtime_ns), (
+                events, nonuniform_fields) in zip(
+                    test_id_dirs, self.__map(self.__read_test_instance,
+                                             [d[3] for d in test_id_dirs])):
+            instances.append((app, test, test_id, events))
+            self.__event_names.update(events.keys())
+            per_event_fields.update(nonuniform_fields)
+
+        self.__set_test_instance_fields(per_event_fields)
+
+        #---Initialize sqlite database, tables.
+
+        self.__db = sqlite3.connect(':memory:')
+        self.__db_cursor = self.__db.cursor()
+        self.__create_tables()
+
+        #---PASS 2: form test_instance data; make all records consistent.
+
+        self.__insert_test_instances(instances, per_event_fields)
+        self.__db.commit()
+
+    #--------------------------------------------------------------------------
+
+    def __load_cache(self):
+        """Bring the on-disk database up to date with the event files."""
+
+        self.__db = sqlite3.connect(self.__cache_file, timeout=60,
+                                    isolation_level=None)
+        self.__db_cursor = self.__db.cursor()
+
+        #---One transaction, so concurrent loads see either the old or
+        #---the new state of the cache.
+
+        self.__db_cursor.execute('BEGIN IMMEDIATE')
+        try:
+            self.__prepare_cache()
+            changed = self.__ingest_changed_test_instances()
+            self.__update_cached_tables(changed)
+            self.__db_cursor.execute('COMMIT')
+        except BaseException:
+            self.__db_cursor.execute('ROLLBACK')
+            raise
+
+    #--------------------------------------------------------------------------
+
+    def __prepare_cache(self):
+        """Create the bookkeeping tables, discarding a stale cache."""
+
+        cursor = self.__db_cursor
+
+        cursor.execute('CREATE TABLE IF NOT EXISTS cache_info('
+                       'key TEXT PRIMARY KEY, value TEXT)')
+        info = dict(cursor.execute('SELECT key, value FROM cache_info'))
+
+        if (info.get('schema_version') != StatusDatabase.CACHE_SCHEMA_VERSION
+                or info.get('path_to_tests') != self.__path_to_tests):
+            for table in ('events', 'test_instances', 'raw_events',
+                          'ingest_state'):
+                cursor.execute('DROP TABLE IF EXISTS ' + table)
+            cursor.execute('DELETE FROM cache_info')
+            cursor.executemany(
+                'INSERT INTO cache_info(key, value) VALUES(?, ?)',
+                [('schema_version', StatusDatabase.CACHE_SCHEMA_VERSION),
+                 ('path_to_tests', self.__path_to_tests)])
+
+        #---High-water mark of each test instance: the mtime of its Status
+        #---directory, which changes whenever an event file is written.
+
+        cursor.execute('CREATE TABLE IF NOT EXISTS ingest_state('
+                       'app TEXT, test TEXT, test_id TEXT, '
+                       'dir_mtime_ns INTEGER, nonuniform_fields TEXT, '
+                       'PRIMARY KEY(app, test, test_id))')
+        cursor.execute('CREATE TABLE IF NOT EXISTS raw_events('
+                       'app TEXT, test TEXT, test_id TEXT, '
+                       'event_name TEXT, fields TEXT)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS raw_events_instance '
+                       'ON raw_events(app, test, test_id)')
+
+    #--------------------------------------------------------------------------
+
+    def __ingest_changed_test_instances(self):
+        """Read the test instances that changed since the last load.
+
+        Returns the keys of the test instances that were added, changed
+        or removed.
+        """
+
+        cursor = self.__db_cursor
+
+        known = {(app, test, test_id): mtime for app, test, test_id, mtime in
+                 cursor.execute('SELECT app, test, test_id, dir_mtime_ns '
+                                'FROM ingest_state')}
+
+        now_ns = time.time_ns()
+        seen = set()
+        changed = []
+        changed_dirs = []
+        raw_rows = []
+        state_rows = []
+
+        for app, test, test_id, test_id_dir, mtime_ns in (
+                self.__list_test_instances()):
+            key = (app, test, test_id)
+            seen.add(key)
+            if known.get(key) != mtime_ns:
+                changed.append(key)
+                changed_dirs.append((test_id_dir, mtime_ns))
+
+        for key, (test_id_dir, mtime_ns), (events, nonuniform_fields) in zip(
+                changed, changed_dirs,
+                self.__map(self.__read_test_instance,
+                           [d[0] for d in changed_dirs])):
+            for event_name, event_dict in events.items():
+                raw_rows.append(key + (event_name, json.dumps(event_dict)))
+            if now_ns - mtime_ns < StatusDatabase.CACHE_MTIME_GUARD_NS:
+                mtime_ns = -1
+            state_rows.append(key + (mtime_ns,
+                                     json.dumps(sorted(nonuniform_fields))))
+
+        #---Test instances removed from disk, or of tests no longer in
+        #---the input file.
+
+        removed = [key for key in known if key not in seen]
+
+        where = ' WHERE app = ? AND test = ? AND test_id = ?'
+        cursor.executemany('DELETE FROM raw_events' + where, changed + removed)
+        cursor.executemany('DELETE FROM ingest_state' + where,
+                           changed + removed)
+        cursor.executemany('INSERT INTO raw_events(app, test, test_id, '
+                           'event_name, fields) VALUES(?, ?, ?, ?, ?)',
+                           raw_rows)
+        cursor.executemany('INSERT INTO ingest_state(app, test, test_id, '
+                           'dir_mtime_ns, nonuniform_fields) '
+                           'VALUES(?, ?, ?, ?, ?)', state_rows)
+
+        return changed + removed
+
+    #--------------------------------------------------------------------------
+
+    def __update_cached_tables(self, changed):
+        """Update the events and test_instances tables of the cache."""
+
+        cursor = self.__db_cursor
+
+        #---The table layouts depend on all test instances, through the
+        #---event names and the fields with nonuniform values.
+
+        self.__event_names.update(
+            row[0] for row in
+            cursor.execute('SELECT DISTINCT event_name FROM raw_events'))
+        per_event_fields = set(StatusFile.FIELDS_PER_EVENT)
+        for row in cursor.execute('SELECT DISTINCT nonuniform_fields '
+                                  'FROM ingest_state'):
+            per_event_fields.update(json.loads(row[0]))
+        self.__set_test_instance_fields(per_event_fields)
+
+        layout = json.dumps([sorted(self.__event_fields),
+                             sorted(self.__test_instance_fields),
+                             self.__typed_schema])
+        stored_layout = cursor.execute(
+            'SELECT value FROM cache_info WHERE key = \'layout\'').fetchone()
+        tables = set(row[0] for row in cursor.execute(
+            'SELECT name FROM sqlite_master WHERE type = \'table\''))
+
+        if (stored_layout is None or stored_layout[0] != layout
+                or 'events' not in tables or 'test_instances' not in tables
+                or not per_event_fields.isdisjoint(['app', 'test', 'test_id'])):
+
+            #---Rebuild both tables from the cached events.
+
+            cursor.execute('DROP TABLE IF EXISTS events')
+            cursor.execute('DROP TABLE IF EXISTS test_instances')
+            self.__create_tables()
+            cursor.execute('INSERT OR REPLACE INTO cache_info(key, value) '
+                           'VALUES(\'layout\', ?)', (layout,))
+            changed = None
+
+        else:
+            where = ' WHERE app = ? AND test = ? AND test_id = ?'
+            cursor.executemany('DELETE FROM events' + where, changed)
+            cursor.executemany('DELETE FROM test_instances' + where, changed)
+
+        self.__insert_test_instances(self.__read_cached_test_instances(changed),
+                                     per_event_fields)
+
+    #--------------------------------------------------------------------------
+
+    def __read_cached_test_instances(self, keys):
+        """Return the cached events of the given test instances (all if None)."""
+
+        instances = {}
+        query = ('SELECT app, test, test_id, event_name, fields '
+                 'FROM raw_events')
+        if keys is None:
+            rows = self.__db.execute(
+                query + ' ORDER BY app, test, test_id, rowid')
+        else:
+            rows = []
+            for key in keys:
+                rows.extend(self.__db.execute(
+                    query + ' WHERE app = ? AND test = ? AND test_id = ? '
+                    'ORDER BY rowid', key))
+        for app, test, test_id, event_name, fields in rows:
+            instances.setdefault((app, test, test_id), {})[event_name] = (
+                json.loads(fields))
+        return [key + (events,) for key, events in instances.items()]
+
+    #--------------------------------------------------------------------------
+
+    def __map(self, function, items):
+        """Map function over items, on the worker threads if there are any.
+
+        The results are in the order of items.
+        """
+
+        if self.__executor is None:
+            return list(map(function, items))
+        return list(self.__executor.map(function, items))
+
+    #--------------------------------------------------------------------------
+
+    def __list_test_instances(self):
+        """Return app, test, test_id, Status directory and its mtime (ns)
+           of each test instance, sorted by app, test and test_id."""
+
+        #---A test may be listed more than once in the input file.
+
+        app_tests = []
         for test_info in self.__input_file.get_tests():
-            app, test = test_info[0:2]
+            if tuple(test_info[0:2]) not in app_tests:
+                app_tests.append(tuple(test_info[0:2]))
 
-            self.__event_data.setdefault(app, {}).setdefault(test, {})
+        test_id_dirs = []
+        for (app, test), entries in zip(
+                app_tests, self.__map(self.__scan_status_dir, app_tests)):
+            for test_id, test_id_dir, mtime_ns in entries:
+                test_id_dirs.append((app, test, test_id, test_id_dir,
+                                     mtime_ns))
+        return test_id_dirs
 
-            status_dir = os.path.join(self.__path_to_tests, app, test, apptest_layout.test_status_dirname)
-            test_ids = ([d for d in os.listdir(status_dir)
-                         if re.search(r'^[0-9.]+$', d)
-                         and os.path.isdir(os.path.join(status_dir, d))]
-                        if os.path.exists(status_dir) else [])
+    #--------------------------------------------------------------------------
+
+    def __scan_status_dir(self, app_test):
+        """Return test_id, directory and mtime (ns) of the test instances
+           in the Status directory of an app and test."""
 
-            #---Loop over test instances for this app and test.
+        app, test = app_test
+        status_dir = os.path.join(self.__path_to_tests, app, test, apptest_layout.test_status_dirname)
 
-            for test_id in test_ids:
-                self.__event_data[app][test][test_id] = {}
+        entries = []
+        try:
+            with os.scandir(status_dir) as it:
+                for entry in it:
+                    #---is_dir uses the file type from the directory
+                    #---listing, so only the test instances are stat'ed.
+                    if (StatusDatabase.TEST_ID_PATTERN.search(entry.name)
+                            and entry.is_dir()):
+                        entries.append((entry.name, entry.path,
+                                        entry.stat().st_mtime_ns))
+        except FileNotFoundError:
+            pass
 
-                test_id_dir = os.path.join(status_dir, test_id)
-                event_filenames = [f for f in os.listdir(test_id_dir) if
-                                   os.path.isfile(os.path.join(test_id_dir, f))
-                                   and re.search(r'^Event_.*\.txt$', f)]
+        return sorted(entries)
 
-                #---For every field of every event in the test instance,
-                #---collect the values it can take.
+    #--------------------------------------------------------------------------
 
-                fields_values = {}
+    def __read_test_instance(self, test_id_dir):
+        """Read the events recorded for a test instance.
 
-                #---Process events that were recorded for this test instance.
+        Returns a dict of the event dicts by event name, and the set of
+        fields that have nonuniform values across the events.
+        """
 
-                for event_filename in event_filenames:
+        #---For every field of every event in the test instance,
+        #---collect the values it can take.
 
-                    file_ = open(os.path.join(test_id_dir, event_filename), 'r')
-                    line = file_.read()
-                    file_.close()
+        fields_values = {}
+        events = {}
 
-                    line = re.sub('\n', '', line)
-                    f_vs = [f_v.split('=') for f_v in line.split('\t')
-                            if len(f_v.split('=')) == 2]
+        #---Process events that were recorded for this test instance.
 
-                    #---Record all field/value pairs for this event.
+        for record in read_event_records(test_id_dir).values():
 
-                    event_dict = {}
-                    for f_v in f_vs:
-                        field, value = tuple(f_v)
-                        for field2 in stf.FIELDS_SPLUNK_SPECIAL:
-                            if re.search('_' + field2 + '$', field):
-                                continue
-                        event_dict[field] = value
-                        if field in fields_values:
-                            fields_values[field].add(value)
-                        else:
-                            fields_values[field] = set([value])
+            #---Record all field/value pairs for this event.
 
-                    #---ISSUE: should we check app, test,
-                    #---test_id etc. for consistency.
+            event_dict = dict(record.fields)
+            for field, value in event_dict.items():
+                if field in fields_values:
+                    fields_values[field].add(value)
+                else:
+                    fields_values[field] = set([value])
 
-                    #---ISSUE: should we extract event name from event filename
+            #---ISSUE: should we check app, test,
+            #---test_id etc. for consistency.
 
-                    assert 'event_name' in event_dict, (
-                        'Event file does not contain event name')
+            #---ISSUE: should we extract event name from event filename
 
-                    event_name = event_dict['event_name']
+            assert 'event_name' in event_dict, (
+                'Event file does not contain event name')
 
-                    self.__event_data[app][test][test_id][event_name] = (
-                        event_dict)
+            events[event_dict['event_name']] = event_dict
 
-                    self.__event_names.add(event_name)
+        #---Find fields that can have nonuniform values across
+        #---the events of a test instance.
 
-                    self.__event_fields.union(set(list(event_dict.keys())))
+        nonuniform_fields = set(field for field, values in fields_values.items()
+                                if len(values) > 1)
 
-                #---Find fields that can have nonuniform values across
-                #---the events of a test instance.
+        return events, nonuniform_fields
 
-                for field, values in fields_values.items():
-                    if len(values) > 1:
-                        per_event_fields.add(field)
+    #--------------------------------------------------------------------------
 
-        #---Finish building global field lists.
+    def __set_test_instance_fields(self, per_event_fields):
+        """Finish building global field lists."""
 
         #---Test instance fields are composed of fields that have
         #---invariant values across events of a test instance,
@@ -166,116 +464,174 @@ class StatusDatabase:
                 new_field = event_name + '_' + field
                 self.__test_instance_fields.add(new_field)
 
-        #---Initialize sqlite database, tables.
+    #--------------------------------------------------------------------------
 
-        self.__db = sqlite3.connect(':memory:')
-        self.__db_cursor = self.__db.cursor()
-        self.__db_cursor.execute(
-            'CREATE TABLE events(id INTEGER PRIMARY KEY, ' +
-            ' TEXT, '.join(list(self.__event_fields)) + ' TEXT)')
-        self.__db_cursor.execute(
-            'CREATE TABLE test_instances(id INTEGER PRIMARY KEY, ' +
-            ' TEXT, '.join(list(self.__test_instance_fields)) + ' TEXT)')
+    def __columns(self, fields):
+        """Return the (column, type) pairs of a table holding fields."""
+
+        columns = []
+        for field in sorted(fields):
+            if not self.__typed_schema:
+                columns.append((field, 'TEXT'))
+            elif StatusDatabase.NUMERIC_FIELD_PATTERN.search(field):
+                columns.append((field, 'NUMERIC'))
+            else:
+                columns.append((field, 'TEXT'))
+                if StatusDatabase.TIME_FIELD_PATTERN.search(field):
+                    columns.append((field + StatusDatabase.TIME_NS_SUFFIX,
+                                    'INTEGER'))
+        return columns
 
-        #---PASS 2: form test_instance data; make all records consistent.
+    #--------------------------------------------------------------------------
+
+    def __create_tables(self):
+        """Create the events and test_instances tables."""
+
+        for table_name, fields in (('events', self.__event_fields),
+                                   ('test_instances',
+                                    self.__test_instance_fields)):
+            self.__db_cursor.execute(
+                'CREATE TABLE ' + table_name + '(id INTEGER PRIMARY KEY, ' +
+                ', '.join(column + ' ' + column_type for column, column_type
+                          in self.__columns(fields)) + ')')
+
+        if self.__cache_file or self.__typed_schema:
+            #---Lets a changed test instance be replaced quickly,
+            #---and speeds up per-app and per-test queries.
+            self.__db_cursor.execute(
+                'CREATE INDEX events_instance ON events(app, test, test_id)')
+            self.__db_cursor.execute(
+                'CREATE INDEX test_instances_instance '
+                'ON test_instances(app, test, test_id)')
+
+        if self.__typed_schema:
+            self.__db_cursor.execute(
+                'CREATE INDEX events_event_name ON events(event_name)')
+            check_end_time = ('check_end_event_time' +
+                              StatusDatabase.TIME_NS_SUFFIX)
+            if check_end_time in dict(self.__columns(
+                    self.__test_instance_fields)):
+                self.__db_cursor.execute(
+                    'CREATE INDEX test_instances_check_end_time '
+                    'ON test_instances(' + check_end_time + ')')
 
-        for app in self.__event_data:
-            for test in self.__event_data[app]:
-                self.__test_instance_data.setdefault(
-                    app, {}).setdefault(test, {})
-                for test_id in self.__event_data[app][test]:
-                    test_instance_dict = {}
+    #--------------------------------------------------------------------------
 
-                    events = self.__event_data[app][test][test_id]
+    def __insert_test_instances(self, instances, per_event_fields):
+        """Add the events and test_instance records of test instances."""
 
-                    #---Add events to event table in database.
+        no_value = StatusDatabase.NO_VALUE #---Convenience variable.
 
-                    for event_name in events:
+        event_rows = []
+        test_instance_rows = []
 
-                        event_dict = events[event_name]
+        for app, test, test_id, events in instances:
+            test_instance_dict = {}
 
-                        for field in self.__event_fields.difference(
-                                set(list(event_dict.keys()))):
-                            #---Add missing fields (as empty).
-                            #---WARNING: dynamic update - should be ok.
-                            event_dict[field] = no_value
+            #---Add events to event table in database.
 
-                        #---Add to database.
+            for event_name in events:
 
-                        self.__insert_into_db('events',
-                                              self.__event_fields, event_dict)
+                event_dict = events[event_name]
 
-                    #---Add missing events (as having fields with (mostly)
-                    #---empty values) to event table in database.
+                for field in self.__event_fields.difference(
+                        set(list(event_dict.keys()))):
+                    #---Add missing fields (as empty).
+                    #---WARNING: dynamic update - should be ok.
+                    event_dict[field] = no_value
 
-                    for event_name in self.__event_names.difference(
-                            set(list(events.keys()))):
-                        event_dict = {f: no_value for f in self.__event_fields}
-                        #---ISSUE: should we fill more fields here.
-                        event_dict['app'] = app
-                        event_dict['test'] = test
-                        event_dict['test_id'] = test_id
-                        event_dict['test_instance'] = ','.join([app, test,
-                                                                test_id])
-                        #---Add to database.
+                event_rows.append(event_dict)
 
-                        event_dict['event_name'] = event_name
-                        #---WARNING: dynamic update - should be ok.
-                        events[event_name] = event_dict
+            #---Add missing events (as having fields with (mostly)
+            #---empty values) to event table in database.
 
-                        self.__insert_into_db('events',
-                                              self.__event_fields, event_dict)
+            for event_name in self.__event_names.difference(
+                    set(list(events.keys()))):
+                event_dict = {f: no_value for f in self.__event_fields}
+                #---ISSUE: should we fill more fields here.
+                event_dict['app'] = app
+                event_dict['test'] = test
+                event_dict['test_id'] = test_id
+                event_dict['test_instance'] = ','.join([app, test,
+                                                        test_id])
 
-                    #---Get fields, values for test instance.
+                event_dict['event_name'] = event_name
+                #---WARNING: dynamic update - should be ok.
+                events[event_name] = event_dict
 
-                    for event_name, event_dict in events.items():
+                event_rows.append(event_dict)
 
-                        #---Add fields for current event.
+            #---Get fields, values for test instance.
 
-                        for field, value in event_dict.items():
+            for event_name, event_dict in events.items():
 
-                            #---For each event-specific field, give the field a
-                            #---name that denotes the event name.
-                            new_field = (event_name + '_' + field
-                                     if field in per_event_fields else field)
+                #---Add fields for current event.
 
-                            #---Add to dict if not yet there or there but null.
-                            if not new_field in test_instance_dict:
-                                test_instance_dict[new_field] = value
-                            elif test_instance_dict[new_field] == no_value:
-                                test_instance_dict[new_field] = value
+                for field, value in event_dict.items():
 
-                    #---Add any missing fields (as having empty values).
+                    #---For each event-specific field, give the field a
+                    #---name that denotes the event name.
+                    new_field = (event_name + '_' + field
+                             if field in per_event_fields else field)
 
-                    for field in self.__test_instance_fields:
-                        if not field in test_instance_dict:
-                            test_instance_dict[field] = no_value
+                    #---Add to dict if not yet there or there but null.
+                    if not new_field in test_instance_dict:
+                        test_instance_dict[new_field] = value
+                    elif test_instance_dict[new_field] == no_value:
+                        test_instance_dict[new_field] = value
 
-                    #---Add test_instance data to database.
+            #---Add any missing fields (as having empty values).
 
-                    self.__test_instance_data[app][test][test_id] = (
-                        test_instance_dict)
+            for field in self.__test_instance_fields:
+                if not field in test_instance_dict:
+                    test_instance_dict[field] = no_value
 
-                    #---Add to database.
+            test_instance_rows.append(test_instance_dict)
 
-                    self.__insert_into_db('test_instances',
-                                          self.__test_instance_fields,
-                                          test_instance_dict)
+        #---Add to database.
 
-        return self #---for chaining.
+        self.__insert_into_db('events', self.__event_fields, event_rows)
+        self.__insert_into_db('test_instances', self.__test_instance_fields,
+                              test_instance_rows)
 
     #--------------------------------------------------------------------------
 
-    def __insert_into_db(self, table_name, fields, values_dict):
-        """Create a record in the sqlite database."""
+    def __insert_into_db(self, table_name, fields, values_dicts):
+        """Create records in the sqlite database."""
 
-        self.__db_cursor.execute(
+        columns = [column for column, column_type in self.__columns(fields)]
+
+        if self.__typed_schema:
+            time_fields = [field for field in fields if
+                           StatusDatabase.TIME_FIELD_PATTERN.search(field)]
+            for values_dict in values_dicts:
+                for field in time_fields:
+                    values_dict[field + StatusDatabase.TIME_NS_SUFFIX] = (
+                        StatusDatabase.time_ns(values_dict[field]))
+
+        self.__db_cursor.executemany(
             'INSERT INTO ' + table_name + '(' +
-            ','.join(list(fields)) + ') ' +
+            ','.join(columns) + ') ' +
             'VALUES(:' +
-            ', :'.join(list(fields)) + ')',
-            values_dict)
-        self.__db.commit()
+            ', :'.join(columns) + ')',
+            values_dicts)
+
+    #--------------------------------------------------------------------------
+
+    @staticmethod
+    def time_ns(event_time):
+        """Convert an event time (ISO format, local time unless it has an
+           offset) to ns since the epoch; None if it is not a time."""
+
+        try:
+            dt = datetime.datetime.fromisoformat(event_time)
+        except (TypeError, ValueError):
+            return None
+
+        #---Whole seconds and microseconds are converted separately,
+        #---since a float timestamp cannot hold ns since the epoch exactly.
+        seconds = int(dt.replace(microsecond=0).timestamp())
+        return seconds * 1000 * 1000 * 1000 + dt.microsecond * 1000
 
     #--------------------------------------------------------------------------
 
@@ -11,23 +11,20 @@ Copyright (C) 2015 Oak Ridge National Laboratory, UT-Battelle, LLC.
 
 import os
 import sys
+import errno
 import datetime
 import re
 import socket
 import pprint
 import abc
+import contextlib
+import fcntl
 import urllib
 import glob
-import dateutil.parser
 import subprocess
 
-try:
-    import requests
-except ImportError as e:
-    print("Import Warning: Could not import requests in current Python environment. Influx logging will be disabled.")
-
-
 from libraries.layout_of_apps_directory import apptest_layout
+from libraries import event_records
 
 class StatusFile:
     """Perform operations pertaining to logging the status of jobs."""
@@ -60,6 +57,15 @@ class StatusFile:
 
 
     __LINE_FORMAT = "%-28s %-50s %-20s %-10s %-20s %-15s %-15s %-15s\n"
+
+    # Header of the status file index: generation, status file size and mtime.
+    __INDEX_HEADER_FORMAT = "# rgt_status index %20d %20d %20d\n"
+
+    # Initial number of bytes read from the end of the status file to find the last record.
+    __TAIL_CHUNK_SIZE = 4096
+
+    # Errors of a reader who may not write the status file index.
+    __READ_ONLY_ERRNOS = (errno.EACCES, errno.EPERM, errno.EROFS)
     spaces_header = __LINE_FORMAT % (' ', ' ', ' ', ' ', ' ', ' ', ' ', ' ')
     hashes_header = str.replace(spaces_header, ' ', '#')
     column_header = __LINE_FORMAT % (f'# {STATUS_COLUMN_START}', STATUS_COLUMN_LAUNCH,
@@ -319,12 +325,20 @@ class StatusFile:
         """
         self.__logger = logger
         self.__test_id = test_id
+        self.__test_instance = None
 
         # The first task is set the path to status file.
         self.__status_file_path = path_to_status_file
 
+        # The in-memory copy of the status file index.
+        self.__index_path = os.path.join(os.path.dirname(path_to_status_file),
+                                         apptest_layout.test_status_index_filename)
+        self.__index_generation = None
+        self.__index_read_offset = 0
+        self.__record_offsets = {}
+
         # The second task is to create the status file.
-        self.__create_status_file(path_to_status_file)
+        self._create_status_file(path_to_status_file)
 
     ###################
     # Public methods  #
@@ -344,6 +358,7 @@ class StatusFile:
         """
 
         self.__test_id = unique_id
+        self.__test_instance = TestInstanceInfo(unique_id)
         if self._subtest_already_initialized(unique_id):
             pass
         else:
@@ -362,18 +377,30 @@ class StatusFile:
         str
             The harness id of the latest entry in the subtest status file.
         """
-        with open(self.__status_file_path, "r") as file_obj:
-            records = file_obj.readlines()
-
-        line = records[-1]
-        words = line.rstrip().split()
+        words = self._get_last_record()
         unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
-        if len(words) > unique_col:
+        if words is not None and len(words) > unique_col:
             subtest_harness_id = words[unique_col]
         else:
             subtest_harness_id = None
         return subtest_harness_id
 
+    def get_record(self, unique_id):
+        """Returns the status record of a test instance.
+
+        Parameters
+        ----------
+        unique_id : str
+            The harness id of the test instance.
+
+        Returns
+        -------
+        list
+            The words of the record, in the order of STATUS_COLUMNS, or None
+            if the status file has no record for unique_id.
+        """
+        return self._get_record(unique_id)
+
     def log_event(self, event_id, event_value=NO_VALUE):
         """
             Log the occurrence of a harness event.
@@ -425,17 +452,13 @@ class StatusFile:
         """
         # Get the corresponding record from the status file that
         # lists the test results for subtest_harness_id.
-        record = self.__get_harness_id_record(subtest_harness_id)
+        words = self._get_record(subtest_harness_id)
 
-        if record == None:
+        if words == None:
             test_finished = False
         else:
-            # Strip line/record of all leading and trailing whitespace.
-            record = record.strip()
-
             # If batch column, build column, submit column, or check column equals StatusFile.PLACE_HOLDER
             # then we are not finished. The test is still in progress.
-            words = record.split()
             batch_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]
             tmp_words = words[batch_col:]
             if tmp_words.count(StatusFile.PLACE_HOLDER) >= 1:
@@ -452,38 +475,71 @@ class StatusFile:
 
         return test_finished
 
-    def post_event_to_influx(self, event_id, status_info_dict=None):
+    def post_event_to_influx(self, event_id, status_info_dict=None, records=None):
         """
             Posts the event to InfluxDB. Assumes the event file already exists.
             Inherits the event status, time, and all other fields from the event status file
             Supplying status_info_dict will bypass the step of loading in entries to a dict
+            Supplying records, as returned by event_records.read_event_records, bypasses reading the events
         """
         self.__logger.doInfoLogging(f"Posting event: {event_id} with test id: {self.__test_id} to Influx")
+        influx_event_record_string = self.get_influx_event_record(event_id, status_info_dict=status_info_dict,
+                                                                  records=records)
+        if influx_event_record_string is None:
+            return False
+
+        # Write event to InfluxDB
+        if 'RGT_INFLUX_URI' in os.environ and 'RGT_INFLUX_TOKEN' in os.environ:
+            if 'RGT_DISABLE_INFLUX' in os.environ and str(os.environ['RGT_DISABLE_INFLUX']) == '1':
+                self.__logger.doWarningLogging("InfluxDB logging is explicitly disabled with RGT_DISABLE_INFLUX=1")
+            else:
+                self.__logger.doInfoLogging(f"Logging event to influx: {influx_event_record_string}")
+
+                if 'RGT_INFLUX_NO_SEND' in os.environ and os.environ['RGT_INFLUX_NO_SEND'] == '1':
+                    print(f"RGT_INFLUX_NO_SEND is set, echoing: {influx_event_record_string}")
+                else:
+                    # The record is sent by a background thread. If it can't be sent,
+                    # it is spooled in the Status directory of this test instance
+                    # and sent later by the harness --mode influx_log.
+                    from libraries.influx_shipper import get_influx_shipper, spool_influx_records
+                    spool_path = os.path.join(os.path.dirname(self.__status_file_path), str(self.__test_id),
+                                              apptest_layout.influx_spool_filename)
+                    shipper = get_influx_shipper(self.__logger)
+                    if shipper is None:
+                        self.__logger.doWarningLogging(f"InfluxDB is currently disabled. Reason: 'requests' module was unable to load. Spooling InfluxDB message to {spool_path}. This can be logged after the run using the harness --mode influx_log.")
+                        spool_influx_records(spool_path, [influx_event_record_string])
+                    else:
+                        shipper.submit(influx_event_record_string, spool_path)
+
+    def get_influx_event_record(self, event_id, status_info_dict=None, records=None):
+        """
+            Returns the InfluxDB line-protocol record of an event, or None if it can't be built.
+            Inherits the event status, time, and all other fields from the event status file
+            of this test instance. Supplying status_info_dict bypasses reading the event file.
+            Supplying records, as returned by event_records.read_event_records, bypasses reading the events.
+        """
         if status_info_dict == None:
             self.__logger.doInfoLogging(f"Reading fields from status file")
-            # then load the contents of the status file into a dict
+            # then load the fields of the event into a dict
             event_filename = StatusFile.EVENT_DICT[event_id][0]
-            dir_head = os.path.split(os.getcwd())[0]
-            file_path = os.path.join(dir_head, apptest_layout.test_status_dirname, str(self.__test_id),
-                                 event_filename)
-            if not os.path.exists(file_path):
-                self.__logger.doErrorLogging(f"Couldn't find status file to log to Influx: {file_path}. Returning.")
-                return False
+            status_dir = os.path.join(os.path.dirname(self.__status_file_path), str(self.__test_id))
+            if records is not None:
+                record = records.get(event_filename)
+            else:
+                record = event_records.read_event_record(status_dir, event_filename)
+            if record is None:
+                self.__logger.doErrorLogging(f"Couldn't find status file to log to Influx: {os.path.join(status_dir, event_filename)}. Returning.")
+                return None
+            self.__logger.doDebugLogging(f"Got event record: {record}")
             status_info_dict = {}
-            with open(file_path, 'r') as cur_status_file:
-                line = cur_status_file.readline()
-                line = line.split('\t')
-                self.__logger.doDebugLogging(f"Got line: {line} from status file: {cur_status_file}")
-                # Exclude entry 0 (timestamp) - iso-formatted
-                status_info_dict['event_time'] = line[0]
-                status_info_dict['event_value'] = line[1]
-                status_info_dict['test_id'] = self.__test_id
-                for index in range(2, len(line)):
-                    key, value = line[index].split('=')
-                    # In the case of test_instance, there is a comma-separated list which conflicts with Influx
-                    if ',' in value:
-                        value = f'"{value}"'
-                    status_info_dict[key] = value
+            status_info_dict['event_time'] = record.event_time
+            status_info_dict['event_value'] = record.event_value
+            status_info_dict['test_id'] = self.__test_id
+            for (key, value) in record.fields.items():
+                # In the case of test_instance, there is a comma-separated list which conflicts with Influx
+                if ',' in value:
+                    value = f'"{value}"'
+                status_info_dict[key] = value
 
         self.__logger.doInfoLogging(f"Finished initializing event information")
         if not 'machine' in status_info_dict:
@@ -492,14 +548,14 @@ class StatusFile:
             self.__logger.doInfoLogging("For compatibility, falling back to os.environ[RGT_MACHINE_NAME]")
             if not 'RGT_MACHINE_NAME' in os.environ:
                 self.__logger.doErrorLogging("RGT_MACHINE_NAME not found in os.environ")
-                return False
+                return None
             status_info_dict['machine'] = os.environ['RGT_MACHINE_NAME']
         # Initialize the tags for record string
         influx_event_record_string = 'events'
         for tag_name in StatusFile.INFLUX_TAGS:
             if not tag_name in status_info_dict:
                 self.__logger.doErrorLogging(f"Influx key not found in status_info_dict: {tag_name}. Aborting.")
-                return False
+                return None
             influx_event_record_string += f',{tag_name}={status_info_dict[tag_name]}'
         # Remove the 'test_instance' key, since it contains comma-separated values
         if 'test_instance' in status_info_dict.keys():
@@ -520,6 +576,8 @@ class StatusFile:
                 influx_event_record_string += ' '
             influx_event_record_string += f'{field_name}="{status_info_dict[field_name]}"'
             nkeys += 1
+        # dateutil is slow to import, and only needed for Influx records.
+        import dateutil.parser
         event_time_unix = dateutil.parser.parse(status_info_dict['event_time']).strftime('%s%f') + "000"
 
         # Add handling for pasting outputs to influxdb
@@ -573,34 +631,7 @@ class StatusFile:
             influx_event_record_string += ",output_txt=\"" + StatusFile.NO_VALUE  + "\""
 
         influx_event_record_string += f" {str(event_time_unix)}"
-
-        # Write event to InfluxDB
-        if 'RGT_INFLUX_URI' in os.environ and 'RGT_INFLUX_TOKEN' in os.environ:
-            if 'RGT_DISABLE_INFLUX' in os.environ and str(os.environ['RGT_DISABLE_INFLUX']) == '1':
-                self.__logger.doWarningLogging("InfluxDB logging is explicitly disabled with RGT_DISABLE_INFLUX=1")
-            else:
-                influx_url = os.environ['RGT_INFLUX_URI']
-                influx_token = os.environ['RGT_INFLUX_TOKEN']
-        
-                self.__logger.doInfoLogging(f"Logging event to influx: {influx_event_record_string}")
-                headers = {'Authorization': "Token " + influx_token, 'Content-Type': "text/plain; charset=utf-8", 'Accept': "application/json"}
-
-                try:
-                    if 'RGT_INFLUX_NO_SEND' in os.environ and os.environ['RGT_INFLUX_NO_SEND'] == '1':
-                        print(f"RGT_INFLUX_NO_SEND is set, echoing: {influx_event_record_string}")
-                    elif not 'requests' in sys.modules:
-                        self.__logger.doWarningLogging(f"InfluxDB is currently disabled. Reason: 'requests' module was unable to load. Skipping InfluxDB message: {influx_event_record_string}. This can be logged after the run using the harness --mode influx_log or by POSTing this message to the InfluxDB server.")
-                    else:
-                        r = requests.post(influx_url, data=influx_event_record_string, headers=headers)
-                        if r.status_code == 200 or r.status_code == 204:
-                            self.__logger.doInfoLogging(f"Logged to InfluxDB successfully ({r.status_code}, {r.reason}): {influx_event_record_string}")
-                        else:
-                            self.__logger.doInfoLogging(f"Failed to post request. Response: {r.status_code} - {r.reason}")
-                except requests.exceptions.ConnectionError as e:
-                    self.__logger.doWarningLogging(f"InfluxDB is not reachable. Request not sent: {influx_event_record_string}")
-                except Exception as e:
-                    # TODO: add more graceful handling of unreachable influx servers
-                    self.__logger.doErrorLogging(f"An error occurred {e}")
+        return influx_event_record_string
 
 
     def didAllTestsPass(self):
@@ -615,84 +646,271 @@ class StatusFile:
         """
         ret_value = True
 
-        with open(self.__status_file_path, 'r') as status_file_obj:
-            records = status_file_obj.readlines()
-
         verify_test_passed = lambda a_list : True if a_list.count(StatusFile.PASS) == 3 else False
 
         build_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BUILD]
 
-        for index, line in enumerate(records):
-            if self.ignore_line(line):
-                continue
-
-            words = line.rstrip().split()
+        for words in self._get_all_records():
             tmp_words = words[build_col:]
 
             ret_value = ret_value and verify_test_passed(tmp_words)
 
         return ret_value
 
-    ###################
-    # Private methods #
-    ###################
-    def _subtest_already_initialized(self, unique_id):
-        found_instance = False
+    #-----------------------------------------------------
+    #                                                    -
+    # Storage methods.                                   -
+    #                                                    -
+    # These methods are the only ones that touch the     -
+    # status file records. Subclasses override them to   -
+    # provide a different storage backend, the public    -
+    # methods above are written in terms of them.        -
+    #                                                    -
+    #-----------------------------------------------------
+
+    @classmethod
+    def format_record(cls, words):
+        """Returns the fixed-width status file line for the record words."""
+        return cls.__LINE_FORMAT % tuple(words[0:len(cls.STATUS_COLUMNS)])
 
+    def _read_records(self):
+        """Returns the words of every test instance record in file order."""
         with open(self.__status_file_path, 'r') as status_file_obj:
             records = status_file_obj.readlines()
 
-        unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
-
-        for index, line in enumerate(records):
-            words = line.rstrip().split()
-
+        all_words = []
+        for line in records:
             if self.ignore_line(line):
                 continue
+            words = line.rstrip().split()
+            if len(words) < len(StatusFile.STATUS_COLUMNS):
+                continue
+            all_words.append(words)
+        return all_words
 
-            if len(words) > unique_col:
-                test_id = words[unique_col]
-                if test_id == unique_id:
-                    found_instance = True
+    def _get_record(self, unique_id):
+        """Returns the record words for unique_id, or None if there is no such record."""
+        unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
+        try:
+            with self.__locked_index() as index_obj:
+                location = self.__record_offsets.get(unique_id)
+                if location is None:
+                    return None
+                words = self.__read_record_at(location)
+
+            if len(words) > unique_col and words[unique_col] == unique_id:
+                return words
+
+            # The index is stale, which can only happen if the status file was
+            # modified without updating its index. Fall back to a full scan.
+            if self.__logger:
+                self.__logger.doWarningLogging(f"Status file index {self.__index_path} is stale. Rebuilding it.")
+            with self.__locked_index(exclusive=True) as index_obj:
+                self.__rebuild_index(index_obj)
+        except OSError as error:
+            # A reader who may not write to the Status directory, e.g. another
+            # user running rgt_status, scans the status file instead.
+            if error.errno not in StatusFile.__READ_ONLY_ERRNOS:
+                raise
+        for words in self._read_records():
+            if words[unique_col] == unique_id:
+                return words
+        return None
+
+    def _get_last_record(self):
+        """Returns the words of the last line of the status file, or None if it is a comment."""
+        line = b''
+        with open(self.__status_file_path, "rb") as file_obj:
+            file_size = file_obj.seek(0, os.SEEK_END)
+            chunk_size = StatusFile.__TAIL_CHUNK_SIZE
+            while True:
+                start = max(0, file_size - chunk_size)
+                file_obj.seek(start)
+                lines = file_obj.read(file_size - start).rstrip(b'\n').split(b'\n')
+                if len(lines) > 1 or start == 0:
+                    line = lines[-1]
                     break
+                chunk_size *= 2
+
+        line = line.decode()
+        if self.ignore_line(line):
+            return None
+        return line.rstrip().split()
+
+    def _get_all_records(self):
+        """Returns the words of all test instance records."""
+        return self._read_records()
+
+    def _append_record(self, words):
+        """Adds a new test instance record to the status file."""
+        line = StatusFile.format_record(words).encode()
+        with self.__locked_index(exclusive=True) as index_obj:
+            with open(self.__status_file_path, "ab") as file_obj:
+                offset = file_obj.seek(0, os.SEEK_END)
+                file_obj.write(line)
+
+            unique_id = words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]]
+            self.__record_offsets[unique_id] = (offset, len(line))
+            index_obj.seek(0, os.SEEK_END)
+            index_obj.write(f"{unique_id}\t{offset}\t{len(line)}\n".encode())
+            self.__index_read_offset = index_obj.tell()
+            self.__write_index_header(index_obj)
+
+    def _update_record(self, unique_id, column_values):
+        """Sets the columns of the record for unique_id.
+
+        The record is rewritten in place when its length does not change,
+        which is the usual case for the fixed-width format. Otherwise the
+        whole status file is rewritten and its index rebuilt.
 
-        return found_instance
+        Parameters
+        ----------
+        unique_id : str
+            The unique id of the test instance.
 
-    def __get_harness_id_record(self, harness_id):
-        record = None
-        with open(self.__status_file_path, 'r') as status_file_obj:
-            records = status_file_obj.readlines()
+        column_values : dict
+            Maps a status column index to its new value.
+        """
+        with self.__locked_index(exclusive=True) as index_obj:
+            location = self.__record_offsets.get(unique_id)
+            if location is None:
+                return
+            words = self.__read_record_at(location)
+            for column, value in column_values.items():
+                words[column] = value
+            line = StatusFile.format_record(words).encode()
+
+            (offset, length) = location
+            if len(line) == length:
+                with open(self.__status_file_path, 'r+b') as status_file_obj:
+                    status_file_obj.seek(offset)
+                    status_file_obj.write(line)
+                self.__write_index_header(index_obj)
+            else:
+                with open(self.__status_file_path, 'rb') as status_file_obj:
+                    contents = status_file_obj.read()
+                contents = contents[:offset] + line + contents[offset + length:]
+                with open(self.__status_file_path, 'wb') as status_file_obj:
+                    status_file_obj.write(contents)
+                self.__rebuild_index(index_obj)
 
-        unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
+    ###################
+    # Private methods #
+    ###################
+    def _subtest_already_initialized(self, unique_id):
+        return self._get_record(unique_id) is not None
 
-        for index, line in enumerate(records):
-            if self.ignore_line(line):
-                continue
-            words = line.rstrip().split()
-            if len(words) > unique_col:
-                test_id = words[unique_col]
-                if test_id == harness_id:
-                    record = line
-                    break
+    #----------
 
-        return record
+    @contextlib.contextmanager
+    def __locked_index(self, exclusive=False):
+        """Locks the status file index and brings the in-memory copy up to date.
 
-    def __get_all_harness_id(self):
-        with open(self.__status_file_path, 'r') as status_file_obj:
-            records = status_file_obj.readlines()
+        The index is a sidecar file that maps each unique id to the byte
+        offset and length of its record in the status file. Its header
+        records the status file size and mtime at the last update of the
+        index; the index is rebuilt by a full scan when they do not match
+        the status file, e.g. after the status file was edited by hand.
 
+        A shared lock only opens the index for reading, and opens it for
+        writing if it must be created or rebuilt.
+        """
+        index_obj = self.__open_index(writable=exclusive)
+        try:
+            fcntl.flock(index_obj, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            if not exclusive and not self.__sync_index(index_obj):
+                index_obj.close()
+                index_obj = self.__open_index(writable=True)
+                exclusive = True
+                fcntl.flock(index_obj, fcntl.LOCK_EX)
+            if exclusive and not self.__sync_index(index_obj):
+                self.__rebuild_index(index_obj)
+            yield index_obj
+        finally:
+            # Closing the index releases its lock.
+            index_obj.close()
+
+    def __open_index(self, writable):
+        """Opens the status file index, for writing if writable or if it does not exist."""
+        if not writable:
+            try:
+                return open(self.__index_path, 'rb')
+            except FileNotFoundError:
+                pass
+        fd = os.open(self.__index_path, os.O_RDWR | os.O_CREAT, 0o664)
+        return os.fdopen(fd, 'r+b')
+
+    def __get_status_file_signature(self):
+        stat_ = os.stat(self.__status_file_path)
+        return (stat_.st_size, stat_.st_mtime_ns)
+
+    def __sync_index(self, index_obj):
+        """Reads new index entries, returns False if the index must be rebuilt."""
+        index_obj.seek(0)
+        header = index_obj.readline().split()
+        if len(header) != 6:
+            return False
+        (generation, size, mtime_ns) = (int(header[3]), int(header[4]), int(header[5]))
+        if (size, mtime_ns) != self.__get_status_file_signature():
+            return False
+
+        if generation != self.__index_generation:
+            self.__index_generation = generation
+            self.__record_offsets = {}
+            self.__index_read_offset = len(StatusFile.__INDEX_HEADER_FORMAT % (0, 0, 0))
+
+        index_obj.seek(self.__index_read_offset)
+        data = index_obj.read()
+        end = data.rfind(b'\n')
+        if end >= 0:
+            self.__index_read_offset += end + 1
+            for entry in data[:end].decode().split('\n'):
+                (unique_id, offset, length) = entry.split('\t')
+                self.__record_offsets[unique_id] = (int(offset), int(length))
+        return True
+
+    def __rebuild_index(self, index_obj):
+        """Rebuilds the index with a full scan of the status file."""
         unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
-
-        harness_ids = []
-        for index, line in enumerate(records):
-            if self.ignore_line(line):
-                continue
-            words = line.rstrip().split()
-            if len(words) > unique_col:
-                test_id = words[unique_col]
-                harness_ids.append(test_id)
-
-        return harness_ids
+        record_offsets = {}
+        entries = []
+        offset = 0
+        with open(self.__status_file_path, 'rb') as status_file_obj:
+            for line in status_file_obj:
+                text = line.decode()
+                if not self.ignore_line(text):
+                    words = text.split()
+                    if len(words) >= len(StatusFile.STATUS_COLUMNS):
+                        record_offsets[words[unique_col]] = (offset, len(line))
+                        entries.append(f"{words[unique_col]}\t{offset}\t{len(line)}\n")
+                offset += len(line)
+
+        index_obj.seek(0)
+        header = index_obj.readline().split()
+        generation = int(header[3]) + 1 if len(header) == 6 else 1
+
+        index_obj.seek(0)
+        index_obj.truncate()
+        index_obj.write((StatusFile.__INDEX_HEADER_FORMAT % (generation, 0, 0)).encode())
+        index_obj.write(''.join(entries).encode())
+        self.__index_read_offset = index_obj.tell()
+        self.__index_generation = generation
+        self.__record_offsets = record_offsets
+        self.__write_index_header(index_obj)
+
+    def __write_index_header(self, index_obj):
+        """Records the current status file size and mtime in the index header."""
+        (size, mtime_ns) = self.__get_status_file_signature()
+        index_obj.seek(0)
+        index_obj.write((StatusFile.__INDEX_HEADER_FORMAT % (self.__index_generation, size, mtime_ns)).encode())
+        index_obj.flush()
+
+    def __read_record_at(self, location):
+        (offset, length) = location
+        with open(self.__status_file_path, 'rb') as status_file_obj:
+            status_file_obj.seek(offset)
+            line = status_file_obj.read(length)
+        return line.decode().rstrip().split()
 
     def __log_event(self, event_id, event_filename, event_type, event_subtype,
                     event_value, event_time = None):
@@ -709,9 +927,12 @@ class StatusFile:
 
 
         # THE FOLLOWING FORMS THE OFFICIAL TEXT DESCRIBING THE EVENT.
+        if self.__test_instance is None or self.__test_instance.test_id != self.__test_id:
+            self.__test_instance = TestInstanceInfo(self.__test_id)
         status_info = get_status_info(self.__test_id, event_type,
                                       event_subtype, event_value,
-                                      event_time, event_filename)
+                                      event_time, event_filename,
+                                      test_instance=self.__test_instance)
         event_record_string = event_time + '\t' + event_value
         status_info_dict = {}
         for key_value in status_info:
@@ -724,14 +945,11 @@ class StatusFile:
         # (atomically) rename it to the permanent file,
         # to avoid possibility of a partially completed file.
 
-        dir_head = os.path.split(os.getcwd())[0]
-        file_path = os.path.join(dir_head, apptest_layout.test_status_dirname, str(self.__test_id),
-                                 event_filename)
+        file_path = os.path.join(self.__test_instance.status_dir, event_filename)
         if os.path.exists(file_path):
             self.__logger.doWarningLogging('Warning: event log file already exists. ' + file_path)
 
-        file_path_partial = os.path.join(dir_head, apptest_layout.test_status_dirname,
-                                         str(self.__test_id),
+        file_path_partial = os.path.join(self.__test_instance.status_dir,
                                          'partial.' + event_filename)
 
         file_ = open(file_path_partial, 'w')
@@ -742,6 +960,12 @@ class StatusFile:
         # THAT THE EVENT OCCURRED.
         os.rename(file_path_partial, file_path)
 
+        # With RGT_EVENT_JSONL, the event is also appended to events.jsonl.
+        if event_records.is_event_jsonl_enabled():
+            event_records.append_event_record(self.__test_instance.status_dir,
+                                              event_records.EventRecord(event_filename, event_time,
+                                                                        event_value, status_info_dict))
+
         # Put the same event data on the system log.
 
         write_system_log(self.__test_id, status_info)
@@ -768,7 +992,7 @@ class StatusFile:
 
     #----------
 
-    def __create_status_file(self,path_to_status_file):
+    def _create_status_file(self,path_to_status_file):
         """Create the status file for this app/test if it doesn't exist."""
         if not os.path.exists(path_to_status_file):
             with open(self.__status_file_path, "w") as file_obj :
@@ -779,167 +1003,219 @@ class StatusFile:
     def __status_file_add_result(self, event_value, mode):
         """Update the status file to reflect a new event."""
 
-        #---Read the status file.
-        status_file = open(self.__status_file_path, 'r')
-        records = status_file.readlines()
-        status_file.close()
-        #event_time = datetime.datetime.now().isoformat()
+        column_values = {}
 
-        for index, line in enumerate(records):
+        if mode == 'Add_Job_ID':
+            batch_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]
+            column_values[batch_col] = event_value
 
-            # Get the uid for this run instance
+        if mode == 'Add_Build_Result':
+            build_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BUILD]
+            column_values[build_col] = event_value
 
-            words = line.rstrip().split()
+        if mode == 'Add_Run_Count':
+            count_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_COUNT]
+            column_values[count_col] = event_value
 
-            if len(words) < len(StatusFile.STATUS_COLUMNS):
-                continue
+        if mode == 'Add_Submit_Result':
+            submit_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_SUBMIT]
+            column_values[submit_col] = event_value
 
-            test_id = words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]]
+        if mode == 'Add_Run_Result':
+            check_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]
+            column_values[check_col] = event_value
 
-            if test_id != self.__test_id:
-                continue
+        if mode in ('Add_Binary_Running', 'Add_Run_Aborning'):
+            check_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]
+            column_values[check_col] = event_value
 
-            if mode == 'Add_Job_ID':
-                batch_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]
-                words[batch_col] = event_value
+            path2 = os.path.join(self.__test_instance.status_dir,
+                                 apptest_layout.job_status_filename)
+            with open(path2, 'w') as file_obj2:
+                file_obj2.write(event_value)
 
-            if mode == 'Add_Build_Result':
-                build_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BUILD]
-                words[build_col] = event_value
+        self._update_record(self.__test_id, column_values)
 
-            if mode == 'Add_Run_Count':
-                count_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_COUNT]
-                words[count_col] = event_value
+    #----------
 
-            if mode == 'Add_Submit_Result':
-                submit_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_SUBMIT]
-                words[submit_col] = event_value
+    def __status_file_add_test_instance(self, event_time, launch_id, unique_id):
+        """Start new line in master status file for app/test."""
 
-            if mode == 'Add_Run_Result':
-                check_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]
-                words[check_col] = event_value
+        self._append_record([event_time, launch_id, unique_id, StatusFile.PLACE_HOLDER,
+                             StatusFile.PLACE_HOLDER, StatusFile.PLACE_HOLDER,
+                             StatusFile.PLACE_HOLDER, StatusFile.PLACE_HOLDER])
 
-            if mode == 'Add_Binary_Running':
-                binary_running_value = event_value
+#------------------------------------------------------------------------------
 
-                check_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]
-                words[check_col] = binary_running_value
+class TestInstanceInfo:
+    """The fields of the status info that are fixed for a test instance.
 
-                dir_head = os.path.split(os.getcwd())[0]
-                path2 = os.path.join(dir_head, apptest_layout.test_status_dirname, test_id,
-                                     apptest_layout.job_status_filename)
-                file_obj2 = open(path2, 'w')
-                file_obj2.write(binary_running_value)
-                file_obj2.close()
+    The fields that depend only on the test instance, the environment and
+    the current directory are computed once. The files that may change over
+    the lifetime of the instance (check alias, job id and job status) are
+    re-read only when their mtime or size changes.
+    """
 
-            if mode == 'Add_Run_Aborning':
-                aborning_run_value = event_value
-                check_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]
-                words[check_col] = aborning_run_value
-
-                dir_head = os.path.split(os.getcwd())[0]
-                path2 = os.path.join(dir_head, apptest_layout.test_status_dirname, test_id,
-                                     apptest_layout.job_status_filename)
-                file_obj2 = open(path2, 'w')
-                file_obj2.write(aborning_run_value)
-                file_obj2.close()
-
-            records[index] = StatusFile.__LINE_FORMAT % (
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_START]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_LAUNCH]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_COUNT]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BUILD]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_SUBMIT]],
-                words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_CHECK]])
-
-        #---Update the status file.
-        status_file = open(self.__status_file_path, 'w')
-        status_file.writelines(records)
-        status_file.close()
+    ###################
+    # Special methods #
+    ###################
 
-    #----------
+    def __init__(self, test_id):
+        """Constructor.
 
-    def __status_file_add_test_instance(self, event_time, launch_id, unique_id):
-        """Start new line in master status file for app/test."""
+        Parameters
+        ----------
+        test_id : str
+            The unique id of the test instance.
+        """
+        no_value = StatusFile.NO_VALUE
+
+        test_instance_info = {}
+
+        test_instance_info['user'] = os.environ['USER']
+        test_instance_info['hostname'] = socket.gethostname()
+        test_instance_info['cwd'] = os.getcwd()
+
+        (dir_head1, dir_scripts) = os.path.split(test_instance_info['cwd'])
+        assert dir_scripts == apptest_layout.test_scripts_dirname, (
+            'harness function being executed from wrong directory.')
+        (dir_head2, test_) = os.path.split(dir_head1)
+        test_instance_info['test'] = test_
+        test_instance_info['app'] = os.path.split(dir_head2)[1]
+        test_instance_info['test_id'] = test_id
+        test_instance_info['test_instance'] = (
+            test_instance_info['app'] + ',' +
+            test_instance_info['test'] + ',' +
+            test_instance_info['test_id'])
+
+        dir_status = os.path.join(dir_head1, apptest_layout.test_status_dirname)
+        dir_status_this_test = os.path.join(dir_status, test_id)
+
+        run_archive_all = os.path.join(dir_head1, apptest_layout.test_run_archive_dirname)
+        test_instance_info['run_archive'] = os.path.join(run_archive_all, test_id)
+
+        test_instance_info['rgt_path_to_sspace'] = os.environ['RGT_PATH_TO_SSPACE']
+
+        test_instance_info['build_directory'] = os.path.join(
+            test_instance_info['rgt_path_to_sspace'],
+            test_instance_info['app'],
+            test_instance_info['test'],
+            test_instance_info['test_id'], apptest_layout.test_build_dirname)
+
+        test_instance_info['machine'] = os.environ['RGT_MACHINE_NAME'] if 'RGT_MACHINE_NAME' in os.environ else no_value
+
+        test_instance_info['workdir'] = os.path.join(
+            test_instance_info['rgt_path_to_sspace'],
+            test_instance_info['app'],
+            test_instance_info['test'],
+            test_instance_info['test_id'], apptest_layout.test_run_dirname)
+
+        job_account = no_value
+        if 'RGT_PROJECT_ID' in os.environ:
+            job_account = os.environ['RGT_PROJECT_ID']
+        elif 'RGT_ACCT_ID' in os.environ:
+            job_account = os.environ['RGT_ACCT_ID']
+        test_instance_info['job_account_id'] = job_account
+
+        test_instance_info['path_to_rgt_package'] = (
+            os.environ['PATH_TO_RGT_PACKAGE']
+            if 'PATH_TO_RGT_PACKAGE' in os.environ else no_value)
+
+        test_instance_info['rgt_system_log_tag'] = (
+            os.environ['RGT_SYSTEM_LOG_TAG']
+            if 'RGT_SYSTEM_LOG_TAG' in os.environ else no_value)
 
-        with open(self.__status_file_path, "a") as file_obj:
-            format_ = StatusFile.__LINE_FORMAT % (
-                event_time, launch_id, unique_id, StatusFile.PLACE_HOLDER,
-                StatusFile.PLACE_HOLDER, StatusFile.PLACE_HOLDER,
-                StatusFile.PLACE_HOLDER, StatusFile.PLACE_HOLDER)
-            file_obj.write(format_)
+        self.__test_id = test_id
+        self.__path_to_test = dir_head1
+        self.__status_dir = dir_status_this_test
+        self.__test_instance_info = test_instance_info
 
-#------------------------------------------------------------------------------
+        # Maps the path of each per-instance file to ((mtime_ns, size), first line).
+        self.__file_cache = {}
+        self.__check_alias_file = os.path.join(run_archive_all, test_id, 'check_alias.txt')
+        self.__job_id_file = os.path.join(dir_status_this_test, apptest_layout.job_id_filename)
+        self.__job_status_file = os.path.join(dir_status_this_test, apptest_layout.job_status_filename)
 
-def get_status_info(test_id, event_type, event_subtype,
-                    event_value, event_time, event_filename):
-    """Create a data structure with verbose info for an event."""
+    ###################
+    # Public methods  #
+    ###################
 
-    no_value = StatusFile.NO_VALUE
+    @property
+    def test_id(self):
+        """str: The unique id of the test instance."""
+        return self.__test_id
 
-    #---Set up dicts to capture info.
+    @property
+    def path_to_test(self):
+        """str: The path to the app/test directory."""
+        return self.__path_to_test
 
-    test_instance_info = {}
-    event_info = {}
+    @property
+    def status_dir(self):
+        """str: The path to the Status directory of the test instance."""
+        return self.__status_dir
 
-    #---Construct fields to be used for log entry.
+    @property
+    def fields(self):
+        """dict: The values of the FIELDS_PER_TEST_INSTANCE fields."""
+        return self.__test_instance_info
 
-    test_instance_info['user'] = os.environ['USER']
-    test_instance_info['hostname'] = socket.gethostname()
-    test_instance_info['cwd'] = os.getcwd()
+    def get_check_alias(self):
+        """Returns the check alias of the test instance."""
+        return self.__read_first_line(self.__check_alias_file)
 
-    (dir_head1, dir_scripts) = os.path.split(test_instance_info['cwd'])
-    assert dir_scripts == apptest_layout.test_scripts_dirname, (
-        'harness function being executed from wrong directory.')
-    (dir_head2, test_) = os.path.split(dir_head1)
-    test_instance_info['test'] = test_
-    test_instance_info['app'] = os.path.split(dir_head2)[1]
-    test_instance_info['test_id'] = test_id
-    test_instance_info['test_instance'] = (
-        test_instance_info['app'] + ',' +
-        test_instance_info['test'] + ',' +
-        test_instance_info['test_id'])
+    def get_job_id(self):
+        """Returns the batch job id of the test instance."""
+        return re.sub(' ', '', self.__read_first_line(self.__job_id_file))
 
-    dir_status = os.path.join(dir_head1, apptest_layout.test_status_dirname)
-    dir_status_this_test = os.path.join(dir_status, test_id)
+    def get_job_status(self):
+        """Returns the job status of the test instance."""
+        return re.sub(' ', '', self.__read_first_line(self.__job_status_file))
 
-    run_archive_all = os.path.join(dir_head1, apptest_layout.test_run_archive_dirname)
-    test_instance_info['run_archive'] = os.path.join(run_archive_all, test_id)
+    ###################
+    # Private methods #
+    ###################
 
-    test_instance_info['rgt_path_to_sspace'] = os.environ['RGT_PATH_TO_SSPACE']
+    def __read_first_line(self, path):
+        try:
+            stat_ = os.stat(path)
+        except FileNotFoundError:
+            return StatusFile.NO_VALUE
+
+        signature = (stat_.st_mtime_ns, stat_.st_size)
+        cached = self.__file_cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with open(path, 'r') as file_:
+            first_line = file_.read().split('\n')[0]
+        self.__file_cache[path] = (signature, first_line)
+        return first_line
+
+#------------------------------------------------------------------------------
 
-    test_instance_info['build_directory'] = os.path.join(
-        test_instance_info['rgt_path_to_sspace'],
-        test_instance_info['app'],
-        test_instance_info['test'],
-        test_instance_info['test_id'], apptest_layout.test_build_dirname)
+def get_status_info(test_id, event_type, event_subtype,
+                    event_value, event_time, event_filename,
+                    test_instance=None):
+    """Create a data structure with verbose info for an event.
 
-    test_instance_info['machine'] = os.environ['RGT_MACHINE_NAME'] if 'RGT_MACHINE_NAME' in os.environ else no_value
+    Parameters
+    ----------
+    test_instance : TestInstanceInfo
+        The cached per-instance fields of test_id. If None, they are computed
+        for this call.
+    """
 
-    test_instance_info['workdir'] = os.path.join(
-        test_instance_info['rgt_path_to_sspace'],
-        test_instance_info['app'],
-        test_instance_info['test'],
-        test_instance_info['test_id'], apptest_layout.test_run_dirname)
+    no_value = StatusFile.NO_VALUE
 
-    job_account = no_value
-    if 'RGT_PROJECT_ID' in os.environ:
-        job_account = os.environ['RGT_PROJECT_ID']
-    elif 'RGT_ACCT_ID' in os.environ:
-        job_account = os.environ['RGT_ACCT_ID']
-    test_instance_info['job_account_id'] = job_account
+    if test_instance is None:
+        test_instance = TestInstanceInfo(test_id)
 
-    test_instance_info['path_to_rgt_package'] = (
-        os.environ['PATH_TO_RGT_PACKAGE']
-        if 'PATH_TO_RGT_PACKAGE' in os.environ else no_value)
+    test_instance_info = test_instance.fields
 
-    test_instance_info['rgt_system_log_tag'] = (
-        os.environ['RGT_SYSTEM_LOG_TAG']
-        if 'RGT_SYSTEM_LOG_TAG' in os.environ else no_value)
+    #---Set up dicts to capture info.
 
-    #---
+    event_info = {}
 
     event_info['event_name'] = event_type + '_' + event_subtype
     event_info['event_type'] = event_type
@@ -951,32 +1227,9 @@ def get_status_info(test_id, event_type, event_subtype,
 
     event_info['runtag'] = test_instance_info['rgt_system_log_tag']
 
-    file_check_alias = os.path.join(run_archive_all, test_id, 'check_alias.txt')
-    if os.path.exists(file_check_alias):
-        file_ = open(file_check_alias, 'r')
-        check_alias_ = file_.read()
-        file_.close()
-        event_info['check_alias'] = check_alias_.split('\n')[0]
-    else:
-        event_info['check_alias'] = no_value
-
-    file_job_id = os.path.join(dir_status_this_test, apptest_layout.job_id_filename)
-    if os.path.exists(file_job_id):
-        file_ = open(file_job_id, 'r')
-        job_id_ = file_.read()
-        file_.close()
-        event_info['job_id'] = re.sub(' ', '', job_id_.split('\n')[0])
-    else:
-        event_info['job_id'] = no_value
-
-    file_job_status = os.path.join(dir_status_this_test, apptest_layout.job_status_filename)
-    if os.path.exists(file_job_status):
-        file_ = open(file_job_status, 'r')
-        job_status_ = file_.read()
-        file_.close()
-        event_info['job_status'] = re.sub(' ', '', job_status_.split('\n')[0])
-    else:
-        event_info['job_status'] = no_value
+    event_info['check_alias'] = test_instance.get_check_alias()
+    event_info['job_id'] = test_instance.get_job_id()
+    event_info['job_status'] = test_instance.get_job_status()
 
     #---Construct status_info.
 
@@ -1041,9 +1294,9 @@ def write_system_log(test_id, status_info):
         os.system('logger -p local0.notice "' + log_string + '"')
 
     else:
-        dir_head1 = os.path.split(os.getcwd())[0]
-        (dir_head2, test) = os.path.split(dir_head1)
-        app = os.path.split(dir_head2)[1]
+        status_info_dict = dict(status_info)
+        app = status_info_dict['app']
+        test = status_info_dict['test']
 
         log_file = (app + '_#_' +
                     test + '_#_' +
@@ -1057,6 +1310,30 @@ def write_system_log(test_id, status_info):
 
 #------------------------------------------------------------------------------
 
+def read_status_file_lines(path_to_status_file):
+    """Returns the lines of the status file.
+
+    If the status file is journaled then the journal is applied to the
+    records, and the returned lines are the fixed-width view the status file
+    will have after its next compaction. If the status file is sharded then
+    the returned lines are the merged view of the status file and the
+    shards of its test instances.
+    """
+    from libraries.status_file_journal import journal_exists, read_journaled_records
+    from libraries.status_file_shard import shards_exist, read_sharded_records
+
+    if journal_exists(path_to_status_file):
+        return [StatusFile.format_record(words) for words in read_journaled_records(path_to_status_file)]
+
+    if shards_exist(path_to_status_file):
+        return [StatusFile.format_record(words) for words in read_sharded_records(path_to_status_file)]
+
+    with open(path_to_status_file, 'r') as sfile_obj:
+        sfile_lines = sfile_obj.readlines()
+    return sfile_lines
+
+#------------------------------------------------------------------------------
+
 def parse_status_file(path_to_status_file, startdate, enddate,
                       mycomputer_with_events_record):
     """Function: parse_status_file. Parser for rgt_status_file.txt"""
@@ -1078,9 +1355,7 @@ def parse_status_file(path_to_status_file, startdate, enddate,
     else:
         return shash
 
-    sfile_obj = open(path_to_status_file, 'r')
-    sfile_lines = sfile_obj.readlines()
-    sfile_obj.close()
+    sfile_lines = read_status_file_lines(path_to_status_file)
 
     start_col  = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_START]
     batch_col  = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]
@@ -1145,9 +1420,7 @@ def parse_status_file2(path_to_status_file):
     if not os.path.exists(path_to_status_file):
         return shash
 
-    sfile_obj = open(path_to_status_file, 'r')
-    sfile_lines = sfile_obj.readlines()
-    sfile_obj.close()
+    sfile_lines = read_status_file_lines(path_to_status_file)
 
     build_col  = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BUILD]
     submit_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_SUBMIT]
@@ -1190,9 +1463,7 @@ def parse_status_file2(path_to_status_file):
 def summarize_status_file(path_to_status_file, startdate, enddate,
                           mycomputer_with_events_record):
     """Parse, collect summary info from rgt_status.txt."""
-    sfile_obj = open(path_to_status_file, 'r')
-    sfile_lines = sfile_obj.readlines()
-    sfile_obj.close()
+    sfile_lines = read_status_file_lines(path_to_status_file)
 
     number_of_tests = 0
     number_of_passed_tests = 0
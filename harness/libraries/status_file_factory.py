@@ -2,10 +2,13 @@
 """The factory class creating StatusFile objects."""
 
 # Python imports
+import os
 import sys
 
 # Harness imports
 from libraries.status_file import StatusFile
+from libraries.status_file_journal import JournaledStatusFile, journal_exists
+from libraries.status_file_shard import ShardedStatusFile, shards_exist
 
 class StatusFileFactory:
     """This is the factory class of StatusFile objects."""
@@ -15,13 +18,26 @@ class StatusFileFactory:
     # Class attributes and methods.                      -
     #                                                    -
     #-----------------------------------------------------
+    BACKEND_FIXED_WIDTH = 'fixed_width'
+    BACKEND_JOURNAL = 'journal'
+    BACKEND_SHARDED = 'sharded'
+
+    BACKENDS = {BACKEND_FIXED_WIDTH : StatusFile,
+                BACKEND_JOURNAL : JournaledStatusFile,
+                BACKEND_SHARDED : ShardedStatusFile}
+
     @classmethod
     def create(cls,path_to_status_file=None,logger=None, test_id=None):
         """ Returns a StatusFile object.
 
         Notes
         -----
-        This factory method is called if we are creating a StatusFile object
+        This factory method is called if we are creating a StatusFile object.
+        The backend is selected with the environment variable
+        RGT_STATUS_FILE_BACKEND, which is either 'fixed_width' (the default),
+        'journal' or 'sharded'. A status file that already has a journal, or
+        shards, is always opened with the journal, or sharded, backend so
+        that every process working on the same test sees the same records.
 
         Parameters
         ----------
@@ -32,9 +48,19 @@ class StatusFileFactory:
         -------
         StatusFile
         """
-        a_status_file = StatusFile(logger=logger,
-                                   path_to_status_file=path_to_status_file,
-                                   test_id=test_id)
+        backend = os.getenv('RGT_STATUS_FILE_BACKEND', cls.BACKEND_FIXED_WIDTH)
+        if journal_exists(path_to_status_file):
+            backend = cls.BACKEND_JOURNAL
+        elif shards_exist(path_to_status_file):
+            backend = cls.BACKEND_SHARDED
+
+        if backend not in cls.BACKENDS:
+            raise ValueError(f"Unknown status file backend RGT_STATUS_FILE_BACKEND={backend}. "
+                             f"Valid backends are {list(cls.BACKENDS.keys())}.")
+
+        a_status_file = cls.BACKENDS[backend](logger=logger,
+                                              path_to_status_file=path_to_status_file,
+                                              test_id=test_id)
 
         return a_status_file
 
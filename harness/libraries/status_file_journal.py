@@ -0,0 +1,289 @@
+#! /usr/bin/env python3
+"""Append-only journal backend for the subtest status file.
+
+The fixed-width status file is rewritten in full for every status column
+update. For tests with a long history this makes every logged event cost
+O(N) I/O on the (usually parallel) filesystem holding the test.
+
+The journaled status file instead appends one short line per new test
+instance or column update to a journal that lives next to the status file.
+The records are kept in an in-memory index that is refreshed incrementally
+from the journal offset, and the journal is periodically compacted back into
+the fixed-width status file so that it remains the human readable view.
+
+Journal line formats (tab separated)::
+
+    N <start> <launch id> <unique id> <count> <batch id> <build> <submit> <check>
+    U <unique id> <column index> <value>
+"""
+
+# Python imports
+import fcntl
+import os
+
+# Harness imports
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.status_file import StatusFile
+
+def get_path_to_journal(path_to_status_file):
+    """Returns the path to the journal of the status file."""
+    return os.path.join(os.path.dirname(path_to_status_file),
+                        apptest_layout.test_status_journal_filename)
+
+def journal_exists(path_to_status_file):
+    """Returns True if the status file has a journal."""
+    if path_to_status_file is None:
+        return False
+    return os.path.exists(get_path_to_journal(path_to_status_file))
+
+def read_journaled_records(path_to_status_file):
+    """Returns the words of all status records with the journal applied."""
+    a_index = StatusJournalIndex(path_to_status_file)
+    a_index.refresh()
+    return a_index.all_records()
+
+class StatusJournalIndex:
+    """In-memory index of the status records of a journaled status file.
+
+    The index is keyed by unique id and preserves the order in which the
+    test instances were added. It is refreshed by reading only the journal
+    bytes appended since the last refresh; a full rebuild is done when the
+    status file was compacted by another process.
+    """
+
+    JOURNAL_RECORD_NEW = 'N'
+    JOURNAL_RECORD_UPDATE = 'U'
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, path_to_status_file):
+        self.__status_file_path = path_to_status_file
+        self.__journal_path = get_path_to_journal(path_to_status_file)
+        self.__records = {}
+        self.__status_signature = None
+        self.__journal_inode = None
+        self.__journal_offset = 0
+        self.__journal_entries = 0
+
+    ###################
+    # Public methods  #
+    ###################
+
+    @property
+    def journal_entries(self):
+        """int: The number of journal entries not yet compacted."""
+        return self.__journal_entries
+
+    def refresh(self, locked=False):
+        """Brings the index up to date with the status file and journal.
+
+        The status file and journal are checked and read under a shared
+        lock of the journal, so a compaction by another process is never
+        seen half done.
+
+        Parameters
+        ----------
+        locked : bool
+            True if the caller already holds the journal lock.
+        """
+        lock_obj = None
+        if not locked:
+            try:
+                lock_obj = open(self.__journal_path, 'r')
+            except FileNotFoundError:
+                pass
+            else:
+                fcntl.flock(lock_obj, fcntl.LOCK_SH)
+        try:
+            status_signature = self.__get_status_signature()
+            try:
+                journal_stat = os.stat(self.__journal_path)
+            except FileNotFoundError:
+                journal_stat = None
+
+            if ( (status_signature != self.__status_signature) or
+                 (journal_stat is None) or
+                 (journal_stat.st_ino != self.__journal_inode) or
+                 (journal_stat.st_size < self.__journal_offset) ):
+                self.__rebuild()
+            elif journal_stat.st_size > self.__journal_offset:
+                self.__read_journal()
+        finally:
+            if lock_obj is not None:
+                fcntl.flock(lock_obj, fcntl.LOCK_UN)
+                lock_obj.close()
+
+    def reset_to_compacted(self):
+        """Records that the journal was compacted into the status file by this process."""
+        self.__status_signature = self.__get_status_signature()
+        self.__journal_inode = os.stat(self.__journal_path).st_ino
+        self.__journal_offset = 0
+        self.__journal_entries = 0
+
+    def get_record(self, unique_id):
+        """Returns the record words for unique_id or None."""
+        return self.__records.get(unique_id)
+
+    def last_record(self):
+        """Returns the words of the last record or None if there are no records."""
+        if len(self.__records) == 0:
+            return None
+        return self.__records[next(reversed(self.__records))]
+
+    def all_records(self):
+        """Returns the words of all records in the order they were added."""
+        return list(self.__records.values())
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __get_status_signature(self):
+        try:
+            stat_ = os.stat(self.__status_file_path)
+        except FileNotFoundError:
+            return None
+        return (stat_.st_ino, stat_.st_size, stat_.st_mtime_ns)
+
+    def __rebuild(self):
+        self.__records = {}
+        self.__journal_offset = 0
+        self.__journal_entries = 0
+        self.__journal_inode = None
+
+        self.__status_signature = self.__get_status_signature()
+        if self.__status_signature is not None:
+            with open(self.__status_file_path, 'r') as status_file_obj:
+                for line in status_file_obj:
+                    if StatusFile.ignore_line(line):
+                        continue
+                    words = line.split()
+                    if len(words) < len(StatusFile.STATUS_COLUMNS):
+                        continue
+                    self.__records[words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]]] = words
+        if os.path.exists(self.__journal_path):
+            self.__journal_inode = os.stat(self.__journal_path).st_ino
+            self.__read_journal()
+
+    def __read_journal(self):
+        with open(self.__journal_path, 'rb') as journal_obj:
+            journal_obj.seek(self.__journal_offset)
+            data = journal_obj.read()
+
+        # A concurrent writer may be in the middle of appending a line, so
+        # only consume complete lines.
+        end = data.rfind(b'\n')
+        if end < 0:
+            return
+        self.__journal_offset += end + 1
+
+        for line in data[:end].decode().split('\n'):
+            self.__apply(line.split('\t'))
+            self.__journal_entries += 1
+
+    def __apply(self, fields):
+        if fields[0] == StatusJournalIndex.JOURNAL_RECORD_NEW:
+            words = fields[1:]
+            if len(words) == len(StatusFile.STATUS_COLUMNS):
+                unique_id = words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]]
+                self.__records.setdefault(unique_id, words)
+        elif fields[0] == StatusJournalIndex.JOURNAL_RECORD_UPDATE and len(fields) == 4:
+            words = self.__records.get(fields[1])
+            if words is not None:
+                words[int(fields[2])] = fields[3]
+
+class JournaledStatusFile(StatusFile):
+    """A StatusFile that journals status updates instead of rewriting the status file.
+
+    The journal is compacted into the fixed-width status file once it holds
+    RGT_STATUS_JOURNAL_COMPACT_THRESHOLD entries (default 500).
+    """
+
+    DEFAULT_COMPACTION_THRESHOLD = 500
+    """int: Number of journal entries that triggers a compaction."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, logger, path_to_status_file, test_id=None):
+        self.__journal_path = get_path_to_journal(path_to_status_file)
+        self.__index = StatusJournalIndex(path_to_status_file)
+        self.__compaction_threshold = int(os.getenv('RGT_STATUS_JOURNAL_COMPACT_THRESHOLD',
+                                                    JournaledStatusFile.DEFAULT_COMPACTION_THRESHOLD))
+        super().__init__(logger, path_to_status_file, test_id=test_id)
+
+    ###################
+    # Public methods  #
+    ###################
+
+    @property
+    def journal_path(self):
+        return self.__journal_path
+
+    def compact(self):
+        """Folds the journal into the fixed-width status file and truncates the journal."""
+        with open(self.__journal_path, 'r+') as journal_obj:
+            fcntl.flock(journal_obj, fcntl.LOCK_EX)
+            try:
+                self.__index.refresh(locked=True)
+                path_tmp = self.status_file_path + '.compact.' + str(os.getpid())
+                with open(path_tmp, 'w') as file_obj:
+                    file_obj.write(StatusFile.header)
+                    for words in self.__index.all_records():
+                        file_obj.write(StatusFile.format_record(words))
+                os.replace(path_tmp, self.status_file_path)
+                journal_obj.truncate(0)
+                self.__index.reset_to_compacted()
+            finally:
+                fcntl.flock(journal_obj, fcntl.LOCK_UN)
+
+    ###################
+    # Storage methods #
+    ###################
+
+    def _create_status_file(self, path_to_status_file):
+        super()._create_status_file(path_to_status_file)
+        if not os.path.exists(self.__journal_path):
+            with open(self.__journal_path, 'a'):
+                pass
+
+    def _get_record(self, unique_id):
+        self.__index.refresh()
+        return self.__index.get_record(unique_id)
+
+    def _get_last_record(self):
+        self.__index.refresh()
+        return self.__index.last_record()
+
+    def _get_all_records(self):
+        self.__index.refresh()
+        return self.__index.all_records()
+
+    def _append_record(self, words):
+        self.__append_journal([StatusJournalIndex.JOURNAL_RECORD_NEW] + list(words))
+
+    def _update_record(self, unique_id, column_values):
+        lines = [[StatusJournalIndex.JOURNAL_RECORD_UPDATE, unique_id, str(column), value]
+                 for column, value in column_values.items()]
+        self.__append_journal(*lines)
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __append_journal(self, *lines):
+        text = ''.join('\t'.join(fields) + '\n' for fields in lines)
+        with open(self.__journal_path, 'a') as journal_obj:
+            fcntl.flock(journal_obj, fcntl.LOCK_EX)
+            try:
+                journal_obj.write(text)
+                journal_obj.flush()
+            finally:
+                fcntl.flock(journal_obj, fcntl.LOCK_UN)
+
+        self.__index.refresh()
+        if self.__index.journal_entries >= self.__compaction_threshold:
+            self.compact()
@@ -0,0 +1,300 @@
+#! /usr/bin/env python3
+"""Sharded backend for the subtest status file.
+
+With the fixed-width and journal backends every test instance of an app/test
+writes to the same status file, or journal, in the Status directory. The
+test instances of resubmission chains and overlapping launches then all
+contend for it.
+
+The sharded status file instead keeps the record of each test instance in a
+shard of its own, Status/<unique id>/rgt_status_shard.txt. Only the
+processes of that test instance write to the shard, and they only append
+one short line per update, so the writers of different test instances never
+touch the same file and no update is lost. The merged view of all records
+is built lazily by the readers, e.g. parse_status_file2 through
+read_status_file_lines.
+
+The records of rgt_status.txt written before the test switched to the
+sharded backend are kept, and a record that is updated after the switch is
+copied to its shard first.
+
+Every write to a shard also touches the marker file of the sharded status
+file, so a reader only scans the shards again once the marker or the Status
+directory changed.
+
+Shard line formats (tab separated)::
+
+    N <start> <launch id> <unique id> <count> <batch id> <build> <submit> <check>
+    U <column index> <value>
+"""
+
+# Python imports
+import contextlib
+import os
+import time
+
+# Harness imports
+from libraries.layout_of_apps_directory import apptest_layout
+from libraries.status_file import StatusFile
+
+SHARD_RECORD_NEW = 'N'
+SHARD_RECORD_UPDATE = 'U'
+
+def get_path_to_sharded_marker(path_to_status_file):
+    """Returns the path to the file marking the status file as sharded."""
+    return os.path.join(os.path.dirname(path_to_status_file),
+                        apptest_layout.test_status_sharded_filename)
+
+def get_path_to_shard(path_to_status_file, unique_id):
+    """Returns the path to the status shard of the test instance unique_id."""
+    return os.path.join(os.path.dirname(path_to_status_file), unique_id,
+                        apptest_layout.test_status_shard_filename)
+
+def shards_exist(path_to_status_file):
+    """Returns True if the status file is sharded."""
+    if path_to_status_file is None:
+        return False
+    return os.path.exists(get_path_to_sharded_marker(path_to_status_file))
+
+def read_sharded_records(path_to_status_file):
+    """Returns the words of all status records of the status file and its shards."""
+    a_index = StatusShardIndex(path_to_status_file)
+    a_index.refresh()
+    return a_index.all_records()
+
+def read_shard(path_to_shard):
+    """Returns the record words of a status shard, or None if it has no record."""
+    try:
+        with open(path_to_shard, 'rb') as shard_obj:
+            data = shard_obj.read()
+    except FileNotFoundError:
+        return None
+
+    # A writer may be in the middle of appending a line, so only consume
+    # complete lines.
+    end = data.rfind(b'\n')
+    if end < 0:
+        return None
+
+    words = None
+    for line in data[:end].decode().split('\n'):
+        fields = line.split('\t')
+        if fields[0] == SHARD_RECORD_NEW:
+            if words is None and len(fields) == len(StatusFile.STATUS_COLUMNS) + 1:
+                words = fields[1:]
+        elif fields[0] == SHARD_RECORD_UPDATE and len(fields) == 3 and words is not None:
+            words[int(fields[1])] = fields[2]
+    return words
+
+class StatusShardIndex:
+    """In-memory index of the status records of a sharded status file.
+
+    The index holds the records of rgt_status.txt, in file order, followed
+    by the records of the test instances that only have a shard, in order
+    of their start time. On refresh, the shards are only scanned if the
+    Status directory or the marker file changed since the last scan, and
+    only the shards whose size or mtime changed are read again.
+    """
+
+    MTIME_RESOLUTION = 2.0
+    """float: Seconds within which two changes may get the same mtime, e.g. on NFS."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, path_to_status_file):
+        self.__status_file_path = path_to_status_file
+        self.__status_dir = os.path.dirname(path_to_status_file)
+        self.__marker_path = get_path_to_sharded_marker(path_to_status_file)
+        self.__status_signature = None
+        self.__scan_signature = None
+        self.__legacy_records = {}
+        self.__shards = {}
+        self.__records = {}
+
+    ###################
+    # Public methods  #
+    ###################
+
+    def refresh(self):
+        """Brings the index up to date with the status file and its shards."""
+        status_signature = self.__get_signature(self.__status_file_path)
+        scan_signature = (self.__get_signature(self.__status_dir), self.__get_signature(self.__marker_path))
+        if status_signature == self.__status_signature and scan_signature == self.__scan_signature:
+            return
+        if status_signature != self.__status_signature:
+            self.__status_signature = status_signature
+            self.__legacy_records = self.__read_legacy_records()
+
+        # A change made within MTIME_RESOLUTION of the scan may leave the
+        # mtimes as they are, so the scan is only trusted for older mtimes.
+        scan_time = time.time()
+        if all(signature is not None and signature[2] < (scan_time - self.MTIME_RESOLUTION) * 1e9
+               for signature in scan_signature):
+            self.__scan_signature = scan_signature
+        else:
+            self.__scan_signature = None
+
+        shards = {}
+        try:
+            with os.scandir(self.__status_dir) as it:
+                for entry in it:
+                    if not entry.is_dir():
+                        continue
+                    path = os.path.join(entry.path, apptest_layout.test_status_shard_filename)
+                    signature = self.__get_signature(path)
+                    if signature is None:
+                        continue
+                    cached = self.__shards.get(entry.name)
+                    if cached is not None and cached[0] == signature:
+                        shards[entry.name] = cached
+                    else:
+                        shards[entry.name] = (signature, read_shard(path))
+        except FileNotFoundError:
+            pass
+        self.__shards = shards
+
+        records = dict(self.__legacy_records)
+        unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
+        start_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_START]
+        new_records = []
+        for (signature, words) in shards.values():
+            if words is None:
+                continue
+            if words[unique_col] in records:
+                records[words[unique_col]] = words
+            else:
+                new_records.append(words)
+        for words in sorted(new_records, key=lambda words: (words[start_col], words[unique_col])):
+            records[words[unique_col]] = words
+        self.__records = records
+
+    def get_record(self, unique_id):
+        """Returns the record words for unique_id or None."""
+        return self.__records.get(unique_id)
+
+    def get_legacy_record(self, unique_id):
+        """Returns the record words for unique_id in rgt_status.txt or None."""
+        return self.__legacy_records.get(unique_id)
+
+    def last_record(self):
+        """Returns the words of the last record or None if there are no records."""
+        if len(self.__records) == 0:
+            return None
+        return self.__records[next(reversed(self.__records))]
+
+    def all_records(self):
+        """Returns the words of all records in order."""
+        return list(self.__records.values())
+
+    ###################
+    # Private methods #
+    ###################
+
+    @staticmethod
+    def __get_signature(path):
+        try:
+            stat_ = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat_.st_ino, stat_.st_size, stat_.st_mtime_ns)
+
+    def __read_legacy_records(self):
+        records = {}
+        if self.__status_signature is None:
+            return records
+        unique_col = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
+        with open(self.__status_file_path, 'r') as status_file_obj:
+            for line in status_file_obj:
+                if StatusFile.ignore_line(line):
+                    continue
+                words = line.split()
+                if len(words) < len(StatusFile.STATUS_COLUMNS):
+                    continue
+                records[words[unique_col]] = words
+        return records
+
+class ShardedStatusFile(StatusFile):
+    """A StatusFile that keeps the record of each test instance in a shard of its own."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, logger, path_to_status_file, test_id=None):
+        self.__marker_path = get_path_to_sharded_marker(path_to_status_file)
+        self.__index = StatusShardIndex(path_to_status_file)
+        super().__init__(logger, path_to_status_file, test_id=test_id)
+
+    ###################
+    # Public methods  #
+    ###################
+
+    @property
+    def marker_path(self):
+        return self.__marker_path
+
+    ###################
+    # Storage methods #
+    ###################
+
+    def _create_status_file(self, path_to_status_file):
+        super()._create_status_file(path_to_status_file)
+        if not os.path.exists(self.__marker_path):
+            with open(self.__marker_path, 'a') as file_obj:
+                file_obj.write(f"{StatusFile.COMMENT_LINE_INDICATOR} The records of this test are kept in "
+                               f"<unique id>/{apptest_layout.test_status_shard_filename}.\n")
+
+    def _get_record(self, unique_id):
+        words = read_shard(self.__get_path_to_shard(unique_id))
+        if words is not None:
+            return words
+        self.__index.refresh()
+        return self.__index.get_legacy_record(unique_id)
+
+    def _get_last_record(self):
+        self.__index.refresh()
+        return self.__index.last_record()
+
+    def _get_all_records(self):
+        self.__index.refresh()
+        return self.__index.all_records()
+
+    def _append_record(self, words):
+        unique_id = words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]]
+        os.makedirs(os.path.dirname(self.__get_path_to_shard(unique_id)), exist_ok=True)
+        self.__append_shard(unique_id, [SHARD_RECORD_NEW] + list(words), create=True)
+
+    def _update_record(self, unique_id, column_values):
+        lines = [[SHARD_RECORD_UPDATE, str(column), value] for column, value in column_values.items()]
+        if os.path.exists(self.__get_path_to_shard(unique_id)):
+            self.__append_shard(unique_id, *lines)
+            return
+
+        # The record was written to rgt_status.txt before the test switched
+        # to the sharded backend.
+        self.__index.refresh()
+        words = self.__index.get_legacy_record(unique_id)
+        if words is not None:
+            self.__append_shard(unique_id, [SHARD_RECORD_NEW] + list(words), *lines, create=True)
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __get_path_to_shard(self, unique_id):
+        return get_path_to_shard(self.status_file_path, unique_id)
+
+    def __append_shard(self, unique_id, *lines, create=False):
+        """Appends the lines to the shard of unique_id with a single write."""
+        text = ''.join('\t'.join(fields) + '\n' for fields in lines)
+        flags = os.O_WRONLY | os.O_APPEND | (os.O_CREAT if create else 0)
+        fd = os.open(self.__get_path_to_shard(unique_id), flags, 0o664)
+        try:
+            os.write(fd, text.encode())
+        finally:
+            os.close(fd)
+        # Tells the readers to scan the shards again.
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(self.__marker_path)
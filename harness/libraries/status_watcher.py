@@ -0,0 +1,393 @@
+#! /usr/bin/env python3
+"""Waits for the testing cycles of subtests to complete.
+
+A testing cycle is complete when the last test instance of a subtest has a
+check result in the status file and no new test instance is started within a
+settle time, for example by a batch script that resubmits itself.
+
+Instead of sleeping between checks, the Status directories of the subtests
+are watched with inotify. The rename of Event_200_check_end.txt into a
+Status/<test_id> directory, and the status file update that follows it, wake
+the waiter, so the completion of a test is noticed within milliseconds. All
+subtests are waited on at once by a single thread.
+
+inotify only reports changes made by the node that watches the directories.
+Jobs running on compute nodes write to a parallel file system, so all
+subtests are also checked every poll interval. Where inotify is not
+available, the watcher falls back to polling.
+
+The jobs of the unfinished subtests can also be queried from the scheduler,
+with a single command for all jobs, so that a test whose job was cancelled
+or lost to a node failure is not waited on until the timeout.
+
+The watcher is tuned with the following environment variables:
+
+    RGT_STATUS_WATCHER          'inotify' (the default) or 'poll'.
+    RGT_STATUS_POLL_INTERVAL    Seconds between checks of all subtests (default 5).
+    RGT_STATUS_SETTLE_TIME      Seconds a finished test instance must remain the
+                                last one of its subtest (default 5).
+    RGT_JOB_STATE_POLL_INTERVAL Seconds between queries of the job states, when
+                                a scheduler is given (default 30).
+    RGT_JOB_STATE_GRACE         Seconds a test is still waited on after its job
+                                left the queue (default 30).
+"""
+
+# Python imports
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+# Harness imports
+from libraries.status_file import StatusFile
+from libraries.status_file_factory import StatusFileFactory
+
+DEFAULT_POLL_INTERVAL = 5.0
+DEFAULT_SETTLE_TIME = 5.0
+DEFAULT_JOB_STATE_POLL_INTERVAL = 30.0
+DEFAULT_JOB_STATE_GRACE = 30.0
+
+WATCHER_INOTIFY = 'inotify'
+WATCHER_POLL = 'poll'
+
+# Constants of <sys/inotify.h>.
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT_HEADER = struct.Struct('iIII')
+
+def _load_inotify():
+    """Returns the libc with the inotify functions, or None if inotify is not available."""
+    libc_name = ctypes.util.find_library('c')
+    if libc_name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+class StatusWatcher:
+    """Watches Status directories for changes.
+
+    Each watched directory belongs to a key, which is reported by wait when
+    the directory or, with inotify, one of its new subdirectories changes.
+    """
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, poll_interval=None, mode=None):
+        self.__poll_interval = poll_interval or float(os.getenv('RGT_STATUS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL))
+        self.__keys = set()
+        self.__watched_paths = set()
+        self.__wd_to_watch = {}
+        self.__fd = None
+        self.__next_poll = time.monotonic() + self.__poll_interval
+
+        mode = mode or os.getenv('RGT_STATUS_WATCHER', WATCHER_INOTIFY)
+        if mode not in (WATCHER_INOTIFY, WATCHER_POLL):
+            raise ValueError(f"Unknown status watcher RGT_STATUS_WATCHER={mode}. "
+                             f"Valid watchers are {[WATCHER_INOTIFY, WATCHER_POLL]}.")
+        if mode == WATCHER_INOTIFY:
+            self.__libc = _load_inotify()
+            if self.__libc is not None:
+                fd = self.__libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+                if fd >= 0:
+                    self.__fd = fd
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    ###################
+    # Public methods  #
+    ###################
+
+    @property
+    def uses_inotify(self):
+        return self.__fd is not None
+
+    def watch(self, path, key):
+        """Reports changes of the directory path, and of its new subdirectories, as key.
+
+        A directory that cannot be watched, for example because it does not
+        exist yet or the inotify watch limit is reached, is still checked
+        every poll interval.
+        """
+        self.__keys.add(key)
+        if self.__fd is None or path in self.__watched_paths or not os.path.isdir(path):
+            return
+        wd = self.__libc.inotify_add_watch(self.__fd, os.fsencode(path), _WATCH_MASK)
+        if wd >= 0:
+            self.__wd_to_watch[wd] = (path, key)
+            self.__watched_paths.add(path)
+
+    def wait(self, timeout):
+        """Waits at most timeout seconds for changes.
+
+        Returns
+        -------
+        set
+            The keys whose directories changed. When a poll interval elapses,
+            all keys are returned.
+        """
+        poll_wait = max(0.0, self.__next_poll - time.monotonic())
+        timeout = min(max(0.0, timeout), poll_wait)
+        changed = set()
+        if self.__fd is None:
+            time.sleep(timeout)
+        else:
+            (readable, _, _) = select.select([self.__fd], [], [], timeout)
+            if readable:
+                changed = self.__read_events()
+
+        if time.monotonic() >= self.__next_poll:
+            self.__next_poll = time.monotonic() + self.__poll_interval
+            changed = set(self.__keys)
+        return changed
+
+    def close(self):
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __read_events(self):
+        changed = set()
+        try:
+            buffer = os.read(self.__fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(buffer):
+            (wd, mask, cookie, name_length) = _EVENT_HEADER.unpack_from(buffer, offset)
+            name = buffer[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_length].rstrip(b'\0')
+            offset += _EVENT_HEADER.size + name_length
+            if wd not in self.__wd_to_watch:
+                continue
+            (path, key) = self.__wd_to_watch[wd]
+            changed.add(key)
+            # A new Status/<test_id> directory is watched for its event files.
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                self.watch(os.path.join(path, os.fsdecode(name)), key)
+        return changed
+
+class _TestCycle:
+    """The completion state of the testing cycle of one subtest."""
+
+    def __init__(self, subtest, settle_time):
+        self.subtest = subtest
+        self.status_dir = os.path.dirname(subtest.get_path_to_status_file())
+        self.__status_file = StatusFileFactory.create(path_to_status_file=subtest.get_path_to_status_file())
+        self.__settle_time = settle_time
+        self.__harness_id = None
+        self.finished_at = None
+        self.job_id = None
+        self.job_state = None
+        self.job_reported = False
+        self.job_ended_at = None
+
+    @property
+    def last_harness_id(self):
+        return self.__status_file.getLastHarnessID()
+
+    def is_complete(self, now):
+        """Returns True once the last test instance has been finished for the settle time."""
+        harness_id = self.__status_file.getLastHarnessID()
+        if harness_id is None or not self.__status_file.isTestFinished(harness_id):
+            self.finished_at = None
+            return False
+        if self.finished_at is None or harness_id != self.__harness_id:
+            self.__harness_id = harness_id
+            self.finished_at = now
+        return now - self.finished_at >= self.__settle_time
+
+    def settle_deadline(self):
+        if self.finished_at is None:
+            return None
+        return self.finished_at + self.__settle_time
+
+    def last_job_id(self):
+        """Returns the batch job id of the last test instance, or None if it has no job yet."""
+        harness_id = self.__status_file.getLastHarnessID()
+        if harness_id is None:
+            return None
+        words = self.__status_file.get_record(harness_id)
+        if words is None:
+            return None
+        job_id = words[StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_BATCH]]
+        if job_id in (StatusFile.PLACE_HOLDER, '0'):
+            return None
+        return job_id
+
+    def set_job_state(self, job_id, job_state, job_ended, now, reported=True):
+        """Records the scheduler state of the job of the last test instance.
+
+        reported is False if the job was missing from the answer of the scheduler.
+        """
+        if job_id != self.job_id:
+            self.job_reported = False
+        if job_id != self.job_id or not job_ended:
+            self.job_ended_at = None
+        if job_ended and self.job_ended_at is None:
+            self.job_ended_at = now
+        self.job_id = job_id
+        self.job_state = job_state
+        self.job_reported = self.job_reported or reported
+
+def _poll_job_states(cycles, scheduler, now):
+    """Queries the jobs of all unfinished cycles with one scheduler command."""
+    job_ids = {}
+    for cycle in cycles:
+        if cycle.finished_at is None:
+            job_id = cycle.last_job_id()
+            if job_id is not None:
+                job_ids[cycle] = job_id
+    if not job_ids:
+        return
+
+    states = scheduler.query_job_states(job_ids.values())
+    if states is None:
+        return
+    for (cycle, job_id) in job_ids.items():
+        if job_id not in states:
+            continue
+        job_state = states[job_id]
+        if job_state == scheduler.JOB_STATE_MISSING:
+            # sacct and qstat -x may not report a job yet just after it was
+            # submitted, so a missing job has only ended if it was reported before.
+            job_ended = cycle.job_reported and job_id == cycle.job_id
+            cycle.set_job_state(job_id, job_state, job_ended, now, reported=False)
+        else:
+            cycle.set_job_state(job_id, job_state, job_state in scheduler.JOB_STATES_ENDED, now)
+
+def wait_for_test_cycles(subtests, timeout, logger=None, settle_time=None, watcher=None, scheduler=None):
+    """Waits for the testing cycles of all subtests to complete.
+
+    Parameters
+    ----------
+    subtests : list
+        The apptest.subtest objects to wait on.
+
+    timeout : float
+        The maximum time to wait in seconds.
+
+    logger : rgt_logger
+        Logs the completion of each subtest.
+
+    settle_time : float
+        The time in seconds a finished test instance must remain the last
+        one of its subtest. Defaults to RGT_STATUS_SETTLE_TIME. A subtest
+        that finished before the timeout is given its settle time.
+
+    watcher : StatusWatcher
+        The watcher of the Status directories. By default a new watcher is used.
+
+    scheduler : BaseScheduler
+        If given, the jobs of all unfinished subtests are queried every
+        RGT_JOB_STATE_POLL_INTERVAL seconds. A subtest whose job has left
+        the queue without finishing the test, for example because it was
+        cancelled, is not waited on after RGT_JOB_STATE_GRACE seconds.
+
+    Returns
+    -------
+    list
+        The subtests whose testing cycle did not complete within timeout.
+    """
+    if settle_time is None:
+        settle_time = float(os.getenv('RGT_STATUS_SETTLE_TIME', DEFAULT_SETTLE_TIME))
+    job_poll_interval = float(os.getenv('RGT_JOB_STATE_POLL_INTERVAL', DEFAULT_JOB_STATE_POLL_INTERVAL))
+    job_grace = float(os.getenv('RGT_JOB_STATE_GRACE', DEFAULT_JOB_STATE_GRACE))
+    own_watcher = watcher is None
+    if own_watcher:
+        watcher = StatusWatcher()
+
+    completed = set()
+    try:
+        pending = {}
+        for (key, subtest) in enumerate(subtests):
+            cycle = _TestCycle(subtest, settle_time)
+            pending[key] = cycle
+            watcher.watch(cycle.status_dir, key)
+            harness_id = cycle.last_harness_id
+            if harness_id is not None:
+                watcher.watch(os.path.join(cycle.status_dir, harness_id), key)
+
+        deadline = time.monotonic() + timeout
+        next_job_poll = time.monotonic()
+        changed = set(pending.keys())
+        while pending:
+            now = time.monotonic()
+            for key in list(pending.keys()):
+                cycle = pending[key]
+                # Finished subtests are checked again when their settle time ends.
+                if key not in changed and cycle.finished_at is None:
+                    continue
+                if cycle.is_complete(now):
+                    del pending[key]
+                    completed.add(key)
+                    if logger is not None:
+                        logger.doInfoLogging('The testing cycle of {} : {} is complete.'.format(
+                            cycle.subtest.getNameOfApplication(), cycle.subtest.getNameOfSubtest()))
+
+            wake_times = []
+            if scheduler is not None and pending and now < deadline:
+                if now >= next_job_poll:
+                    _poll_job_states(pending.values(), scheduler, now)
+                    next_job_poll = now + job_poll_interval
+                wake_times.append(next_job_poll)
+
+                for key in list(pending.keys()):
+                    cycle = pending[key]
+                    if cycle.job_ended_at is None or cycle.finished_at is not None:
+                        continue
+                    if now - cycle.job_ended_at < job_grace:
+                        wake_times.append(cycle.job_ended_at + job_grace)
+                    elif not cycle.is_complete(now) and cycle.finished_at is None:
+                        # The job left the queue without finishing the test.
+                        del pending[key]
+                        if logger is not None:
+                            logger.doWarningLogging('Job {} of {} : {} left the queue in state {} without completing the testing cycle.'.format(
+                                cycle.job_id, cycle.subtest.getNameOfApplication(), cycle.subtest.getNameOfSubtest(), cycle.job_state))
+
+            # A subtest that finished before the timeout is given its settle time.
+            settle_deadlines = [cycle.settle_deadline() for cycle in pending.values()
+                                if cycle.settle_deadline() is not None]
+            if not pending or (now >= deadline and not settle_deadlines):
+                break
+
+            if now < deadline:
+                wake_times.append(deadline)
+            wake_time = min(settle_deadlines + wake_times)
+            changed = watcher.wait(wake_time - now)
+    finally:
+        if own_watcher:
+            watcher.close()
+
+    return [subtest for (key, subtest) in enumerate(subtests) if key not in completed]
+
+def is_test_cycle_complete(subtest, settle_time=None):
+    """Returns True if the testing cycle of subtest is complete.
+
+    An unfinished subtest is reported at once. A finished subtest is watched
+    for the settle time, in case a new test instance is started.
+    """
+    return not wait_for_test_cycles([subtest], 0.0, settle_time=settle_time)
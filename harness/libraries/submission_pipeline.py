@@ -0,0 +1,225 @@
+#! /usr/bin/env python3
+"""Concurrent, rate-limited submission of batch scripts to the scheduler.
+
+Schedulers limit the rate of the RPCs of their clients, and a burst of
+sbatch, bsub or qsub calls from many tests can be throttled or rejected.
+The submissions of the harness are spaced by a token bucket of
+RGT_SUBMIT_RATE submissions per second, which allows bursts of
+RGT_SUBMIT_BURST submissions. The harness shares the bucket between its
+test_harness_driver processes through the file RGT_SUBMIT_RATE_FILE.
+
+A SubmissionPipeline submits many batch scripts at once from a pool of
+threads, RGT_SUBMIT_PIPELINE_WORKERS of them, each one with an optional
+preparation step, e.g. writing the batch script, that overlaps with the
+other submissions. The submissions run in
+their run archive directory through the cwd argument of the submit command,
+without changing the working directory of the process.
+"""
+
+# Python imports
+import concurrent.futures
+import fcntl
+import json
+import os
+import threading
+import time
+
+DEFAULT_PIPELINE_WORKERS = 8
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+class SubmitResult:
+    """The outcome of a submit command."""
+
+    def __init__(self, exit_status, job_id, stdout, stderr):
+        self.exit_status = exit_status
+        """int: The exit status of the submit command."""
+
+        self.job_id = job_id
+        """str: The id of the submitted job, or None if the submission failed."""
+
+        self.stdout = stdout
+        """str: The standard output of the submit command."""
+
+        self.stderr = stderr
+        """str: The standard error of the submit command."""
+
+    def __repr__(self):
+        return f"SubmitResult({self.exit_status!r}, job_id={self.job_id!r})"
+
+class RateLimiter:
+    """A token bucket of rate submissions per second, with bursts of burst submissions.
+
+    With a state_file, the bucket is shared by all the processes using the
+    same file.
+    """
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, rate, burst=1, state_file=None):
+        if rate <= 0:
+            raise ValueError(f"The rate {rate} of a RateLimiter must be positive.")
+        self.__rate = float(rate)
+        self.__burst = max(1, int(burst))
+        self.__state_file = state_file
+        self.__lock = threading.Lock()
+        self.__tokens = float(self.__burst)
+        self.__stamp = time.time()
+
+    ##################
+    # Public methods #
+    ##################
+
+    @property
+    def rate(self):
+        """float: The number of submissions per second."""
+        return self.__rate
+
+    @property
+    def burst(self):
+        """int: The number of submissions that may be made at once."""
+        return self.__burst
+
+    def acquire(self):
+        """Waits until a submission is allowed. Returns the seconds waited."""
+        with self.__lock:
+            if self.__state_file:
+                wait = self.__take_shared()
+            else:
+                (self.__tokens, self.__stamp, wait) = self.__take(self.__tokens, self.__stamp)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __take(self, tokens, stamp):
+        """Returns the tokens and time stamp of the bucket after taking a token, and the time to wait for it.
+
+        A token not yet available is reserved, so the tokens may be negative
+        and the waiting callers are served in order.
+        """
+        now = time.time()
+        tokens = min(float(self.__burst), tokens + max(0.0, now - stamp) * self.__rate)
+        tokens -= 1.0
+        wait = -tokens / self.__rate if tokens < 0 else 0.0
+        return (tokens, now, wait)
+
+    def __take_shared(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.__state_file)), exist_ok=True)
+        with open(self.__state_file, 'a+') as file_obj:
+            fcntl.flock(file_obj, fcntl.LOCK_EX)
+            try:
+                file_obj.seek(0)
+                try:
+                    state = json.loads(file_obj.read())
+                    (tokens, stamp) = (float(state['tokens']), float(state['stamp']))
+                except (ValueError, KeyError, TypeError):
+                    (tokens, stamp) = (float(self.__burst), time.time())
+                (tokens, stamp, wait) = self.__take(tokens, stamp)
+                file_obj.seek(0)
+                file_obj.truncate()
+                file_obj.write(json.dumps({'tokens' : tokens, 'stamp' : stamp}))
+                file_obj.flush()
+            finally:
+                fcntl.flock(file_obj, fcntl.LOCK_UN)
+        return wait
+
+def get_submit_rate_limiter():
+    """Returns the RateLimiter of the submissions of this process, or None if the rate is not limited.
+
+    The rate limiter is set by RGT_SUBMIT_RATE, RGT_SUBMIT_BURST and RGT_SUBMIT_RATE_FILE.
+    """
+    rate = float(os.getenv('RGT_SUBMIT_RATE', '0') or 0)
+    if rate <= 0:
+        return None
+    burst = int(os.getenv('RGT_SUBMIT_BURST', '1'))
+    state_file = os.getenv('RGT_SUBMIT_RATE_FILE') or None
+    key = (rate, burst, state_file)
+    with _rate_limiters_lock:
+        if key not in _rate_limiters:
+            _rate_limiters[key] = RateLimiter(rate, burst, state_file)
+        return _rate_limiters[key]
+
+class SubmissionPipeline:
+    """Submits batch scripts concurrently, at the rate allowed by a RateLimiter."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, max_workers=None, rate_limiter=None):
+        """
+        Parameters
+        ----------
+        max_workers : int
+            The number of submissions run at once. The default is set by
+            RGT_SUBMIT_PIPELINE_WORKERS, or DEFAULT_PIPELINE_WORKERS.
+
+        rate_limiter : RateLimiter
+            The rate limiter of the submissions. The default is get_submit_rate_limiter().
+        """
+        if max_workers is None:
+            max_workers = int(os.getenv('RGT_SUBMIT_PIPELINE_WORKERS', DEFAULT_PIPELINE_WORKERS))
+        self.__rate_limiter = rate_limiter if rate_limiter is not None else get_submit_rate_limiter()
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                                thread_name_prefix='submit')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+        return False
+
+    ##################
+    # Public methods #
+    ##################
+
+    def submit(self, scheduler, batchfilename, cwd, env=None, prepare=None, extra_args=()):
+        """Submits batchfilename in the directory cwd. Returns a future of the SubmitResult.
+
+        Parameters
+        ----------
+        scheduler : BaseScheduler
+            The scheduler to submit to. Its job id is not changed.
+
+        batchfilename : str
+            The batch script, relative to cwd.
+
+        cwd : str
+            The directory in which the submit command runs.
+
+        env : dict
+            The environment of the submit command. The default is the environment of the process.
+
+        prepare : callable
+            A function called before the submission, outside of the rate limit,
+            e.g. to write the batch script. An exception raised by it is raised
+            by the future, and the batch script is not submitted.
+
+        extra_args : list
+            Arguments of the submit command put before batchfilename, e.g. job array options.
+        """
+        return self.__executor.submit(self.__submit, scheduler, batchfilename, cwd, env, prepare, extra_args)
+
+    def shutdown(self, wait=True):
+        """Stops the pipeline, after the pending submissions if wait is True."""
+        self.__executor.shutdown(wait=wait)
+        return
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __submit(self, scheduler, batchfilename, cwd, env, prepare, extra_args):
+        if prepare is not None:
+            prepare()
+        if self.__rate_limiter is not None:
+            self.__rate_limiter.acquire()
+        return scheduler.run_submit_command(batchfilename, cwd=cwd, env=env, extra_args=extra_args)
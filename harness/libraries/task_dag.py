@@ -0,0 +1,164 @@
+#! /usr/bin/env python3
+"""A dependency graph of harness tasks, run on bounded resource pools.
+
+Every task names the tasks it depends on and the resource pool it runs in.
+A task is started as soon as all of its dependencies have succeeded and its
+pool has a free slot, so a slow task only holds up the tasks that depend on
+it. If a task fails, every task that depends on it is skipped.
+
+The harness uses one pool per kind of resource, e.g. the login node that
+builds the tests and the scheduler that the tests are submitted to.
+"""
+
+# Python imports
+import collections
+import concurrent.futures
+import traceback
+
+class TaskDAGError(Exception):
+    """Raised for an invalid task graph."""
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+
+class TaskResult:
+    """The outcome of a task of the graph."""
+
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, status, value=None, error=None):
+        self.status = status
+        """str : SUCCEEDED, FAILED or SKIPPED."""
+
+        self.value = value
+        """The return value of the task function."""
+
+        self.error = error
+        """str : The traceback of the exception raised by the task function, or the
+        reason the task was skipped."""
+
+    def __repr__(self):
+        return f"TaskResult({self.status!r}, value={self.value!r})"
+
+class TaskDAG:
+    """A set of tasks with dependencies, each one run in a bounded pool.
+
+    A task function returns an exit status: 0 or None means success, and any
+    other value or a raised exception means failure.
+    """
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, pool_sizes):
+        """
+        Parameters
+        ----------
+        pool_sizes : dict
+            The maximum number of tasks run at once in each pool, by pool name.
+        """
+        for (pool, size) in pool_sizes.items():
+            if size < 1:
+                raise TaskDAGError(f"The size of pool {pool} must be at least 1, not {size}.")
+        self.__pool_sizes = dict(pool_sizes)
+        self.__tasks = collections.OrderedDict()
+        self.__dependents = {}
+
+    def __len__(self):
+        return len(self.__tasks)
+
+    def __contains__(self, key):
+        return key in self.__tasks
+
+    ##################
+    # Public methods #
+    ##################
+
+    def add_task(self, key, function, pool, dependencies=()):
+        """Adds the task key, which runs function() in pool after its dependencies succeeded.
+
+        The dependencies must have been added before, which keeps the graph
+        free of cycles. Tasks that become ready at the same time are started in
+        the order they were added.
+        """
+        if key in self.__tasks:
+            raise TaskDAGError(f"The task {key} has already been added.")
+        if pool not in self.__pool_sizes:
+            raise TaskDAGError(f"The task {key} uses the unknown pool {pool}.")
+        dependencies = tuple(dependencies)
+        for dependency in dependencies:
+            if dependency not in self.__tasks:
+                raise TaskDAGError(f"The task {key} depends on the unknown task {dependency}.")
+        self.__tasks[key] = (function, pool, dependencies)
+        self.__dependents[key] = []
+        for dependency in dependencies:
+            self.__dependents[dependency].append(key)
+        return
+
+    def run(self):
+        """Runs all tasks and returns an ordered dict of their TaskResult, by key."""
+        results = {}
+        waiting_on = {key : len(dependencies) for (key, (function, pool, dependencies)) in self.__tasks.items()}
+        ready = {pool : collections.deque() for pool in self.__pool_sizes}
+        running = {pool : 0 for pool in self.__pool_sizes}
+        future_to_key = {}
+
+        for (key, count) in waiting_on.items():
+            if count == 0:
+                ready[self.__tasks[key][1]].append(key)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=sum(self.__pool_sizes.values())) as executor:
+            while True:
+                for (pool, keys) in ready.items():
+                    while keys and running[pool] < self.__pool_sizes[pool]:
+                        key = keys.popleft()
+                        future_to_key[executor.submit(self.__tasks[key][0])] = key
+                        running[pool] += 1
+
+                if not future_to_key:
+                    break
+
+                (done, not_done) = concurrent.futures.wait(future_to_key,
+                                                           return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    key = future_to_key.pop(future)
+                    running[self.__tasks[key][1]] -= 1
+                    results[key] = TaskDAG.__result_of(future)
+                    if results[key].status == TaskResult.SUCCEEDED:
+                        for dependent in self.__dependents[key]:
+                            waiting_on[dependent] -= 1
+                            if waiting_on[dependent] == 0 and dependent not in results:
+                                ready[self.__tasks[dependent][1]].append(dependent)
+                    else:
+                        self.__skip_dependents(key, results)
+
+        return collections.OrderedDict((key, results[key]) for key in self.__tasks)
+
+    ###################
+    # Private methods #
+    ###################
+
+    @staticmethod
+    def __result_of(future):
+        error = future.exception()
+        if error is not None:
+            trace = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+            return TaskResult(TaskResult.FAILED, error=trace)
+        value = future.result()
+        if value:
+            return TaskResult(TaskResult.FAILED, value=value)
+        return TaskResult(TaskResult.SUCCEEDED, value=value)
+
+    def __skip_dependents(self, key, results):
+        pending = list(self.__dependents[key])
+        while pending:
+            dependent = pending.pop()
+            if dependent not in results:
+                results[dependent] = TaskResult(TaskResult.SKIPPED,
+                                                error=f"The task {key} did not succeed.")
+                pending.extend(self.__dependents[dependent])
+        return
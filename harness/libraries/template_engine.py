@@ -0,0 +1,179 @@
+#! /usr/bin/env python3
+"""Templates with __key__ placeholders, such as the scheduler templates of the tests.
+
+A template is split into its literal text and the keys of the replacements
+it contains, once for every set of replacement keys, and is rendered in a
+single pass: each key is replaced by its value, taken literally. Any key of
+the replacements is found, e.g. __a__b__ or ___x__, the longest key first
+where keys overlap. The other placeholders are kept as they are. The
+templates read from files are cached by path, modification time and size, so
+the tests sharing a scheduler template parse it once per process.
+
+The replacements are a dictionary of the form { ..., "__key1__" : value1, ...},
+as returned by rgt_test.get_test_replacements.
+"""
+
+# Python imports
+import os
+import re
+import threading
+
+PLACEHOLDER_REGXP = re.compile(r'__[A-Za-z0-9][\w.-]*?__')
+"""re.compile : A placeholder of a template, e.g. __batch_queue__, as reported when it has no replacement."""
+
+MAX_SPLITS_PER_TEMPLATE = 16
+"""int : The number of sets of replacement keys for which the split of a template is kept."""
+
+_templates = {}
+_templates_lock = threading.Lock()
+
+class TemplateError(Exception):
+    """Raised when a template is rendered in strict mode with unresolved placeholders."""
+
+    def __init__(self, message, unresolved):
+        super().__init__(message)
+        self.message = message
+        self.unresolved = unresolved
+
+class Template:
+    """A parsed template."""
+
+    ###################
+    # Special methods #
+    ###################
+
+    def __init__(self, text, name='<string>'):
+        """
+        Parameters
+        ----------
+        text : str
+            The text of the template.
+
+        name : str
+            The name of the template in error messages, e.g. its path.
+        """
+        self.__name = name
+        self.__text = text
+        self.__placeholders = frozenset(PLACEHOLDER_REGXP.findall(text))
+
+        # The splits of the text by set of replacement keys.
+        self.__splits = {}
+        self.__splits_lock = threading.Lock()
+
+    ##################
+    # Public methods #
+    ##################
+
+    @property
+    def name(self):
+        """str: The name of the template."""
+        return self.__name
+
+    @property
+    def placeholders(self):
+        """frozenset: The placeholders of the template matching PLACEHOLDER_REGXP, e.g. {'__job_name__', ...}."""
+        return self.__placeholders
+
+    def unresolved_placeholders(self, replacements):
+        """Returns the sorted list of the placeholders of the template without a replacement."""
+        return list(self.__split(replacements)[1])
+
+    def render(self, replacements, strict=False):
+        """Returns the text of the template with its placeholders replaced.
+
+        Parameters
+        ----------
+        replacements : dict
+            The values of the placeholders, e.g. {'__job_name__' : 'my_job'}.
+            The values are converted with str and are not interpreted.
+
+        strict : bool
+            If True, raise a TemplateError if a placeholder has no replacement.
+            Otherwise the placeholder is kept as it is.
+        """
+        (chunks, unresolved) = self.__split(replacements)
+        if strict and unresolved:
+            unresolved = list(unresolved)
+            message = f"The template {self.__name} has unresolved placeholders {unresolved}."
+            raise TemplateError(message, unresolved)
+
+        rendered = chunks[:]
+        for index in range(1, len(chunks), 2):
+            rendered[index] = str(replacements[chunks[index]])
+        return ''.join(rendered)
+
+    ###################
+    # Private methods #
+    ###################
+
+    def __split(self, replacements):
+        """Returns the split of the text by the keys of replacements.
+
+        Returns
+        -------
+        tuple
+            (list of the literal text at even indices and the keys at odd
+            indices, tuple of the sorted placeholders left in the literal text).
+        """
+        keys = frozenset(replacements)
+        with self.__splits_lock:
+            split = self.__splits.get(keys)
+        if split is not None:
+            return split
+
+        chunks = []
+        position = 0
+        present_keys = sorted((key for key in keys if key and key in self.__text), key=len, reverse=True)
+        if present_keys:
+            pattern = re.compile('|'.join(re.escape(key) for key in present_keys))
+            for match in pattern.finditer(self.__text):
+                chunks.append(self.__text[position:match.start()])
+                chunks.append(match.group())
+                position = match.end()
+        chunks.append(self.__text[position:])
+
+        unresolved = set()
+        for literal in chunks[0::2]:
+            unresolved.update(PLACEHOLDER_REGXP.findall(literal))
+        split = (chunks, tuple(sorted(unresolved.difference(keys))))
+        with self.__splits_lock:
+            if len(self.__splits) >= MAX_SPLITS_PER_TEMPLATE:
+                self.__splits.clear()
+            self.__splits[keys] = split
+        return split
+
+def load_template(path):
+    """Returns the Template of the file path, parsed once while the file is unchanged.
+
+    Raises an OSError if the file can not be read.
+    """
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _templates_lock:
+        cached = _templates.get(path)
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    with open(path, 'r') as file_obj:
+        template = Template(file_obj.read(), name=path)
+    with _templates_lock:
+        _templates[path] = (signature, template)
+    return template
+
+def render_template_file(template_path, output_path, replacements, strict=False):
+    """Writes the file output_path from the template file template_path.
+
+    Raises an OSError if a file can not be read or written, and a TemplateError
+    in strict mode, see Template.render.
+
+    Returns
+    -------
+    list
+        The sorted placeholders of the template that have no replacement.
+    """
+    template = load_template(template_path)
+    text = template.render(replacements, strict=strict)
+    with open(output_path, 'w') as file_obj:
+        file_obj.write(text)
+    return template.unresolved_placeholders(replacements)
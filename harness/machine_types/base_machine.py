@@ -63,6 +63,9 @@ class BaseMachine(metaclass=ABCMeta):
 
         runarchive_dir = self.apptest.get_path_to_runarchive()
         log_filepath = os.path.join(runarchive_dir,self.__class__.__module__)
+        self.__build_cache_key = None
+        self.__build_cache_hit = False
+        self.__process_results = {}
 
     #@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     #                                                                 @
@@ -99,6 +102,21 @@ class BaseMachine(metaclass=ABCMeta):
         """bool: If true, separate build into stdout and stderr"""
         return self.__separate_build_stdio
 
+    @property
+    def build_cache_key(self):
+        """str: The key of the build in the build cache, or None if the cache is not used."""
+        return self.__build_cache_key
+
+    @property
+    def build_cache_hit(self):
+        """bool: True if the build was restored from the build cache."""
+        return self.__build_cache_hit
+
+    @property
+    def process_results(self):
+        """dict: The ProcessResult of the supervised 'build' and 'check' commands that were run."""
+        return self.__process_results
+
     @property
     def check_command(self):
         """Returns the check command string. If no check command string then returns None."""
@@ -229,25 +247,47 @@ class BaseMachine(metaclass=ABCMeta):
 
         return exit_status
 
-    def submit_to_scheduler(self, batchfilename):
-        """ Return the jobID for the submission."""
+    def submit_to_scheduler(self, batchfilename, env=None):
+        """ Return the jobID for the submission.
 
-        # If not already in run archive dir, change working directory
-        cwd = os.getcwd()
-        ra_dir = self.apptest.get_path_to_runarchive()
-        if cwd != ra_dir:
-            os.chdir(ra_dir)
-
-        submit_exit_value = self.scheduler.submit_job(batchfilename)
+        env is the environment of the submit command, by default the
+        environment of the harness.
+        """
 
-        if cwd != ra_dir:
-            os.chdir(cwd)
+        # The batch script is submitted from the run archive directory,
+        # without changing the working directory of the process.
+        ra_dir = self.apptest.get_path_to_runarchive()
+        submit_exit_value = self.scheduler.submit_job(batchfilename, cwd=ra_dir, env=env)
 
         # Record job id
         self.write_jobid_to_status()
 
         return submit_exit_value
 
+    def queue_packed_submission(self, pack_dir):
+        """Queues the batch script in pack_dir, where the harness submits it in a packed job.
+
+        See libraries.packed_submission. Returns 0 if the batch script was queued, otherwise 1.
+        """
+        from libraries.packed_submission import PackRequest, make_pack_key, queue_request
+
+        ra_dir = self.apptest.get_path_to_runarchive()
+        batch_file = self.test_config.get_batch_file()
+        try:
+            request = PackRequest(scheduler_type=self.scheduler.get_scheduler_type(),
+                                  scripts_dir=self.apptest.get_path_to_scripts(),
+                                  unique_id=self.apptest.get_harness_id(),
+                                  test_name=f"{self.apptest.getNameOfApplication()}.{self.apptest.getNameOfSubtest()}",
+                                  runarchive_dir=ra_dir,
+                                  batch_file=batch_file,
+                                  pack_key=make_pack_key(self.scheduler, os.path.join(ra_dir, batch_file)))
+            path = queue_request(pack_dir, request)
+        except OSError as err:
+            self.logger.doCriticalLogging(f"Unable to queue the batch script {batch_file} for a packed submission: {err}")
+            return 1
+        self.logger.doInfoLogging(f"Queued the batch script {batch_file} for a packed submission in {path}.")
+        return 0
+
     def write_jobid_to_status(self):
         """ Write the job id to the appropriate status file """
         jobid_file = self.apptest.get_path_to_job_id_file()
@@ -302,24 +342,33 @@ class BaseMachine(metaclass=ABCMeta):
         message = f"The build directory is {path_to_build_directory}"
         self.logger.doInfoLogging(message)
 
-        # Copy the source to the build directory.
-        self._copy_source_to_build_directory()
+        # With RGT_BUILD_CACHE_DIR, an unchanged build is restored instead of built again.
+        from libraries.build_cache import BuildCache
+        build_cache = BuildCache.from_environment(self.logger)
+        if build_cache:
+            # The key is computed from the Source and Scripts directories, so
+            # the source is only copied when the build is not cached. The build
+            # runtime environment file is run in the empty build directory.
+            os.makedirs(path_to_build_directory, exist_ok=True)
+            new_env = self._get_build_environment()
+            self.__build_cache_key = self._make_build_cache_key(new_env)
+            if build_cache.restore(self.__build_cache_key, path_to_build_directory):
+                self.__build_cache_hit = True
+                message = f"{messloc} Restored the build {self.__build_cache_key} from the build cache."
+                self.logger.doInfoLogging(message)
+                return 0
+
+            # The build directory only holds the output of the build runtime environment file.
+            shutil.rmtree(path_to_build_directory)
+            self._copy_source_to_build_directory()
+        else:
+            # Copy the source to the build directory.
+            self._copy_source_to_build_directory()
+            new_env = self._get_build_environment()
 
         message = f"{messloc} Copied source to build directory.\n"
         self.logger.doInfoLogging(message)
 
-        # Get the environment using the build runtime environment file.
-        new_env = None
-        filename = self.build_runtime_environment_command_file
-
-        if filename != "":
-            message = f"{messloc} The build runtime environmental file is {filename}."
-            self.logger.doInfoLogging(message)
-            new_env = linux_utilities.get_new_environment(self,filename)
-            message = f"{messloc} The new build environment is as follows:\n"
-            message += str(new_env)
-            self.logger.doInfoLogging(message)
-
         # We now change directories to the build directory.
         os.chdir(path_to_build_directory)
 
@@ -341,6 +390,9 @@ class BaseMachine(metaclass=ABCMeta):
         message = f"{messloc} Changed back to Scripts directory {currentdir}."
         self.logger.doInfoLogging(message)
 
+        if build_cache and exit_status == 0:
+            build_cache.store(self.__build_cache_key, path_to_build_directory)
+
         message = f"{messloc} End of buiding executable."
         self.logger.doInfoLogging(message)
 
@@ -458,9 +510,41 @@ class BaseMachine(metaclass=ABCMeta):
         # Use Error threshold to show this message all the time
         self.logger.doErrorLogging(f"Path to Build: {path_to_build_directory}")
 
-        shutil.copytree(src=path_to_source,
-                        dst=path_to_build_directory,
-                        symlinks=True)
+        # The copy strategy is set by RGT_SOURCE_COPY_STRATEGY.
+        from libraries.source_copy import copy_source_tree
+        statistics = copy_source_tree(path_to_source, path_to_build_directory)
+        message = f"{messloc} Copied the source to the build directory: {statistics}"
+        self.logger.doInfoLogging(message)
+
+    def _get_build_environment(self):
+        """Returns the environment set by the build runtime environment file, or None if the test has none."""
+        messloc = "In function {functionname}:".format(functionname=self._name_of_current_function()) 
+
+        new_env = None
+        filename = self.build_runtime_environment_command_file
+
+        if filename != "":
+            message = f"{messloc} The build runtime environmental file is {filename}."
+            self.logger.doInfoLogging(message)
+            new_env = linux_utilities.get_new_environment(self,filename)
+            message = f"{messloc} The new build environment is as follows:\n"
+            message += str(new_env)
+            self.logger.doInfoLogging(message)
+        return new_env
+
+    def _make_build_cache_key(self, new_env):
+        """Returns the build cache key of the sources, environment and build command of the test."""
+        from libraries.build_cache import BuildCache
+        environment = new_env if new_env else dict(os.environ)
+        instance_paths = [self.apptest.get_path_to_workspace_build(),
+                          self.apptest.get_path_to_workspace_run(),
+                          self.apptest.get_path_to_status(),
+                          self.apptest.get_path_to_runarchive()]
+        return BuildCache.make_key([self.apptest.get_path_to_source(), self.apptest.get_path_to_scripts()],
+                                   environment,
+                                   self.test_config.get_build_command(),
+                                   self.test_config.test_environment,
+                                   instance_paths=instance_paths)
 
     def _write_check_exit_status(self, cstatus):
         """ Write the status of checking results to the status directory."""
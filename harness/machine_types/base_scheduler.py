@@ -4,8 +4,14 @@
 #
 #
 
+import os
+import re
+import shlex
+import subprocess
 from abc import abstractmethod, ABCMeta
 
+from libraries.submission_pipeline import SubmitResult, get_submit_rate_limiter
+
 class BaseScheduler(metaclass=ABCMeta):
     
     """ BaseScheduler represents a batch scheduler and has the following
@@ -15,7 +21,41 @@ class BaseScheduler(metaclass=ABCMeta):
     Methods:
         get_scheduler_type:
         print_scheduler_info:
+        query_job_states:
+        submit_job:
+        run_submit_command:
     """
+
+    # The states of a job reported by query_job_states.
+    JOB_STATE_PENDING = 'PENDING'
+    JOB_STATE_RUNNING = 'RUNNING'
+    JOB_STATE_COMPLETED = 'COMPLETED'
+    JOB_STATE_FAILED = 'FAILED'
+    JOB_STATE_UNKNOWN = 'UNKNOWN'
+
+    # A job missing from the answer of the scheduler. sacct and qstat -x may
+    # not report a job for a while after it was submitted, so it is not an
+    # ended state on its own.
+    JOB_STATE_MISSING = 'MISSING'
+
+    # A job in one of these states has left the queue.
+    JOB_STATES_ENDED = (JOB_STATE_COMPLETED, JOB_STATE_FAILED, JOB_STATE_UNKNOWN)
+
+    # The maximum time in seconds of a job state command.
+    JOB_STATE_COMMAND_TIMEOUT = 60
+
+    # The options of the submit command that set the queue and the account.
+    QUEUE_OPTION = None
+    ACCOUNT_OPTION = None
+
+    # The prefix of the directives of a batch script, and the options of the
+    # directives that differ between tests packed in one job.
+    DIRECTIVE_PREFIX = None
+    PER_TEST_DIRECTIVE_OPTIONS = ()
+
+    # The variable holding the index of a task of a job array, and the index of the first task.
+    ARRAY_INDEX_VARIABLE = None
+    ARRAY_FIRST_INDEX = 0
     
     def __init__(self, type, submitCmd, statusCmd, deleteCmd,
                  walltimeOpt, numTasksOpt, jobNameOpt, templateFile):
@@ -39,11 +79,184 @@ class BaseScheduler(metaclass=ABCMeta):
         self.__job_id = jobid
         return
 
+    def get_submit_command(self, batchfilename, env=None, extra_args=()):
+        """Returns the command submitting batchfilename, as an argument list.
+
+        The queue and account are set by RGT_SUBMIT_QUEUE or RGT_BATCH_QUEUE,
+        and RGT_SUBMIT_ACCT or RGT_PROJECT_ID, and extra arguments by
+        RGT_SUBMIT_ARGS, taken from env or the environment of the process.
+        The arguments extra_args are put before batchfilename.
+        """
+        if env is None:
+            env = os.environ
+
+        qargs = ""
+        if 'RGT_SUBMIT_QUEUE' in env:
+            qargs += f" {self.QUEUE_OPTION} " + env.get('RGT_SUBMIT_QUEUE')
+        elif 'RGT_BATCH_QUEUE' in env:
+            qargs += f" {self.QUEUE_OPTION} " + env.get('RGT_BATCH_QUEUE')
+
+        if 'RGT_SUBMIT_ARGS' in env:
+            qargs += " " + env.get('RGT_SUBMIT_ARGS')
+
+        if 'RGT_SUBMIT_ACCT' in env:
+            qargs += f" {self.ACCOUNT_OPTION} " + env.get('RGT_SUBMIT_ACCT')
+        elif 'RGT_PROJECT_ID' in env:
+            qargs += f" {self.ACCOUNT_OPTION} " + env.get('RGT_PROJECT_ID')
+
+        qcommand = self.__submitCmd + " " + qargs
+        return shlex.split(qcommand) + list(extra_args) + [batchfilename]
+
+    def run_submit_command(self, batchfilename, cwd=None, env=None, extra_args=()):
+        """Runs the submit command of batchfilename in the directory cwd and returns its SubmitResult.
+
+        The output of the command is kept in memory, and neither the working
+        directory of the process nor the job id of the scheduler are changed,
+        so many submissions may run at once in threads.
+
+        Parameters
+        ----------
+        batchfilename : str
+            The batch script, relative to cwd.
+
+        cwd : str
+            The directory of the submission. The default is the working directory.
+
+        env : dict
+            The environment of the submit command. The default is the environment of the process.
+
+        extra_args : list
+            Arguments of the submit command put before batchfilename.
+        """
+        args = self.get_submit_command(batchfilename, env, extra_args)
+        print(" ".join(args))
+
+        p = subprocess.run(args, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                           universal_newlines=True)
+
+        job_id = None
+        exit_status = p.returncode
+        stderr = p.stderr
+        if exit_status == 0:
+            job_id = self._parse_job_id(p.stdout)
+            if job_id is None:
+                exit_status = 1
+                stderr += f"No job id in the output of {args[0]}.\n"
+        return SubmitResult(exit_status, job_id, p.stdout, stderr)
+
+    def submit_job(self, batchfilename, cwd=None, env=None):
+        """Submits batchfilename in the directory cwd and sets the job id. Returns the exit status of the submit command.
+
+        The submission waits for the rate limit set by RGT_SUBMIT_RATE, see
+        libraries.submission_pipeline. The output of the submit command is
+        written to submit.out and submit.err in cwd.
+        """
+        print(f"Submitting job from {self.__type} class using batchfilename {batchfilename}")
+
+        rate_limiter = get_submit_rate_limiter()
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        result = self.run_submit_command(batchfilename, cwd=cwd, env=env)
+
+        submit_dir = cwd if cwd else os.getcwd()
+        for (filename, output) in (("submit.out", result.stdout), ("submit.err", result.stderr)):
+            with open(os.path.join(submit_dir, filename), "w") as file_obj:
+                file_obj.write(output)
+
+        if result.exit_status == 0:
+            self.set_job_id(result.job_id)
+            print(f"{self.__type} jobID = ", self.get_job_id())
+        else:
+            print(result.stderr)
+
+        return result.exit_status
+
+    def get_array_options(self, num_tasks):
+        """Returns the options of the submit command making a job array of num_tasks tasks, or None if not supported."""
+        return None
+
+    def get_array_task_job_id(self, job_id, index):
+        """Returns the job id of the task index of the job array job_id."""
+        return f"{job_id}[{index}]"
+
+    def get_output_directives(self, path_prefix):
+        """Returns the directives writing the output and error of a packed job to files starting with path_prefix."""
+        return []
+
+    def scale_walltime_directive(self, directive, factor):
+        """Returns the batch script directive with its walltime multiplied by factor, or None if it does not set the walltime."""
+        return None
+
+    def _get_directive_option(self, directive):
+        """Returns the (option, value) of a batch script directive, e.g. ('-t', '10') for '#SBATCH -t 10'."""
+        words = directive.split()
+        if len(words) < 2:
+            return (None, None)
+        if '=' in words[1] and words[1].startswith('--'):
+            return tuple(words[1].split('=', 1))
+        return (words[1], words[2] if len(words) > 2 else None)
+
+    def _parse_job_id(self, stdout):
+        """Returns the job id in the output of the submit command, or None."""
+        lines = stdout.splitlines()
+        match = re.search(r'\d+', lines[0]) if lines else None
+        return match.group() if match else None
+
     @abstractmethod
     def set_job_id_from_environ(self):
         print("Setting job id from environment in BaseScheduler class")
         return
 
+    def query_job_states(self, job_ids):
+        """Returns the states of many jobs, with a single scheduler command.
+
+        Parameters
+        ----------
+        job_ids : list
+            The job ids to query.
+
+        Returns
+        -------
+        dict
+            The state of each job id the scheduler answered for, one of the
+            JOB_STATE_* values. A job the scheduler reports it does not know is
+            JOB_STATE_UNKNOWN, and a job missing from a successful answer is
+            JOB_STATE_MISSING. None is returned if the scheduler could not be
+            queried.
+        """
+        job_ids = sorted(set(str(job_id) for job_id in job_ids))
+        if not job_ids:
+            return {}
+
+        # The commands are alternatives, tried in order until one runs.
+        for command in self._job_state_commands(job_ids):
+            try:
+                p = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   universal_newlines=True, timeout=BaseScheduler.JOB_STATE_COMMAND_TIMEOUT)
+            except (OSError, subprocess.SubprocessError):
+                continue
+
+            states = self._parse_job_states(p.stdout, p.stderr)
+            if p.returncode == 0:
+                # A job missing from a successful answer has left the
+                # scheduler, or is not reported by it yet.
+                for job_id in job_ids:
+                    states.setdefault(job_id, BaseScheduler.JOB_STATE_MISSING)
+            elif not states:
+                continue
+            return {job_id : states[job_id] for job_id in job_ids if job_id in states}
+
+        return None
+
+    def _job_state_commands(self, job_ids):
+        """Returns the commands, as argument lists, that query the states of job_ids."""
+        return []
+
+    def _parse_job_states(self, stdout, stderr):
+        """Returns a dictionary of job id to JOB_STATE_* parsed from a job state command."""
+        return {}
+
     def get_scheduler_template_file_name(self):
         return self.__templateFile
 
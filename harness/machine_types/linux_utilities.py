@@ -13,6 +13,11 @@ import subprocess
 import shlex
 import time
 
+# Harness imports
+from libraries.process_supervisor import get_live_output, get_timeout, run_supervised
+from libraries.rte_cache import get_rte_cache
+from libraries.template_engine import render_template_file
+
 class LinuxEnvRegxp:
     """
     When one does an env | less on Linux, we get results similar to the following:
@@ -84,38 +89,24 @@ def make_batch_script_for_linux(a_machine):
     message = f"{messloc} The batch scheduler template file is {batch_template_file}."
     a_machine.logger.doInfoLogging(message)
     
-    # Get batch job template lines
+    # Create test batch job script in run archive directory. The template is
+    # parsed once for the tests sharing it, and the wildcards in it are
+    # replaced with the values in the test config in a single pass.
+    test_replacements = a_machine.test_config.get_test_replacements()
     try :
-        with open(batch_template_file, "r") as templatefileobj:
-            templatelines = templatefileobj.readlines()
+        unresolved = render_template_file(batch_template_file, batch_file_path, test_replacements)
     except OSError as err:
         bstatus = False
-        message = ( f"{messloc} Error opening bath template file '{batch_template_file}' for reading."
+        message = ( f"{messloc} Error making batch script '{batch_file_path}' from template file '{batch_template_file}'.\n"
                     f"Handling error: {err}\n" )
         a_machine.logger.doCriticalLogging(message)
-    
+
     if bstatus:
-        message = f"{messloc} Completed reading lines of the batch template file {batch_template_file}."
-        a_machine.logger.doInfoLogging(message)
+        if unresolved:
+            message = f"{messloc} The batch template file {batch_template_file} has unresolved placeholders {unresolved}."
+            a_machine.logger.doWarningLogging(message)
 
-        # Create test batch job script in run archive directory
-        try :
-            with open(batch_file_path, "w") as batch_job:
-                # Replace all the wildcards in the batch job template with the values in
-                # the test config
-                test_replacements = a_machine.test_config.get_test_replacements()
-                for record in templatelines:
-                    for (replace_key,val) in test_replacements.items():
-                        re_tmp = re.compile(replace_key)
-                        record = re_tmp.sub(val, record)
-                    batch_job.write(record)
-        except OSError as err:
-            bstatus = False
-            message = ( f"{messloc} Error opening bath template file '{batch_file_path}' for writing.\n"
-                        f"Handling error: {err}\n" )
-            a_machine.logger.doCriticalLogging(message)
-
-        message = f"{messloc} Completed regex substitutions."
+        message = f"{messloc} Completed template substitutions."
         a_machine.logger.doInfoLogging(message)
 
     return bstatus
@@ -148,18 +139,16 @@ def check_executable(a_machine,new_env):
     message = f"{messloc} The check command line is {check_command_line}."
     a_machine.logger.doInfoLogging(message)
 
+    # The check command is killed if it runs past RGT_CHECK_TIMEOUT.
     check_outfile = "output_check.txt"
-    check_stdout = open(check_outfile, "w")
-
-    if new_env != None:
-        p = subprocess.Popen(check_command_line,shell=True,env=new_env,stdout=check_stdout,stderr=subprocess.STDOUT)
-    else:
-        p = subprocess.Popen(check_command_line,shell=True,stdout=check_stdout,stderr=subprocess.STDOUT)
-
-    p.wait()
-    check_stdout.close()
+    result = run_supervised(check_command_line, check_outfile, env=new_env,
+                            timeout=get_timeout('check'), live_output=get_live_output(), name='check')
+    a_machine.process_results['check'] = result
+    if result.timed_out:
+        message = f"{messloc} The check command was killed after running past its time limit."
+        a_machine.logger.doCriticalLogging(message)
 
-    check_exit_status = p.returncode
+    check_exit_status = result.exit_status
 
     message = f"{messloc} The check command return code {check_exit_status}."
     a_machine.logger.doInfoLogging(message)
@@ -203,41 +192,10 @@ def isTestCycleComplete(stest):
     """
     # From the test status file, verify all jobs
     # are completed and no new jobs are waiting to run.
-    # Get the path to the status file
-    from libraries.status_file_factory import StatusFileFactory
-    path_to_status_file = stest.get_path_to_status_file()
-    sfile = StatusFileFactory.create(path_to_status_file=path_to_status_file)
-
-    # Set the time between checks for verifying all jobs are complete
-    # and no new jobs have started.
-    time_between_checks = 10
-    time_to_wait_for_new_job = 5
-    jobs_still_pending = True
-
-    # Set the number of checks to perform.
-    max_checks = 3
-    for check_nm in range(max_checks):
-        last_harness_id = sfile.getLastHarnessID()
-        time.sleep(time_between_checks)
-        if sfile.isTestFinished(last_harness_id):
-            # Wait a short time in case a new job is submitted.
-            time.sleep(time_to_wait_for_new_job)
-            new_harness_id = sfile.getLastHarnessID()
-            if new_harness_id == last_harness_id:
-                # No new job was submitted so no jobs pending.
-                jobs_still_pending = False
-            else :
-                # A new job was submitted so we set the harness_id to 
-                # its new value.
-                jobs_still_pending = True
-                harness_id = new_harness_id
-    
-    if jobs_still_pending == True:
-        subtest_cyle_complete = False
-    else:
-        subtest_cyle_complete = True
-
-    return subtest_cyle_complete
+    # A finished subtest is watched for RGT_STATUS_SETTLE_TIME
+    # seconds in case a new job is submitted.
+    from libraries.status_watcher import is_test_cycle_complete
+    return is_test_cycle_complete(stest)
 
 def get_new_environment(a_machine,filename):
     """ Returns a dictionary of the environmental variables.
@@ -259,6 +217,18 @@ def get_new_environment(a_machine,filename):
         variable and env_value is its value.
     """
     path_to_build_directory = a_machine.apptest.get_path_to_workspace_build()
+
+    # Tests sharing a runtime environment file source it once, see libraries.rte_cache.
+    rte_cache = get_rte_cache()
+    if rte_cache:
+        parent_env = dict(os.environ)
+        instance_paths = _get_instance_paths(a_machine)
+        rte_key = rte_cache.make_key(filename, path_to_build_directory, parent_env, instance_paths)
+        env_dict = rte_cache.lookup(rte_key, parent_env, instance_paths)
+        if env_dict is not None:
+            a_machine.logger.doInfoLogging(f"Using the cached environment {rte_key} of {filename}.")
+            return env_dict
+
     tmp_source_file = os.path.join(path_to_build_directory,"tmp_source_file")
     std_out_file = os.path.join(path_to_build_directory,"std.env.out.txt")
     std_err_file = os.path.join(path_to_build_directory,"std.env.err.txt")
@@ -270,7 +240,9 @@ def get_new_environment(a_machine,filename):
     with open(tmp_source_file, 'w') as tmp_src_file:
         tmp_src_file.write('#!/usr/bin/env bash\n')
         tmp_src_file.write('source %s\n'%filename)
-        tmp_src_file.write('env\n')
+        # NUL separated records are exact for multiline values, such as
+        # the exported BASH_FUNC_* functions of Lmod.
+        tmp_src_file.write('env -0 2>/dev/null || env\n')
 
     # Execute the random file with Popen and capture the std output.
     os.chmod(tmp_source_file,0o755)
@@ -287,86 +259,35 @@ def get_new_environment(a_machine,filename):
         raise BaseMachine.SetBuildRTEError(message)
 
     #-----------------------------------------------------
-    # Read the file and store the in list records.       -
+    # Read the file and parse the environment variables. -
     #                                                    -
     #-----------------------------------------------------
-    with open(std_out_file, 'r') as infile:
-        records = infile.readlines()
-
-    #-----------------------------------------------------
-    # Now loop over the records and process              -
-    # the environment variables.                         -
-    #                                                    -
-    #-----------------------------------------------------
-    env_dict = {}
-    current_line_nm = 0
-    nm_records = len(records)
-    while current_line_nm < nm_records:
-        # Check that on the current line we have a new environmental
-        # variable entry for this line. If a new environmental variable 
-        # is not  found then proceed to the next line.
-        record_decoded = records[current_line_nm]
-
-        search = LinuxEnvRegxp.env_variable_regxp.search(record_decoded)
-        if search:
-            key=search.group('key')
-            a_machine.logger.doInfoLogging(f"Found new env variable {key} at line: {current_line_nm}")
-        else:
-            message = "Error in finding the next environment variable.\n"
-            message += f"The following line, #{current_line_nm}, had no matches for searches:\n"
-            message += record_decoded + "\n"
-            a_machine.logger.doCriticalLogging(message)
-            raise BaseMachine.SetBuildRTEError(message)
-
-        # We now get the range of entries for this environmental variable.
-        start_line = current_line_nm
-
-        # Set the pending current line number to the current
-        # line number. 
-        pending_current_line_nm = current_line_nm
-
-        if ( start_line == (nm_records-1) ):
-
-            # We are at the last line and the finish
-            # line is the last line.
-            finish_line = nm_records - 1
-
-            pending_current_line_nm += 1
-        else:
-
-            search_range_begin = current_line_nm + 1 # Set the start range for 
-                                                     # searching the next environmental entry
-
-            max_search_range_end = nm_records - 1 # Set the maximum rnage of lines to search.
-                                                  # Offset by 1 because records 
-                                                  # list index starts at 0.
-
-            a_machine.logger.doInfoLogging(f"Search range is {search_range_begin} to {max_search_range_end}.")
+    with open(std_out_file, 'r', errors='surrogateescape') as infile:
+        env_output = infile.read()
 
-            for tmp_line_nm in range(search_range_begin,max_search_range_end+1,1):
-                pending_current_line_nm += 1
-                record_decoded = records[tmp_line_nm]
-                search = LinuxEnvRegxp.env_variable_regxp.search(record_decoded)
-                if search:
-                    # We have found the next environmental variable entry
-                    # so break from for loop.
-                    break
-
-
-            # The finish_line is 1 less than the pending_current_line_nm
-            # due to the prior for loop breaking at the start of the 
-            # next environmental variable.
-            finish_line = pending_current_line_nm - 1
-
-            # We now parse the range of entries for the environmental key and 
-            # value.
-            _parse_env_variable(records[start_line:(finish_line+1)],env_dict)
+    try:
+        env_dict = parse_env_output(env_output)
+    except ValueError as error:
+        message = "Error in parsing the environment variables.\n" + str(error)
+        a_machine.logger.doCriticalLogging(message)
+        raise BaseMachine.SetBuildRTEError(message)
+    a_machine.logger.doInfoLogging(f"Parsed {len(env_dict)} environment variables from {filename}.")
 
-        # The current line now is now equal to pending_current_line_nm.
-        current_line_nm = pending_current_line_nm
+    if rte_cache:
+        rte_cache.store(rte_key, parent_env, env_dict, instance_paths)
 
     return env_dict
 
+def _get_instance_paths(a_machine):
+    """Returns the paths of the test instance, which the runtime environment cache replaces by placeholders."""
+    apptest = a_machine.apptest
+    return {'TEST_BUILD_DIR' : apptest.get_path_to_workspace_build(),
+            'TEST_WORK_DIR' : apptest.get_path_to_workspace_run(),
+            'TEST_STATUS_DIR' : apptest.get_path_to_status(),
+            'TEST_RUNARCHIVE_DIR' : apptest.get_path_to_runarchive(),
+            'TEST_SCRIPTS_DIR' : apptest.get_path_to_scripts(),
+            'APP_SOURCE_DIR' : apptest.get_path_to_source()}
+
 def build_executable(a_machine, new_env):
     """ Return the status of the build. Runs the build command.
 
@@ -387,42 +308,31 @@ def build_executable(a_machine, new_env):
     function_name = inspect.getframeinfo(frame).function
     messloc = "In function {functionname}:".format(functionname=function_name ) 
 
-    # Update the build environment
-    env_vars = a_machine.test_config.test_environment
-    message = ""
-    for e in env_vars:
-        v = env_vars[e]
-        eu = e.upper()
-        #print("Setting env var", eu, "=", v)
-        os.putenv(eu, v)
-        message += f"Set build environment variable {eu}={v}\n"
-    if new_env:
-        for e in new_env:
-            v = new_env[e]
-            eu = e.upper()
-            os.putenv(eu, v)
-            message += f"Set build environment variable {eu}={v}\n"
-    a_machine.logger.doInfoLogging(message)
+    # The build environment
+    build_env = _get_test_environment(a_machine, new_env, "build")
 
     # We get the command for bulding the binary.
     buildcmd = a_machine.test_config.get_build_command()
     message = f"{messloc} The build command: {buildcmd}"
     a_machine.logger.doInfoLogging(message)
 
+    # The build command is killed if it runs past RGT_BUILD_TIMEOUT.
     if a_machine.separate_build_stdio:
         build_std_out = "output_build.stdout.txt"
         build_std_err = "output_build.stderr.txt"
-        with open(build_std_out,"w") as build_std_out :
-            with open(build_std_err,"w") as build_std_err :
-                p = subprocess.Popen(buildcmd, shell=True, stdout=build_std_out, stderr=build_std_err)
-                p.wait()
-                build_exit_status = p.returncode
     else:
-        build_out = "output_build.txt"
-        with open(build_out,"w") as build_out :
-            p = subprocess.Popen(buildcmd, shell=True, stdout=build_out, stderr=subprocess.STDOUT)
-            p.wait()
-            build_exit_status = p.returncode
+        build_std_out = "output_build.txt"
+        build_std_err = None
+    result = run_supervised(buildcmd, build_std_out, build_std_err, env=build_env,
+                            timeout=get_timeout('build'), live_output=get_live_output(), name='build')
+    a_machine.process_results['build'] = result
+    if result.timed_out:
+        message = f"{messloc} The build command was killed after running past its time limit."
+        a_machine.logger.doCriticalLogging(message)
+
+    message = f"{messloc} The build command resource usage: {result}"
+    a_machine.logger.doInfoLogging(message)
+    build_exit_status = result.exit_status
 
     return build_exit_status
 
@@ -432,26 +342,12 @@ def submit_batch_script(a_machine, new_env):
     function_name = inspect.getframeinfo(frame).function
     messloc = "In function {functionname}:".format(functionname=function_name) 
 
-    # Update the batch submission environment
-    env_vars = a_machine.test_config.test_environment
-    message = ""
-    for e in env_vars:
-        v = env_vars[e]
-        eu = e.upper()
-        #print("Setting env var", eu, "=", v)
-        os.putenv(eu, v)
-        message += f"Set batch environment variable {eu}={v}\n"
-    if new_env:
-        for e in new_env:
-            v = new_env[e]
-            eu = e.upper()
-            os.putenv(eu, v)
-            message += f"Set batch environment variable {eu}={v}\n"
-    a_machine.logger.doInfoLogging(message)
+    # The batch submission environment
+    batch_env = _get_test_environment(a_machine, new_env, "batch")
 
     # Submit the test's batch script
     batch_script = a_machine.test_config.get_batch_file()
-    submit_exit_value = a_machine.submit_to_scheduler(batch_script)
+    submit_exit_value = a_machine.submit_to_scheduler(batch_script, env=batch_env)
 
     message = f"{messloc} Submitted batch script {batch_script} with exit status of {submit_exit_value}."
     return submit_exit_value
@@ -462,6 +358,31 @@ def submit_batch_script(a_machine, new_env):
 #                                                    -
 #-----------------------------------------------------
 
+def _get_test_environment(a_machine, new_env, kind):
+    """ Returns the environment of the build or submit command of the test.
+
+    The environment of the harness is updated with the [EnvVars] of the
+    test, then with new_env. It is passed to the command instead of being
+    set in the harness process, so it does not leak into the commands of
+    the next tests run by the same process.
+    """
+    env = dict(os.environ)
+    message = ""
+    env_vars = a_machine.test_config.test_environment
+    for e in env_vars:
+        v = env_vars[e]
+        eu = e.upper()
+        env[eu] = v
+        message += f"Set {kind} environment variable {eu}={v}\n"
+    if new_env:
+        for e in new_env:
+            v = new_env[e]
+            eu = e.upper()
+            env[eu] = v
+            message += f"Set {kind} environment variable {eu}={v}\n"
+    a_machine.logger.doInfoLogging(message)
+    return env
+
 def _form_proper_command_line(path_to_scripts,command_line):
     args = shlex.split(command_line)
     proper_command = path_to_scripts
@@ -472,17 +393,50 @@ def _form_proper_command_line(path_to_scripts,command_line):
             proper_command = proper_command + " " + args[ip]
     return proper_command
 
-def _parse_env_variable(records,new_env):
-    new_record = ""
-    for (ip,tmp_line) in enumerate(records):
-        if ip == 0 :
-            search = LinuxEnvRegxp.env_variable_regxp.search(tmp_line)
-            key=search.group('key')
-            tmp_value = search.group('value')
-        else:
-            tmp_value = tmp_line
-        new_record += tmp_value
+def parse_env_output(env_output):
+    """ Returns the dictionary of the environment variables printed by env -0, or by env.
 
-    new_env[key] = new_record
+    The output of env -0 is split at the NUL characters. Without NUL
+    characters, the output of env is parsed line by line: a line matching
+    LinuxEnvRegxp starts a new variable, and the other lines continue the
+    value of the previous one. An empty value then continues the previous
+    variable, as it is not told apart from a line of a multiline value.
 
-    return new_env 
+    Parameters
+    ----------
+    env_output : str
+        The output of the env command.
+
+    Returns
+    -------
+    dict
+        A dictionary obj["env_key"] = env_value.
+    """
+    env_dict = {}
+    if '\0' in env_output:
+        for record in env_output.split('\0'):
+            if record:
+                (key, sep, value) = record.partition('=')
+                env_dict[key] = value
+        return env_dict
+
+    if env_output.endswith('\n'):
+        env_output = env_output[:-1]
+    if not env_output:
+        return env_dict
+
+    key = None
+    value_lines = []
+    for (line_nm, line) in enumerate(env_output.split('\n')):
+        search = LinuxEnvRegxp.env_variable_regxp.search(line)
+        if search:
+            if key is not None:
+                env_dict[key] = '\n'.join(value_lines)
+            key = search.group('key')
+            value_lines = [search.group('value')]
+        elif key is not None:
+            value_lines.append(line)
+        else:
+            raise ValueError(f"Line #{line_nm} does not start an environment variable:\n{line}")
+    env_dict[key] = '\n'.join(value_lines)
+    return env_dict
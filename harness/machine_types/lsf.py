@@ -4,8 +4,6 @@
 #
 #
 import os
-import shlex
-import subprocess
 import re
 
 from .base_scheduler import BaseScheduler
@@ -15,6 +13,28 @@ class LSF(BaseScheduler):
 
     """ LSF class represents an LSF scheduler. """
 
+    # The job states of bjobs. UNKWN is reported while the
+    # execution host is unreachable, which may recover.
+    JOB_STATES = {'PEND' : BaseScheduler.JOB_STATE_PENDING,
+                  'PSUSP' : BaseScheduler.JOB_STATE_PENDING,
+                  'WAIT' : BaseScheduler.JOB_STATE_PENDING,
+                  'PROV' : BaseScheduler.JOB_STATE_RUNNING,
+                  'RUN' : BaseScheduler.JOB_STATE_RUNNING,
+                  'USUSP' : BaseScheduler.JOB_STATE_RUNNING,
+                  'SSUSP' : BaseScheduler.JOB_STATE_RUNNING,
+                  'UNKWN' : BaseScheduler.JOB_STATE_RUNNING,
+                  'DONE' : BaseScheduler.JOB_STATE_COMPLETED,
+                  'EXIT' : BaseScheduler.JOB_STATE_FAILED,
+                  'ZOMBI' : BaseScheduler.JOB_STATE_FAILED}
+
+    QUEUE_OPTION = '-q'
+    ACCOUNT_OPTION = '-P'
+
+    DIRECTIVE_PREFIX = '#BSUB'
+    PER_TEST_DIRECTIVE_OPTIONS = ('-J', '-o', '-oo', '-e', '-eo', '-cwd')
+    ARRAY_INDEX_VARIABLE = 'LSB_JOBINDEX'
+    ARRAY_FIRST_INDEX = 1
+
     def __init__(self):
         self.__name = 'LSF'
         self.__submitCmd = 'bsub'
@@ -29,58 +49,39 @@ class LSF(BaseScheduler):
                                self.__walltimeOpt, self.__numTasksOpt, self.__jobNameOpt,
                                self.__templateFile)
 
-    def submit_job(self, batchfilename):
-        print("Submitting job from LSF class using batchfilename " + batchfilename)
-
-        qargs = ""
-        if 'RGT_SUBMIT_QUEUE' in os.environ:
-            qargs += " -q " + os.environ.get('RGT_SUBMIT_QUEUE')
-        elif 'RGT_BATCH_QUEUE' in os.environ:
-            qargs += " -q " + os.environ.get('RGT_BATCH_QUEUE')
-
-        if 'RGT_SUBMIT_ARGS' in os.environ:
-            qargs += " " + os.environ.get('RGT_SUBMIT_ARGS')
-
-        if 'RGT_SUBMIT_ACCT' in os.environ:
-            qargs += " -P " + os.environ.get('RGT_SUBMIT_ACCT')
-        elif 'RGT_PROJECT_ID' in os.environ:
-            qargs += " -P " + os.environ.get('RGT_PROJECT_ID')
-
-        qcommand = self.__submitCmd + " " + qargs + " " + batchfilename
-        print(qcommand)
-
-        args = shlex.split(qcommand)
-        temp_stdout = "submit.out"
-        temp_stderr = "submit.err"
-
-        submit_stdout = open(temp_stdout,"w")
-        submit_stderr = open(temp_stderr,"w")
-
-        # We no longer need 'bsub <' since we are using the OLCF bsub
-        #jobfileobj = open(batchfilename,"r")
-        #p = subprocess.Popen(args,stdout=submit_stdout,stderr=submit_stderr,stdin=jobfileobj)
-        #jobfileobj.close()
-
-        p = subprocess.Popen(args,stdout=submit_stdout,stderr=submit_stderr)
-        p.wait()
-
-        submit_stdout.close()
-        submit_stderr.close()
-
-        submit_stdout = open(temp_stdout,"r")
-        records = submit_stdout.readlines()
-        submit_stdout.close()
-
-        if p.returncode == 0:
-            jobid_pattern = re.compile('\d+')
-            jobid = jobid_pattern.findall(records[0])[0]
-            self.set_job_id(jobid)
-            print("LSF jobID = ",self.get_job_id())
-        else:
-            with open(temp_stderr,"r") as submit_stderr:
-                print(submit_stderr.read())
-
-        return p.returncode
+    def get_array_options(self, num_tasks):
+        return ['-J', f'rgt_pack[{self.ARRAY_FIRST_INDEX}-{self.ARRAY_FIRST_INDEX + num_tasks - 1}]']
+
+    def get_output_directives(self, path_prefix):
+        return [f'{self.DIRECTIVE_PREFIX} -o {path_prefix}.%J_%I.out',
+                f'{self.DIRECTIVE_PREFIX} -e {path_prefix}.%J_%I.err']
+
+    def scale_walltime_directive(self, directive, factor):
+        (option, value) = self._get_directive_option(directive)
+        if option != '-W' or value is None:
+            return None
+        try:
+            minutes = 0
+            for field in value.split(':'):
+                minutes = minutes * 60 + int(field)
+        except ValueError:
+            return None
+        (hours, minutes) = divmod(minutes * factor, 60)
+        return f"{self.DIRECTIVE_PREFIX} -W {hours}:{minutes:02d}"
+
+    def _job_state_commands(self, job_ids):
+        return [[self.__statusCmd, '-a', '-noheader', '-o', 'jobid stat'] + list(job_ids)]
+
+    def _parse_job_states(self, stdout, stderr):
+        states = {}
+        for line in stdout.splitlines():
+            words = line.split()
+            if len(words) >= 2 and words[0].isdigit():
+                states[words[0]] = LSF.JOB_STATES.get(words[1], BaseScheduler.JOB_STATE_RUNNING)
+        # bjobs reports 'Job <1234> is not found' for jobs it has forgotten.
+        for job_id in re.findall(r'Job <(\d+)> is not found', stderr):
+            states[job_id] = BaseScheduler.JOB_STATE_UNKNOWN
+        return states
 
     def set_job_id_from_environ(self):
         print("Setting job id from environment in LSF class")
@@ -5,14 +5,36 @@
 #
 
 import os
-import shlex
-import subprocess
 import re
 
 from .base_scheduler import BaseScheduler
 
 class PBS(BaseScheduler):
 
+    # The job states of qstat. qstat does not report whether a finished
+    # job failed.
+    JOB_STATES = {'Q' : BaseScheduler.JOB_STATE_PENDING,
+                  'H' : BaseScheduler.JOB_STATE_PENDING,
+                  'W' : BaseScheduler.JOB_STATE_PENDING,
+                  'T' : BaseScheduler.JOB_STATE_PENDING,
+                  'M' : BaseScheduler.JOB_STATE_PENDING,
+                  'R' : BaseScheduler.JOB_STATE_RUNNING,
+                  'E' : BaseScheduler.JOB_STATE_RUNNING,
+                  'B' : BaseScheduler.JOB_STATE_RUNNING,
+                  'S' : BaseScheduler.JOB_STATE_RUNNING,
+                  'U' : BaseScheduler.JOB_STATE_RUNNING,
+                  'F' : BaseScheduler.JOB_STATE_COMPLETED,
+                  'C' : BaseScheduler.JOB_STATE_COMPLETED,
+                  'X' : BaseScheduler.JOB_STATE_COMPLETED}
+
+    QUEUE_OPTION = '-q'
+    ACCOUNT_OPTION = '-A'
+
+    DIRECTIVE_PREFIX = '#PBS'
+    PER_TEST_DIRECTIVE_OPTIONS = ('-N', '-o', '-e')
+    ARRAY_INDEX_VARIABLE = 'PBS_ARRAY_INDEX'
+    ARRAY_FIRST_INDEX = 0
+
     def __init__(self):
         self.__name = 'PBS'
         self.__submitCmd = 'qsub'
@@ -27,53 +49,56 @@ class PBS(BaseScheduler):
                                self.__walltimeOpt, self.__numTasksOpt, self.__jobNameOpt,
                                self.__templateFile)
 
-    def submit_job(self, batchfilename):
-        print("Submitting job from PBS class using batchfilename " + batchfilename)
-
-        qargs = ""
-        if 'RGT_SUBMIT_QUEUE' in os.environ:
-            qargs += " -q " + os.environ.get('RGT_SUBMIT_QUEUE')
-        elif 'RGT_BATCH_QUEUE' in os.environ:
-            qargs += " -q " + os.environ.get('RGT_BATCH_QUEUE')
-
-        if 'RGT_SUBMIT_ARGS' in os.environ:
-            qargs += " " + os.environ.get('RGT_SUBMIT_ARGS')
-
-        if 'RGT_SUBMIT_ACCT' in os.environ:
-            qargs += " -A " + os.environ.get('RGT_SUBMIT_ACCT')
-        elif 'RGT_PROJECT_ID' in os.environ:
-            qargs += " -A " + os.environ.get('RGT_PROJECT_ID')
-
-        qcommand = self.__submitCmd + " " + qargs + " " + batchfilename
-        print(qcommand)
-
-        args = shlex.split(qcommand)
-        temp_stdout = "submit.out"
-        temp_stderr = "submit.err"
-
-        submit_stdout = open(temp_stdout,"w")
-        submit_stderr = open(temp_stderr,"w")
-
-        p = subprocess.Popen(args,stdout=submit_stdout,stderr=submit_stderr)
-        p.wait()
-
-        submit_stdout.close()
-        submit_stderr.close()
-
-        submit_stdout = open(temp_stdout,"r")
-        records = submit_stdout.readlines()
-        submit_stdout.close()
-
-        if p.returncode == 0:
-            jobid_pattern = re.compile('\d+')
-            jobid = jobid_pattern.findall(records[0])[0]
-            self.set_job_id(jobid)
-            print("PBS jobID = ",self.get_job_id())
+    def get_array_options(self, num_tasks):
+        # PBS Pro job arrays have at least 2 subjobs.
+        if num_tasks < 2:
+            return None
+        return ['-J', f'{self.ARRAY_FIRST_INDEX}-{self.ARRAY_FIRST_INDEX + num_tasks - 1}']
+
+    def get_output_directives(self, path_prefix):
+        return [f'{self.DIRECTIVE_PREFIX} -o {path_prefix}.out',
+                f'{self.DIRECTIVE_PREFIX} -e {path_prefix}.err']
+
+    def scale_walltime_directive(self, directive, factor):
+        (option, value) = self._get_directive_option(directive)
+        if option != '-l' or value is None:
+            return None
+        resources = value.split(',')
+        for (index, resource) in enumerate(resources):
+            if resource.startswith('walltime='):
+                break
         else:
-            with open(temp_stderr,"r") as submit_stderr:
-                print(submit_stderr.read())
-
-        return p.returncode
+            return None
+        try:
+            seconds = 0
+            for field in resource[len('walltime='):].split(':'):
+                seconds = seconds * 60 + int(field)
+        except ValueError:
+            return None
+        (minutes, seconds) = divmod(seconds * factor, 60)
+        (hours, minutes) = divmod(minutes, 60)
+        resources[index] = f"walltime={hours:02d}:{minutes:02d}:{seconds:02d}"
+        return f"{self.DIRECTIVE_PREFIX} -l {','.join(resources)}"
+
+    def _job_state_commands(self, job_ids):
+        # -x includes finished jobs kept in the PBS Pro job history.
+        return [[self.__statusCmd, '-x'] + list(job_ids)]
+
+    def _parse_job_states(self, stdout, stderr):
+        states = {}
+        if stdout.lstrip().startswith('<'):
+            # Torque answers -x with XML.
+            for (job_id, pbs_state) in re.findall(r'<Job_Id>([^<]*)</Job_Id>.*?<job_state>([^<]*)</job_state>',
+                                                  stdout, flags=re.DOTALL):
+                states[job_id.split('.')[0]] = PBS.JOB_STATES.get(pbs_state, BaseScheduler.JOB_STATE_RUNNING)
+        else:
+            for line in stdout.splitlines():
+                words = line.split()
+                if len(words) >= 6 and words[0][:1].isdigit():
+                    states[words[0].split('.')[0]] = PBS.JOB_STATES.get(words[4], BaseScheduler.JOB_STATE_RUNNING)
+        for job_id in re.findall(r'Unknown Job Id (?:Error )?(\d+)', stderr):
+            states[job_id] = BaseScheduler.JOB_STATE_UNKNOWN
+        return states
 
     def set_job_id_from_environ(self):
         print("Setting job id from environment in PBS class")
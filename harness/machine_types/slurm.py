@@ -5,9 +5,6 @@
 #
 
 import os
-import shlex
-import subprocess
-import re
 
 from .base_scheduler import BaseScheduler
 
@@ -15,6 +12,39 @@ class SLURM(BaseScheduler):
 
     """ SLURM class represents an SLURM scheduler. """
 
+    # The job states of sacct and squeue.
+    JOB_STATES = {'PENDING' : BaseScheduler.JOB_STATE_PENDING,
+                  'REQUEUED' : BaseScheduler.JOB_STATE_PENDING,
+                  'REQUEUE_HOLD' : BaseScheduler.JOB_STATE_PENDING,
+                  'REQUEUE_FED' : BaseScheduler.JOB_STATE_PENDING,
+                  'CONFIGURING' : BaseScheduler.JOB_STATE_RUNNING,
+                  'RUNNING' : BaseScheduler.JOB_STATE_RUNNING,
+                  'COMPLETING' : BaseScheduler.JOB_STATE_RUNNING,
+                  'RESIZING' : BaseScheduler.JOB_STATE_RUNNING,
+                  'SUSPENDED' : BaseScheduler.JOB_STATE_RUNNING,
+                  'STOPPED' : BaseScheduler.JOB_STATE_RUNNING,
+                  'SIGNALING' : BaseScheduler.JOB_STATE_RUNNING,
+                  'STAGE_OUT' : BaseScheduler.JOB_STATE_RUNNING,
+                  'COMPLETED' : BaseScheduler.JOB_STATE_COMPLETED,
+                  'CANCELLED' : BaseScheduler.JOB_STATE_FAILED,
+                  'FAILED' : BaseScheduler.JOB_STATE_FAILED,
+                  'NODE_FAIL' : BaseScheduler.JOB_STATE_FAILED,
+                  'BOOT_FAIL' : BaseScheduler.JOB_STATE_FAILED,
+                  'TIMEOUT' : BaseScheduler.JOB_STATE_FAILED,
+                  'OUT_OF_MEMORY' : BaseScheduler.JOB_STATE_FAILED,
+                  'PREEMPTED' : BaseScheduler.JOB_STATE_FAILED,
+                  'DEADLINE' : BaseScheduler.JOB_STATE_FAILED,
+                  'REVOKED' : BaseScheduler.JOB_STATE_FAILED,
+                  'SPECIAL_EXIT' : BaseScheduler.JOB_STATE_FAILED}
+
+    QUEUE_OPTION = '-p'
+    ACCOUNT_OPTION = '-A'
+
+    DIRECTIVE_PREFIX = '#SBATCH'
+    PER_TEST_DIRECTIVE_OPTIONS = ('-J', '--job-name', '-o', '--output', '-e', '--error', '-D', '--chdir')
+    ARRAY_INDEX_VARIABLE = 'SLURM_ARRAY_TASK_ID'
+    ARRAY_FIRST_INDEX = 0
+
     def __init__(self):
         self.__name = 'SLURM'
         self.__submitCmd = 'sbatch'
@@ -29,53 +59,49 @@ class SLURM(BaseScheduler):
                                self.__walltimeOpt, self.__numTasksOpt, self.__jobNameOpt,
                                self.__templateFile)
 
-    def submit_job(self, batchfilename):
-        print("Submitting job from SLURM class using batchfilename " + batchfilename)
-
-        qargs = ""
-        if 'RGT_SUBMIT_QUEUE' in os.environ:
-            qargs += " -p " + os.environ.get('RGT_SUBMIT_QUEUE')
-        elif 'RGT_BATCH_QUEUE' in os.environ:
-            qargs += " -p " + os.environ.get('RGT_BATCH_QUEUE')
-
-        if 'RGT_SUBMIT_ARGS' in os.environ:
-            qargs += " " + os.environ.get('RGT_SUBMIT_ARGS')
-
-        if 'RGT_SUBMIT_ACCT' in os.environ:
-            qargs += " -A " + os.environ.get('RGT_SUBMIT_ACCT')
-        elif 'RGT_PROJECT_ID' in os.environ:
-            qargs += " -A " + os.environ.get('RGT_PROJECT_ID')
-
-        qcommand = self.__submitCmd + " " + qargs + " " + batchfilename
-        print(qcommand)
-
-        args = shlex.split(qcommand)
-        temp_stdout = "submit.out"
-        temp_stderr = "submit.err"
-
-        submit_stdout = open(temp_stdout,"w")
-        submit_stderr = open(temp_stderr,"w")
-
-        p = subprocess.Popen(args, stdout=submit_stdout, stderr=submit_stderr)
-        p.wait()
-
-        submit_stdout.close()
-        submit_stderr.close()
-
-        submit_stdout = open(temp_stdout,"r")
-        records = submit_stdout.readlines()
-        submit_stdout.close()
-
-        if p.returncode == 0:
-            jobid_pattern = re.compile('\d+')
-            jobid = jobid_pattern.findall(records[0])[0]
-            self.set_job_id(jobid)
-            print("SLURM jobID = ",self.get_job_id())
-        else:
-            with open(temp_stderr,"r") as submit_stderr:
-                print(submit_stderr.read())
-
-        return p.returncode
+    def get_array_options(self, num_tasks):
+        return [f'--array={self.ARRAY_FIRST_INDEX}-{self.ARRAY_FIRST_INDEX + num_tasks - 1}']
+
+    def get_array_task_job_id(self, job_id, index):
+        return f"{job_id}_{index}"
+
+    def get_output_directives(self, path_prefix):
+        return [f'{self.DIRECTIVE_PREFIX} -o {path_prefix}.%A_%a.out',
+                f'{self.DIRECTIVE_PREFIX} -e {path_prefix}.%A_%a.err']
+
+    def scale_walltime_directive(self, directive, factor):
+        (option, value) = self._get_directive_option(directive)
+        if option not in ('-t', '--time') or value is None:
+            return None
+        if value.upper() in ('UNLIMITED', 'INFINITE'):
+            return directive
+        try:
+            seconds = _parse_time(value)
+        except ValueError:
+            return None
+        (minutes, seconds) = divmod(seconds * factor, 60)
+        (hours, minutes) = divmod(minutes, 60)
+        (days, hours) = divmod(hours, 24)
+        return f"{self.DIRECTIVE_PREFIX} --time={days}-{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+    def _job_state_commands(self, job_ids):
+        # sacct also reports jobs that have left the queue. squeue is used
+        # where job accounting is not available.
+        job_list = ','.join(job_ids)
+        return [['sacct', '--noheader', '--parsable2', '--allocations',
+                 '--format=JobID,State', '--jobs', job_list],
+                [self.__statusCmd, '--noheader', '--format=%i|%T', '--jobs', job_list]]
+
+    def _parse_job_states(self, stdout, stderr):
+        states = {}
+        for line in stdout.splitlines():
+            words = line.strip().split('|')
+            if len(words) < 2 or not words[1]:
+                continue
+            # sacct reports, e.g., 'CANCELLED by 1234'.
+            slurm_state = words[1].split()[0].rstrip('+')
+            states[words[0]] = SLURM.JOB_STATES.get(slurm_state, BaseScheduler.JOB_STATE_RUNNING)
+        return states
 
     def set_job_id_from_environ(self):
         print("Setting job id from environment in SLURM class")
@@ -86,5 +112,22 @@ class SLURM(BaseScheduler):
             print(f'{jobvar} not set in environment!')
 
 
+def _parse_time(value):
+    """Returns the seconds of a time limit of sbatch, e.g. 'minutes', 'hours:minutes:seconds' or 'days-hours:minutes'."""
+    if '-' in value:
+        (days, value) = value.split('-', 1)
+        # With days, the fields are hours[:minutes[:seconds]].
+        fields = [int(field) for field in value.split(':')] + [0, 0]
+        return ((int(days) * 24 + fields[0]) * 60 + fields[1]) * 60 + fields[2]
+    fields = [int(field) for field in value.split(':')]
+    if len(fields) == 1:
+        return fields[0] * 60
+    if len(fields) == 2:
+        return fields[0] * 60 + fields[1]
+    if len(fields) == 3:
+        return (fields[0] * 60 + fields[1]) * 60 + fields[2]
+    raise ValueError(f"Invalid time limit {value}")
+
+
 if __name__ == '__main__':
     print('This is the SLURM scheduler class')
@@ -5,6 +5,7 @@ import sys
 import getopt
 
 from libraries.layout_of_apps_directory import apptest_layout
+from libraries.status_file import StatusFile, read_status_file_lines
 
 #
 # Author: Arnold Tharrington (arnoldt@ornl.gov)
@@ -12,6 +13,8 @@ from libraries.layout_of_apps_directory import apptest_layout
 # Oak Ridge National Laboratory
 #
 
+# The index of the unique id in the words of a status file record.
+UNIQUE_ID_COLUMN = StatusFile.STATUS_COLUMNS[StatusFile.STATUS_COLUMN_UNIQUE]
 
 def main():
 
@@ -53,22 +56,17 @@ def main():
         rerun_checks(test1)
 
 def get_list_of_run_dirs(test1):
-    #Open the status file and read.
+    #Read the records of the status file, with its journal or shards applied.
     path_to_status_file = os.path.join(test1, apptest_layout.test_status_dirname, apptest_layout.test_status_filename)
-    fileobj = open(path_to_status_file)
-    lines = fileobj.readlines()
-    fileobj.close()
-
-    #Get the number of lines in the status file.
-    nlines = len(lines)
+    lines = read_status_file_lines(path_to_status_file)
 
     #Get the names of the rundirs.
     rundirs = []
-    for ip in range(nlines-5):
-        jp = ip + 5
-        tmpline = lines[jp]
+    for tmpline in lines:
+        if StatusFile.ignore_line(tmpline):
+            continue
         words = tmpline.split()
-        rundirs = rundirs + [words[1]]
+        rundirs = rundirs + [words[UNIQUE_ID_COLUMN]]
 
     return rundirs
 
@@ -158,20 +156,18 @@ def printsummary(test1):
     #--Get path to rgt_status.txt file.
     path1 = os.path.join("..", apptest_layout.test_status_dirname, apptest_layout.test_status_filename)
 
-    #--Read the records of the rgt_status.txt file
-    fileobj = open(path1,'r')
-    filerecords = fileobj.readlines()
-    fileobj.close()
+    #--Read the records of the rgt_status.txt file, with its journal
+    #--or shards applied.
+    filerecords = read_status_file_lines(path1)
 
-    #--The 6th record is where we start reading.
-    #--We only want the 2-6 fields. Don't forget
-    #--we offset by -1 because python  lists start with
-    #--index 0.
-    for record in filerecords[5:]:
+    #--Skip the header and comment lines.
+    for record in filerecords:
+        if StatusFile.ignore_line(record):
+            continue
         #--Remove the trailing newlines and beginning whitespace.
         tmprecord = record.strip()
         words = tmprecord.split()
-        uid = words[1]
+        uid = words[UNIQUE_ID_COLUMN]
 
         #--Increment the counters as appropiate.
         nm_total = nm_total + 1
@@ -235,16 +231,14 @@ def get_dict_of_completed_runs():
     #--Get path to rgt_status.txt file.
     path1 = os.path.join("..", apptest_layout.test_status_dirname, apptest_layout.test_status_filename)
 
-    #--Read the records of the rgt_status.txt file
-    fileobj = open(path1,'r')
-    filerecords = fileobj.readlines()
-    fileobj.close()
+    #--Read the records of the rgt_status.txt file, with its journal
+    #--or shards applied.
+    filerecords = read_status_file_lines(path1)
 
-    #--The 6th record is where we start reading.
-    #--We only want the 2-6 fields. Don't forget
-    #--we offset by -1 because python  lists start with
-    #--index 0.
-    for record in filerecords[5:]:
+    #--Skip the header and comment lines.
+    for record in filerecords:
+        if StatusFile.ignore_line(record):
+            continue
         #--Remove the trailing newlines and beginning whitespace.
         tmprecord = record.strip()
         words = tmprecord.split()
@@ -254,7 +248,7 @@ def get_dict_of_completed_runs():
         if words[-1] == "***": #Not completed
             pass
         else:                  #Completed
-            uid = words[1]
+            uid = words[UNIQUE_ID_COLUMN]
             cr_dict[uid] = tmprecord
 
     return cr_dict